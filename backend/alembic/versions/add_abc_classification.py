@@ -0,0 +1,36 @@
+"""add_abc_classification
+
+Revision ID: add_abc_classification
+Revises: add_reorder_suggestions
+Create Date: 2025-08-13 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_abc_classification'
+down_revision = 'add_reorder_suggestions'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Classe ABC gravada pela análise de Pareto (filtro nas listagens)
+    op.add_column('product_skus', sa.Column('abc_class', sa.String(length=1), nullable=True))
+    op.create_index(op.f('ix_product_skus_abc_class'), 'product_skus', ['abc_class'], unique=False)
+
+    op.add_column('customers', sa.Column('abc_class', sa.String(length=1), nullable=True))
+    op.create_index('ix_customers_company_id_abc_class', 'customers', ['company_id', 'abc_class'], unique=False)
+
+    # Agregação das contas a receber por cliente
+    op.create_index('ix_accounts_receivable_customer_id_entry_date', 'accounts_receivable',
+                    ['customer_id', 'entry_date'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_accounts_receivable_customer_id_entry_date', table_name='accounts_receivable')
+    op.drop_index('ix_customers_company_id_abc_class', table_name='customers')
+    op.drop_column('customers', 'abc_class')
+    op.drop_index(op.f('ix_product_skus_abc_class'), table_name='product_skus')
+    op.drop_column('product_skus', 'abc_class')
@@ -0,0 +1,44 @@
+"""add_average_cost
+
+Revision ID: add_average_cost
+Revises: add_effective_stock
+Create Date: 2025-08-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from app.models.catalog_change import change_log_functions
+
+# revision identifiers, used by Alembic.
+revision = 'add_average_cost'
+down_revision = 'add_effective_stock'
+branch_labels = None
+depends_on = None
+
+PRODUCT_IGNORED_COLUMNS = (
+    "updated_at", "search_vector", "cost_price", "sale_price",
+    "current_stock", "reserved_stock", "effective_stock", "min_stock", "max_stock",
+)
+# Custo médio é interno: não gera alteração de cadastro no feed
+SKU_IGNORED_COLUMNS = (
+    "updated_at", "abc_class", "cost_price", "average_cost", "sale_price", "wholesale_price",
+    "promotional_price", "promotional_starts_at", "promotional_ends_at",
+    "current_stock", "reserved_stock", "effective_stock", "minimum_stock", "maximum_stock",
+)
+
+
+def upgrade():
+    # Custo médio ponderado móvel (preenchido por scripts/backfill_average_cost.py)
+    op.add_column('product_skus', sa.Column('average_cost', sa.Float(), nullable=True))
+    op.add_column('stock_branches', sa.Column('average_cost', sa.Float(), nullable=True))
+
+    op.execute(change_log_functions(PRODUCT_IGNORED_COLUMNS, SKU_IGNORED_COLUMNS))
+
+
+def downgrade():
+    op.execute(change_log_functions(
+        PRODUCT_IGNORED_COLUMNS, tuple(column for column in SKU_IGNORED_COLUMNS if column != "average_cost")
+    ))
+
+    op.drop_column('stock_branches', 'average_cost')
+    op.drop_column('product_skus', 'average_cost')
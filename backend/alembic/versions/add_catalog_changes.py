@@ -0,0 +1,64 @@
+"""add_catalog_changes
+
+Revision ID: add_catalog_changes
+Revises: partition_stock_movements_by_month
+Create Date: 2025-08-15 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from app.models.catalog_change import change_log_functions, CHANGE_LOG_TRIGGERS
+
+# revision identifiers, used by Alembic.
+revision = 'add_catalog_changes'
+down_revision = 'partition_stock_movements_by_month'
+branch_labels = None
+depends_on = None
+
+# Colunas fora do bit de cadastro nesta revisão
+PRODUCT_IGNORED_COLUMNS = (
+    "updated_at", "search_vector", "cost_price", "sale_price",
+    "current_stock", "reserved_stock", "min_stock", "max_stock",
+)
+SKU_IGNORED_COLUMNS = (
+    "updated_at", "abc_class", "cost_price", "sale_price", "wholesale_price",
+    "promotional_price", "promotional_starts_at", "promotional_ends_at",
+    "current_stock", "reserved_stock", "minimum_stock", "maximum_stock",
+)
+
+
+def upgrade():
+    # Registro de alterações de produtos/SKUs para o feed incremental (integração com marketplaces)
+    op.create_table('catalog_changes',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('company_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('entity', sa.String(length=10), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('fields', sa.SmallInteger(), nullable=False),
+        sa.Column('changed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['company_id'], ['companies.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_catalog_changes_company_id_id', 'catalog_changes', ['company_id', 'id'], unique=False)
+
+    # fields: 1 = cadastro, 2 = preço, 4 = estoque, 8 = removido
+    op.execute(change_log_functions(PRODUCT_IGNORED_COLUMNS, SKU_IGNORED_COLUMNS))
+
+    # Triggers por comando com tabelas de transição: um INSERT por comando, mesmo em UPDATEs em massa
+    op.execute(CHANGE_LOG_TRIGGERS)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS trg_product_skus_log_delete ON product_skus")
+    op.execute("DROP TRIGGER IF EXISTS trg_product_skus_log_update ON product_skus")
+    op.execute("DROP TRIGGER IF EXISTS trg_product_skus_log_insert ON product_skus")
+    op.execute("DROP TRIGGER IF EXISTS trg_products_log_delete ON products")
+    op.execute("DROP TRIGGER IF EXISTS trg_products_log_update ON products")
+    op.execute("DROP TRIGGER IF EXISTS trg_products_log_insert ON products")
+    op.execute("DROP FUNCTION IF EXISTS product_skus_log_changes()")
+    op.execute("DROP FUNCTION IF EXISTS products_log_changes()")
+
+    op.drop_index('ix_catalog_changes_company_id_id', table_name='catalog_changes')
+    op.drop_table('catalog_changes')
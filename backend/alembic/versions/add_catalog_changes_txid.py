@@ -0,0 +1,33 @@
+"""add_catalog_changes_txid
+
+Revision ID: add_catalog_changes_txid
+Revises: convert_json_to_jsonb
+Create Date: 2025-08-28 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_catalog_changes_txid'
+down_revision = 'convert_json_to_jsonb'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Transação de cada registro: o feed pagina por (txid, id) até o xmin do snapshot.
+    # Registros existentes ficam com o txid da migração (ordenados por id); consumidores
+    # recomeçam de since=0.
+    op.add_column('catalog_changes', sa.Column(
+        'txid', sa.BigInteger(), nullable=False, server_default=sa.text('txid_current()')
+    ))
+    op.drop_index('ix_catalog_changes_company_id_id', table_name='catalog_changes')
+    op.create_index('ix_catalog_changes_company_id_txid_id', 'catalog_changes', ['company_id', 'txid', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_catalog_changes_company_id_txid_id', table_name='catalog_changes')
+    op.create_index('ix_catalog_changes_company_id_id', 'catalog_changes', ['company_id', 'id'])
+    op.drop_column('catalog_changes', 'txid')
@@ -0,0 +1,109 @@
+"""add_effective_stock
+
+Revision ID: add_effective_stock
+Revises: add_catalog_changes
+Create Date: 2025-08-16 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from app.models.catalog_change import change_log_functions
+
+# revision identifiers, used by Alembic.
+revision = 'add_effective_stock'
+down_revision = 'add_catalog_changes'
+branch_labels = None
+depends_on = None
+
+# Colunas fora do bit de cadastro nesta revisão (effective_stock conta como estoque)
+PRODUCT_IGNORED_COLUMNS = (
+    "updated_at", "search_vector", "cost_price", "sale_price",
+    "current_stock", "reserved_stock", "effective_stock", "min_stock", "max_stock",
+)
+SKU_IGNORED_COLUMNS = (
+    "updated_at", "abc_class", "cost_price", "sale_price", "wholesale_price",
+    "promotional_price", "promotional_starts_at", "promotional_ends_at",
+    "current_stock", "reserved_stock", "effective_stock", "minimum_stock", "maximum_stock",
+)
+
+
+def upgrade():
+    # Estoque compartilhado (SKU de estoque + SKUs associados) mantido por trigger
+    op.add_column('product_skus', sa.Column('effective_stock', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('products', sa.Column('effective_stock', sa.Integer(), server_default='0', nullable=False))
+    op.create_index(op.f('ix_product_skus_stock_sku_id'), 'product_skus', ['stock_sku_id'], unique=False)
+    op.create_index('ix_products_company_id_effective_stock', 'products', ['company_id', 'effective_stock'], unique=False)
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION product_skus_refresh_effective_stock()
+        RETURNS trigger AS $$
+        DECLARE
+            v_sku_ids integer[] := ARRAY[]::integer[];
+            v_product_ids integer[] := ARRAY[]::integer[];
+        BEGIN
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                v_sku_ids := v_sku_ids || ARRAY[NEW.id, NEW.stock_sku_id];
+                v_product_ids := v_product_ids || NEW.product_id;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                v_sku_ids := v_sku_ids || ARRAY[OLD.id, OLD.stock_sku_id];
+                v_product_ids := v_product_ids || OLD.product_id;
+            END IF;
+
+            UPDATE product_skus s
+            SET effective_stock = coalesce(s.current_stock, 0) + CASE WHEN s.is_stock_sku THEN coalesce((
+                    SELECT sum(a.current_stock) FROM product_skus a
+                    WHERE a.stock_sku_id = s.id AND a.is_active AND a.id <> s.id
+                ), 0) ELSE 0 END
+            WHERE s.id = ANY(v_sku_ids);
+
+            UPDATE products p
+            SET effective_stock = coalesce((
+                    SELECT sum(s.effective_stock) FROM product_skus s
+                    WHERE s.product_id = p.id AND s.is_active
+                ), 0)
+            WHERE p.id = ANY(v_product_ids || ARRAY(SELECT product_id FROM product_skus WHERE id = ANY(v_sku_ids)));
+
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql;
+    """)
+
+    op.execute("""
+        CREATE TRIGGER trg_product_skus_effective_stock
+        AFTER INSERT OR DELETE OR UPDATE OF current_stock, stock_sku_id, is_active, is_stock_sku, product_id ON product_skus
+        FOR EACH ROW EXECUTE FUNCTION product_skus_refresh_effective_stock()
+    """)
+
+    # Feed de alterações: effective_stock conta como estoque, não como cadastro
+    op.execute(change_log_functions(PRODUCT_IGNORED_COLUMNS, SKU_IGNORED_COLUMNS))
+
+    # Preencher valores existentes
+    op.execute("""
+        UPDATE product_skus s
+        SET effective_stock = coalesce(s.current_stock, 0) + CASE WHEN s.is_stock_sku THEN coalesce((
+                SELECT sum(a.current_stock) FROM product_skus a
+                WHERE a.stock_sku_id = s.id AND a.is_active AND a.id <> s.id
+            ), 0) ELSE 0 END
+    """)
+    op.execute("""
+        UPDATE products p
+        SET effective_stock = t.total
+        FROM (
+            SELECT product_id, sum(effective_stock) AS total
+            FROM product_skus
+            WHERE is_active
+            GROUP BY product_id
+        ) t
+        WHERE t.product_id = p.id
+    """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS trg_product_skus_effective_stock ON product_skus")
+    op.execute("DROP FUNCTION IF EXISTS product_skus_refresh_effective_stock()")
+
+    op.drop_index('ix_products_company_id_effective_stock', table_name='products')
+    op.drop_index(op.f('ix_product_skus_stock_sku_id'), table_name='product_skus')
+    op.drop_column('products', 'effective_stock')
+    op.drop_column('product_skus', 'effective_stock')
@@ -0,0 +1,55 @@
+"""add_nota_fiscal_chave_acesso
+
+Revision ID: add_nota_fiscal_chave_acesso
+Revises: add_nota_fiscal_import_indexes
+Create Date: 2025-08-23 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_nota_fiscal_chave_acesso'
+down_revision = 'add_nota_fiscal_import_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('notas_fiscais', sa.Column('chave_acesso', sa.String(length=44), nullable=True))
+
+    # Chave e protocolo das notas já importadas, a partir do XML armazenado
+    op.execute("""
+        UPDATE notas_fiscais
+        SET chave_acesso = substring(xml_content FROM 'Id="NFe([0-9]{44})"')
+        WHERE xml_content IS NOT NULL
+    """)
+    op.execute("""
+        UPDATE notas_fiscais
+        SET protocolo_autorizacao = substring(xml_content FROM '<nProt>([0-9]+)</nProt>')
+        WHERE xml_content IS NOT NULL AND protocolo_autorizacao IS NULL
+    """)
+
+    # Duplicatas antigas (mesma chave na empresa): a mais recente mantém a chave
+    op.execute("""
+        UPDATE notas_fiscais
+        SET chave_acesso = NULL
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, row_number() OVER (
+                    PARTITION BY company_id, chave_acesso ORDER BY id DESC
+                ) AS position
+                FROM notas_fiscais
+                WHERE chave_acesso IS NOT NULL
+            ) ranked
+            WHERE position > 1
+        )
+    """)
+
+    op.create_index('uq_notas_fiscais_company_id_chave_acesso', 'notas_fiscais', ['company_id', 'chave_acesso'], unique=True)
+
+
+def downgrade():
+    op.drop_index('uq_notas_fiscais_company_id_chave_acesso', table_name='notas_fiscais')
+    op.drop_column('notas_fiscais', 'chave_acesso')
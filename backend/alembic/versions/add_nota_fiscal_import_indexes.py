@@ -0,0 +1,27 @@
+"""add_nota_fiscal_import_indexes
+
+Revision ID: add_nota_fiscal_import_indexes
+Revises: add_sales_orders
+Create Date: 2025-08-22 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_nota_fiscal_import_indexes'
+down_revision = 'add_sales_orders'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Duplicidade do lote em uma consulta e remoção dos produtos das notas sobrescritas
+    op.create_index('ix_notas_fiscais_company_id_numero_serie', 'notas_fiscais', ['company_id', 'numero', 'serie'], unique=False)
+    op.create_index(op.f('ix_notas_fiscais_produtos_nota_fiscal_id'), 'notas_fiscais_produtos', ['nota_fiscal_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_notas_fiscais_produtos_nota_fiscal_id'), table_name='notas_fiscais_produtos')
+    op.drop_index('ix_notas_fiscais_company_id_numero_serie', table_name='notas_fiscais')
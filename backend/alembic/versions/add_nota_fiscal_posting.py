@@ -0,0 +1,53 @@
+"""add_nota_fiscal_posting
+
+Revision ID: add_nota_fiscal_posting
+Revises: add_nota_fiscal_xml_gzip
+Create Date: 2025-08-25 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_nota_fiscal_posting'
+down_revision = 'add_nota_fiscal_xml_gzip'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Nota: duplicatas da fatura e lançamento no estoque/contas a pagar
+    op.add_column('notas_fiscais', sa.Column('duplicatas', sa.JSON(), nullable=True))
+    op.add_column('notas_fiscais', sa.Column('supplier_id', postgresql.UUID(as_uuid=True), nullable=True))
+    op.add_column('notas_fiscais', sa.Column('data_lancamento', sa.DateTime(timezone=True), nullable=True))
+    op.create_foreign_key(
+        'notas_fiscais_supplier_id_fkey', 'notas_fiscais', 'suppliers', ['supplier_id'], ['id']
+    )
+
+    # Itens: EAN do XML e SKU correspondente
+    op.add_column('notas_fiscais_produtos', sa.Column('ean', sa.String(length=14), nullable=True))
+    op.add_column('notas_fiscais_produtos', sa.Column('sku_id', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'notas_fiscais_produtos_sku_id_fkey', 'notas_fiscais_produtos', 'product_skus', ['sku_id'], ['id']
+    )
+
+    # Buscas do lançamento: código do fornecedor e CNPJ (só dígitos)
+    op.create_index('ix_product_skus_supplier_id_supplier_sku', 'product_skus', ['supplier_id', 'supplier_sku'])
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_suppliers_company_id_cnpj_digits
+        ON suppliers (company_id, regexp_replace(cnpj, '[^0-9]', '', 'g'))
+    """)
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_suppliers_company_id_cnpj_digits")
+    op.drop_index('ix_product_skus_supplier_id_supplier_sku', table_name='product_skus')
+    op.drop_constraint('notas_fiscais_produtos_sku_id_fkey', 'notas_fiscais_produtos', type_='foreignkey')
+    op.drop_column('notas_fiscais_produtos', 'sku_id')
+    op.drop_column('notas_fiscais_produtos', 'ean')
+    op.drop_constraint('notas_fiscais_supplier_id_fkey', 'notas_fiscais', type_='foreignkey')
+    op.drop_column('notas_fiscais', 'data_lancamento')
+    op.drop_column('notas_fiscais', 'supplier_id')
+    op.drop_column('notas_fiscais', 'duplicatas')
@@ -0,0 +1,297 @@
+"""add_nota_fiscal_resumo_mensal
+
+Revision ID: add_nota_fiscal_resumo_mensal
+Revises: add_nota_fiscal_posting
+Create Date: 2025-08-26 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_nota_fiscal_resumo_mensal'
+down_revision = 'add_nota_fiscal_posting'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Totais de impostos por mês/tipo/CFOP/NCM/emitente para os relatórios fiscais
+    op.create_table('notas_fiscais_resumo_mensal',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('company_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('mes', sa.Date(), nullable=False),
+        sa.Column('tipo', sa.String(length=20), nullable=False),
+        sa.Column('cfop', sa.String(length=10), nullable=False),
+        sa.Column('ncm', sa.String(length=10), nullable=False),
+        sa.Column('emitente_cnpj', sa.String(length=18), nullable=False),
+        sa.Column('emitente_nome', sa.String(length=255), nullable=False),
+        sa.Column('itens', sa.Integer(), nullable=False),
+        sa.Column('valor_total', sa.Float(), nullable=False),
+        sa.Column('valor_icms', sa.Float(), nullable=False),
+        sa.Column('valor_ipi', sa.Float(), nullable=False),
+        sa.Column('valor_pis', sa.Float(), nullable=False),
+        sa.Column('valor_cofins', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['company_id'], ['companies.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(
+        'uq_notas_fiscais_resumo_mensal_grupo', 'notas_fiscais_resumo_mensal',
+        ['company_id', 'mes', 'tipo', 'cfop', 'ncm', 'emitente_cnpj'], unique=True
+    )
+
+    # Carga inicial a partir dos itens já importados (notas canceladas/denegadas fora)
+    op.execute("""
+        INSERT INTO notas_fiscais_resumo_mensal
+            (company_id, mes, tipo, cfop, ncm, emitente_cnpj, emitente_nome, itens,
+             valor_total, valor_icms, valor_ipi, valor_pis, valor_cofins)
+        SELECT n.company_id, date_trunc('month', n.data_emissao)::date, n.tipo, p.cfop, coalesce(p.ncm, ''),
+               n.emitente_cnpj, max(n.emitente_nome), count(p.id),
+               sum(p.valor_total), sum(p.valor_icms), sum(p.valor_ipi), sum(p.valor_pis), sum(p.valor_cofins)
+        FROM notas_fiscais_produtos p JOIN notas_fiscais n ON n.id = p.nota_fiscal_id
+        WHERE coalesce(n.status, '') NOT IN ('cancelada', 'denegada')
+        GROUP BY 1, 2, 3, 4, 5, 6
+    """)
+
+    # Triggers por comando (tabelas de transição): deltas somados com INSERT ... ON CONFLICT
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notas_fiscais_produtos_refresh_resumo()
+        RETURNS trigger AS $$
+        DECLARE
+            emptied bigint[];
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                WITH delta AS (
+                    SELECT company_id, mes, tipo, cfop, ncm, emitente_cnpj, max(emitente_nome) AS emitente_nome,
+                           sum(sinal) AS itens,
+                           sum(sinal * valor_total) AS valor_total,
+                           sum(sinal * valor_icms) AS valor_icms,
+                           sum(sinal * valor_ipi) AS valor_ipi,
+                           sum(sinal * valor_pis) AS valor_pis,
+                           sum(sinal * valor_cofins) AS valor_cofins
+                    FROM (
+                        SELECT n.company_id, date_trunc('month', n.data_emissao)::date AS mes, n.tipo, p.cfop,
+                               coalesce(p.ncm, '') AS ncm, n.emitente_cnpj, n.emitente_nome, 1 AS sinal,
+                               p.valor_total, p.valor_icms, p.valor_ipi, p.valor_pis, p.valor_cofins
+                        FROM new_rows p JOIN notas_fiscais n ON n.id = p.nota_fiscal_id
+                        WHERE coalesce(n.status, '') NOT IN ('cancelada', 'denegada')
+                    ) itens
+                    GROUP BY company_id, mes, tipo, cfop, ncm, emitente_cnpj
+                ), applied AS (
+                    INSERT INTO notas_fiscais_resumo_mensal AS r
+                        (company_id, mes, tipo, cfop, ncm, emitente_cnpj, emitente_nome, itens, valor_total, valor_icms, valor_ipi, valor_pis, valor_cofins)
+                    SELECT company_id, mes, tipo, cfop, ncm, emitente_cnpj, emitente_nome, itens, valor_total, valor_icms, valor_ipi, valor_pis, valor_cofins
+                    FROM delta
+                    ORDER BY company_id, mes, tipo, cfop, ncm, emitente_cnpj  -- mesma ordem de bloqueio entre importações simultâneas
+                    ON CONFLICT (company_id, mes, tipo, cfop, ncm, emitente_cnpj) DO UPDATE SET
+                        emitente_nome = EXCLUDED.emitente_nome,
+                        itens = r.itens + EXCLUDED.itens,
+                        valor_total = r.valor_total + EXCLUDED.valor_total,
+                        valor_icms = r.valor_icms + EXCLUDED.valor_icms,
+                        valor_ipi = r.valor_ipi + EXCLUDED.valor_ipi,
+                        valor_pis = r.valor_pis + EXCLUDED.valor_pis,
+                        valor_cofins = r.valor_cofins + EXCLUDED.valor_cofins
+                    RETURNING r.id, r.itens
+                )
+                SELECT array_agg(id) INTO emptied FROM applied WHERE itens <= 0;
+                IF emptied IS NOT NULL THEN
+                    DELETE FROM notas_fiscais_resumo_mensal WHERE id = ANY(emptied);
+                END IF;
+            ELSIF TG_OP = 'UPDATE' THEN
+                WITH delta AS (
+                    SELECT company_id, mes, tipo, cfop, ncm, emitente_cnpj, max(emitente_nome) AS emitente_nome,
+                           sum(sinal) AS itens,
+                           sum(sinal * valor_total) AS valor_total,
+                           sum(sinal * valor_icms) AS valor_icms,
+                           sum(sinal * valor_ipi) AS valor_ipi,
+                           sum(sinal * valor_pis) AS valor_pis,
+                           sum(sinal * valor_cofins) AS valor_cofins
+                    FROM (
+                        SELECT n.company_id, date_trunc('month', n.data_emissao)::date AS mes, n.tipo, p.cfop,
+                               coalesce(p.ncm, '') AS ncm, n.emitente_cnpj, n.emitente_nome, -1 AS sinal,
+                               p.valor_total, p.valor_icms, p.valor_ipi, p.valor_pis, p.valor_cofins
+                        FROM old_rows p JOIN notas_fiscais n ON n.id = p.nota_fiscal_id
+                        WHERE coalesce(n.status, '') NOT IN ('cancelada', 'denegada')
+                          AND p.id IN (
+                              SELECT o.id FROM old_rows o JOIN new_rows c ON c.id = o.id
+                              WHERE (o.nota_fiscal_id, o.cfop, o.ncm, o.valor_total, o.valor_icms, o.valor_ipi, o.valor_pis, o.valor_cofins)
+                                    IS DISTINCT FROM
+                                    (c.nota_fiscal_id, c.cfop, c.ncm, c.valor_total, c.valor_icms, c.valor_ipi, c.valor_pis, c.valor_cofins)
+                          )
+                        UNION ALL
+                        SELECT n.company_id, date_trunc('month', n.data_emissao)::date AS mes, n.tipo, p.cfop,
+                               coalesce(p.ncm, '') AS ncm, n.emitente_cnpj, n.emitente_nome, 1 AS sinal,
+                               p.valor_total, p.valor_icms, p.valor_ipi, p.valor_pis, p.valor_cofins
+                        FROM new_rows p JOIN notas_fiscais n ON n.id = p.nota_fiscal_id
+                        WHERE coalesce(n.status, '') NOT IN ('cancelada', 'denegada')
+                          AND p.id IN (
+                              SELECT o.id FROM old_rows o JOIN new_rows c ON c.id = o.id
+                              WHERE (o.nota_fiscal_id, o.cfop, o.ncm, o.valor_total, o.valor_icms, o.valor_ipi, o.valor_pis, o.valor_cofins)
+                                    IS DISTINCT FROM
+                                    (c.nota_fiscal_id, c.cfop, c.ncm, c.valor_total, c.valor_icms, c.valor_ipi, c.valor_pis, c.valor_cofins)
+                          )
+                    ) itens
+                    GROUP BY company_id, mes, tipo, cfop, ncm, emitente_cnpj
+                ), applied AS (
+                    INSERT INTO notas_fiscais_resumo_mensal AS r
+                        (company_id, mes, tipo, cfop, ncm, emitente_cnpj, emitente_nome, itens, valor_total, valor_icms, valor_ipi, valor_pis, valor_cofins)
+                    SELECT company_id, mes, tipo, cfop, ncm, emitente_cnpj, emitente_nome, itens, valor_total, valor_icms, valor_ipi, valor_pis, valor_cofins
+                    FROM delta
+                    ORDER BY company_id, mes, tipo, cfop, ncm, emitente_cnpj  -- mesma ordem de bloqueio entre importações simultâneas
+                    ON CONFLICT (company_id, mes, tipo, cfop, ncm, emitente_cnpj) DO UPDATE SET
+                        emitente_nome = EXCLUDED.emitente_nome,
+                        itens = r.itens + EXCLUDED.itens,
+                        valor_total = r.valor_total + EXCLUDED.valor_total,
+                        valor_icms = r.valor_icms + EXCLUDED.valor_icms,
+                        valor_ipi = r.valor_ipi + EXCLUDED.valor_ipi,
+                        valor_pis = r.valor_pis + EXCLUDED.valor_pis,
+                        valor_cofins = r.valor_cofins + EXCLUDED.valor_cofins
+                    RETURNING r.id, r.itens
+                )
+                SELECT array_agg(id) INTO emptied FROM applied WHERE itens <= 0;
+                IF emptied IS NOT NULL THEN
+                    DELETE FROM notas_fiscais_resumo_mensal WHERE id = ANY(emptied);
+                END IF;
+            ELSE
+                WITH delta AS (
+                    SELECT company_id, mes, tipo, cfop, ncm, emitente_cnpj, max(emitente_nome) AS emitente_nome,
+                           sum(sinal) AS itens,
+                           sum(sinal * valor_total) AS valor_total,
+                           sum(sinal * valor_icms) AS valor_icms,
+                           sum(sinal * valor_ipi) AS valor_ipi,
+                           sum(sinal * valor_pis) AS valor_pis,
+                           sum(sinal * valor_cofins) AS valor_cofins
+                    FROM (
+                        SELECT n.company_id, date_trunc('month', n.data_emissao)::date AS mes, n.tipo, p.cfop,
+                               coalesce(p.ncm, '') AS ncm, n.emitente_cnpj, n.emitente_nome, -1 AS sinal,
+                               p.valor_total, p.valor_icms, p.valor_ipi, p.valor_pis, p.valor_cofins
+                        FROM old_rows p JOIN notas_fiscais n ON n.id = p.nota_fiscal_id
+                        WHERE coalesce(n.status, '') NOT IN ('cancelada', 'denegada')
+                    ) itens
+                    GROUP BY company_id, mes, tipo, cfop, ncm, emitente_cnpj
+                ), applied AS (
+                    INSERT INTO notas_fiscais_resumo_mensal AS r
+                        (company_id, mes, tipo, cfop, ncm, emitente_cnpj, emitente_nome, itens, valor_total, valor_icms, valor_ipi, valor_pis, valor_cofins)
+                    SELECT company_id, mes, tipo, cfop, ncm, emitente_cnpj, emitente_nome, itens, valor_total, valor_icms, valor_ipi, valor_pis, valor_cofins
+                    FROM delta
+                    ORDER BY company_id, mes, tipo, cfop, ncm, emitente_cnpj  -- mesma ordem de bloqueio entre importações simultâneas
+                    ON CONFLICT (company_id, mes, tipo, cfop, ncm, emitente_cnpj) DO UPDATE SET
+                        emitente_nome = EXCLUDED.emitente_nome,
+                        itens = r.itens + EXCLUDED.itens,
+                        valor_total = r.valor_total + EXCLUDED.valor_total,
+                        valor_icms = r.valor_icms + EXCLUDED.valor_icms,
+                        valor_ipi = r.valor_ipi + EXCLUDED.valor_ipi,
+                        valor_pis = r.valor_pis + EXCLUDED.valor_pis,
+                        valor_cofins = r.valor_cofins + EXCLUDED.valor_cofins
+                    RETURNING r.id, r.itens
+                )
+                SELECT array_agg(id) INTO emptied FROM applied WHERE itens <= 0;
+                IF emptied IS NOT NULL THEN
+                    DELETE FROM notas_fiscais_resumo_mensal WHERE id = ANY(emptied);
+                END IF;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql;
+    """)
+
+    # Alteração do cabeçalho (empresa, tipo, mês, emitente, cancelamento) move os itens de grupo
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notas_fiscais_refresh_resumo()
+        RETURNS trigger AS $$
+        DECLARE
+            emptied bigint[];
+        BEGIN
+            WITH delta AS (
+                SELECT company_id, mes, tipo, cfop, ncm, emitente_cnpj, max(emitente_nome) AS emitente_nome,
+                       sum(sinal) AS itens,
+                       sum(sinal * valor_total) AS valor_total,
+                       sum(sinal * valor_icms) AS valor_icms,
+                       sum(sinal * valor_ipi) AS valor_ipi,
+                       sum(sinal * valor_pis) AS valor_pis,
+                       sum(sinal * valor_cofins) AS valor_cofins
+                FROM (
+                    SELECT n.company_id, date_trunc('month', n.data_emissao)::date AS mes, n.tipo, p.cfop,
+                           coalesce(p.ncm, '') AS ncm, n.emitente_cnpj, n.emitente_nome, -1 AS sinal,
+                           p.valor_total, p.valor_icms, p.valor_ipi, p.valor_pis, p.valor_cofins
+                    FROM notas_fiscais_produtos p JOIN old_rows n ON n.id = p.nota_fiscal_id
+                    WHERE coalesce(n.status, '') NOT IN ('cancelada', 'denegada')
+                      AND n.id IN (
+                          SELECT o.id FROM old_rows o JOIN new_rows c ON c.id = o.id
+                          WHERE (o.company_id, o.tipo, date_trunc('month', o.data_emissao), o.emitente_cnpj, o.emitente_nome,
+                                 coalesce(o.status, '') IN ('cancelada', 'denegada'))
+                                IS DISTINCT FROM
+                                (c.company_id, c.tipo, date_trunc('month', c.data_emissao), c.emitente_cnpj, c.emitente_nome,
+                                 coalesce(c.status, '') IN ('cancelada', 'denegada'))
+                      )
+                    UNION ALL
+                    SELECT n.company_id, date_trunc('month', n.data_emissao)::date AS mes, n.tipo, p.cfop,
+                           coalesce(p.ncm, '') AS ncm, n.emitente_cnpj, n.emitente_nome, 1 AS sinal,
+                           p.valor_total, p.valor_icms, p.valor_ipi, p.valor_pis, p.valor_cofins
+                    FROM notas_fiscais_produtos p JOIN new_rows n ON n.id = p.nota_fiscal_id
+                    WHERE coalesce(n.status, '') NOT IN ('cancelada', 'denegada')
+                      AND n.id IN (
+                          SELECT o.id FROM old_rows o JOIN new_rows c ON c.id = o.id
+                          WHERE (o.company_id, o.tipo, date_trunc('month', o.data_emissao), o.emitente_cnpj, o.emitente_nome,
+                                 coalesce(o.status, '') IN ('cancelada', 'denegada'))
+                                IS DISTINCT FROM
+                                (c.company_id, c.tipo, date_trunc('month', c.data_emissao), c.emitente_cnpj, c.emitente_nome,
+                                 coalesce(c.status, '') IN ('cancelada', 'denegada'))
+                      )
+                ) itens
+                GROUP BY company_id, mes, tipo, cfop, ncm, emitente_cnpj
+            ), applied AS (
+                INSERT INTO notas_fiscais_resumo_mensal AS r
+                    (company_id, mes, tipo, cfop, ncm, emitente_cnpj, emitente_nome, itens, valor_total, valor_icms, valor_ipi, valor_pis, valor_cofins)
+                SELECT company_id, mes, tipo, cfop, ncm, emitente_cnpj, emitente_nome, itens, valor_total, valor_icms, valor_ipi, valor_pis, valor_cofins
+                FROM delta
+                ORDER BY company_id, mes, tipo, cfop, ncm, emitente_cnpj  -- mesma ordem de bloqueio entre importações simultâneas
+                ON CONFLICT (company_id, mes, tipo, cfop, ncm, emitente_cnpj) DO UPDATE SET
+                    emitente_nome = EXCLUDED.emitente_nome,
+                    itens = r.itens + EXCLUDED.itens,
+                    valor_total = r.valor_total + EXCLUDED.valor_total,
+                    valor_icms = r.valor_icms + EXCLUDED.valor_icms,
+                    valor_ipi = r.valor_ipi + EXCLUDED.valor_ipi,
+                    valor_pis = r.valor_pis + EXCLUDED.valor_pis,
+                    valor_cofins = r.valor_cofins + EXCLUDED.valor_cofins
+                RETURNING r.id, r.itens
+            )
+            SELECT array_agg(id) INTO emptied FROM applied WHERE itens <= 0;
+            IF emptied IS NOT NULL THEN
+                DELETE FROM notas_fiscais_resumo_mensal WHERE id = ANY(emptied);
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql;
+    """)
+
+    op.execute("""
+        DROP TRIGGER IF EXISTS trg_notas_fiscais_produtos_resumo_insert ON notas_fiscais_produtos;
+        DROP TRIGGER IF EXISTS trg_notas_fiscais_produtos_resumo_update ON notas_fiscais_produtos;
+        DROP TRIGGER IF EXISTS trg_notas_fiscais_produtos_resumo_delete ON notas_fiscais_produtos;
+        CREATE TRIGGER trg_notas_fiscais_produtos_resumo_insert AFTER INSERT ON notas_fiscais_produtos
+            REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION notas_fiscais_produtos_refresh_resumo();
+        CREATE TRIGGER trg_notas_fiscais_produtos_resumo_update AFTER UPDATE ON notas_fiscais_produtos
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION notas_fiscais_produtos_refresh_resumo();
+        CREATE TRIGGER trg_notas_fiscais_produtos_resumo_delete AFTER DELETE ON notas_fiscais_produtos
+            REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION notas_fiscais_produtos_refresh_resumo();
+
+        DROP TRIGGER IF EXISTS trg_notas_fiscais_resumo_update ON notas_fiscais;
+        CREATE TRIGGER trg_notas_fiscais_resumo_update AFTER UPDATE ON notas_fiscais
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION notas_fiscais_refresh_resumo();
+    """)
+
+
+def downgrade():
+    op.execute("""
+        DROP TRIGGER IF EXISTS trg_notas_fiscais_resumo_update ON notas_fiscais;
+        DROP TRIGGER IF EXISTS trg_notas_fiscais_produtos_resumo_delete ON notas_fiscais_produtos;
+        DROP TRIGGER IF EXISTS trg_notas_fiscais_produtos_resumo_update ON notas_fiscais_produtos;
+        DROP TRIGGER IF EXISTS trg_notas_fiscais_produtos_resumo_insert ON notas_fiscais_produtos;
+        DROP FUNCTION IF EXISTS notas_fiscais_refresh_resumo();
+        DROP FUNCTION IF EXISTS notas_fiscais_produtos_refresh_resumo();
+    """)
+    op.drop_index('uq_notas_fiscais_resumo_mensal_grupo', table_name='notas_fiscais_resumo_mensal')
+    op.drop_table('notas_fiscais_resumo_mensal')
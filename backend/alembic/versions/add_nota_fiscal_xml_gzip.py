@@ -0,0 +1,82 @@
+"""add_nota_fiscal_xml_gzip
+
+Revision ID: add_nota_fiscal_xml_gzip
+Revises: add_nota_fiscal_chave_acesso
+Create Date: 2025-08-24 09:00:00.000000
+
+"""
+import gzip
+import hashlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_nota_fiscal_xml_gzip'
+down_revision = 'add_nota_fiscal_chave_acesso'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+
+def upgrade():
+    op.add_column('notas_fiscais', sa.Column('xml_gzip', sa.LargeBinary(), nullable=True))
+    op.add_column('notas_fiscais', sa.Column('xml_sha256', sa.String(length=64), nullable=True))
+    op.add_column('notas_fiscais', sa.Column('xml_size', sa.Integer(), nullable=True))
+    # Conteúdo já comprimido: TOAST apenas move para fora da linha, sem tentar comprimir de novo
+    op.execute("ALTER TABLE notas_fiscais ALTER COLUMN xml_gzip SET STORAGE EXTERNAL")
+
+    # Comprimir o XML das notas existentes em lotes (por id)
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        rows = bind.execute(sa.text("""
+            SELECT id, xml_content FROM notas_fiscais
+            WHERE id > :last_id AND xml_content IS NOT NULL
+            ORDER BY id LIMIT :batch_size
+        """), {"last_id": last_id, "batch_size": BATCH_SIZE}).all()
+        if not rows:
+            break
+        values = []
+        for row in rows:
+            data = row.xml_content.encode("utf-8")
+            values.append({
+                "id": row.id,
+                "xml_gzip": gzip.compress(data, compresslevel=6, mtime=0),
+                "xml_sha256": hashlib.sha256(data).hexdigest(),
+                "xml_size": len(data),
+            })
+        bind.execute(sa.text("""
+            UPDATE notas_fiscais
+            SET xml_gzip = :xml_gzip, xml_sha256 = :xml_sha256, xml_size = :xml_size
+            WHERE id = :id
+        """), values)
+        last_id = rows[-1].id
+
+    op.drop_column('notas_fiscais', 'xml_content')
+
+
+def downgrade():
+    op.add_column('notas_fiscais', sa.Column('xml_content', sa.Text(), nullable=True))
+
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        rows = bind.execute(sa.text("""
+            SELECT id, xml_gzip FROM notas_fiscais
+            WHERE id > :last_id AND xml_gzip IS NOT NULL
+            ORDER BY id LIMIT :batch_size
+        """), {"last_id": last_id, "batch_size": BATCH_SIZE}).all()
+        if not rows:
+            break
+        bind.execute(sa.text("UPDATE notas_fiscais SET xml_content = :xml_content WHERE id = :id"), [
+            {"id": row.id, "xml_content": gzip.decompress(row.xml_gzip).decode("utf-8", errors="replace")}
+            for row in rows
+        ])
+        last_id = rows[-1].id
+
+    op.drop_column('notas_fiscais', 'xml_size')
+    op.drop_column('notas_fiscais', 'xml_sha256')
+    op.drop_column('notas_fiscais', 'xml_gzip')
@@ -0,0 +1,131 @@
+"""add_product_search_index
+
+Revision ID: add_product_search_index
+Revises: 2b56de293529
+Create Date: 2025-08-10 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'add_product_search_index'
+down_revision = '2b56de293529'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Extensões para busca sem acento e por trigramas
+    op.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # Configuração de busca em português que ignora acentos
+    op.execute("""
+        DO $$
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'portuguese_unaccent') THEN
+                CREATE TEXT SEARCH CONFIGURATION portuguese_unaccent (COPY = portuguese);
+                ALTER TEXT SEARCH CONFIGURATION portuguese_unaccent
+                    ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+            END IF;
+        END
+        $$;
+    """)
+
+    # Coluna tsvector com nome, marca, modelo, descrição e códigos dos SKUs
+    op.add_column('products', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION products_compute_search_vector(
+            p_id INTEGER, p_name TEXT, p_description TEXT, p_brand TEXT,
+            p_model TEXT, p_sku TEXT, p_ean TEXT, p_gtin TEXT
+        )
+        RETURNS tsvector AS $$
+            SELECT
+                setweight(to_tsvector('portuguese_unaccent', coalesce(p_name, '')), 'A') ||
+                setweight(to_tsvector('simple', concat_ws(' ', p_sku, p_ean, p_gtin)), 'A') ||
+                setweight(to_tsvector('simple', coalesce((
+                    SELECT string_agg(concat_ws(' ', s.sku_code, s.barcode), ' ')
+                    FROM product_skus s
+                    WHERE s.product_id = p_id
+                ), '')), 'A') ||
+                setweight(to_tsvector('portuguese_unaccent', concat_ws(' ', p_brand, p_model)), 'B') ||
+                setweight(to_tsvector('portuguese_unaccent', coalesce(p_description, '')), 'C')
+        $$ LANGUAGE sql STABLE;
+    """)
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION products_search_vector_trigger()
+        RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := products_compute_search_vector(
+                NEW.id, NEW.name, NEW.description, NEW.brand, NEW.model, NEW.sku, NEW.ean, NEW.gtin
+            );
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql;
+    """)
+
+    op.execute("""
+        CREATE TRIGGER trg_products_search_vector
+        BEFORE INSERT OR UPDATE OF name, description, brand, model, sku, ean, gtin ON products
+        FOR EACH ROW EXECUTE FUNCTION products_search_vector_trigger();
+    """)
+
+    # Alterações nos SKUs recalculam o vetor do produto dono
+    op.execute("""
+        CREATE OR REPLACE FUNCTION product_skus_search_vector_trigger()
+        RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                UPDATE products SET search_vector = products_compute_search_vector(id, name, description, brand, model, sku, ean, gtin)
+                WHERE id = OLD.product_id;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') AND (TG_OP = 'INSERT' OR NEW.product_id IS DISTINCT FROM OLD.product_id OR
+                    NEW.sku_code IS DISTINCT FROM OLD.sku_code OR NEW.barcode IS DISTINCT FROM OLD.barcode) THEN
+                UPDATE products SET search_vector = products_compute_search_vector(id, name, description, brand, model, sku, ean, gtin)
+                WHERE id = NEW.product_id;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql;
+    """)
+
+    op.execute("""
+        CREATE TRIGGER trg_product_skus_search_vector
+        AFTER INSERT OR UPDATE OF sku_code, barcode, product_id OR DELETE ON product_skus
+        FOR EACH ROW EXECUTE FUNCTION product_skus_search_vector_trigger();
+    """)
+
+    # Preencher vetores existentes
+    op.execute("UPDATE products SET search_vector = products_compute_search_vector(id, name, description, brand, model, sku, ean, gtin)")
+
+    # Índices GIN
+    op.create_index('ix_products_search_vector', 'products', ['search_vector'], unique=False, postgresql_using='gin')
+    op.execute("CREATE INDEX ix_products_name_trgm ON products USING gin (name gin_trgm_ops)")
+    op.execute("CREATE INDEX ix_products_description_trgm ON products USING gin (description gin_trgm_ops)")
+    op.execute("CREATE INDEX ix_products_brand_trgm ON products USING gin (brand gin_trgm_ops)")
+    op.execute("CREATE INDEX ix_products_model_trgm ON products USING gin (model gin_trgm_ops)")
+    op.execute("CREATE INDEX ix_product_skus_sku_code_trgm ON product_skus USING gin (sku_code gin_trgm_ops)")
+    op.execute("CREATE INDEX ix_product_skus_barcode_trgm ON product_skus USING gin (barcode gin_trgm_ops)")
+
+
+def downgrade():
+    op.drop_index('ix_product_skus_barcode_trgm', table_name='product_skus')
+    op.drop_index('ix_product_skus_sku_code_trgm', table_name='product_skus')
+    op.drop_index('ix_products_model_trgm', table_name='products')
+    op.drop_index('ix_products_brand_trgm', table_name='products')
+    op.drop_index('ix_products_description_trgm', table_name='products')
+    op.drop_index('ix_products_name_trgm', table_name='products')
+    op.drop_index('ix_products_search_vector', table_name='products')
+
+    op.execute("DROP TRIGGER IF EXISTS trg_product_skus_search_vector ON product_skus")
+    op.execute("DROP TRIGGER IF EXISTS trg_products_search_vector ON products")
+    op.execute("DROP FUNCTION IF EXISTS product_skus_search_vector_trigger()")
+    op.execute("DROP FUNCTION IF EXISTS products_search_vector_trigger()")
+    op.execute("DROP FUNCTION IF EXISTS products_compute_search_vector(INTEGER, TEXT, TEXT, TEXT, TEXT, TEXT, TEXT, TEXT)")
+
+    op.drop_column('products', 'search_vector')
+    op.execute("DROP TEXT SEARCH CONFIGURATION IF EXISTS portuguese_unaccent")
@@ -0,0 +1,36 @@
+"""add_promotional_window_to_product_skus
+
+Revision ID: add_promotional_window_to_product_skus
+Revises: add_product_search_index
+Create Date: 2025-08-11 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'add_promotional_window_to_product_skus'
+down_revision = 'add_product_search_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Janela de validade do preço promocional
+    op.add_column('product_skus', sa.Column('promotional_starts_at', postgresql.TIMESTAMP(timezone=True), nullable=True))
+    op.add_column('product_skus', sa.Column('promotional_ends_at', postgresql.TIMESTAMP(timezone=True), nullable=True))
+
+    # Filtros usados pelo reajuste de preços em massa
+    op.create_index('ix_product_skus_product_id', 'product_skus', ['product_id'], unique=False)
+    op.create_index('ix_product_skus_supplier_id', 'product_skus', ['supplier_id'], unique=False)
+    op.create_index('ix_products_company_id_brand', 'products', ['company_id', 'brand'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_products_company_id_brand', table_name='products')
+    op.drop_index('ix_product_skus_supplier_id', table_name='product_skus')
+    op.drop_index('ix_product_skus_product_id', table_name='product_skus')
+
+    op.drop_column('product_skus', 'promotional_ends_at')
+    op.drop_column('product_skus', 'promotional_starts_at')
@@ -0,0 +1,60 @@
+"""add_reorder_suggestions
+
+Revision ID: add_reorder_suggestions
+Revises: add_promotional_window_to_product_skus
+Create Date: 2025-08-12 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'add_reorder_suggestions'
+down_revision = 'add_promotional_window_to_product_skus'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Filial da movimentação (demanda por filial)
+    op.add_column('stock_movements', sa.Column('branch_id', postgresql.UUID(as_uuid=True), nullable=True))
+    op.create_foreign_key('fk_stock_movements_branch_id', 'stock_movements', 'branches', ['branch_id'], ['id'])
+
+    # Histórico de saídas por empresa e período
+    op.create_index('ix_stock_movements_company_type_created_at', 'stock_movements',
+                    ['company_id', 'movement_type', 'created_at'], unique=False)
+
+    op.create_table('reorder_suggestions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('company_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('sku_id', sa.Integer(), nullable=False),
+        sa.Column('branch_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('demand_rate', sa.Float(), nullable=False),
+        sa.Column('demand_std', sa.Float(), nullable=False),
+        sa.Column('available_stock', sa.Integer(), nullable=False),
+        sa.Column('days_of_cover', sa.Float(), nullable=True),
+        sa.Column('safety_stock', sa.Integer(), nullable=False),
+        sa.Column('reorder_point', sa.Integer(), nullable=False),
+        sa.Column('target_stock', sa.Integer(), nullable=False),
+        sa.Column('suggested_quantity', sa.Integer(), nullable=False),
+        sa.Column('needs_reorder', sa.Boolean(), nullable=False),
+        sa.Column('computed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['company_id'], ['companies.id'], ),
+        sa.ForeignKeyConstraint(['sku_id'], ['product_skus.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['branch_id'], ['branches.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_reorder_suggestions_id'), 'reorder_suggestions', ['id'], unique=False)
+    op.create_index('ix_reorder_suggestions_company_id_needs_reorder', 'reorder_suggestions',
+                    ['company_id', 'needs_reorder'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_reorder_suggestions_company_id_needs_reorder', table_name='reorder_suggestions')
+    op.drop_index(op.f('ix_reorder_suggestions_id'), table_name='reorder_suggestions')
+    op.drop_table('reorder_suggestions')
+
+    op.drop_index('ix_stock_movements_company_type_created_at', table_name='stock_movements')
+    op.drop_constraint('fk_stock_movements_branch_id', 'stock_movements', type_='foreignkey')
+    op.drop_column('stock_movements', 'branch_id')
@@ -0,0 +1,26 @@
+"""add_reservation_consumed_status
+
+Revision ID: add_reservation_consumed_status
+Revises: statement_level_effective_stock
+Create Date: 2025-09-01 09:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_reservation_consumed_status'
+down_revision = 'statement_level_effective_stock'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # ALTER TYPE ... ADD VALUE não pode ser usado na mesma transação em que foi criado
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE reservationstatus ADD VALUE IF NOT EXISTS 'CONSUMED'")
+
+
+def downgrade():
+    # O PostgreSQL não remove valores de enum; reservas baixadas passam a liberadas
+    op.execute("UPDATE stock_reservations SET status = 'RELEASED' WHERE status = 'CONSUMED'")
@@ -0,0 +1,78 @@
+"""add_sales_orders
+
+Revision ID: add_sales_orders
+Revises: add_stock_reservations
+Create Date: 2025-08-21 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'add_sales_orders'
+down_revision = 'add_stock_reservations'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('sales_orders',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('company_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('customer_id', sa.Integer(), nullable=False),
+        sa.Column('branch_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('order_number', sa.String(length=50), nullable=True),
+        sa.Column('channel', sa.String(length=30), nullable=False),
+        sa.Column('external_id', sa.String(length=100), nullable=True),
+        sa.Column('status', sa.Enum('PENDING', 'CONFIRMED', 'PREPARING', 'SHIPPED', 'DELIVERED', 'CANCELLED', name='orderstatus'), nullable=False),
+        sa.Column('payment_method', sa.String(length=30), nullable=True),
+        sa.Column('installments', sa.Integer(), nullable=True),
+        sa.Column('subtotal', sa.Numeric(precision=12, scale=2), nullable=False),
+        sa.Column('discount_amount', sa.Numeric(precision=12, scale=2), nullable=True),
+        sa.Column('shipping_amount', sa.Numeric(precision=12, scale=2), nullable=True),
+        sa.Column('total_amount', sa.Numeric(precision=12, scale=2), nullable=False),
+        sa.Column('order_date', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('shipped_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('delivered_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('notes', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['company_id'], ['companies.id'], ),
+        sa.ForeignKeyConstraint(['customer_id'], ['customers.id'], ),
+        sa.ForeignKeyConstraint(['branch_id'], ['branches.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('company_id', 'channel', 'external_id', name='uq_sales_orders_company_channel_external_id')
+    )
+    op.create_index(op.f('ix_sales_orders_id'), 'sales_orders', ['id'], unique=False)
+    op.create_index('ix_sales_orders_company_id_status_order_date', 'sales_orders', ['company_id', 'status', 'order_date'], unique=False)
+
+    op.create_table('sales_order_items',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('order_id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('sku_id', sa.Integer(), nullable=False),
+        sa.Column('stock_sku_id', sa.Integer(), nullable=False),
+        sa.Column('code', sa.String(length=50), nullable=True),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('unit_price', sa.Numeric(precision=12, scale=2), nullable=False),
+        sa.Column('discount_amount', sa.Numeric(precision=12, scale=2), nullable=True),
+        sa.Column('total_amount', sa.Numeric(precision=12, scale=2), nullable=False),
+        sa.ForeignKeyConstraint(['order_id'], ['sales_orders.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+        sa.ForeignKeyConstraint(['sku_id'], ['product_skus.id'], ),
+        sa.ForeignKeyConstraint(['stock_sku_id'], ['product_skus.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_sales_order_items_id'), 'sales_order_items', ['id'], unique=False)
+    op.create_index(op.f('ix_sales_order_items_order_id'), 'sales_order_items', ['order_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_sales_order_items_order_id'), table_name='sales_order_items')
+    op.drop_index(op.f('ix_sales_order_items_id'), table_name='sales_order_items')
+    op.drop_table('sales_order_items')
+    op.drop_index('ix_sales_orders_company_id_status_order_date', table_name='sales_orders')
+    op.drop_index(op.f('ix_sales_orders_id'), table_name='sales_orders')
+    op.drop_table('sales_orders')
+    op.execute("DROP TYPE IF EXISTS orderstatus")
@@ -0,0 +1,44 @@
+"""add_stock_branch_unique_sku_branch
+
+Revision ID: add_stock_branch_unique_sku_branch
+Revises: add_average_cost
+Create Date: 2025-08-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_stock_branch_unique_sku_branch'
+down_revision = 'add_average_cost'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Consolidar configurações duplicadas (mantém a mais antiga, somando o estoque)
+    op.execute("""
+        WITH duplicates AS (
+            SELECT id, min(id) OVER (PARTITION BY sku_id, branch_id) AS keep_id
+            FROM stock_branches
+        ), totals AS (
+            SELECT d.keep_id, sum(s.current_stock) AS current_stock, sum(s.reserved_stock) AS reserved_stock
+            FROM duplicates d JOIN stock_branches s ON s.id = d.id
+            GROUP BY d.keep_id
+            HAVING count(*) > 1
+        )
+        UPDATE stock_branches s
+        SET current_stock = t.current_stock, reserved_stock = t.reserved_stock
+        FROM totals t
+        WHERE s.id = t.keep_id
+    """)
+    op.execute("""
+        DELETE FROM stock_branches s
+        USING stock_branches k
+        WHERE k.sku_id = s.sku_id AND k.branch_id = s.branch_id AND k.id < s.id
+    """)
+    op.create_unique_constraint('uq_stock_branches_sku_id_branch_id', 'stock_branches', ['sku_id', 'branch_id'])
+
+
+def downgrade():
+    op.drop_constraint('uq_stock_branches_sku_id_branch_id', 'stock_branches', type_='unique')
@@ -0,0 +1,47 @@
+"""add_stock_reservations
+
+Revision ID: add_stock_reservations
+Revises: add_stock_branch_unique_sku_branch
+Create Date: 2025-08-20 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'add_stock_reservations'
+down_revision = 'add_stock_branch_unique_sku_branch'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stock_reservations',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('company_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('sku_id', sa.Integer(), nullable=False),
+        sa.Column('stock_sku_id', sa.Integer(), nullable=False),
+        sa.Column('branch_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('reference', sa.String(length=100), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('status', sa.Enum('ACTIVE', 'CONFIRMED', 'RELEASED', 'EXPIRED', name='reservationstatus'), nullable=False),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['company_id'], ['companies.id'], ),
+        sa.ForeignKeyConstraint(['sku_id'], ['product_skus.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['stock_sku_id'], ['product_skus.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['branch_id'], ['branches.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_stock_reservations_company_id_reference', 'stock_reservations', ['company_id', 'reference'], unique=False)
+    op.create_index('ix_stock_reservations_active_expires_at', 'stock_reservations', ['expires_at'], unique=False,
+                    postgresql_where=sa.text("status = 'ACTIVE'"))
+
+
+def downgrade():
+    op.drop_index('ix_stock_reservations_active_expires_at', table_name='stock_reservations')
+    op.drop_index('ix_stock_reservations_company_id_reference', table_name='stock_reservations')
+    op.drop_table('stock_reservations')
+    op.execute("DROP TYPE IF EXISTS reservationstatus")
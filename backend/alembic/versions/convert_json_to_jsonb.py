@@ -0,0 +1,55 @@
+"""convert_json_to_jsonb
+
+Revision ID: convert_json_to_jsonb
+Revises: add_nota_fiscal_resumo_mensal
+Create Date: 2025-08-27 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'convert_json_to_jsonb'
+down_revision = 'add_nota_fiscal_resumo_mensal'
+branch_labels = None
+depends_on = None
+
+COLUMNS = (
+    ('notas_fiscais', 'emitente_endereco'),
+    ('notas_fiscais', 'destinatario_endereco'),
+    ('product_skus', 'taxes'),
+)
+
+
+def upgrade():
+    # JSON -> JSONB (reescreve as tabelas): operadores ->>, ? e @> indexáveis
+    for table, column in COLUMNS:
+        op.alter_column(
+            table, column, existing_type=sa.JSON(), type_=postgresql.JSONB(astext_type=sa.Text()),
+            postgresql_using=f'{column}::jsonb'
+        )
+
+    # Filtros da listagem de notas por UF/cidade do emitente e do destinatário
+    op.execute("CREATE INDEX ix_notas_fiscais_company_id_emitente_uf ON notas_fiscais (company_id, (emitente_endereco ->> 'estado'))")
+    op.execute("CREATE INDEX ix_notas_fiscais_company_id_emitente_cidade ON notas_fiscais (company_id, lower(emitente_endereco ->> 'cidade'))")
+    op.execute("CREATE INDEX ix_notas_fiscais_company_id_destinatario_uf ON notas_fiscais (company_id, (destinatario_endereco ->> 'estado'))")
+    op.execute("CREATE INDEX ix_notas_fiscais_company_id_destinatario_cidade ON notas_fiscais (company_id, lower(destinatario_endereco ->> 'cidade'))")
+
+    # Filtro de SKUs por imposto (?) e alíquota (@>)
+    op.create_index('ix_product_skus_taxes', 'product_skus', ['taxes'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    op.drop_index('ix_product_skus_taxes', table_name='product_skus')
+    op.execute("DROP INDEX IF EXISTS ix_notas_fiscais_company_id_destinatario_cidade")
+    op.execute("DROP INDEX IF EXISTS ix_notas_fiscais_company_id_destinatario_uf")
+    op.execute("DROP INDEX IF EXISTS ix_notas_fiscais_company_id_emitente_cidade")
+    op.execute("DROP INDEX IF EXISTS ix_notas_fiscais_company_id_emitente_uf")
+
+    for table, column in COLUMNS:
+        op.alter_column(
+            table, column, existing_type=postgresql.JSONB(astext_type=sa.Text()), type_=sa.JSON(),
+            postgresql_using=f'{column}::json'
+        )
@@ -0,0 +1,131 @@
+"""partition_stock_movements_by_month
+
+Revision ID: partition_stock_movements_by_month
+Revises: add_abc_classification
+Create Date: 2025-08-14 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'partition_stock_movements_by_month'
+down_revision = 'add_abc_classification'
+branch_labels = None
+depends_on = None
+
+
+COLUMNS = """
+    id, product_id, sku_id, company_id, branch_id, movement_type, movement_reason,
+    quantity, previous_stock, current_stock, reference_document, reference_id,
+    from_location, to_location, unit_cost, total_cost, notes, user_id, created_at
+"""
+
+COLUMN_DEFINITIONS = """
+    id INTEGER NOT NULL DEFAULT nextval('stock_movements_id_seq'),
+    product_id INTEGER NOT NULL CONSTRAINT stock_movements_product_id_fkey REFERENCES products (id),
+    sku_id INTEGER NOT NULL CONSTRAINT stock_movements_sku_id_fkey REFERENCES product_skus (id),
+    company_id UUID NOT NULL CONSTRAINT stock_movements_company_id_fkey REFERENCES companies (id),
+    branch_id UUID CONSTRAINT fk_stock_movements_branch_id REFERENCES branches (id),
+    movement_type movementtype NOT NULL,
+    movement_reason movementreason NOT NULL,
+    quantity INTEGER NOT NULL,
+    previous_stock INTEGER NOT NULL,
+    current_stock INTEGER NOT NULL,
+    reference_document VARCHAR(100),
+    reference_id INTEGER,
+    from_location VARCHAR(100),
+    to_location VARCHAR(100),
+    unit_cost FLOAT,
+    total_cost FLOAT,
+    notes TEXT,
+    user_id UUID CONSTRAINT stock_movements_user_id_fkey REFERENCES users (id),
+"""
+
+
+def upgrade():
+    # Nova tabela particionada por mês (a chave primária inclui created_at)
+    op.execute("ALTER SEQUENCE stock_movements_id_seq OWNED BY NONE")
+    op.execute(f"""
+        CREATE TABLE stock_movements_partitioned (
+            {COLUMN_DEFINITIONS}
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+
+    op.execute("ALTER TABLE stock_movements RENAME TO stock_movements_legacy")
+    op.execute("ALTER TABLE stock_movements_partitioned RENAME TO stock_movements")
+
+    # Partição mensal sob demanda (mesma função criada pelo modelo em instalações via create_all)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION stock_movements_create_partition(p_month date)
+        RETURNS text AS $$
+        DECLARE
+            v_start date := date_trunc('month', p_month)::date;
+            v_name text := 'stock_movements_' || to_char(v_start, 'YYYY_MM');
+        BEGIN
+            IF to_regclass(v_name) IS NULL THEN
+                EXECUTE 'CREATE TABLE ' || quote_ident(v_name) || ' PARTITION OF stock_movements FOR VALUES FROM ('
+                    || quote_literal(v_start::timestamp AT TIME ZONE 'UTC') || ') TO ('
+                    || quote_literal((v_start + interval '1 month')::timestamp AT TIME ZONE 'UTC') || ')';
+            END IF;
+            RETURN v_name;
+        END
+        $$ LANGUAGE plpgsql;
+    """)
+
+    # Uma partição para cada mês com histórico até 3 meses à frente, mais a partição padrão
+    op.execute("""
+        SELECT stock_movements_create_partition(month::date)
+        FROM generate_series(
+            date_trunc('month', coalesce((SELECT min(created_at) FROM stock_movements_legacy), now()) AT TIME ZONE 'UTC'),
+            date_trunc('month', now() AT TIME ZONE 'UTC') + interval '3 months',
+            interval '1 month'
+        ) AS month
+    """)
+    op.execute("CREATE TABLE stock_movements_default PARTITION OF stock_movements DEFAULT")
+
+    # Copiar o histórico (linhas antigas sem data ficam com a data da migração)
+    op.execute(f"""
+        INSERT INTO stock_movements ({COLUMNS})
+        SELECT {COLUMNS.replace('created_at', 'coalesce(created_at, now())')}
+        FROM stock_movements_legacy
+    """)
+
+    op.execute("DROP TABLE stock_movements_legacy")
+    op.execute("ALTER SEQUENCE stock_movements_id_seq OWNED BY stock_movements.id")
+    op.execute("ALTER INDEX stock_movements_partitioned_pkey RENAME TO stock_movements_pkey")
+
+    # Índices no pai são criados em todas as partições
+    op.create_index('ix_stock_movements_id', 'stock_movements', ['id'], unique=False)
+    op.create_index('ix_stock_movements_company_type_created_at', 'stock_movements',
+                    ['company_id', 'movement_type', 'created_at'], unique=False)
+    op.create_index('ix_stock_movements_sku_id_created_at', 'stock_movements',
+                    ['sku_id', 'created_at'], unique=False)
+
+
+def downgrade():
+    # Partições arquivadas (desanexadas) não voltam para a tabela
+    op.execute("ALTER SEQUENCE stock_movements_id_seq OWNED BY NONE")
+    op.execute(f"""
+        CREATE TABLE stock_movements_plain (
+            {COLUMN_DEFINITIONS}
+            created_at TIMESTAMPTZ DEFAULT now(),
+            PRIMARY KEY (id)
+        )
+    """)
+    op.execute(f"""
+        INSERT INTO stock_movements_plain ({COLUMNS})
+        SELECT {COLUMNS} FROM stock_movements
+    """)
+
+    op.execute("DROP TABLE stock_movements CASCADE")
+    op.execute("DROP FUNCTION IF EXISTS stock_movements_create_partition(date)")
+    op.execute("ALTER TABLE stock_movements_plain RENAME TO stock_movements")
+    op.execute("ALTER SEQUENCE stock_movements_id_seq OWNED BY stock_movements.id")
+    op.execute("ALTER INDEX stock_movements_plain_pkey RENAME TO stock_movements_pkey")
+
+    op.create_index('ix_stock_movements_id', 'stock_movements', ['id'], unique=False)
+    op.create_index('ix_stock_movements_company_type_created_at', 'stock_movements',
+                    ['company_id', 'movement_type', 'created_at'], unique=False)
@@ -0,0 +1,69 @@
+"""statement_level_effective_stock
+
+Revision ID: statement_level_effective_stock
+Revises: update_catalog_change_sku_stock
+Create Date: 2025-08-31 09:00:00.000000
+
+"""
+from alembic import op
+from app.models.product_sku import EFFECTIVE_STOCK_FUNCTION, EFFECTIVE_STOCK_TRIGGER
+
+
+# revision identifiers, used by Alembic.
+revision = 'statement_level_effective_stock'
+down_revision = 'update_catalog_change_sku_stock'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # effective_stock recalculado uma vez por comando (tabelas de transição), não por linha
+    op.execute(EFFECTIVE_STOCK_FUNCTION)
+    op.execute(EFFECTIVE_STOCK_TRIGGER)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS trg_product_skus_effective_stock_delete ON product_skus")
+    op.execute("DROP TRIGGER IF EXISTS trg_product_skus_effective_stock_update ON product_skus")
+    op.execute("DROP TRIGGER IF EXISTS trg_product_skus_effective_stock_insert ON product_skus")
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION product_skus_refresh_effective_stock()
+        RETURNS trigger AS $$
+        DECLARE
+            v_sku_ids integer[] := ARRAY[]::integer[];
+            v_product_ids integer[] := ARRAY[]::integer[];
+        BEGIN
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                v_sku_ids := v_sku_ids || ARRAY[NEW.id, NEW.stock_sku_id];
+                v_product_ids := v_product_ids || NEW.product_id;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                v_sku_ids := v_sku_ids || ARRAY[OLD.id, OLD.stock_sku_id];
+                v_product_ids := v_product_ids || OLD.product_id;
+            END IF;
+
+            UPDATE product_skus s
+            SET effective_stock = coalesce(s.current_stock, 0) + CASE WHEN s.is_stock_sku THEN coalesce((
+                    SELECT sum(a.current_stock) FROM product_skus a
+                    WHERE a.stock_sku_id = s.id AND a.is_active AND a.id <> s.id
+                ), 0) ELSE 0 END
+            WHERE s.id = ANY(v_sku_ids);
+
+            UPDATE products p
+            SET effective_stock = coalesce((
+                    SELECT sum(s.effective_stock) FROM product_skus s
+                    WHERE s.product_id = p.id AND s.is_active
+                ), 0)
+            WHERE p.id = ANY(v_product_ids || ARRAY(SELECT product_id FROM product_skus WHERE id = ANY(v_sku_ids)));
+
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql;
+    """)
+
+    op.execute("""
+        CREATE TRIGGER trg_product_skus_effective_stock
+        AFTER INSERT OR DELETE OR UPDATE OF current_stock, stock_sku_id, is_active, is_stock_sku, product_id ON product_skus
+        FOR EACH ROW EXECUTE FUNCTION product_skus_refresh_effective_stock()
+    """)
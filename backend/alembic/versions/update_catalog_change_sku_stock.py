@@ -0,0 +1,26 @@
+"""update_catalog_change_sku_stock
+
+Revision ID: update_catalog_change_sku_stock
+Revises: update_stock_movements_create_partition
+Create Date: 2025-08-30 09:00:00.000000
+
+"""
+from alembic import op
+from app.models.catalog_change import change_log_functions
+
+
+# revision identifiers, used by Alembic.
+revision = 'update_catalog_change_sku_stock'
+down_revision = 'update_stock_movements_create_partition'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SKUs: alteração de effective_stock marca o bit de estoque, como já ocorre nos produtos
+    op.execute(change_log_functions())
+
+
+def downgrade():
+    # As revisões anteriores usam o mesmo gerador: a função já é a mesma
+    pass
@@ -0,0 +1,72 @@
+"""update_stock_movements_create_partition
+
+Revision ID: update_stock_movements_create_partition
+Revises: add_catalog_changes_txid
+Create Date: 2025-08-29 09:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'update_stock_movements_create_partition'
+down_revision = 'add_catalog_changes_txid'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Partição de um mês que já tem linhas na partição padrão: move as linhas antes de anexar
+    op.execute("""
+        CREATE OR REPLACE FUNCTION stock_movements_create_partition(p_month date)
+        RETURNS text AS $$
+        DECLARE
+            v_start date := date_trunc('month', p_month)::date;
+            v_name text := 'stock_movements_' || to_char(v_start, 'YYYY_MM');
+            v_from text := quote_literal(v_start::timestamp AT TIME ZONE 'UTC');
+            v_to text := quote_literal((v_start + interval '1 month')::timestamp AT TIME ZONE 'UTC');
+        BEGIN
+            IF to_regclass(v_name) IS NOT NULL THEN
+                RETURN v_name;
+            END IF;
+            IF to_regclass('stock_movements_default') IS NOT NULL AND EXISTS (
+                SELECT 1 FROM stock_movements_default
+                WHERE created_at >= v_start::timestamp AT TIME ZONE 'UTC'
+                  AND created_at < (v_start + interval '1 month')::timestamp AT TIME ZONE 'UTC'
+            ) THEN
+                -- Mês já gravado na partição padrão (manutenção atrasada): a partição é criada fora da
+                -- tabela, recebe as linhas do mês retiradas da padrão e então é anexada
+                EXECUTE 'CREATE TABLE ' || quote_ident(v_name)
+                    || ' (LIKE stock_movements INCLUDING DEFAULTS INCLUDING CONSTRAINTS)';
+                EXECUTE 'WITH moved AS (DELETE FROM stock_movements_default WHERE created_at >= ' || v_from
+                    || ' AND created_at < ' || v_to || ' RETURNING *) INSERT INTO ' || quote_ident(v_name)
+                    || ' SELECT * FROM moved';
+                EXECUTE 'ALTER TABLE stock_movements ATTACH PARTITION ' || quote_ident(v_name)
+                    || ' FOR VALUES FROM (' || v_from || ') TO (' || v_to || ')';
+            ELSE
+                EXECUTE 'CREATE TABLE ' || quote_ident(v_name) || ' PARTITION OF stock_movements FOR VALUES FROM ('
+                    || v_from || ') TO (' || v_to || ')';
+            END IF;
+            RETURN v_name;
+        END
+        $$ LANGUAGE plpgsql;
+    """)
+
+
+def downgrade():
+    op.execute("""
+        CREATE OR REPLACE FUNCTION stock_movements_create_partition(p_month date)
+        RETURNS text AS $$
+        DECLARE
+            v_start date := date_trunc('month', p_month)::date;
+            v_name text := 'stock_movements_' || to_char(v_start, 'YYYY_MM');
+        BEGIN
+            IF to_regclass(v_name) IS NULL THEN
+                EXECUTE 'CREATE TABLE ' || quote_ident(v_name) || ' PARTITION OF stock_movements FOR VALUES FROM ('
+                    || quote_literal(v_start::timestamp AT TIME ZONE 'UTC') || ') TO ('
+                    || quote_literal((v_start + interval '1 month')::timestamp AT TIME ZONE 'UTC') || ')';
+            END IF;
+            RETURN v_name;
+        END
+        $$ LANGUAGE plpgsql;
+    """)
@@ -16,10 +16,12 @@ from ...schemas.admin import (
     AdminStats,
     CompanyDetail,
     PlanDetail,
-    ModuleDetail
+    ModuleDetail,
+    StockDriftReport
 )
 from ...schemas.module import ModuleCreate, ModuleUpdate, PlanModuleCreate, PlanModuleUpdate
 from ...services.module_service import ModuleService
+from ...services.stock_drift_service import StockDriftService
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
@@ -1014,4 +1016,36 @@ async def verify_master_admin(
         raise HTTPException(
             status_code=500,
             detail=f"Erro ao verificar permissões: {str(e)}"
-        ) 
\ No newline at end of file
+        ) 
+
+@router.post("/stock-drift", response_model=List[StockDriftReport])
+def verify_stock_drift(
+    company_id: Optional[UUID] = None,
+    repair: bool = False,
+    branches: bool = True,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(verify_admin_access)
+):
+    """Conferir o estoque gravado contra o histórico de movimentações
+
+    Sem company_id confere todas as empresas em paralelo (uma por processo) — apenas o
+    admin da empresa master; os demais administradores conferem só a própria empresa.
+    Com repair=true o estoque divergente do SKU é corrigido para o valor do histórico;
+    a divergência de filial é apenas informada.
+    """
+    # Mesma verificação de verify_master_admin
+    master_company = db.query(Company).filter(
+        Company.cnpj == "00.000.000/0001-00"
+    ).first()
+    is_master_admin = master_company is not None and current_user.company_id == master_company.id
+
+    if is_master_admin:
+        company_ids = [company_id] if company_id else None
+    else:
+        if company_id and company_id != current_user.company_id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Acesso negado. Apenas o admin master confere outras empresas."
+            )
+        company_ids = [current_user.company_id]
+    return StockDriftService.verify_companies(db, company_ids, repair, branches)
@@ -0,0 +1,46 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from app.core.database import get_db
+from ..v1.auth import get_current_user
+from app.models.user import User
+from app.schemas.analytics import AbcCurveItem, AbcClassifyResult
+from app.services.abc_analysis_service import AbcAnalysisService
+
+router = APIRouter()
+
+# ==================== CURVA ABC ====================
+
+@router.get("/abc/skus", response_model=List[AbcCurveItem])
+def get_sku_abc_curve(
+    period_days: int = Query(365, ge=1, le=1825),
+    abc_class: Optional[str] = Query(None, pattern="^[ABC]$"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Curva ABC dos SKUs pelo valor das saídas de estoque no período"""
+    return AbcAnalysisService.sku_curve(db, current_user.company_id, period_days, abc_class, skip, limit)
+
+@router.get("/abc/customers", response_model=List[AbcCurveItem])
+def get_customer_abc_curve(
+    period_days: int = Query(365, ge=1, le=1825),
+    abc_class: Optional[str] = Query(None, pattern="^[ABC]$"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Curva ABC dos clientes pelo volume de contas a receber no período"""
+    return AbcAnalysisService.customer_curve(db, current_user.company_id, period_days, abc_class, skip, limit)
+
+@router.post("/abc/classify", response_model=AbcClassifyResult)
+def classify_abc(
+    period_days: int = Query(365, ge=1, le=1825),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Recalcular e gravar a classe ABC de SKUs e clientes (usada nos filtros das listagens)"""
+    return AbcAnalysisService.classify(db, current_user.company_id, period_days)
@@ -83,6 +83,7 @@ def get_customers(
     city: Optional[str] = None,
     state: Optional[str] = None,
     is_active: Optional[bool] = None,
+    abc_class: Optional[str] = Query(None, pattern="^[ABC]$"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -118,6 +119,9 @@ def get_customers(
         else:
             query = query.filter(Customer.status != CustomerStatus.ACTIVE)
     
+    if abc_class:
+        query = query.filter(Customer.abc_class == abc_class)
+    
     # Ordenar por nome
     query = query.order_by(Customer.name)
     
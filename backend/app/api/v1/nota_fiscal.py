@@ -1,18 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import gzip
+import io
+import zipfile
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import UploadFile as StarletteUploadFile
+from starlette.formparsers import MultiPartException, MultiPartParser
 from sqlalchemy.orm import Session
-from typing import List
+from datetime import date
+from typing import AsyncGenerator, List, Optional
 from app.core.database import get_db
 from ..v1.auth import get_current_user
 from app.models.user import User
 from app.schemas.nota_fiscal import (
     NotaFiscal, NotaFiscalCreate, NotaFiscalUpdate, 
-    NotaFiscalList, NotaFiscalImport, NotaFiscalResponse
+    NotaFiscalList, NotaFiscalImport, NotaFiscalResponse, NotaFiscalBatchImportResult,
+    NotaFiscalPostingRequest, NotaFiscalPostingResult, NotaFiscalTaxReportRow
 )
+from app.core.config import settings
 from app.services.nota_fiscal_service import NotaFiscalService
-from app.services.pdf_service import PDFService
+from app.services.nota_fiscal_import_service import NotaFiscalImportService
+from app.services.nota_fiscal_posting_service import NotaFiscalPostingService
+from app.services.danfe_service import DanfeService
+from app.services.nota_fiscal_report_service import NotaFiscalReportService
 
 router = APIRouter()
 
+# Bloco da descompressão no download do XML
+XML_STREAM_BLOCK_SIZE = 64 * 1024
+
 
 @router.post("/import", response_model=NotaFiscalResponse)
 def import_nota_fiscal(
@@ -56,6 +72,148 @@ def import_nota_fiscal(
         )
 
 
+@router.post("/import/batch", response_model=NotaFiscalBatchImportResult)
+def import_notas_fiscais_batch(
+    files: List[UploadFile] = File(...),
+    tipo: str = Form("entrada", pattern="^(entrada|saida)$"),
+    handle_duplicates: str = Form("skip", pattern="^(skip|overwrite)$"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Importa notas fiscais em lote: arquivos XML e/ou ZIPs com os XMLs
+
+    Retorna o resultado de cada arquivo (criada, sobrescrita, duplicada ou erro); erros em
+    um arquivo não interrompem a importação dos demais.
+    """
+    xml_files = []
+    batch_bytes = 0
+    for upload in files:
+        try:
+            for xml_file in NotaFiscalImportService.iter_files(upload.filename, upload.file, batch_bytes):
+                xml_files.append(xml_file)
+                batch_bytes += len(xml_file[1])
+                if len(xml_files) > settings.NFE_IMPORT_MAX_FILES:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"Limite de {settings.NFE_IMPORT_MAX_FILES} XMLs por importação"
+                    )
+        except zipfile.BadZipFile:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Arquivo ZIP inválido: {upload.filename}"
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=str(e)
+            )
+    
+    if not xml_files:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Nenhum arquivo XML encontrado"
+        )
+    
+    return NotaFiscalImportService.import_files(
+        db, current_user.company_id, xml_files, tipo, handle_duplicates
+    )
+
+
+async def _limited_stream(request: Request, max_bytes: int) -> AsyncGenerator[bytes, None]:
+    """Corpo da requisição em blocos, interrompido ao passar de max_bytes"""
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > max_bytes:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Arquivo maior que o limite de {max_bytes // (1024 * 1024)} MB"
+            )
+        yield chunk
+
+
+@router.post("/import/upload", response_model=NotaFiscalResponse)
+async def upload_nota_fiscal(
+    request: Request,
+    tipo: str = Query("entrada", pattern="^(entrada|saida)$"),
+    handle_duplicates: str = Query("skip", pattern="^(skip|overwrite)$"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Importa nota fiscal a partir de um XML enviado como arquivo (multipart, campo "file")
+    
+    O corpo é lido em blocos para um arquivo temporário (spool), com o limite de
+    NFE_UPLOAD_MAX_BYTES aplicado durante a leitura, e o XML é lido com iterparse.
+    """
+    max_bytes = settings.NFE_UPLOAD_MAX_BYTES
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Arquivo maior que o limite de {max_bytes // (1024 * 1024)} MB"
+        )
+    if not request.headers.get("content-type", "").startswith("multipart/form-data"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Envie o XML como multipart/form-data (campo file)"
+        )
+    
+    try:
+        form = await MultiPartParser(
+            request.headers, _limited_stream(request, max_bytes), max_files=1, max_fields=10
+        ).parse()
+    except MultiPartException as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    try:
+        upload = form.get("file")
+        if not isinstance(upload, StarletteUploadFile):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Arquivo XML não enviado (campo file)"
+            )
+        
+        nota_fiscal = await run_in_threadpool(
+            NotaFiscalService.import_xml_file,
+            db, current_user.company_id, upload.file, upload.filename or "nfe.xml", tipo, handle_duplicates
+        )
+        return NotaFiscalResponse(
+            success=True,
+            message="Nota fiscal importada com sucesso",
+            data=nota_fiscal
+        )
+    except ValueError as e:
+        return NotaFiscalResponse(
+            success=False,
+            message="Erro ao importar nota fiscal",
+            errors=[str(e)]
+        )
+    finally:
+        await form.close()
+
+
+@router.post("/post", response_model=NotaFiscalPostingResult)
+def post_notas_fiscais(
+    request_data: NotaFiscalPostingRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Lança notas fiscais de entrada no estoque (movimentações de entrada) e no contas a pagar
+    
+    Cada nota é lançada em uma transação; notas já lançadas são ignoradas e notas com
+    fornecedor ou itens sem SKU correspondente voltam com os erros, sem lançamento parcial.
+    """
+    if len(request_data.nota_fiscal_ids) > settings.NFE_POSTING_MAX_NOTAS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Limite de {settings.NFE_POSTING_MAX_NOTAS} notas fiscais por lançamento"
+        )
+    
+    return NotaFiscalPostingService.post(
+        db, current_user.company_id, request_data.nota_fiscal_ids, current_user.id, request_data.branch_id
+    )
+
+
 @router.post("/", response_model=NotaFiscal)
 def create_nota_fiscal(
     nota_fiscal_data: NotaFiscalCreate,
@@ -77,16 +235,106 @@ def create_nota_fiscal(
 
 @router.get("/", response_model=List[NotaFiscalList])
 def list_notas_fiscais(
+    emitente_uf: Optional[str] = Query(None, pattern="^[A-Za-z]{2}$"),
+    emitente_cidade: Optional[str] = None,
+    destinatario_uf: Optional[str] = Query(None, pattern="^[A-Za-z]{2}$"),
+    destinatario_cidade: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Lista TODAS as notas fiscais da empresa (sem limite)"""
+    """Lista TODAS as notas fiscais da empresa (sem limite)
+    
+    Filtros opcionais por UF e cidade (sem diferenciar maiúsculas) do emitente e do
+    destinatário, atendidos por índices de expressão sobre os endereços.
+    """
     notas_fiscais = NotaFiscalService.get_all_notas_fiscais(
-        db, current_user.company_id
+        db, current_user.company_id, emitente_uf, emitente_cidade, destinatario_uf, destinatario_cidade
     )
     return notas_fiscais
 
 
+@router.get("/export/danfe")
+def export_danfe_notas_fiscais(
+    data_inicio: Optional[date] = None,
+    data_fim: Optional[date] = None,
+    emitente_cnpj: Optional[str] = None,
+    tipo: Optional[str] = Query(None, pattern="^(entrada|saida)$"),
+    format: str = Query("zip", pattern="^(zip|pdf)$"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Exporta os DANFEs das notas do filtro (período de emissão, emitente, tipo)
+    
+    zip: um PDF por nota, enviado à medida que os blocos são renderizados no pool de
+    processos; pdf: um único PDF com todas as notas na ordem de emissão, montado em memória
+    antes do envio e limitado a DANFE_MERGE_MAX_NOTAS notas (lotes maiores: zip).
+    """
+    if format == "pdf" and not DanfeService.merge_available():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Exportação em PDF único indisponível (pypdf não instalado); use format=zip"
+        )
+    try:
+        nota_fiscal_ids = DanfeService.export_ids(
+            db, current_user.company_id, data_inicio, data_fim, emitente_cnpj, tipo,
+            settings.DANFE_MERGE_MAX_NOTAS if format == "pdf" else None
+        )
+    except ValueError as e:
+        detail = str(e)
+        if format == "pdf":
+            detail += "; para lotes maiores use format=zip"
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=detail
+        )
+    if not nota_fiscal_ids:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Nenhuma nota fiscal encontrada para o filtro"
+        )
+    
+    rendered = DanfeService.iter_rendered(current_user.company_id, nota_fiscal_ids)
+    period = "_".join(str(value) for value in (data_inicio, data_fim) if value) or "todas"
+    if format == "pdf":
+        return StreamingResponse(
+            DanfeService.iter_merged_pdf(rendered),
+            media_type="application/pdf",
+            headers={"Content-Disposition": f"attachment; filename=danfes_{period}.pdf"}
+        )
+    return StreamingResponse(
+        DanfeService.iter_zip(rendered),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename=danfes_{period}.zip"}
+    )
+
+
+@router.get("/reports/taxes", response_model=List[NotaFiscalTaxReportRow])
+def get_tax_report(
+    group_by: str = Query("mes,tipo,cfop", pattern="^(mes|tipo|cfop|ncm|emitente)(,(mes|tipo|cfop|ncm|emitente))*$"),
+    mes_inicio: Optional[date] = None,
+    mes_fim: Optional[date] = None,
+    tipo: Optional[str] = Query(None, pattern="^(entrada|saida)$"),
+    emitente_cnpj: Optional[str] = None,
+    cfop: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Apuração de ICMS, IPI, PIS e COFINS dos itens por mês, tipo, CFOP, NCM e/ou emitente
+    
+    group_by define as dimensões e a ordem dos subtotais (ex.: mes,cfop); mes_inicio e
+    mes_fim selecionam meses inteiros de emissão. Notas canceladas e denegadas não entram.
+    """
+    try:
+        return NotaFiscalReportService.tax_report(
+            db, current_user.company_id, group_by.split(","), mes_inicio, mes_fim, tipo, emitente_cnpj, cfop
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
 @router.get("/{nota_fiscal_id}", response_model=NotaFiscal)
 def get_nota_fiscal(
     nota_fiscal_id: int,
@@ -112,10 +360,16 @@ def update_nota_fiscal(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Atualiza uma nota fiscal"""
-    nota_fiscal = NotaFiscalService.update_nota_fiscal(
-        db, nota_fiscal_id, current_user.company_id, update_data
-    )
+    """Atualiza uma nota fiscal (campos do lançamento ficam bloqueados após o lançamento)"""
+    try:
+        nota_fiscal = NotaFiscalService.update_nota_fiscal(
+            db, nota_fiscal_id, current_user.company_id, update_data
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
     if not nota_fiscal:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -130,10 +384,16 @@ def delete_nota_fiscal(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Deleta uma nota fiscal"""
-    success = NotaFiscalService.delete_nota_fiscal(
-        db, nota_fiscal_id, current_user.company_id
-    )
+    """Deleta uma nota fiscal (notas lançadas no estoque/financeiro não podem ser excluídas)"""
+    try:
+        success = NotaFiscalService.delete_nota_fiscal(
+            db, nota_fiscal_id, current_user.company_id
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -168,11 +428,16 @@ def check_nota_fiscal_exists(
 @router.get("/{nota_fiscal_id}/xml")
 def download_xml_nota_fiscal(
     nota_fiscal_id: int,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Download do XML da nota fiscal"""
-    nota_fiscal = NotaFiscalService.get_nota_fiscal(
+    """Download do XML da nota fiscal
+    
+    O XML é armazenado comprimido: clientes que aceitam gzip recebem os bytes gravados
+    (Content-Encoding: gzip); os demais recebem o XML descomprimido em blocos.
+    """
+    nota_fiscal = NotaFiscalService.get_xml_nota_fiscal(
         db, nota_fiscal_id, current_user.company_id
     )
     if not nota_fiscal:
@@ -181,20 +446,30 @@ def download_xml_nota_fiscal(
             detail="Nota fiscal não encontrada"
         )
     
-    if not nota_fiscal.xml_content:
+    if not nota_fiscal.xml_gzip:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="XML não disponível para esta nota fiscal"
         )
     
     filename = nota_fiscal.xml_filename or f"nfe_{nota_fiscal.numero}.xml"
+    headers = {"Content-Disposition": f"attachment; filename={filename}", "Vary": "Accept-Encoding"}
+    if nota_fiscal.xml_sha256:
+        headers["ETag"] = f'"{nota_fiscal.xml_sha256}"'
     
-    from fastapi.responses import Response
-    return Response(
-        content=nota_fiscal.xml_content,
-        media_type="application/xml",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
-    )
+    if "gzip" in request.headers.get("accept-encoding", "").lower():
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=nota_fiscal.xml_gzip, media_type="application/xml", headers=headers)
+    
+    def iter_xml():
+        with gzip.GzipFile(fileobj=io.BytesIO(nota_fiscal.xml_gzip)) as xml_file:
+            while True:
+                block = xml_file.read(XML_STREAM_BLOCK_SIZE)
+                if not block:
+                    break
+                yield block
+    
+    return StreamingResponse(iter_xml(), media_type="application/xml", headers=headers)
 
 
 @router.get("/{nota_fiscal_id}/pdf")
@@ -213,54 +488,11 @@ def download_pdf_nota_fiscal(
             detail="Nota fiscal não encontrada"
         )
     
-    # Converter para dict para o PDF service
-    nota_fiscal_dict = {
-        'numero': nota_fiscal.numero,
-        'serie': nota_fiscal.serie,
-        'tipo': nota_fiscal.tipo,
-        'natureza_operacao': nota_fiscal.natureza_operacao,
-        'data_emissao': nota_fiscal.data_emissao,
-        'emitente_nome': nota_fiscal.emitente_nome,
-        'emitente_cnpj': nota_fiscal.emitente_cnpj,
-        'emitente_ie': nota_fiscal.emitente_ie,
-        'emitente_endereco': nota_fiscal.emitente_endereco,
-        'destinatario_nome': nota_fiscal.destinatario_nome,
-        'destinatario_documento': nota_fiscal.destinatario_documento,
-        'destinatario_email': nota_fiscal.destinatario_email,
-        'destinatario_telefone': nota_fiscal.destinatario_telefone,
-        'destinatario_endereco': nota_fiscal.destinatario_endereco,
-        'valor_total': nota_fiscal.valor_total,
-        'valor_produtos': nota_fiscal.valor_produtos,
-        'valor_icms': nota_fiscal.valor_icms,
-        'valor_ipi': nota_fiscal.valor_ipi,
-        'valor_pis': nota_fiscal.valor_pis,
-        'valor_cofins': nota_fiscal.valor_cofins,
-        'valor_frete': nota_fiscal.valor_frete,
-        'valor_seguro': nota_fiscal.valor_seguro,
-        'valor_desconto': nota_fiscal.valor_desconto,
-        'observacoes': nota_fiscal.observacoes,
-        'informacoes_adicionais': nota_fiscal.informacoes_adicionais,
-        'produtos': [
-            {
-                'codigo': p.codigo,
-                'descricao': p.descricao,
-                'ncm': p.ncm,
-                'cfop': p.cfop,
-                'unidade': p.unidade,
-                'quantidade': p.quantidade,
-                'valor_unitario': p.valor_unitario,
-                'valor_total': p.valor_total,
-            } for p in nota_fiscal.produtos
-        ] if nota_fiscal.produtos else []
-    }
-    
-    # Gerar PDF
-    pdf_buffer = PDFService.generate_nota_fiscal_pdf(nota_fiscal_dict)
-    pdf_content = pdf_buffer.getvalue()
+    # DANFE do cache em disco; quando ausente, renderizado no pool de processos
+    pdf_content = DanfeService.get_pdf(nota_fiscal)
     
     filename = f"nfe_{nota_fiscal.numero}.pdf"
     
-    from fastapi.responses import Response
     return Response(
         content=pdf_content,
         media_type="application/pdf",
@@ -0,0 +1,162 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import and_, desc
+from typing import List, Optional
+from datetime import datetime
+
+from app.core.database import get_db
+from ..v1.auth import get_current_user
+from app.models.sales_order import SalesOrder, OrderStatus
+from app.models.user import User
+from app.schemas.sales_order import (
+    SalesOrderCreate, SalesOrderBatchCreate, SalesOrderBatchResult, SalesOrderIntakeResult,
+    SalesOrderResponse, SalesOrderList, SalesOrderStatusUpdate, PickingListRequest
+)
+from app.services.sales_order_service import SalesOrderService
+from app.services.picking_service import PickingService
+from app.services.pdf_service import PDFService
+
+router = APIRouter()
+
+# ==================== PEDIDOS DE VENDA ====================
+
+@router.post("/batch", response_model=SalesOrderBatchResult)
+def create_orders_batch(
+    batch: SalesOrderBatchCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Importar um lote de pedidos (marketplaces, loja, integrações)
+
+    Cada pedido é aceito ou recusado por inteiro: SKUs resolvidos por sku_code/código de
+    barras, estoque reservado e parcelas a receber geradas. Pedidos com o mesmo canal e
+    external_id já importados retornam como duplicados.
+    """
+    return SalesOrderService.ingest(db, current_user.company_id, batch.orders)
+
+@router.post("/", response_model=SalesOrderIntakeResult, status_code=status.HTTP_201_CREATED)
+def create_order(
+    order: SalesOrderCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Criar um pedido"""
+    result = SalesOrderService.ingest(db, current_user.company_id, [order])["results"][0]
+    if result["status"] == "rejected":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="; ".join(result["errors"])
+        )
+    return result
+
+@router.post("/picking-list")
+def generate_picking_list(
+    request: PickingListRequest,
+    output_format: str = Query("json", alias="format", pattern="^(json|pdf)$"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Gerar lista de separação de um lote de pedidos e/ou saídas de estoque
+
+    Quantidades consolidadas por SKU de estoque e ordenadas pela localização (corredor,
+    prateleira, posição), alternando o sentido a cada corredor. Com branch_id, apenas
+    pedidos e saídas dessa filial entram na lista. Resposta em JSON ou PDF.
+    """
+    picking = PickingService.build(
+        db, current_user.company_id, request.order_ids, request.movement_ids, request.branch_id
+    )
+    if not picking["lines"]:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Nenhum item a separar para os pedidos/movimentações informados"
+        )
+    
+    if request.mark_preparing:
+        PickingService.mark_preparing(db, current_user.company_id, picking["order_ids"])
+    
+    filename = f"separacao_{picking['generated_at'].strftime('%Y%m%d%H%M%S')}"
+    if output_format == "pdf":
+        return StreamingResponse(
+            PDFService.generate_picking_list_pdf(picking),
+            media_type="application/pdf",
+            headers={"Content-Disposition": f"attachment; filename={filename}.pdf"}
+        )
+    
+    return StreamingResponse(PickingService.iter_json(picking), media_type="application/json")
+
+@router.get("/", response_model=List[SalesOrderList])
+def get_orders(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    status: Optional[OrderStatus] = None,
+    channel: Optional[str] = None,
+    customer_id: Optional[int] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Listar pedidos"""
+    query = db.query(SalesOrder).filter(SalesOrder.company_id == current_user.company_id)
+    
+    if status:
+        query = query.filter(SalesOrder.status == status)
+    
+    if channel:
+        query = query.filter(SalesOrder.channel == channel)
+    
+    if customer_id:
+        query = query.filter(SalesOrder.customer_id == customer_id)
+    
+    if start_date:
+        query = query.filter(SalesOrder.order_date >= start_date)
+    
+    if end_date:
+        query = query.filter(SalesOrder.order_date <= end_date)
+    
+    return query.options(
+        joinedload(SalesOrder.customer), joinedload(SalesOrder.items)
+    ).order_by(desc(SalesOrder.order_date)).offset(skip).limit(limit).all()
+
+@router.get("/{order_id}", response_model=SalesOrderResponse)
+def get_order(
+    order_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Obter pedido"""
+    order = SalesOrderService.get_order(db, current_user.company_id, order_id)
+    if not order:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Pedido não encontrado"
+        )
+    return order
+
+@router.put("/{order_id}/status", response_model=SalesOrderResponse)
+def update_order_status(
+    order_id: int,
+    status_update: SalesOrderStatusUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Alterar status do pedido
+
+    Enviado dá baixa no estoque (converte a reserva em saída); cancelado libera a reserva
+    e cancela as parcelas pendentes.
+    """
+    try:
+        return SalesOrderService.update_status(
+            db, current_user.company_id, current_user.id, order_id, status_update.status
+        )
+    except LookupError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status, UploadFile, File
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, or_, func
+from sqlalchemy import and_, or_, func, select, tuple_
 from typing import List, Optional
 from datetime import datetime, timedelta
+from uuid import UUID
 
 from app.core.database import get_db
 from ..v1.auth import get_current_user
@@ -10,16 +11,30 @@ from app.models.product import Product
 from app.models.product_sku import ProductSKU
 from app.models.stock_branch import StockBranch
 from app.models.stock_movement import StockMovement, MovementType, MovementReason
+from app.models.reorder_suggestion import ReorderSuggestion
 from app.models.user import User
 from app.schemas.product import (
     ProductCreate, ProductUpdate, ProductResponse, ProductList,
     ProductSKUCreate, ProductSKUUpdate, ProductSKUResponse, ProductSKUList,
     StockMovementCreate, StockMovementResponse, StockMovementList,
-    ProductFilter, ProductSKUFilter, StockMovementFilter
+    ProductFilter, ProductSKUFilter, StockMovementFilter,
+    SKULookupRecord, SKULookupBatchRequest, SKULookupBatchResponse,
+    ProductImportResult, BulkPriceUpdateRequest, BulkPriceUpdateResponse,
+    ReorderSuggestionResponse, ReorderRunResult, CatalogChangesResponse,
+    StockValuationResponse
 )
 from app.schemas.stock_branch import (
-    StockBranchCreate, StockBranchUpdate, StockBranchResponse, StockBranchList
+    StockBranchCreate, StockBranchUpdate, StockBranchResponse, StockBranchList,
+    StockTransferRequest, StockTransferResult
 )
+from app.services.product_search_service import ProductSearchService
+from app.services.sku_lookup_cache import sku_lookup_cache
+from app.services.product_import_service import ProductImportService
+from app.services.pricing_service import PricingService
+from app.services.reorder_service import ReorderService
+from app.services.catalog_change_service import CatalogChangeService
+from app.services.stock_cost_service import StockCostService
+from app.services.stock_transfer_service import StockTransferService
 
 router = APIRouter()
 
@@ -84,6 +99,7 @@ def create_product(
             
             db.add(db_sku)
             db.commit()
+            sku_lookup_cache.invalidate(current_user.company_id)
             print(f"SKU criado automaticamente usando SKU da aba básicas: {db_sku.sku_code} (is_stock_sku: {db_sku.is_stock_sku})")
         
         print(f"Produto criado com sucesso: {db_product.id}")
@@ -96,20 +112,83 @@ def create_product(
         print(f"Traceback: {traceback.format_exc()}")
         raise
 
+@router.post("/import", response_model=ProductImportResult)
+def import_products(
+    file: UploadFile = File(...),
+    file_format: Optional[str] = Query(None, pattern="^(csv|jsonl)$"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Importar produtos e SKUs em massa (CSV ou JSON lines), com upsert por sku_code
+
+    Cada linha descreve um SKU e repete os dados do produto (product_name agrupa as variações).
+    As linhas são gravadas em lotes, um commit por lote; linhas inválidas não interrompem a
+    importação e são devolvidas no relatório de erros.
+    """
+    if not file_format:
+        filename = (file.filename or "").lower()
+        file_format = "jsonl" if filename.endswith((".jsonl", ".ndjson", ".json")) else "csv"
+    
+    result = ProductImportService.import_file(db, current_user.company_id, file.file, file_format)
+    sku_lookup_cache.invalidate(current_user.company_id)
+    
+    return result
+
+@router.post("/prices/bulk-update", response_model=BulkPriceUpdateResponse)
+def bulk_update_prices(
+    request: BulkPriceUpdateRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Reajustar preços de SKUs em massa por regras (markup, percentual, valor fixo, promoção)
+
+    Cada regra vira um único UPDATE filtrado por categoria, marca, fornecedor, produtos ou SKUs.
+    Com dry_run=true (padrão) as regras são executadas e desfeitas, retornando a prévia.
+    """
+    try:
+        result = PricingService.bulk_update(db, current_user.company_id, request)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    if not request.dry_run:
+        sku_lookup_cache.invalidate(current_user.company_id)
+    
+    return result
+
 @router.get("/", response_model=List[ProductList])
 def get_products(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     search: Optional[str] = None,
+    search_mode: str = Query("substring", pattern="^(substring|fulltext)$"),
     category: Optional[str] = None,
     brand: Optional[str] = None,
     ncm: Optional[str] = None,
     is_active: Optional[bool] = None,
     is_service: Optional[bool] = None,
+    has_stock: Optional[bool] = None,
+    min_stock: Optional[int] = Query(None, description="Estoque total (incluindo SKUs associados) mínimo"),
+    tax: Optional[str] = Query(None, max_length=20, description="Produtos com SKU ativo com o imposto (ex.: ICMS)"),
+    tax_rate: Optional[float] = Query(None, ge=0, description="Alíquota do imposto informado em tax"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Listar produtos com filtros"""
+    """Listar produtos com filtros
+
+    search_mode=substring mantém a busca por trecho (ILIKE, atendida por índices de trigramas);
+    search_mode=fulltext usa o vetor de busca (português, sem acentos, prefixo) incluindo
+    códigos de SKU e códigos de barras, ordenando por relevância. tax/tax_rate filtram pelos
+    impostos dos SKUs (índice GIN em taxes).
+    """
+    if tax_rate is not None and not tax:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Informe o imposto (tax) para filtrar pela alíquota"
+        )
+    
     print(f"Listando produtos para usuário: {current_user.email}")
     print(f"Company ID do usuário: {current_user.company_id}")
     
@@ -121,13 +200,10 @@ def get_products(
     
     # Aplicar filtros
     if search:
-        search_filter = or_(
-            Product.name.ilike(f"%{search}%"),
-            Product.description.ilike(f"%{search}%"),
-            Product.brand.ilike(f"%{search}%"),
-            Product.model.ilike(f"%{search}%")
-        )
-        query = query.filter(search_filter)
+        if search_mode == "fulltext":
+            query = ProductSearchService.apply_fulltext_filter(query, search)
+        else:
+            query = ProductSearchService.apply_ilike_filter(query, search)
     
     if category:
         query = query.filter(Product.category == category)
@@ -144,29 +220,45 @@ def get_products(
     if is_service is not None:
         query = query.filter(Product.is_service == is_service)
     
-    # Contar SKUs e estoque total
+    # Estoque total mantido em effective_stock (SKUs ativos + SKUs associados)
+    if has_stock is not None:
+        query = query.filter(Product.effective_stock > 0 if has_stock else Product.effective_stock <= 0)
+    
+    if min_stock is not None:
+        query = query.filter(Product.effective_stock >= min_stock)
+    
+    if tax:
+        query = query.filter(Product.id.in_(
+            select(ProductSKU.product_id).where(
+                and_(ProductSearchService.sku_tax_filter(tax, tax_rate), ProductSKU.is_active == True)
+            )
+        ))
+    
     products = query.options(joinedload(Product.skus)).offset(skip).limit(limit).all()
     
+    # Contar SKUs associados aos SKUs de estoque da página em uma única consulta
+    stock_sku_ids = [sku.id for product in products for sku in product.skus if sku.is_active and sku.is_stock_sku]
+    associated_counts = {}
+    if stock_sku_ids:
+        associated_counts = dict(
+            db.query(ProductSKU.stock_sku_id, func.count(ProductSKU.id)).filter(
+                and_(
+                    ProductSKU.stock_sku_id.in_(stock_sku_ids),
+                    ProductSKU.is_active == True
+                )
+            ).group_by(ProductSKU.stock_sku_id).all()
+        )
+    
     result = []
     for product in products:
         # Filtrar apenas SKUs ativos do produto
         active_skus = [sku for sku in product.skus if sku.is_active]
         
-        # Contar SKUs associados (que apontam para este produto como stock_sku)
-        from app.models.product_sku import ProductSKU
-        associated_skus = db.query(ProductSKU).filter(
-            and_(
-                ProductSKU.stock_sku_id.in_([sku.id for sku in active_skus if sku.is_stock_sku]),
-                ProductSKU.is_active == True
-            )
-        ).all()
-        
         # Total de SKUs = SKUs próprios + SKUs associados
-        total_sku_count = len(active_skus) + len(associated_skus)
-        
-        # Calcular estoque total (incluindo SKUs associados)
-        total_stock = sum(sku.current_stock for sku in active_skus)
-        total_stock += sum(sku.current_stock for sku in associated_skus)
+        total_sku_count = len(active_skus) + sum(
+            associated_counts.get(sku.id, 0) for sku in active_skus if sku.is_stock_sku
+        )
+        total_stock = product.effective_stock
         
         result.append(ProductList(
             id=product.id,
@@ -183,6 +275,59 @@ def get_products(
     
     return result
 
+@router.get("/search")
+def search_products(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Busca rápida de produtos (typeahead) por nome, marca, modelo, descrição, SKU e código de barras"""
+    return ProductSearchService.search(db, current_user.company_id, q, limit=limit)
+
+@router.get("/lookup", response_model=SKULookupRecord)
+def lookup_sku(
+    code: str = Query(..., min_length=1, max_length=50),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Resolver um código de SKU ou código de barras (cache em memória por empresa)"""
+    record = sku_lookup_cache.lookup(db, current_user.company_id, code)
+    if not record:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="SKU não encontrado"
+        )
+    return record
+
+@router.post("/lookup", response_model=SKULookupBatchResponse)
+def lookup_skus_batch(
+    lookup: SKULookupBatchRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Resolver vários códigos de SKU/códigos de barras em uma única requisição"""
+    found, missing = sku_lookup_cache.lookup_many(db, current_user.company_id, lookup.codes)
+    return SKULookupBatchResponse(found=found, missing=missing)
+
+@router.get("/changes", response_model=CatalogChangesResponse)
+def get_catalog_changes(
+    since: int = Query(0, ge=0, description="Cursor retornado pela chamada anterior (0 = desde o início da retenção)"),
+    since_id: int = Query(0, ge=0, description="cursor_id retornado pela chamada anterior"),
+    limit: int = Query(5000, ge=1, le=50000, description="Máximo de registros de alteração lidos por página"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Feed incremental de alterações de produtos e SKUs (integração com marketplaces)
+
+    Cada item traz só os grupos alterados (catalog, price, stock) com o valor atual;
+    várias alterações do mesmo SKU na página são agrupadas em um item. Alterações de
+    transações ainda abertas só aparecem depois de confirmadas, sempre após o cursor; por
+    isso uma transação de escrita longa no banco atrasa o feed (página vazia com
+    has_more=false) até terminar.
+    """
+    return CatalogChangeService.get_changes(db, current_user.company_id, since, since_id, limit)
+
 @router.get("/{product_id}", response_model=ProductResponse)
 def get_product(
     product_id: int,
@@ -291,6 +436,7 @@ def update_product(
             print(f"SKU criado durante atualização: {db_sku.sku_code} (is_stock_sku: {db_sku.is_stock_sku})")
     
     db.commit()
+    sku_lookup_cache.invalidate(current_user.company_id)
     return db_product
 
 @router.delete("/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -397,6 +543,7 @@ def create_product_sku(
     db.add(db_sku)
     db.commit()
     db.refresh(db_sku)
+    sku_lookup_cache.invalidate(current_user.company_id)
     
     return db_sku
 
@@ -471,6 +618,7 @@ def associate_product_skus(
             created_skus.append(associated_sku)
     
     db.commit()
+    sku_lookup_cache.invalidate(current_user.company_id)
     
     return {
         "message": f"Associados {len(created_skus)} SKUs ao produto",
@@ -489,10 +637,19 @@ def get_product_skus(
     is_active: Optional[bool] = None,
     is_available_for_sale: Optional[bool] = None,
     supplier_id: Optional[int] = None,
+    abc_class: Optional[str] = Query(None, pattern="^[ABC]$"),
+    tax: Optional[str] = Query(None, max_length=20, description="SKUs com o imposto (ex.: ICMS)"),
+    tax_rate: Optional[float] = Query(None, ge=0, description="Alíquota do imposto informado em tax"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Listar SKUs de um produto"""
+    if tax_rate is not None and not tax:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Informe o imposto (tax) para filtrar pela alíquota"
+        )
+    
     # Verificar se o produto existe e pertence à empresa
     product = db.query(Product).filter(
         and_(
@@ -546,6 +703,12 @@ def get_product_skus(
     if supplier_id:
         query = query.filter(ProductSKU.supplier_id == supplier_id)
     
+    if abc_class:
+        query = query.filter(ProductSKU.abc_class == abc_class)
+    
+    if tax:
+        query = query.filter(ProductSearchService.sku_tax_filter(tax, tax_rate))
+    
     skus = query.offset(skip).limit(limit).all()
     
     result = []
@@ -558,12 +721,14 @@ def get_product_skus(
             cost_price=sku.cost_price,
             sale_price=sku.sale_price,
             current_stock=sku.current_stock,
+            effective_stock=sku.effective_stock,
             available_stock=sku.available_stock,
             stock_status=sku.stock_status,
             is_active=sku.is_active,
             is_available_for_sale=sku.is_available_for_sale,
             is_stock_sku=sku.is_stock_sku,
             stock_sku_id=sku.stock_sku_id,
+            abc_class=sku.abc_class,
             created_at=sku.created_at
         ))
     
@@ -635,6 +800,7 @@ def update_sku(
     
     db.commit()
     db.refresh(db_sku)
+    sku_lookup_cache.invalidate(current_user.company_id)
     
     return db_sku
 
@@ -674,6 +840,7 @@ def delete_sku(
     # Soft delete - apenas desativar
     db_sku.is_active = False
     db.commit()
+    sku_lookup_cache.invalidate(current_user.company_id)
     
     return None
 
@@ -687,13 +854,13 @@ def create_stock_movement(
     current_user: User = Depends(get_current_user)
 ):
     """Criar movimentação de estoque"""
-    # Verificar se o SKU existe e pertence à empresa
+    # Verificar se o SKU existe e pertence à empresa (bloqueado até o commit: estoque e custo médio)
     sku = db.query(ProductSKU).join(Product).filter(
         and_(
             ProductSKU.id == sku_id,
             Product.company_id == current_user.company_id
         )
-    ).first()
+    ).with_for_update(of=ProductSKU).first()
     
     if not sku:
         raise HTTPException(
@@ -722,10 +889,11 @@ def create_stock_movement(
     if movement.movement_type == MovementType.ENTRY:
         new_stock = previous_stock + movement.quantity
     elif movement.movement_type == MovementType.EXIT:
-        if previous_stock < movement.quantity:
+        # Unidades reservadas não podem sair por movimentação avulsa (use a baixa da reserva)
+        if previous_stock - (sku.reserved_stock or 0) < movement.quantity:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Estoque insuficiente para saída"
+                detail="Estoque insuficiente para saída (descontado o estoque reservado)"
             )
         new_stock = previous_stock - movement.quantity
     elif movement.movement_type == MovementType.ADJUSTMENT:
@@ -733,16 +901,54 @@ def create_stock_movement(
     else:
         new_stock = previous_stock  # Outros tipos não alteram estoque
     
+    # Movimentação de filial: aplicar a mesma variação ao estoque da filial
+    branch_stock = None
+    branch_previous_stock = 0
+    if movement.branch_id:
+        branch_stock = db.query(StockBranch).filter(
+            and_(
+                StockBranch.sku_id == sku_id,
+                StockBranch.branch_id == movement.branch_id
+            )
+        ).with_for_update().first()
+        
+        if not branch_stock:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Estoque da filial não encontrado para este SKU"
+            )
+        
+        branch_previous_stock = branch_stock.current_stock or 0
+        branch_new_stock = branch_previous_stock + (new_stock - previous_stock)
+        # O total do SKU pode cobrir a saída sem que a filial tenha o saldo livre
+        branch_floor = (branch_stock.reserved_stock or 0) if movement.movement_type == MovementType.EXIT else 0
+        if branch_new_stock < branch_floor:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Estoque insuficiente na filial para saída"
+            )
+        branch_stock.current_stock = branch_new_stock
+    
+    # Entradas atualizam o custo médio; as demais movimentações são valorizadas por ele
+    movement_data = movement.dict()
+    if movement.movement_type == MovementType.ENTRY:
+        StockCostService.apply_entry(
+            sku, previous_stock, movement.quantity, movement.unit_cost,
+            branch_stock, branch_previous_stock
+        )
+    elif movement.unit_cost is None:
+        movement_data["unit_cost"] = StockCostService.current_unit_cost(sku, branch_stock)
+    
     # Atualizar estoque do SKU
     sku.current_stock = new_stock
     
     # Criar movimentação
     db_movement = StockMovement(
-        **movement.dict(),
+        **movement_data,
         company_id=current_user.company_id,
         previous_stock=previous_stock,
         current_stock=new_stock,
-        total_cost=movement.calculate_total_cost(),
+        total_cost=round(movement.quantity * (movement_data["unit_cost"] or 0), 2),
         user_id=current_user.id
     )
     
@@ -762,10 +968,18 @@ def get_sku_movements(
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     reference_document: Optional[str] = None,
+    before: Optional[datetime] = Query(None, description="Cursor: created_at da última movimentação da página anterior"),
+    before_id: Optional[int] = Query(None, description="Cursor: id da última movimentação da página anterior"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Listar movimentações de um SKU"""
+    """Listar movimentações de um SKU
+
+    A tabela é particionada por mês: start_date/end_date limitam as partições lidas.
+    Para paginar históricos longos prefira o cursor `before` + `before_id` (created_at e id
+    da última movimentação recebida) em vez de `skip`: movimentações com o mesmo created_at
+    são desempatadas pelo id.
+    """
     # Verificar se o SKU existe e pertence à empresa
     sku = db.query(ProductSKU).join(Product).filter(
         and_(
@@ -798,7 +1012,16 @@ def get_sku_movements(
     if reference_document:
         query = query.filter(StockMovement.reference_document.ilike(f"%{reference_document}%"))
     
-    movements = query.order_by(StockMovement.created_at.desc()).offset(skip).limit(limit).all()
+    if before and before_id is not None:
+        # created_at <= before isolado mantém o corte de partições; a tupla desempata pelo id
+        query = query.filter(
+            StockMovement.created_at <= before,
+            tuple_(StockMovement.created_at, StockMovement.id) < tuple_(before, before_id)
+        )
+    elif before:
+        query = query.filter(StockMovement.created_at < before)
+    
+    movements = query.order_by(StockMovement.created_at.desc(), StockMovement.id.desc()).offset(skip).limit(limit).all()
     
     result = []
     for movement in movements:
@@ -901,10 +1124,8 @@ def get_stock_status_report(
         )
     ).count()
     
-    # Valor total do estoque
-    total_value = db.query(func.sum(ProductSKU.current_stock * ProductSKU.cost_price)).join(Product).filter(
-        Product.company_id == current_user.company_id
-    ).scalar() or 0
+    # Valor total do estoque (custo médio ponderado; sem entradas com custo, preço de custo)
+    total_value = StockCostService.valuation(db, current_user.company_id)["total_stock_value"]
     
     return {
         "total_products": total_products,
@@ -917,8 +1138,105 @@ def get_stock_status_report(
         "total_stock_value": float(total_value)
     }
 
+@router.get("/reports/stock-valuation", response_model=StockValuationResponse)
+def get_stock_valuation_report(
+    branch_id: Optional[UUID] = Query(None, description="Filial; sem filial valoriza o estoque da empresa toda"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Valor do estoque ao custo médio ponderado (empresa ou filial)"""
+    return StockCostService.valuation(db, current_user.company_id, branch_id)
+
+@router.get("/reports/reorder-suggestions", response_model=List[ReorderSuggestionResponse])
+def get_reorder_suggestions(
+    branch_id: Optional[UUID] = Query(None, description="Filial; sem filial retorna a visão da empresa toda"),
+    only_needed: bool = Query(True, description="Apenas SKUs abaixo do ponto de pedido"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Sugestões de reposição calculadas na última execução (ordenadas por menor cobertura)"""
+    query = db.query(
+        ReorderSuggestion,
+        ProductSKU.sku_code,
+        Product.name.label("product_name")
+    ).join(
+        ProductSKU, ReorderSuggestion.sku_id == ProductSKU.id
+    ).join(
+        Product, ProductSKU.product_id == Product.id
+    ).filter(
+        ReorderSuggestion.company_id == current_user.company_id
+    )
+    
+    if branch_id:
+        query = query.filter(ReorderSuggestion.branch_id == branch_id)
+    else:
+        query = query.filter(ReorderSuggestion.branch_id.is_(None))
+    
+    if only_needed:
+        query = query.filter(ReorderSuggestion.needs_reorder == True)
+    
+    rows = query.order_by(
+        ReorderSuggestion.days_of_cover.asc().nulls_last(),
+        ReorderSuggestion.sku_id
+    ).offset(skip).limit(limit).all()
+    
+    return [
+        ReorderSuggestionResponse(
+            sku_id=suggestion.sku_id,
+            sku_code=sku_code,
+            product_name=product_name,
+            branch_id=suggestion.branch_id,
+            demand_rate=suggestion.demand_rate,
+            demand_std=suggestion.demand_std,
+            available_stock=suggestion.available_stock,
+            days_of_cover=suggestion.days_of_cover,
+            safety_stock=suggestion.safety_stock,
+            reorder_point=suggestion.reorder_point,
+            target_stock=suggestion.target_stock,
+            suggested_quantity=suggestion.suggested_quantity,
+            needs_reorder=suggestion.needs_reorder,
+            computed_at=suggestion.computed_at
+        )
+        for suggestion, sku_code, product_name in rows
+    ]
+
+@router.post("/reports/reorder-suggestions/run", response_model=ReorderRunResult)
+def run_reorder_suggestions(
+    history_days: Optional[int] = Query(None, ge=7, le=730),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Recalcular agora as sugestões de reposição da empresa (normalmente executado à noite)"""
+    return ReorderService.run(db, current_user.company_id, history_days)
+
 # ==================== ESTOQUE POR FILIAL ====================
 
+@router.post("/branch-stock/transfers", response_model=StockTransferResult, status_code=status.HTTP_201_CREATED)
+def transfer_branch_stock(
+    transfer: StockTransferRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Transferir estoque de vários SKUs entre filiais em uma única transação
+
+    Gera um par de movimentações (saída/entrada) por SKU; se algum SKU não tiver estoque
+    disponível na origem, nada é transferido.
+    """
+    try:
+        return StockTransferService.transfer(db, current_user.company_id, current_user.id, transfer)
+    except LookupError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
 @router.post("/skus/{sku_id}/branch-stock", response_model=StockBranchResponse, status_code=status.HTTP_201_CREATED)
 def create_sku_branch_stock(
     sku_id: int,
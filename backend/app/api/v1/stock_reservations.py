@@ -0,0 +1,116 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from uuid import UUID
+
+from app.core.database import get_db
+from ..v1.auth import get_current_user
+from app.models.user import User
+from app.schemas.stock_reservation import (
+    StockReservationCreate, StockReservationResponse, StockReservationResult, StockAvailability
+)
+from app.services.stock_reservation_service import StockReservationService
+
+router = APIRouter()
+
+# ==================== RESERVAS DE ESTOQUE ====================
+
+@router.post("/", response_model=StockReservationResult, status_code=status.HTTP_201_CREATED)
+def create_reservation(
+    reservation: StockReservationCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Reservar estoque para um carrinho/pedido (todos os itens ou nenhum)
+
+    A reserva expira após ttl_seconds, a menos que seja confirmada.
+    """
+    try:
+        return StockReservationService.reserve(
+            db, current_user.company_id, reservation.reference,
+            [item.dict() for item in reservation.items],
+            reservation.branch_id, reservation.ttl_seconds
+        )
+    except LookupError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+
+@router.get("/availability", response_model=List[StockAvailability])
+def get_availability(
+    sku_ids: List[int] = Query(...),
+    branch_id: Optional[UUID] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Estoque disponível para prometer (estoque atual - reservado)"""
+    return StockReservationService.availability(db, current_user.company_id, sku_ids, branch_id)
+
+@router.get("/{reference}", response_model=List[StockReservationResponse])
+def get_reservations(
+    reference: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Listar reservas de uma referência"""
+    reservations = StockReservationService.get_reservations(db, current_user.company_id, reference)
+    if not reservations:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Reserva não encontrada"
+        )
+    return reservations
+
+@router.post("/{reference}/confirm", response_model=StockReservationResult)
+def confirm_reservation(
+    reference: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Confirmar reservas ativas (deixam de expirar)"""
+    result = StockReservationService.confirm(db, current_user.company_id, reference)
+    if not result["affected"]:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Nenhuma reserva ativa para confirmar (expirada ou já liberada)"
+        )
+    return result
+
+@router.post("/{reference}/release", response_model=StockReservationResult)
+def release_reservation(
+    reference: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Liberar reservas e devolver o estoque reservado"""
+    return StockReservationService.release(db, current_user.company_id, reference)
+
+@router.post("/{reference}/consume", response_model=StockReservationResult)
+def consume_reservation(
+    reference: str,
+    reference_document: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Baixar reservas: libera o reservado e registra a saída do estoque (venda)"""
+    try:
+        result = StockReservationService.consume(
+            db, current_user.company_id, reference, current_user.id, reference_document
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    if not result["affected"]:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Nenhuma reserva ativa para baixar (expirada, liberada ou já baixada)"
+        )
+    return result
@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings
 from typing import Optional, List
 import os
+import tempfile
 
 class Settings(BaseSettings):
     # Configurações da API
@@ -30,6 +31,55 @@ class Settings(BaseSettings):
     # Configurações de Redis (para cache)
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379")
     
+    # Cache em memória de SKUs/códigos de barras (leitores de código de barras)
+    SKU_LOOKUP_CACHE_TTL: int = 300  # segundos
+    SKU_LOOKUP_CACHE_MAX_TENANTS: int = 200
+    
+    # Sugestão de reposição de estoque
+    REORDER_HISTORY_DAYS: int = 90  # janela de histórico de saídas
+    REORDER_RECENT_DAYS: int = 28  # janela recente (capta tendência)
+    REORDER_LEAD_TIME_DAYS: int = 7  # prazo de entrega do fornecedor
+    REORDER_REVIEW_DAYS: int = 14  # intervalo entre pedidos de compra
+    REORDER_SERVICE_LEVEL_Z: float = 1.65  # ~95% de nível de serviço
+    
+    # Partições mensais de stock_movements
+    STOCK_MOVEMENT_PARTITIONS_AHEAD: int = 3  # meses futuros criados antecipadamente
+    STOCK_MOVEMENT_RETENTION_MONTHS: int = 24  # meses mantidos na tabela principal
+    STOCK_MOVEMENT_ARCHIVE_SCHEMA: str = "stock_archive"
+    STOCK_MOVEMENT_ARCHIVE_TABLESPACE: Optional[str] = os.getenv("STOCK_MOVEMENT_ARCHIVE_TABLESPACE")  # sem compressão: apenas muda o volume
+    
+    # Retenção do feed de alterações do catálogo
+    CATALOG_CHANGES_RETENTION_DAYS: int = 30
+    
+    # Reservas de estoque (carrinhos/pedidos)
+    STOCK_RESERVATION_TTL_SECONDS: int = 900  # validade padrão de uma reserva
+    STOCK_RESERVATION_MAX_TTL_SECONDS: int = 7 * 24 * 3600
+    STOCK_RESERVATION_SWEEP_BATCH: int = 5000  # reservas expiradas liberadas por transação
+    
+    # Conferência do estoque contra o histórico de movimentações
+    STOCK_DRIFT_CHUNK_SKUS: int = 20000  # SKUs agregados por consulta
+    STOCK_DRIFT_WORKERS: int = 4  # processos (uma empresa por tarefa)
+    STOCK_DRIFT_SAMPLE_SIZE: int = 100  # divergências detalhadas no relatório
+    
+    # Importação de XMLs de NF-e em lote (ZIP/multipart)
+    NFE_IMPORT_MAX_FILES: int = 20000  # XMLs por requisição
+    NFE_IMPORT_CHUNK_SIZE: int = 500  # notas gravadas por transação
+    NFE_IMPORT_WORKERS: int = 4  # processos de parsing
+    NFE_IMPORT_POOL_THRESHOLD: int = 50  # abaixo disso o parsing é feito no próprio processo
+    NFE_UPLOAD_MAX_BYTES: int = 10 * 1024 * 1024  # tamanho máximo de um XML (upload ou dentro do ZIP)
+    NFE_IMPORT_MAX_BATCH_BYTES: int = 512 * 1024 * 1024  # XML descompactado por importação em lote
+    NFE_POSTING_MAX_NOTAS: int = 1000  # notas por lançamento em lote (estoque + contas a pagar)
+    
+    # DANFE (PDF da nota fiscal): cache em disco e renderização em pool de processos
+    DANFE_CACHE_DIR: str = os.getenv("DANFE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "finwise_danfe"))
+    DANFE_CACHE_MAX_BYTES: int = 2 * 1024 * 1024 * 1024  # limite do cache (scripts/prune_danfe_cache.py)
+    DANFE_RENDER_WORKERS: int = 2  # 0 renderiza no próprio processo
+    DANFE_RENDER_TIMEOUT: int = 60  # segundos
+    DANFE_EXPORT_MAX_NOTAS: int = 5000  # notas por exportação em lote
+    DANFE_MERGE_MAX_NOTAS: int = 200  # notas no PDF único (montado em memória; acima disso, ZIP)
+    DANFE_EXPORT_WORKERS: int = 4  # processos do pool compartilhado da exportação em lote
+    DANFE_EXPORT_CHUNK_SIZE: int = 20  # notas por tarefa do pool
+    
     # Configurações de Log
     LOG_LEVEL: str = "INFO"
     
@@ -6,13 +6,17 @@ from .core.config import settings
 import logging
 from .core.database import engine, Base
 from .models.supplier import Supplier, SupplierContact
-from .models.nota_fiscal import NotaFiscal, NotaFiscalProduto
+from .models.nota_fiscal import NotaFiscal, NotaFiscalProduto, NotaFiscalResumoMensal
 from .models.company import Company, Branch
 from .models.user import User, Permission, UserPermission
 from .models.product import Product
 from .models.product_sku import ProductSKU
 from .models.stock_branch import StockBranch
 from .models.stock_movement import StockMovement
+from .models.reorder_suggestion import ReorderSuggestion
+from .models.catalog_change import CatalogChange
+from .models.stock_reservation import StockReservation
+from .models.sales_order import SalesOrder, SalesOrderItem
 from .models.product_component import ProductComponent
 from .models.category import Category
 from .models.customer import Customer
@@ -21,7 +25,7 @@ from .models.accounts_payable import AccountsPayable
 from .models.payable_category import PayableCategory
 from .models.bank import Bank
 from .models.account import Account
-from .api.v1 import auth, admin, company, billing, suppliers, nota_fiscal, products, categories, customers, accounts_receivable, accounts_payable, payable_categories, banks, accounts, cash_flow
+from .api.v1 import auth, admin, company, billing, suppliers, nota_fiscal, products, categories, customers, accounts_receivable, accounts_payable, payable_categories, banks, accounts, cash_flow, analytics, stock_reservations, orders
 
 # Criar tabelas no banco de dados
 Base.metadata.create_all(bind=engine)
@@ -58,6 +62,9 @@ app.include_router(payable_categories.router, prefix=f"{settings.API_V1_STR}/pay
 app.include_router(banks.router, prefix=f"{settings.API_V1_STR}/banks", tags=["banks"])
 app.include_router(accounts.router, prefix=f"{settings.API_V1_STR}/accounts", tags=["accounts"])
 app.include_router(cash_flow.router, prefix=f"{settings.API_V1_STR}/cash-flow", tags=["cash-flow"])
+app.include_router(analytics.router, prefix=f"{settings.API_V1_STR}/analytics", tags=["analytics"])
+app.include_router(stock_reservations.router, prefix=f"{settings.API_V1_STR}/stock-reservations", tags=["stock-reservations"])
+app.include_router(orders.router, prefix=f"{settings.API_V1_STR}/orders", tags=["orders"])
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
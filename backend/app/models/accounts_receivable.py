@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Enum, Numeric, Date
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Enum, Numeric, Date, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -58,6 +58,10 @@ class AccountsReceivable(Base):
     category = relationship("Category")
     account = relationship("Account")
     
+    __table_args__ = (
+        Index("ix_accounts_receivable_customer_id_entry_date", "customer_id", "entry_date"),
+    )
+    
     def __repr__(self):
         return f"<AccountsReceivable(id={self.id}, description='{self.description}', amount={self.total_amount})>"
     
@@ -0,0 +1,159 @@
+from sqlalchemy import Column, Integer, BigInteger, SmallInteger, String, DateTime, ForeignKey, Index, DDL, event
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func, text
+from app.core.database import Base
+from app.models.product import Product
+from app.models.product_sku import ProductSKU
+
+# Bits de CatalogChange.fields (combinados com OR ao agrupar alterações)
+CHANGE_CATALOG = 1  # cadastro (nome, códigos, atributos, status)
+CHANGE_PRICE = 2    # preço de venda/promocional/atacado
+CHANGE_STOCK = 4    # estoque atual/reservado
+CHANGE_DELETED = 8  # registro removido
+
+class CatalogChange(Base):
+    """Registro de alterações de produtos/SKUs (preenchido por triggers no banco)"""
+    __tablename__ = "catalog_changes"
+    
+    id = Column(BigInteger, primary_key=True)  # Cursor do feed de alterações (junto com txid)
+    # Transação que gravou o registro: o feed só entrega transações já encerradas (ver CatalogChangeService)
+    txid = Column(BigInteger, nullable=False, server_default=text("txid_current()"))
+    company_id = Column(UUID(as_uuid=True), ForeignKey("companies.id"), nullable=False)
+    entity = Column(String(10), nullable=False)  # product, sku
+    entity_id = Column(Integer, nullable=False)
+    product_id = Column(Integer, nullable=False)
+    fields = Column(SmallInteger, nullable=False)
+    changed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    __table_args__ = (
+        Index("ix_catalog_changes_company_id_txid_id", "company_id", "txid", "id"),
+    )
+    
+    def __repr__(self):
+        return f"<CatalogChange(id={self.id}, entity='{self.entity}', entity_id={self.entity_id}, fields={self.fields})>"
+
+
+# Colunas que não geram alteração de cadastro (preço, estoque e campos internos)
+PRODUCT_IGNORED_COLUMNS = (
+    "updated_at", "search_vector", "cost_price", "sale_price",
+    "current_stock", "reserved_stock", "effective_stock", "min_stock", "max_stock",
+)
+SKU_IGNORED_COLUMNS = (
+    "updated_at", "abc_class", "cost_price", "average_cost", "sale_price", "wholesale_price",
+    "promotional_price", "promotional_starts_at", "promotional_ends_at",
+    "current_stock", "reserved_stock", "effective_stock", "minimum_stock", "maximum_stock",
+)
+
+
+def _ignored(columns) -> str:
+    return "ARRAY[" + ", ".join(f"'{column}'" for column in columns) + "]"
+
+
+def change_log_functions(product_ignored=PRODUCT_IGNORED_COLUMNS, sku_ignored=SKU_IGNORED_COLUMNS) -> str:
+    """Funções dos triggers do feed (create_all e migrations usam este mesmo gerador)
+
+    product_ignored/sku_ignored: colunas que não geram o bit de cadastro. effective_stock entra
+    no bit de estoque de produtos e SKUs; é lido via to_jsonb para a função continuar válida
+    em bancos sem a coluna (migrations anteriores a add_effective_stock).
+    """
+    return f"""
+CREATE OR REPLACE FUNCTION products_log_changes()
+RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO catalog_changes (company_id, entity, entity_id, product_id, fields)
+        SELECT n.company_id, 'product', n.id, n.id, 7 FROM new_rows n;
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO catalog_changes (company_id, entity, entity_id, product_id, fields)
+        SELECT company_id, 'product', id, id, fields
+        FROM (
+            SELECT n.company_id, n.id,
+                (CASE WHEN (to_jsonb(n) - {_ignored(product_ignored)}::text[])
+                           IS DISTINCT FROM (to_jsonb(o) - {_ignored(product_ignored)}::text[]) THEN 1 ELSE 0 END)
+                | (CASE WHEN n.sale_price IS DISTINCT FROM o.sale_price THEN 2 ELSE 0 END)
+                | (CASE WHEN (n.current_stock, n.reserved_stock) IS DISTINCT FROM (o.current_stock, o.reserved_stock)
+                             OR (to_jsonb(n) -> 'effective_stock') IS DISTINCT FROM (to_jsonb(o) -> 'effective_stock')
+                        THEN 4 ELSE 0 END) AS fields
+            FROM new_rows n JOIN old_rows o ON o.id = n.id
+        ) changed
+        WHERE fields <> 0;
+    ELSE
+        INSERT INTO catalog_changes (company_id, entity, entity_id, product_id, fields)
+        SELECT o.company_id, 'product', o.id, o.id, 8 FROM old_rows o;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION product_skus_log_changes()
+RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO catalog_changes (company_id, entity, entity_id, product_id, fields)
+        SELECT p.company_id, 'sku', n.id, n.product_id, 7
+        FROM new_rows n JOIN products p ON p.id = n.product_id;
+    ELSIF TG_OP = 'UPDATE' THEN
+        WITH changed AS (
+            SELECT n.id, n.product_id,
+                (CASE WHEN (to_jsonb(n) - {_ignored(sku_ignored)}::text[])
+                           IS DISTINCT FROM (to_jsonb(o) - {_ignored(sku_ignored)}::text[]) THEN 1 ELSE 0 END)
+                | (CASE WHEN (n.sale_price, n.wholesale_price, n.promotional_price, n.promotional_starts_at, n.promotional_ends_at)
+                           IS DISTINCT FROM (o.sale_price, o.wholesale_price, o.promotional_price, o.promotional_starts_at, o.promotional_ends_at)
+                        THEN 2 ELSE 0 END)
+                | (CASE WHEN (n.current_stock, n.reserved_stock) IS DISTINCT FROM (o.current_stock, o.reserved_stock)
+                             OR (to_jsonb(n) -> 'effective_stock') IS DISTINCT FROM (to_jsonb(o) -> 'effective_stock')
+                        THEN 4 ELSE 0 END) AS fields
+            FROM new_rows n JOIN old_rows o ON o.id = n.id
+        )
+        INSERT INTO catalog_changes (company_id, entity, entity_id, product_id, fields)
+        SELECT p.company_id, 'sku', c.id, c.product_id, c.fields
+        FROM changed c JOIN products p ON p.id = c.product_id
+        WHERE c.fields <> 0
+        UNION ALL
+        -- SKUs associados vendem o estoque do SKU de estoque
+        SELECT p.company_id, 'sku', a.id, a.product_id, 4
+        FROM changed c
+        JOIN product_skus a ON a.stock_sku_id = c.id
+        JOIN products p ON p.id = a.product_id
+        WHERE c.fields & 4 <> 0;
+    ELSE
+        INSERT INTO catalog_changes (company_id, entity, entity_id, product_id, fields)
+        SELECT p.company_id, 'sku', o.id, o.product_id, 8
+        FROM old_rows o JOIN products p ON p.id = o.product_id;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+
+# Triggers por comando (tabelas de transição): um INSERT ... SELECT por UPDATE em massa
+CHANGE_LOG_FUNCTIONS = change_log_functions()
+
+CHANGE_LOG_TRIGGERS = """
+DROP TRIGGER IF EXISTS trg_products_log_insert ON products;
+DROP TRIGGER IF EXISTS trg_products_log_update ON products;
+DROP TRIGGER IF EXISTS trg_products_log_delete ON products;
+CREATE TRIGGER trg_products_log_insert AFTER INSERT ON products
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION products_log_changes();
+CREATE TRIGGER trg_products_log_update AFTER UPDATE ON products
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION products_log_changes();
+CREATE TRIGGER trg_products_log_delete AFTER DELETE ON products
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION products_log_changes();
+
+DROP TRIGGER IF EXISTS trg_product_skus_log_insert ON product_skus;
+DROP TRIGGER IF EXISTS trg_product_skus_log_update ON product_skus;
+DROP TRIGGER IF EXISTS trg_product_skus_log_delete ON product_skus;
+CREATE TRIGGER trg_product_skus_log_insert AFTER INSERT ON product_skus
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION product_skus_log_changes();
+CREATE TRIGGER trg_product_skus_log_update AFTER UPDATE ON product_skus
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION product_skus_log_changes();
+CREATE TRIGGER trg_product_skus_log_delete AFTER DELETE ON product_skus
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION product_skus_log_changes();
+"""
+
+# Instalações via create_all: triggers criados junto com a tabela (depois de products/product_skus)
+CatalogChange.__table__.add_is_dependent_on(Product.__table__)
+CatalogChange.__table__.add_is_dependent_on(ProductSKU.__table__)
+event.listen(CatalogChange.__table__, "after_create", DDL(CHANGE_LOG_FUNCTIONS).execute_if(dialect="postgresql"))
+event.listen(CatalogChange.__table__, "after_create", DDL(CHANGE_LOG_TRIGGERS).execute_if(dialect="postgresql"))
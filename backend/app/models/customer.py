@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Enum, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -54,6 +54,9 @@ class Customer(Base):
     # Observações
     notes = Column(Text)
     
+    # Curva ABC por volume a receber (recalculada pela análise ABC)
+    abc_class = Column(String(1))
+    
     # Metadados
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -63,6 +66,10 @@ class Customer(Base):
     # orders = relationship("Order", back_populates="customer")  # Comentado até criar o modelo Order
     # invoices = relationship("Invoice", back_populates="customer")  # Comentado até criar o modelo Invoice
     
+    __table_args__ = (
+        Index("ix_customers_company_id_abc_class", "company_id", "abc_class"),
+    )
+    
     def __repr__(self):
         return f"<Customer(id={self.id}, name='{self.name}', email='{self.email}')>"
     
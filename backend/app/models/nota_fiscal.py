@@ -1,8 +1,13 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Boolean, ForeignKey, JSON
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Date, DateTime, Text, Boolean, ForeignKey, JSON, Index, LargeBinary, DDL, event
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.sql import func
 from app.core.database import Base
+from typing import Any, BinaryIO, Dict, Optional, Union
+import gzip
+import hashlib
+import io
+import textwrap
 import uuid
 
 
@@ -20,6 +25,7 @@ class NotaFiscal(Base):
     data_entrada_saida = Column(DateTime, nullable=True)
     
     # Status
+    chave_acesso = Column(String(44), nullable=True)  # chave de acesso (44 dígitos)
     status = Column(String(50), default="pendente")  # pendente, autorizada, cancelada, denegada
     origem = Column(String(50), default="manual")  # manual, sefaz, erp, email, api
     protocolo_autorizacao = Column(String(100), nullable=True)
@@ -29,14 +35,14 @@ class NotaFiscal(Base):
     emitente_nome = Column(String(255), nullable=False)
     emitente_cnpj = Column(String(18), nullable=False)
     emitente_ie = Column(String(20), nullable=True)
-    emitente_endereco = Column(JSON, nullable=True)
+    emitente_endereco = Column(JSONB, nullable=True)  # Estrutura: {"logradouro", "numero", "bairro", "cidade", "estado", "cep"}
     
     # Destinatário
     destinatario_nome = Column(String(255), nullable=False)
     destinatario_documento = Column(String(18), nullable=False)  # CPF ou CNPJ
     destinatario_email = Column(String(255), nullable=True)
     destinatario_telefone = Column(String(20), nullable=True)
-    destinatario_endereco = Column(JSON, nullable=True)
+    destinatario_endereco = Column(JSONB, nullable=True)
     
     # Valores
     valor_total = Column(Float, nullable=False, default=0.0)
@@ -52,6 +58,7 @@ class NotaFiscal(Base):
     # Pagamento
     forma_pagamento = Column(String(100), nullable=True)
     condicao_pagamento = Column(String(255), nullable=True)
+    duplicatas = Column(JSON, nullable=True)  # Estrutura: [{"numero": "001", "vencimento": "2025-08-23", "valor": 100.0}]
     
     # Transporte
     transportadora_nome = Column(String(255), nullable=True)
@@ -63,20 +70,99 @@ class NotaFiscal(Base):
     observacoes = Column(Text, nullable=True)
     informacoes_adicionais = Column(Text, nullable=True)
     
-    # XML e arquivos
-    xml_content = Column(Text, nullable=True)  # XML completo da nota
+    # XML e arquivos: XML completo comprimido (gzip), fora da linha e carregado só quando acessado
+    xml_gzip = deferred(Column(LargeBinary, nullable=True))
+    xml_sha256 = Column(String(64), nullable=True)  # Hash do XML original (ETag do download)
+    xml_size = Column(Integer, nullable=True)  # Tamanho do XML original em bytes
     xml_filename = Column(String(255), nullable=True)
     
     # Relacionamentos - CORRIGIDO: Usando UUID em vez de Integer
     company_id = Column(UUID(as_uuid=True), ForeignKey("companies.id"), nullable=False)
     company = relationship("Company", back_populates="notas_fiscais")
     
+    # Lançamento no estoque (entradas) e no contas a pagar
+    supplier_id = Column(UUID(as_uuid=True), ForeignKey("suppliers.id"), nullable=True)
+    data_lancamento = Column(DateTime(timezone=True), nullable=True)
+    
     # Produtos (relacionamento one-to-many)
     produtos = relationship("NotaFiscalProduto", back_populates="nota_fiscal", cascade="all, delete-orphan")
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    __table_args__ = (
+        # Verificação de duplicidade (número/série/emitente) da importação
+        Index("ix_notas_fiscais_company_id_numero_serie", "company_id", "numero", "serie"),
+        # Deduplicação da importação (INSERT ... ON CONFLICT); notas sem chave não conflitam
+        Index("uq_notas_fiscais_company_id_chave_acesso", "company_id", "chave_acesso", unique=True),
+    )
+
+
+    @staticmethod
+    def compress_xml(xml_content: Optional[Union[str, bytes]]) -> Dict[str, Any]:
+        """Colunas de armazenamento do XML (xml_gzip, xml_sha256, xml_size)"""
+        if not xml_content:
+            return {"xml_gzip": None, "xml_sha256": None, "xml_size": None}
+        data = xml_content.encode("utf-8") if isinstance(xml_content, str) else xml_content
+        return {
+            # mtime=0: mesmo XML gera sempre os mesmos bytes
+            "xml_gzip": gzip.compress(data, compresslevel=6, mtime=0),
+            "xml_sha256": hashlib.sha256(data).hexdigest(),
+            "xml_size": len(data),
+        }
+
+    @staticmethod
+    def compress_xml_file(xml_file: BinaryIO, block_size: int = 64 * 1024) -> Dict[str, Any]:
+        """Colunas de compress_xml lendo o arquivo em blocos (sem o XML inteiro em memória)"""
+        compressed = io.BytesIO()
+        digest = hashlib.sha256()
+        size = 0
+        with gzip.GzipFile(filename="", mode="wb", fileobj=compressed, compresslevel=6, mtime=0) as gzip_file:
+            for block in iter(lambda: xml_file.read(block_size), b""):
+                gzip_file.write(block)
+                digest.update(block)
+                size += len(block)
+        if not size:
+            return NotaFiscal.compress_xml(None)
+        return {"xml_gzip": compressed.getvalue(), "xml_sha256": digest.hexdigest(), "xml_size": size}
+
+    @property
+    def xml_content(self) -> Optional[str]:
+        """XML descomprimido (carrega a coluna adiada)"""
+        if not self.xml_gzip:
+            return None
+        data = gzip.decompress(self.xml_gzip)
+        try:
+            return data.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            return data.decode("latin-1")
+
+    @xml_content.setter
+    def xml_content(self, value: Optional[Union[str, bytes]]) -> None:
+        for field, stored in NotaFiscal.compress_xml(value).items():
+            setattr(self, field, stored)
+
+
+# Filtros da listagem por UF e cidade do emitente/destinatário (expressões iguais às de NotaFiscalService)
+Index("ix_notas_fiscais_company_id_emitente_uf", NotaFiscal.company_id, NotaFiscal.emitente_endereco["estado"].astext)
+Index(
+    "ix_notas_fiscais_company_id_emitente_cidade",
+    NotaFiscal.company_id, func.lower(NotaFiscal.emitente_endereco["cidade"].astext)
+)
+Index("ix_notas_fiscais_company_id_destinatario_uf", NotaFiscal.company_id, NotaFiscal.destinatario_endereco["estado"].astext)
+Index(
+    "ix_notas_fiscais_company_id_destinatario_cidade",
+    NotaFiscal.company_id, func.lower(NotaFiscal.destinatario_endereco["cidade"].astext)
+)
+
+
+# XML já comprimido: sem nova tentativa de compressão pelo TOAST, apenas armazenamento fora da linha
+event.listen(
+    NotaFiscal.__table__,
+    "after_create",
+    DDL("ALTER TABLE notas_fiscais ALTER COLUMN xml_gzip SET STORAGE EXTERNAL").execute_if(dialect="postgresql")
+)
 
 
 class NotaFiscalProduto(Base):
@@ -85,7 +171,7 @@ class NotaFiscalProduto(Base):
     id = Column(Integer, primary_key=True, index=True)
     
     # Relacionamento
-    nota_fiscal_id = Column(Integer, ForeignKey("notas_fiscais.id"), nullable=False)
+    nota_fiscal_id = Column(Integer, ForeignKey("notas_fiscais.id"), nullable=False, index=True)
     nota_fiscal = relationship("NotaFiscal", back_populates="produtos")
     
     # Informações do produto
@@ -94,6 +180,10 @@ class NotaFiscalProduto(Base):
     ncm = Column(String(10), nullable=True)
     cfop = Column(String(10), nullable=False)
     unidade = Column(String(10), nullable=False)
+    ean = Column(String(14), nullable=True)  # GTIN/EAN (cEAN) do item
+    
+    # SKU do item (preenchido no lançamento ou informado manualmente)
+    sku_id = Column(Integer, ForeignKey("product_skus.id"), nullable=True)
     
     # Quantidades e valores
     quantidade = Column(Float, nullable=False)
@@ -111,4 +201,165 @@ class NotaFiscalProduto(Base):
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now()) 
\ No newline at end of file
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now()) 
+
+
+class NotaFiscalResumoMensal(Base):
+    """Totais de impostos por mês de emissão, tipo, CFOP, NCM e emitente (mantidos por triggers)"""
+    __tablename__ = "notas_fiscais_resumo_mensal"
+
+    id = Column(BigInteger, primary_key=True)
+    company_id = Column(UUID(as_uuid=True), ForeignKey("companies.id"), nullable=False)
+    mes = Column(Date, nullable=False)  # Primeiro dia do mês de emissão
+    tipo = Column(String(20), nullable=False)
+    cfop = Column(String(10), nullable=False)
+    ncm = Column(String(10), nullable=False, default="")  # "" para itens sem NCM
+    emitente_cnpj = Column(String(18), nullable=False)
+    emitente_nome = Column(String(255), nullable=False)
+
+    # Totais dos itens do grupo
+    itens = Column(Integer, nullable=False, default=0)
+    valor_total = Column(Float, nullable=False, default=0.0)
+    valor_icms = Column(Float, nullable=False, default=0.0)
+    valor_ipi = Column(Float, nullable=False, default=0.0)
+    valor_pis = Column(Float, nullable=False, default=0.0)
+    valor_cofins = Column(Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        Index(
+            "uq_notas_fiscais_resumo_mensal_grupo",
+            "company_id", "mes", "tipo", "cfop", "ncm", "emitente_cnpj", unique=True
+        ),
+    )
+
+
+# Notas fora da apuração de impostos
+RESUMO_EXCLUDED_STATUS = ("cancelada", "denegada")
+
+RESUMO_VALUES = ("valor_total", "valor_icms", "valor_ipi", "valor_pis", "valor_cofins")
+
+_EXCLUDED = ", ".join(f"'{status}'" for status in RESUMO_EXCLUDED_STATUS)
+
+
+def _resumo_itens(produtos: str, notas: str, sinal: int, changed: str = "") -> str:
+    """Itens (com os dados da nota) que entram (sinal 1) ou saem (-1) do resumo"""
+    return f"""SELECT n.company_id, date_trunc('month', n.data_emissao)::date AS mes, n.tipo, p.cfop,
+       coalesce(p.ncm, '') AS ncm, n.emitente_cnpj, n.emitente_nome, {sinal} AS sinal,
+       {", ".join(f"p.{column}" for column in RESUMO_VALUES)}
+FROM {produtos} p JOIN {notas} n ON n.id = p.nota_fiscal_id
+WHERE coalesce(n.status, '') NOT IN ({_EXCLUDED}){changed}"""
+
+
+def _resumo_apply(*sources: str) -> str:
+    """Soma ao resumo os itens das consultas e remove os grupos que ficaram vazios"""
+    itens = textwrap.indent("\nUNION ALL\n".join(sources), " " * 8)
+    sums = ",\n".join(f"           sum(sinal * {column}) AS {column}" for column in RESUMO_VALUES)
+    updates = ",\n".join(f"        {column} = r.{column} + EXCLUDED.{column}" for column in RESUMO_VALUES)
+    columns = ", ".join(RESUMO_VALUES)
+    return f"""WITH delta AS (
+    SELECT company_id, mes, tipo, cfop, ncm, emitente_cnpj, max(emitente_nome) AS emitente_nome,
+           sum(sinal) AS itens,
+{sums}
+    FROM (
+{itens}
+    ) itens
+    GROUP BY company_id, mes, tipo, cfop, ncm, emitente_cnpj
+), applied AS (
+    INSERT INTO notas_fiscais_resumo_mensal AS r
+        (company_id, mes, tipo, cfop, ncm, emitente_cnpj, emitente_nome, itens, {columns})
+    SELECT company_id, mes, tipo, cfop, ncm, emitente_cnpj, emitente_nome, itens, {columns}
+    FROM delta
+    ORDER BY company_id, mes, tipo, cfop, ncm, emitente_cnpj  -- mesma ordem de bloqueio entre importações simultâneas
+    ON CONFLICT (company_id, mes, tipo, cfop, ncm, emitente_cnpj) DO UPDATE SET
+        emitente_nome = EXCLUDED.emitente_nome,
+        itens = r.itens + EXCLUDED.itens,
+{updates}
+    RETURNING r.id, r.itens
+)
+SELECT array_agg(id) INTO emptied FROM applied WHERE itens <= 0;
+IF emptied IS NOT NULL THEN
+    DELETE FROM notas_fiscais_resumo_mensal WHERE id = ANY(emptied);
+END IF;"""
+
+
+def _body(sql: str, spaces: int) -> str:
+    return textwrap.indent(sql, " " * spaces).lstrip()
+
+
+# Notas cujo grupo no resumo mudou (empresa, tipo, mês, emitente ou entrada/saída da apuração)
+RESUMO_CHANGED_NOTAS = f"""
+  AND n.id IN (
+      SELECT o.id FROM old_rows o JOIN new_rows c ON c.id = o.id
+      WHERE (o.company_id, o.tipo, date_trunc('month', o.data_emissao), o.emitente_cnpj, o.emitente_nome,
+             coalesce(o.status, '') IN ({_EXCLUDED}))
+            IS DISTINCT FROM
+            (c.company_id, c.tipo, date_trunc('month', c.data_emissao), c.emitente_cnpj, c.emitente_nome,
+             coalesce(c.status, '') IN ({_EXCLUDED}))
+  )"""
+
+# Itens com alteração em campos do resumo (ex.: o lançamento só preenche sku_id)
+RESUMO_CHANGED_PRODUTOS = f"""
+  AND p.id IN (
+      SELECT o.id FROM old_rows o JOIN new_rows c ON c.id = o.id
+      WHERE (o.nota_fiscal_id, o.cfop, o.ncm, {", ".join(f"o.{column}" for column in RESUMO_VALUES)})
+            IS DISTINCT FROM
+            (c.nota_fiscal_id, c.cfop, c.ncm, {", ".join(f"c.{column}" for column in RESUMO_VALUES)})
+  )"""
+
+# Triggers por comando (tabelas de transição): um INSERT ... ON CONFLICT por lote importado
+RESUMO_FUNCTIONS = f"""
+CREATE OR REPLACE FUNCTION notas_fiscais_produtos_refresh_resumo()
+RETURNS trigger AS $$
+DECLARE
+    emptied bigint[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        {_body(_resumo_apply(_resumo_itens("new_rows", "notas_fiscais", 1)), 8)}
+    ELSIF TG_OP = 'UPDATE' THEN
+        {_body(_resumo_apply(
+            _resumo_itens("old_rows", "notas_fiscais", -1, RESUMO_CHANGED_PRODUTOS),
+            _resumo_itens("new_rows", "notas_fiscais", 1, RESUMO_CHANGED_PRODUTOS)
+        ), 8)}
+    ELSE
+        {_body(_resumo_apply(_resumo_itens("old_rows", "notas_fiscais", -1)), 8)}
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION notas_fiscais_refresh_resumo()
+RETURNS trigger AS $$
+DECLARE
+    emptied bigint[];
+BEGIN
+    {_body(_resumo_apply(
+        _resumo_itens("notas_fiscais_produtos", "old_rows", -1, RESUMO_CHANGED_NOTAS),
+        _resumo_itens("notas_fiscais_produtos", "new_rows", 1, RESUMO_CHANGED_NOTAS)
+    ), 4)}
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+# Itens removidos antes da nota (chave estrangeira): exclusão de notas não precisa de trigger
+RESUMO_TRIGGERS = """
+DROP TRIGGER IF EXISTS trg_notas_fiscais_produtos_resumo_insert ON notas_fiscais_produtos;
+DROP TRIGGER IF EXISTS trg_notas_fiscais_produtos_resumo_update ON notas_fiscais_produtos;
+DROP TRIGGER IF EXISTS trg_notas_fiscais_produtos_resumo_delete ON notas_fiscais_produtos;
+CREATE TRIGGER trg_notas_fiscais_produtos_resumo_insert AFTER INSERT ON notas_fiscais_produtos
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION notas_fiscais_produtos_refresh_resumo();
+CREATE TRIGGER trg_notas_fiscais_produtos_resumo_update AFTER UPDATE ON notas_fiscais_produtos
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION notas_fiscais_produtos_refresh_resumo();
+CREATE TRIGGER trg_notas_fiscais_produtos_resumo_delete AFTER DELETE ON notas_fiscais_produtos
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION notas_fiscais_produtos_refresh_resumo();
+
+DROP TRIGGER IF EXISTS trg_notas_fiscais_resumo_update ON notas_fiscais;
+CREATE TRIGGER trg_notas_fiscais_resumo_update AFTER UPDATE ON notas_fiscais
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION notas_fiscais_refresh_resumo();
+"""
+
+# Instalações via create_all: triggers criados junto com o resumo (depois das notas e itens)
+NotaFiscalResumoMensal.__table__.add_is_dependent_on(NotaFiscal.__table__)
+NotaFiscalResumoMensal.__table__.add_is_dependent_on(NotaFiscalProduto.__table__)
+event.listen(NotaFiscalResumoMensal.__table__, "after_create", DDL(RESUMO_FUNCTIONS).execute_if(dialect="postgresql"))
+event.listen(NotaFiscalResumoMensal.__table__, "after_create", DDL(RESUMO_TRIGGERS).execute_if(dialect="postgresql"))
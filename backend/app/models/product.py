@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, Text, Float, Boolean, DateTime, ForeignKey, JSON, Enum
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, Float, Boolean, DateTime, ForeignKey, JSON, Enum, Index, DDL, event
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.sql import func
 from app.core.database import Base
 import enum
@@ -57,6 +57,7 @@ class Product(Base):
     min_stock = Column(Integer, default=0)
     max_stock = Column(Integer, default=0)
     reserved_stock = Column(Integer, default=0)
+    effective_stock = Column(Integer, nullable=False, default=0, server_default="0")  # Soma dos SKUs ativos (mantido por trigger)
     
     # Campos Fiscais
     cest = Column(String(20))
@@ -97,6 +98,9 @@ class Product(Base):
     mercadolivre_listing_type = Column(String(20))  # gold_pro, gold_special, gold_premium
     mercadolivre_shipping = Column(JSON)  # Configurações de frete
     
+    # Busca textual (mantido por trigger no banco: nome, marca, modelo, descrição e códigos dos SKUs)
+    search_vector = deferred(Column(TSVECTOR))
+    
     # Metadados
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -116,5 +120,55 @@ class Product(Base):
                                      foreign_keys="ProductComponent.component_product_id",
                                      back_populates="component_product")
     
+    # Índices
+    __table_args__ = (
+        Index("ix_products_search_vector", "search_vector", postgresql_using="gin"),
+        Index("ix_products_company_id_brand", "company_id", "brand"),
+        Index("ix_products_company_id_effective_stock", "company_id", "effective_stock"),
+    )
+    
     def __repr__(self):
-        return f"<Product(id={self.id}, name='{self.name}', company_id={self.company_id})>" 
\ No newline at end of file
+        return f"<Product(id={self.id}, name='{self.name}', company_id={self.company_id})>" 
+
+
+# Busca textual: extensões, configuração portuguese_unaccent e índices de trigramas
+SEARCH_SETUP = """
+CREATE EXTENSION IF NOT EXISTS unaccent;
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'portuguese_unaccent') THEN
+        CREATE TEXT SEARCH CONFIGURATION portuguese_unaccent (COPY = portuguese);
+        ALTER TEXT SEARCH CONFIGURATION portuguese_unaccent
+            ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+    END IF;
+END
+$$;
+CREATE INDEX IF NOT EXISTS ix_products_name_trgm ON products USING gin (name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_products_description_trgm ON products USING gin (description gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_products_brand_trgm ON products USING gin (brand gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_products_model_trgm ON products USING gin (model gin_trgm_ops);
+"""
+
+# search_vector preenchido no INSERT/UPDATE do produto. products_compute_search_vector (lê os
+# SKUs) é criada junto com product_skus (ver app/models/product_sku.py)
+SEARCH_VECTOR_TRIGGER = """
+CREATE OR REPLACE FUNCTION products_search_vector_trigger()
+RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := products_compute_search_vector(
+        NEW.id, NEW.name, NEW.description, NEW.brand, NEW.model, NEW.sku, NEW.ean, NEW.gtin
+    );
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_products_search_vector ON products;
+CREATE TRIGGER trg_products_search_vector
+BEFORE INSERT OR UPDATE OF name, description, brand, model, sku, ean, gtin ON products
+FOR EACH ROW EXECUTE FUNCTION products_search_vector_trigger();
+"""
+
+# Instalações via create_all
+event.listen(Product.__table__, "after_create", DDL(SEARCH_SETUP).execute_if(dialect="postgresql"))
+event.listen(Product.__table__, "after_create", DDL(SEARCH_VECTOR_TRIGGER).execute_if(dialect="postgresql"))
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Text, Float, Boolean, DateTime, ForeignKey, JSON, Enum
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, Integer, String, Text, Float, Boolean, DateTime, ForeignKey, Enum, DDL, Index, event
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -18,7 +18,7 @@ class ProductSKU(Base):
     __tablename__ = "product_skus"
     
     id = Column(Integer, primary_key=True, index=True)
-    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False, index=True)
     
     # Identificação única do SKU
     sku_code = Column(String(50), nullable=False, unique=True, index=True)
@@ -33,37 +33,52 @@ class ProductSKU(Base):
     
     # Preços
     cost_price = Column(Float, nullable=False)  # Preço de custo
+    average_cost = Column(Float)  # Custo médio ponderado móvel (atualizado nas entradas de estoque)
     sale_price = Column(Float, nullable=False)  # Preço de venda
     wholesale_price = Column(Float)  # Preço atacado
     promotional_price = Column(Float)  # Preço promocional
+    promotional_starts_at = Column(DateTime(timezone=True))  # Início da promoção (vazio = imediato)
+    promotional_ends_at = Column(DateTime(timezone=True))  # Fim da promoção (vazio = sem fim)
     
     # Controle de estoque
     current_stock = Column(Integer, default=0)  # Estoque atual
     minimum_stock = Column(Integer, default=0)  # Estoque mínimo
     maximum_stock = Column(Integer)  # Estoque máximo
     reserved_stock = Column(Integer, default=0)  # Estoque reservado
+    # Estoque do SKU somado ao dos SKUs associados (mantido por trigger no banco)
+    effective_stock = Column(Integer, nullable=False, default=0, server_default="0")
     
     # Localização no estoque
     warehouse_location = Column(String(100))  # Localização no armazém
     shelf_location = Column(String(50))  # Localização na prateleira
     
-    # Impostos (JSON para flexibilidade)
-    taxes = Column(JSON, default=dict)  # Estrutura: {"ICMS": 18.0, "IPI": 5.0, ...}
+    # Impostos (JSONB: filtro por imposto/alíquota com índice GIN)
+    taxes = Column(JSONB, default=dict)  # Estrutura: {"ICMS": 18.0, "IPI": 5.0, ...}
     
     # Informações adicionais
     supplier_sku = Column(String(50))  # SKU do fornecedor
-    supplier_id = Column(UUID(as_uuid=True), ForeignKey("suppliers.id"))
+    supplier_id = Column(UUID(as_uuid=True), ForeignKey("suppliers.id"), index=True)
     
     # Status
     is_active = Column(Boolean, default=True)
     is_available_for_sale = Column(Boolean, default=True)
     is_stock_sku = Column(Boolean, default=False)  # Se é o SKU principal de estoque
-    stock_sku_id = Column(Integer, ForeignKey("product_skus.id"))  # Referência ao SKU de estoque principal
+    stock_sku_id = Column(Integer, ForeignKey("product_skus.id"), index=True)  # Referência ao SKU de estoque principal
+    
+    # Curva ABC por valor movimentado (recalculada pela análise ABC)
+    abc_class = Column(String(1), index=True)
     
     # Metadados
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
+    __table_args__ = (
+        # Lançamento de NF-e: item do fornecedor (cProd) -> SKU
+        Index("ix_product_skus_supplier_id_supplier_sku", "supplier_id", "supplier_sku"),
+        # Filtro por imposto (taxes ? 'ICMS') e por alíquota (taxes @> '{"ICMS": 18}')
+        Index("ix_product_skus_taxes", "taxes", postgresql_using="gin"),
+    )
+    
     # Relacionamentos
     product = relationship("Product", back_populates="skus")
     supplier = relationship("Supplier")
@@ -113,6 +128,26 @@ class ProductSKU(Base):
         else:
             return "in_stock"
     
+    @property
+    def is_promotion_active(self):
+        """Se o preço promocional está vigente agora"""
+        if self.promotional_price is None:
+            return False
+        from datetime import datetime, timezone
+        now = datetime.now(timezone.utc)
+        if self.promotional_starts_at and self.promotional_starts_at > now:
+            return False
+        if self.promotional_ends_at and self.promotional_ends_at < now:
+            return False
+        return True
+    
+    @property
+    def effective_price(self):
+        """Preço de venda considerando a promoção vigente"""
+        if self.is_promotion_active:
+            return self.promotional_price
+        return self.sale_price
+    
     def calculate_total_tax_rate(self):
         """Calcula a taxa total de impostos"""
         if not self.taxes:
@@ -123,4 +158,140 @@ class ProductSKU(Base):
         """Calcula o preço com impostos"""
         base_price = getattr(self, price_type, 0) or 0
         tax_rate = self.calculate_total_tax_rate()
-        return base_price * (1 + tax_rate / 100) 
\ No newline at end of file
+        return base_price * (1 + tax_rate / 100)
+
+
+# Recalcula effective_stock dos SKUs de estoque e dos produtos afetados, uma vez por comando
+# (tabelas de transição): transferências, lançamentos e reparos em massa custam três comandos,
+# não dois UPDATEs por linha. Os SKUs e produtos são bloqueados em ordem de id antes dos UPDATEs
+# (ordem de bloqueio estável entre transações concorrentes). O UPDATE interno só altera
+# effective_stock: o trigger dispara de novo, mas não encontra linhas relevantes alteradas.
+EFFECTIVE_STOCK_FUNCTION = """
+CREATE OR REPLACE FUNCTION product_skus_refresh_effective_stock()
+RETURNS trigger AS $$
+DECLARE
+    v_sku_ids integer[];
+    v_product_ids integer[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(DISTINCT sku_id) INTO v_sku_ids
+        FROM new_rows n, unnest(ARRAY[n.id, n.stock_sku_id]) AS sku_id
+        WHERE sku_id IS NOT NULL;
+        SELECT array_agg(DISTINCT n.product_id) INTO v_product_ids FROM new_rows n;
+    ELSIF TG_OP = 'UPDATE' THEN
+        SELECT array_agg(DISTINCT sku_id), array_agg(DISTINCT product_id) INTO v_sku_ids, v_product_ids
+        FROM new_rows n
+        JOIN old_rows o ON o.id = n.id,
+        unnest(ARRAY[n.id, n.stock_sku_id, o.stock_sku_id]) AS sku_id,
+        unnest(ARRAY[n.product_id, o.product_id]) AS product_id
+        WHERE (n.current_stock, n.stock_sku_id, n.is_active, n.is_stock_sku, n.product_id)
+              IS DISTINCT FROM (o.current_stock, o.stock_sku_id, o.is_active, o.is_stock_sku, o.product_id)
+          AND sku_id IS NOT NULL;
+    ELSE
+        SELECT array_agg(DISTINCT sku_id) INTO v_sku_ids
+        FROM old_rows o, unnest(ARRAY[o.id, o.stock_sku_id]) AS sku_id
+        WHERE sku_id IS NOT NULL;
+        SELECT array_agg(DISTINCT o.product_id) INTO v_product_ids FROM old_rows o;
+    END IF;
+
+    IF v_sku_ids IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    PERFORM 1 FROM product_skus WHERE id = ANY(v_sku_ids) ORDER BY id FOR UPDATE;
+    UPDATE product_skus s
+    SET effective_stock = t.total
+    FROM (
+        SELECT k.id, coalesce(k.current_stock, 0) + CASE WHEN k.is_stock_sku THEN coalesce((
+                SELECT sum(a.current_stock) FROM product_skus a
+                WHERE a.stock_sku_id = k.id AND a.is_active AND a.id <> k.id
+            ), 0) ELSE 0 END AS total
+        FROM product_skus k
+        WHERE k.id = ANY(v_sku_ids)
+    ) t
+    WHERE s.id = t.id AND s.effective_stock IS DISTINCT FROM t.total;
+
+    v_product_ids := v_product_ids || ARRAY(SELECT product_id FROM product_skus WHERE id = ANY(v_sku_ids));
+    PERFORM 1 FROM products WHERE id = ANY(v_product_ids) ORDER BY id FOR UPDATE;
+    UPDATE products p
+    SET effective_stock = t.total
+    FROM (
+        SELECT k.id, coalesce((
+                SELECT sum(s.effective_stock) FROM product_skus s
+                WHERE s.product_id = k.id AND s.is_active
+            ), 0) AS total
+        FROM products k
+        WHERE k.id = ANY(v_product_ids)
+    ) t
+    WHERE p.id = t.id AND p.effective_stock IS DISTINCT FROM t.total;
+
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+# Tabelas de transição não aceitam lista de colunas no UPDATE: o filtro fica na função
+EFFECTIVE_STOCK_TRIGGER = """
+DROP TRIGGER IF EXISTS trg_product_skus_effective_stock ON product_skus;
+DROP TRIGGER IF EXISTS trg_product_skus_effective_stock_insert ON product_skus;
+DROP TRIGGER IF EXISTS trg_product_skus_effective_stock_update ON product_skus;
+DROP TRIGGER IF EXISTS trg_product_skus_effective_stock_delete ON product_skus;
+CREATE TRIGGER trg_product_skus_effective_stock_insert AFTER INSERT ON product_skus
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION product_skus_refresh_effective_stock();
+CREATE TRIGGER trg_product_skus_effective_stock_update AFTER UPDATE ON product_skus
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION product_skus_refresh_effective_stock();
+CREATE TRIGGER trg_product_skus_effective_stock_delete AFTER DELETE ON product_skus
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION product_skus_refresh_effective_stock();
+"""
+
+# Vetor de busca do produto (inclui códigos e códigos de barras dos SKUs); alterações nos SKUs
+# recalculam o vetor do produto dono
+SEARCH_VECTOR_FUNCTIONS = """
+CREATE OR REPLACE FUNCTION products_compute_search_vector(
+    p_id INTEGER, p_name TEXT, p_description TEXT, p_brand TEXT,
+    p_model TEXT, p_sku TEXT, p_ean TEXT, p_gtin TEXT
+)
+RETURNS tsvector AS $$
+    SELECT
+        setweight(to_tsvector('portuguese_unaccent', coalesce(p_name, '')), 'A') ||
+        setweight(to_tsvector('simple', concat_ws(' ', p_sku, p_ean, p_gtin)), 'A') ||
+        setweight(to_tsvector('simple', coalesce((
+            SELECT string_agg(concat_ws(' ', s.sku_code, s.barcode), ' ')
+            FROM product_skus s
+            WHERE s.product_id = p_id
+        ), '')), 'A') ||
+        setweight(to_tsvector('portuguese_unaccent', concat_ws(' ', p_brand, p_model)), 'B') ||
+        setweight(to_tsvector('portuguese_unaccent', coalesce(p_description, '')), 'C')
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION product_skus_search_vector_trigger()
+RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE products SET search_vector = products_compute_search_vector(id, name, description, brand, model, sku, ean, gtin)
+        WHERE id = OLD.product_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND (TG_OP = 'INSERT' OR NEW.product_id IS DISTINCT FROM OLD.product_id OR
+            NEW.sku_code IS DISTINCT FROM OLD.sku_code OR NEW.barcode IS DISTINCT FROM OLD.barcode) THEN
+        UPDATE products SET search_vector = products_compute_search_vector(id, name, description, brand, model, sku, ean, gtin)
+        WHERE id = NEW.product_id;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+SEARCH_VECTOR_TRIGGER = """
+DROP TRIGGER IF EXISTS trg_product_skus_search_vector ON product_skus;
+CREATE TRIGGER trg_product_skus_search_vector
+AFTER INSERT OR UPDATE OF sku_code, barcode, product_id OR DELETE ON product_skus
+FOR EACH ROW EXECUTE FUNCTION product_skus_search_vector_trigger();
+CREATE INDEX IF NOT EXISTS ix_product_skus_sku_code_trgm ON product_skus USING gin (sku_code gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_product_skus_barcode_trgm ON product_skus USING gin (barcode gin_trgm_ops);
+"""
+
+# Instalações via create_all (products já existe: pg_trgm e portuguese_unaccent criados com ela)
+event.listen(ProductSKU.__table__, "after_create", DDL(SEARCH_VECTOR_FUNCTIONS).execute_if(dialect="postgresql"))
+event.listen(ProductSKU.__table__, "after_create", DDL(SEARCH_VECTOR_TRIGGER).execute_if(dialect="postgresql"))
+event.listen(ProductSKU.__table__, "after_create", DDL(EFFECTIVE_STOCK_FUNCTION).execute_if(dialect="postgresql"))
+event.listen(ProductSKU.__table__, "after_create", DDL(EFFECTIVE_STOCK_TRIGGER).execute_if(dialect="postgresql"))
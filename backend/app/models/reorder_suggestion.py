@@ -0,0 +1,45 @@
+from sqlalchemy import Column, Integer, Float, Boolean, DateTime, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+class ReorderSuggestion(Base):
+    """Sugestão de reposição calculada a partir do histórico de saídas (recalculada toda noite)"""
+    __tablename__ = "reorder_suggestions"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    
+    # Relacionamentos
+    company_id = Column(UUID(as_uuid=True), ForeignKey("companies.id"), nullable=False)
+    sku_id = Column(Integer, ForeignKey("product_skus.id", ondelete="CASCADE"), nullable=False)
+    branch_id = Column(UUID(as_uuid=True), ForeignKey("branches.id", ondelete="CASCADE"), nullable=True)  # None = empresa toda
+    
+    # Demanda (unidades/dia)
+    demand_rate = Column(Float, nullable=False)
+    demand_std = Column(Float, nullable=False)
+    
+    # Posição de estoque
+    available_stock = Column(Integer, nullable=False)
+    days_of_cover = Column(Float)  # None quando não há demanda
+    
+    # Política de reposição
+    safety_stock = Column(Integer, nullable=False)
+    reorder_point = Column(Integer, nullable=False)
+    target_stock = Column(Integer, nullable=False)
+    suggested_quantity = Column(Integer, nullable=False)
+    needs_reorder = Column(Boolean, nullable=False, default=False)
+    
+    # Metadados
+    computed_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # Relacionamentos
+    sku = relationship("ProductSKU")
+    branch = relationship("Branch")
+    
+    __table_args__ = (
+        Index("ix_reorder_suggestions_company_id_needs_reorder", "company_id", "needs_reorder"),
+    )
+    
+    def __repr__(self):
+        return f"<ReorderSuggestion(sku_id={self.sku_id}, branch_id={self.branch_id}, suggested_quantity={self.suggested_quantity})>"
@@ -0,0 +1,103 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum, Numeric, Index, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from app.core.database import Base
+import enum
+
+class OrderStatus(str, enum.Enum):
+    PENDING = "pending"         # Pendente
+    CONFIRMED = "confirmed"     # Confirmado (estoque reservado)
+    PREPARING = "preparing"     # Em separação
+    SHIPPED = "shipped"         # Enviado (baixa do estoque)
+    DELIVERED = "delivered"     # Entregue
+    CANCELLED = "cancelled"     # Cancelado
+
+class SalesOrder(Base):
+    __tablename__ = "sales_orders"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    company_id = Column(UUID(as_uuid=True), ForeignKey("companies.id"), nullable=False)
+    customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False)
+    branch_id = Column(UUID(as_uuid=True), ForeignKey("branches.id"), nullable=True)  # Filial que atende o pedido
+    
+    # Identificação
+    order_number = Column(String(50))  # Número informado (vazio = PED-<id>)
+    channel = Column(String(30), nullable=False, default="manual")  # manual, loja, mercadolivre, shopee...
+    external_id = Column(String(100))  # Id do pedido no canal (idempotência da importação)
+    status = Column(Enum(OrderStatus), nullable=False, default=OrderStatus.CONFIRMED)
+    
+    # Pagamento
+    payment_method = Column(String(30))
+    installments = Column(Integer, default=1)
+    
+    # Valores
+    subtotal = Column(Numeric(12, 2), nullable=False)
+    discount_amount = Column(Numeric(12, 2), default=0)
+    shipping_amount = Column(Numeric(12, 2), default=0)
+    total_amount = Column(Numeric(12, 2), nullable=False)
+    
+    # Datas
+    order_date = Column(DateTime(timezone=True), server_default=func.now())
+    shipped_at = Column(DateTime(timezone=True))
+    delivered_at = Column(DateTime(timezone=True))
+    
+    notes = Column(Text)
+    
+    # Metadados
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    # Relacionamentos
+    company = relationship("Company")
+    customer = relationship("Customer")
+    branch = relationship("Branch")
+    items = relationship("SalesOrderItem", back_populates="order", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        UniqueConstraint("company_id", "channel", "external_id", name="uq_sales_orders_company_channel_external_id"),
+        Index("ix_sales_orders_company_id_status_order_date", "company_id", "status", "order_date"),
+    )
+    
+    def __repr__(self):
+        return f"<SalesOrder(id={self.id}, number='{self.number}', status='{self.status}')>"
+    
+    @property
+    def number(self):
+        """Número exibido do pedido"""
+        return self.order_number or f"PED-{self.id:06d}"
+    
+    @property
+    def reservation_reference(self):
+        """Referência das reservas de estoque do pedido"""
+        return f"order:{self.id}"
+    
+    @property
+    def customer_name(self):
+        return self.customer.name if self.customer else ""
+    
+    @property
+    def item_count(self):
+        return len(self.items)
+
+class SalesOrderItem(Base):
+    __tablename__ = "sales_order_items"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    order_id = Column(Integer, ForeignKey("sales_orders.id", ondelete="CASCADE"), nullable=False, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    sku_id = Column(Integer, ForeignKey("product_skus.id"), nullable=False)  # SKU vendido
+    stock_sku_id = Column(Integer, ForeignKey("product_skus.id"), nullable=False)  # SKU que detém o estoque
+    
+    code = Column(String(50))  # Código recebido (sku_code ou código de barras)
+    quantity = Column(Integer, nullable=False)
+    unit_price = Column(Numeric(12, 2), nullable=False)
+    discount_amount = Column(Numeric(12, 2), default=0)
+    total_amount = Column(Numeric(12, 2), nullable=False)
+    
+    # Relacionamentos
+    order = relationship("SalesOrder", back_populates="items")
+    sku = relationship("ProductSKU", foreign_keys=[sku_id])
+    
+    def __repr__(self):
+        return f"<SalesOrderItem(id={self.id}, order_id={self.order_id}, sku_id={self.sku_id}, quantity={self.quantity})>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -19,6 +19,7 @@ class StockBranch(Base):
     minimum_stock = Column(Integer, default=0)  # Estoque mínimo na filial
     maximum_stock = Column(Integer)  # Estoque máximo na filial
     reserved_stock = Column(Integer, default=0)  # Estoque reservado na filial
+    average_cost = Column(Float)  # Custo médio ponderado móvel na filial
     
     # Localização específica da filial
     warehouse_location = Column(String(100))  # Localização no armazém da filial
@@ -36,6 +37,11 @@ class StockBranch(Base):
     sku = relationship("ProductSKU", back_populates="branch_stocks")
     branch = relationship("Branch")
     
+    __table_args__ = (
+        # Uma configuração de estoque por SKU/filial (também usada no ON CONFLICT das transferências)
+        UniqueConstraint("sku_id", "branch_id", name="uq_stock_branches_sku_id_branch_id"),
+    )
+    
     def __repr__(self):
         return f"<StockBranch(id={self.id}, sku_id={self.sku_id}, branch_id={self.branch_id})>"
     
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Float, DateTime, ForeignKey, Enum, JSON
+from sqlalchemy import Column, Integer, String, Text, Float, DateTime, ForeignKey, Enum, JSON, Index, DDL, event
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -30,12 +30,14 @@ class MovementReason(enum.Enum):
 class StockMovement(Base):
     __tablename__ = "stock_movements"
     
-    id = Column(Integer, primary_key=True, index=True)
+    # Tabela particionada por mês em created_at: a chave primária precisa incluir a coluna de partição
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     
     # Relacionamentos principais
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     sku_id = Column(Integer, ForeignKey("product_skus.id"), nullable=False)
     company_id = Column(UUID(as_uuid=True), ForeignKey("companies.id"), nullable=False)
+    branch_id = Column(UUID(as_uuid=True), ForeignKey("branches.id"), nullable=True)  # Filial (opcional)
     
     # Tipo e motivo da movimentação
     movement_type = Column(Enum(MovementType), nullable=False)
@@ -65,13 +67,22 @@ class StockMovement(Base):
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"))
     
     # Metadados
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), primary_key=True, nullable=False, server_default=func.now())
     
     # Relacionamentos
     product = relationship("Product", back_populates="stock_movements")
     sku = relationship("ProductSKU", back_populates="stock_movements")
     company = relationship("Company")
     user = relationship("User")
+    branch = relationship("Branch")
+    
+    __table_args__ = (
+        # Histórico por empresa/tipo/período (sugestão de reposição, relatórios)
+        Index("ix_stock_movements_company_type_created_at", "company_id", "movement_type", "created_at"),
+        # Histórico de um SKU do mais recente para o mais antigo
+        Index("ix_stock_movements_sku_id_created_at", "sku_id", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
     
     def __repr__(self):
         return f"<StockMovement(id={self.id}, type='{self.movement_type.value}', quantity={self.quantity}, sku_id={self.sku_id})>"
@@ -109,4 +120,58 @@ class StockMovement(Base):
         """Calcula o custo total da movimentação"""
         if self.unit_cost and self.quantity:
             return self.unit_cost * self.quantity
-        return 0.0 
\ No newline at end of file
+        return 0.0
+
+
+# Cria (se não existir) a partição mensal que contém p_month e retorna o nome dela. Linhas do
+# mês que já estejam na partição padrão são movidas para a nova partição (senão a criação falha)
+CREATE_PARTITION_FUNCTION = """
+CREATE OR REPLACE FUNCTION stock_movements_create_partition(p_month date)
+RETURNS text AS $$
+DECLARE
+    v_start date := date_trunc('month', p_month)::date;
+    v_name text := 'stock_movements_' || to_char(v_start, 'YYYY_MM');
+    v_from text := quote_literal(v_start::timestamp AT TIME ZONE 'UTC');
+    v_to text := quote_literal((v_start + interval '1 month')::timestamp AT TIME ZONE 'UTC');
+BEGIN
+    IF to_regclass(v_name) IS NOT NULL THEN
+        RETURN v_name;
+    END IF;
+    IF to_regclass('stock_movements_default') IS NOT NULL AND EXISTS (
+        SELECT 1 FROM stock_movements_default
+        WHERE created_at >= v_start::timestamp AT TIME ZONE 'UTC'
+          AND created_at < (v_start + interval '1 month')::timestamp AT TIME ZONE 'UTC'
+    ) THEN
+        -- Mês já gravado na partição padrão (manutenção atrasada): a partição é criada fora da
+        -- tabela, recebe as linhas do mês retiradas da padrão e então é anexada
+        EXECUTE 'CREATE TABLE ' || quote_ident(v_name)
+            || ' (LIKE stock_movements INCLUDING DEFAULTS INCLUDING CONSTRAINTS)';
+        EXECUTE 'WITH moved AS (DELETE FROM stock_movements_default WHERE created_at >= ' || v_from
+            || ' AND created_at < ' || v_to || ' RETURNING *) INSERT INTO ' || quote_ident(v_name)
+            || ' SELECT * FROM moved';
+        EXECUTE 'ALTER TABLE stock_movements ATTACH PARTITION ' || quote_ident(v_name)
+            || ' FOR VALUES FROM (' || v_from || ') TO (' || v_to || ')';
+    ELSE
+        EXECUTE 'CREATE TABLE ' || quote_ident(v_name) || ' PARTITION OF stock_movements FOR VALUES FROM ('
+            || v_from || ') TO (' || v_to || ')';
+    END IF;
+    RETURN v_name;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+# Instalações via create_all: função de partição, partição padrão e meses corrente e seguintes
+event.listen(
+    StockMovement.__table__,
+    "after_create",
+    DDL(CREATE_PARTITION_FUNCTION).execute_if(dialect="postgresql")
+)
+event.listen(
+    StockMovement.__table__,
+    "after_create",
+    DDL(
+        "CREATE TABLE IF NOT EXISTS stock_movements_default PARTITION OF stock_movements DEFAULT; "
+        "SELECT stock_movements_create_partition((date_trunc('month', now()) + m * interval '1 month')::date) "
+        "FROM generate_series(0, 3) AS m"
+    ).execute_if(dialect="postgresql")
+)
@@ -0,0 +1,48 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey, Enum, Index, text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from app.core.database import Base
+import enum
+
+class ReservationStatus(enum.Enum):
+    ACTIVE = "active"         # Reserva temporária (expira em expires_at)
+    CONFIRMED = "confirmed"   # Reserva confirmada (pedido), sem expiração
+    RELEASED = "released"     # Liberada (cancelamento)
+    EXPIRED = "expired"       # Expirada pela rotina de limpeza
+    CONSUMED = "consumed"     # Baixada: convertida em saída de estoque
+
+class StockReservation(Base):
+    """Reserva de estoque (carrinho/pedido) aplicada em reserved_stock do SKU e da filial"""
+    __tablename__ = "stock_reservations"
+    
+    id = Column(BigInteger, primary_key=True)
+    
+    # Relacionamentos
+    company_id = Column(UUID(as_uuid=True), ForeignKey("companies.id"), nullable=False)
+    sku_id = Column(Integer, ForeignKey("product_skus.id", ondelete="CASCADE"), nullable=False)  # SKU solicitado
+    stock_sku_id = Column(Integer, ForeignKey("product_skus.id", ondelete="CASCADE"), nullable=False)  # SKU que detém o estoque
+    branch_id = Column(UUID(as_uuid=True), ForeignKey("branches.id"), nullable=True)  # Filial (opcional)
+    
+    # Reserva
+    reference = Column(String(100), nullable=False)  # Carrinho, pedido, etc.
+    quantity = Column(Integer, nullable=False)
+    status = Column(Enum(ReservationStatus), nullable=False, default=ReservationStatus.ACTIVE)
+    expires_at = Column(DateTime(timezone=True))  # None = sem expiração (confirmada)
+    
+    # Metadados
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    # Relacionamentos
+    sku = relationship("ProductSKU", foreign_keys=[sku_id])
+    branch = relationship("Branch")
+    
+    __table_args__ = (
+        Index("ix_stock_reservations_company_id_reference", "company_id", "reference"),
+        # Apenas reservas ativas entram na varredura de expiração
+        Index("ix_stock_reservations_active_expires_at", "expires_at", postgresql_where=text("status = 'ACTIVE'")),
+    )
+    
+    def __repr__(self):
+        return f"<StockReservation(id={self.id}, reference='{self.reference}', sku_id={self.sku_id}, quantity={self.quantity})>"
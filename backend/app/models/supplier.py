@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Boolean, Text, ForeignKey, Integer, Float
+from sqlalchemy import Column, String, DateTime, Boolean, Text, ForeignKey, Integer, Float, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -59,6 +59,14 @@ class Supplier(Base):
         return f"<Supplier(id={self.id}, name='{self.name}', company_id='{self.company_id}')>"
 
 
+# Lançamento de NF-e: CNPJ do emitente (só dígitos) -> fornecedor
+Index(
+    "ix_suppliers_company_id_cnpj_digits",
+    Supplier.company_id,
+    func.regexp_replace(Supplier.cnpj, "[^0-9]", "", "g")
+)
+
+
 class SupplierContact(Base):
     __tablename__ = "supplier_contacts"
 
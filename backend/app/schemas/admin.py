@@ -1,6 +1,7 @@
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
+from uuid import UUID
 
 class AdminStats(BaseModel):
     total_companies: int
@@ -78,4 +79,18 @@ class ModuleDetail(BaseModel):
     price: float
     category: str
     active_subscriptions: int
-    companies: List[CompanyList] 
\ No newline at end of file
+    companies: List[CompanyList] 
+class StockDriftSample(BaseModel):
+    sku_id: int
+    sku_code: Optional[str] = None
+    branch_id: Optional[UUID] = None  # vazio = estoque total do SKU
+    recorded: Optional[int] = None
+    expected: int
+
+class StockDriftReport(BaseModel):
+    company_id: UUID
+    skus_with_drift: int
+    branch_stocks_with_drift: int
+    skus_repaired: int  # divergências de filial são apenas informadas
+    samples: List[StockDriftSample] = []
+    elapsed_seconds: float
@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+from typing import Optional, Dict
+
+class AbcCurveItem(BaseModel):
+    id: int
+    name: str
+    code: Optional[str] = None  # sku_code do SKU ou CNPJ/CPF do cliente
+    value: float
+    rank: int
+    share: float  # participação no total
+    cumulative_share: float  # participação acumulada até o item
+    abc_class: str
+
+class AbcClassifyResult(BaseModel):
+    period_days: int
+    skus: Dict[str, int]  # quantidade por classe
+    customers: Dict[str, int]
@@ -106,6 +106,7 @@ class CustomerList(BaseModel):
     state: Optional[str] = None
     credit_limit_formatted: str
     is_active: bool
+    abc_class: Optional[str] = None
     created_at: datetime
     
     class Config:
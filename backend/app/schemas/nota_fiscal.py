@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
-from datetime import datetime
+from datetime import date, datetime
 from uuid import UUID
 
 
@@ -10,6 +10,7 @@ class NotaFiscalProdutoBase(BaseModel):
     ncm: Optional[str] = None
     cfop: str
     unidade: str
+    ean: Optional[str] = None
     quantidade: float
     valor_unitario: float
     valor_total: float
@@ -27,6 +28,7 @@ class NotaFiscalProdutoCreate(NotaFiscalProdutoBase):
 class NotaFiscalProduto(NotaFiscalProdutoBase):
     id: int
     nota_fiscal_id: int
+    sku_id: Optional[int] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
 
@@ -42,6 +44,7 @@ class NotaFiscalBase(BaseModel):
     data_emissao: datetime
     data_entrada_saida: Optional[datetime] = None
     origem: str = "manual"  # manual, sefaz, erp, email, api
+    chave_acesso: Optional[str] = Field(None, pattern=r"^\d{44}$")
     
     # Emitente
     emitente_nome: str
@@ -70,6 +73,7 @@ class NotaFiscalBase(BaseModel):
     # Pagamento
     forma_pagamento: Optional[str] = None
     condicao_pagamento: Optional[str] = None
+    duplicatas: Optional[List[Dict[str, Any]]] = None
     
     # Transporte
     transportadora_nome: Optional[str] = None
@@ -81,12 +85,12 @@ class NotaFiscalBase(BaseModel):
     observacoes: Optional[str] = None
     informacoes_adicionais: Optional[str] = None
     
-    # XML
-    xml_content: Optional[str] = None
+    # XML (o conteúdo só entra na criação/atualização; o download é feito em /{id}/xml)
     xml_filename: Optional[str] = None
 
 
 class NotaFiscalCreate(NotaFiscalBase):
+    xml_content: Optional[str] = None
     produtos: List[NotaFiscalProdutoCreate]
     company_id: UUID
 
@@ -122,6 +126,7 @@ class NotaFiscalUpdate(BaseModel):
     valor_desconto: Optional[float] = None
     forma_pagamento: Optional[str] = None
     condicao_pagamento: Optional[str] = None
+    duplicatas: Optional[List[Dict[str, Any]]] = None
     transportadora_nome: Optional[str] = None
     transportadora_cnpj: Optional[str] = None
     transportadora_placa: Optional[str] = None
@@ -138,6 +143,9 @@ class NotaFiscal(NotaFiscalBase):
     origem: str = "manual"
     protocolo_autorizacao: Optional[str] = None
     data_autorizacao: Optional[datetime] = None
+    xml_size: Optional[int] = None
+    supplier_id: Optional[UUID] = None
+    data_lancamento: Optional[datetime] = None
     company_id: UUID
     produtos: List[NotaFiscalProduto] = []
     created_at: datetime
@@ -151,6 +159,7 @@ class NotaFiscalList(BaseModel):
     id: int
     numero: str
     serie: str
+    chave_acesso: Optional[str] = None
     tipo: str
     data_emissao: datetime
     emitente_nome: str
@@ -178,4 +187,63 @@ class NotaFiscalResponse(BaseModel):
     success: bool
     message: str
     data: Optional[NotaFiscal] = None
-    errors: Optional[List[str]] = None 
\ No newline at end of file
+    errors: Optional[List[str]] = None 
+
+class NotaFiscalImportFileResult(BaseModel):
+    filename: str
+    status: str  # created, overwritten, duplicate, error
+    nota_fiscal_id: Optional[int] = None
+    numero: Optional[str] = None
+    serie: Optional[str] = None
+    emitente_nome: Optional[str] = None
+    errors: List[str] = []
+
+
+class NotaFiscalBatchImportResult(BaseModel):
+    total_files: int
+    created: int
+    overwritten: int
+    duplicates: int
+    errors: int
+    elapsed_seconds: float
+    results: List[NotaFiscalImportFileResult]
+
+
+class NotaFiscalPostingRequest(BaseModel):
+    nota_fiscal_ids: List[int] = Field(..., min_length=1)
+    branch_id: Optional[UUID] = None  # Filial que recebe as entradas (opcional)
+
+
+class NotaFiscalPostingNotaResult(BaseModel):
+    nota_fiscal_id: int
+    status: str  # posted, skipped, error
+    movements: int = 0
+    payables: int = 0
+    errors: List[str] = []
+
+
+class NotaFiscalPostingResult(BaseModel):
+    total: int
+    posted: int
+    skipped: int
+    errors: int
+    elapsed_seconds: float
+    results: List[NotaFiscalPostingNotaResult]
+
+
+class NotaFiscalTaxReportRow(BaseModel):
+    # Dimensões (None quando fora do agrupamento ou agregada no subtotal)
+    mes: Optional[date] = None
+    tipo: Optional[str] = None
+    cfop: Optional[str] = None
+    ncm: Optional[str] = None  # "" para itens sem NCM
+    emitente_cnpj: Optional[str] = None
+    emitente_nome: Optional[str] = None
+    nivel: int  # Dimensões preenchidas: todas no detalhe, 0 no total geral
+    
+    itens: int
+    valor_total: float
+    valor_icms: float
+    valor_ipi: float
+    valor_pis: float
+    valor_cofins: float
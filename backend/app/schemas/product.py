@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 from uuid import UUID
@@ -124,6 +124,8 @@ class ProductSKUBase(BaseModel):
     sale_price: float = Field(..., gt=0)
     wholesale_price: Optional[float] = Field(None, ge=0)
     promotional_price: Optional[float] = Field(None, ge=0)
+    promotional_starts_at: Optional[datetime] = None
+    promotional_ends_at: Optional[datetime] = None
     current_stock: int = Field(0, ge=0)
     minimum_stock: int = Field(0, ge=0)
     maximum_stock: Optional[int] = Field(None, ge=0)
@@ -148,6 +150,7 @@ class StockMovementBase(BaseModel):
     to_location: Optional[str] = Field(None, max_length=100)
     unit_cost: Optional[float] = Field(None, ge=0)
     notes: Optional[str] = None
+    branch_id: Optional[UUID] = None
 
 # Create schemas
 class ProductCreate(ProductBase):
@@ -243,6 +246,8 @@ class ProductSKUUpdate(BaseModel):
     sale_price: Optional[float] = Field(None, gt=0)
     wholesale_price: Optional[float] = Field(None, ge=0)
     promotional_price: Optional[float] = Field(None, ge=0)
+    promotional_starts_at: Optional[datetime] = None
+    promotional_ends_at: Optional[datetime] = None
     current_stock: Optional[int] = Field(None, ge=0)
     minimum_stock: Optional[int] = Field(None, ge=0)
     maximum_stock: Optional[int] = Field(None, ge=0)
@@ -309,6 +314,7 @@ class ProductSKUResponse(ProductSKUBase):
     product_id: int
     available_stock: int
     stock_status: str
+    average_cost: Optional[float] = None
     total_tax_rate: float = 0.0
     price_with_taxes: float = 0.0
     created_at: datetime
@@ -367,12 +373,14 @@ class ProductSKUList(BaseModel):
     cost_price: float
     sale_price: float
     current_stock: int
+    effective_stock: int = 0
     available_stock: int
     stock_status: str
     is_active: bool
     is_available_for_sale: bool
     is_stock_sku: bool
     stock_sku_id: Optional[int] = None
+    abc_class: Optional[str] = None
     created_at: datetime
     
     class Config:
@@ -415,4 +423,184 @@ class StockMovementFilter(BaseModel):
     movement_reason: Optional[MovementReason] = None
     start_date: Optional[datetime] = None
     end_date: Optional[datetime] = None
-    reference_document: Optional[str] = None 
\ No newline at end of file
+    reference_document: Optional[str] = None 
+# Lookup schemas (leitor de código de barras)
+class SKULookupRecord(BaseModel):
+    sku_id: int
+    product_id: int
+    product_name: str
+    sku_code: str
+    barcode: Optional[str] = None
+    variant_description: Optional[str] = None
+    sale_price: float
+    promotional_price: Optional[float] = None
+    promotional_starts_at: Optional[datetime] = None
+    promotional_ends_at: Optional[datetime] = None
+    wholesale_price: Optional[float] = None
+    is_available_for_sale: Optional[bool] = True
+    stock_sku_id: Optional[int] = None
+
+class SKULookupBatchRequest(BaseModel):
+    codes: List[str] = Field(..., min_length=1, max_length=5000)
+
+class SKULookupBatchResponse(BaseModel):
+    found: Dict[str, SKULookupRecord]
+    missing: List[str]
+
+# Import schemas (importação em massa de produtos/SKUs)
+class ProductImportRow(BaseModel):
+    """Uma linha do arquivo de importação: um SKU com os dados do produto repetidos"""
+    product_name: str = Field(..., min_length=1, max_length=255)
+    sku_code: str = Field(..., min_length=1, max_length=50)
+    description: Optional[str] = None
+    brand: Optional[str] = Field(None, max_length=100)
+    model: Optional[str] = Field(None, max_length=100)
+    category: Optional[str] = Field(None, max_length=100)
+    ncm: Optional[str] = Field(None, max_length=20)
+    barcode: Optional[str] = Field(None, max_length=50)
+    color: Optional[str] = Field(None, max_length=50)
+    size: Optional[str] = Field(None, max_length=20)
+    material: Optional[str] = Field(None, max_length=100)
+    flavor: Optional[str] = Field(None, max_length=50)
+    variant_description: Optional[str] = None
+    cost_price: float = Field(..., gt=0)
+    sale_price: float = Field(..., gt=0)
+    wholesale_price: Optional[float] = Field(None, ge=0)
+    promotional_price: Optional[float] = Field(None, ge=0)
+    current_stock: int = Field(0, ge=0)  # Aplicado apenas na criação do SKU
+    minimum_stock: int = Field(0, ge=0)
+    maximum_stock: Optional[int] = Field(None, ge=0)
+    warehouse_location: Optional[str] = Field(None, max_length=100)
+    shelf_location: Optional[str] = Field(None, max_length=50)
+    supplier_sku: Optional[str] = Field(None, max_length=50)
+    supplier_cnpj: Optional[str] = Field(None, max_length=18)
+
+    @field_validator('*', mode='before')
+    @classmethod
+    def empty_string_to_none(cls, v):
+        if isinstance(v, str):
+            v = v.strip()
+            return v or None
+        return v
+
+    @field_validator('cost_price', 'sale_price', 'wholesale_price', 'promotional_price', mode='before')
+    @classmethod
+    def parse_decimal_comma(cls, v):
+        # Aceita "1.234,56" e "1234,56" (formato brasileiro)
+        if isinstance(v, str) and ',' in v:
+            return v.replace('.', '').replace(',', '.')
+        return v
+
+class ProductImportError(BaseModel):
+    row: int
+    sku_code: Optional[str] = None
+    errors: List[str]
+
+class ProductImportResult(BaseModel):
+    total_rows: int
+    products_created: int
+    skus_created: int
+    skus_updated: int
+    failed_rows: int
+    errors: List[ProductImportError] = []
+
+# Bulk pricing schemas (reajuste de preços em massa)
+class PriceRuleAction(str, Enum):
+    MARKUP = "markup"              # preço = custo * (1 + valor/100)
+    PERCENT = "percent"            # preço = preço * (1 + valor/100)
+    FIXED = "fixed"                # preço = preço + valor
+    SET = "set"                    # preço = valor
+    PROMOTION = "promotion"        # promocional = venda * (1 - valor/100) na janela informada
+    CLEAR_PROMOTION = "clear_promotion"
+
+class PriceTarget(str, Enum):
+    SALE_PRICE = "sale_price"
+    WHOLESALE_PRICE = "wholesale_price"
+    PROMOTIONAL_PRICE = "promotional_price"
+
+class PriceRuleFilter(BaseModel):
+    category: Optional[str] = None
+    category_id: Optional[int] = None
+    brand: Optional[str] = None
+    supplier_id: Optional[UUID] = None
+    product_ids: Optional[List[int]] = None
+    sku_ids: Optional[List[int]] = None
+    only_active: bool = True
+
+class PriceRule(BaseModel):
+    action: PriceRuleAction
+    target: PriceTarget = PriceTarget.SALE_PRICE
+    value: Optional[float] = None
+    rounding_ending: Optional[float] = Field(None, ge=0, lt=1)  # ex.: 0.90 arredonda para X,90
+    starts_at: Optional[datetime] = None
+    ends_at: Optional[datetime] = None
+    filters: PriceRuleFilter = Field(default_factory=PriceRuleFilter)
+
+class BulkPriceUpdateRequest(BaseModel):
+    rules: List[PriceRule] = Field(..., min_length=1, max_length=50)
+    dry_run: bool = True
+    preview_limit: int = Field(20, ge=0, le=500)
+
+class PricePreviewItem(BaseModel):
+    sku_id: int
+    sku_code: str
+    product_name: str
+    old_price: Optional[float] = None
+    new_price: Optional[float] = None
+
+class PriceRuleResult(BaseModel):
+    rule_index: int
+    affected: int
+    preview: List[PricePreviewItem] = []
+
+class BulkPriceUpdateResponse(BaseModel):
+    dry_run: bool
+    total_affected: int
+    rules: List[PriceRuleResult]
+
+# Sugestão de reposição
+class ReorderSuggestionResponse(BaseModel):
+    sku_id: int
+    sku_code: str
+    product_name: str
+    branch_id: Optional[UUID] = None
+    demand_rate: float
+    demand_std: float
+    available_stock: int
+    days_of_cover: Optional[float] = None
+    safety_stock: int
+    reorder_point: int
+    target_stock: int
+    suggested_quantity: int
+    needs_reorder: bool
+    computed_at: datetime
+
+class ReorderRunResult(BaseModel):
+    company_id: UUID
+    suggestions: int
+    needs_reorder: int
+    elapsed_seconds: float
+
+# Valorização do estoque ao custo médio
+class StockValuationResponse(BaseModel):
+    branch_id: Optional[UUID] = None
+    total_stock_value: float
+    total_units: int
+    skus_in_stock: int
+
+# Feed de alterações do catálogo
+class CatalogChangeItem(BaseModel):
+    entity: str  # product, sku
+    id: int
+    product_id: int
+    changes: List[str]  # catalog, price, stock ou deleted
+    deleted: bool = False
+    data: Dict[str, Any] = {}  # apenas os campos dos grupos alterados, com o valor atual
+    cursor: int
+    cursor_id: int
+
+class CatalogChangesResponse(BaseModel):
+    cursor: int  # usar como `since` na próxima chamada
+    cursor_id: int  # usar como `since_id` na próxima chamada
+    has_more: bool
+    changes: List[CatalogChangeItem]
@@ -0,0 +1,122 @@
+from pydantic import BaseModel, Field, model_validator
+from typing import Optional, List
+from datetime import datetime, date
+from uuid import UUID
+from app.models.sales_order import OrderStatus
+
+class SalesOrderItemCreate(BaseModel):
+    code: str = Field(..., min_length=1, max_length=50)  # sku_code ou código de barras
+    quantity: int = Field(..., gt=0)
+    unit_price: Optional[float] = Field(None, ge=0)  # vazio = preço de venda do SKU
+    discount_amount: float = Field(0.0, ge=0)
+
+class SalesOrderCreate(BaseModel):
+    channel: str = Field("manual", min_length=1, max_length=30)
+    external_id: Optional[str] = Field(None, max_length=100)
+    order_number: Optional[str] = Field(None, max_length=50)
+    customer_id: Optional[int] = None
+    customer_document: Optional[str] = Field(None, max_length=18)  # CPF/CNPJ (com ou sem máscara)
+    branch_id: Optional[UUID] = None
+    order_date: Optional[datetime] = None
+    payment_method: Optional[str] = Field(None, max_length=30)
+    installments: int = Field(1, ge=1, le=60)
+    first_due_date: Optional[date] = None  # vazio = data do pedido (à vista) ou +30 dias (parcelado)
+    installment_interval_days: int = Field(30, ge=1, le=365)
+    discount_amount: float = Field(0.0, ge=0)
+    shipping_amount: float = Field(0.0, ge=0)
+    notes: Optional[str] = None
+    items: List[SalesOrderItemCreate] = Field(..., min_length=1, max_length=500)
+    
+    @model_validator(mode='after')
+    def check_customer(self):
+        if self.customer_id is None and not self.customer_document:
+            raise ValueError("Informe customer_id ou customer_document")
+        return self
+
+class SalesOrderBatchCreate(BaseModel):
+    orders: List[SalesOrderCreate] = Field(..., min_length=1, max_length=1000)
+
+class SalesOrderIntakeResult(BaseModel):
+    index: int  # posição do pedido no lote
+    status: str  # created, duplicate, rejected
+    order_id: Optional[int] = None
+    order_number: Optional[str] = None
+    errors: List[str] = []
+
+class SalesOrderBatchResult(BaseModel):
+    created: int
+    duplicates: int
+    rejected: int
+    results: List[SalesOrderIntakeResult]
+    elapsed_seconds: float
+
+class SalesOrderItemResponse(BaseModel):
+    id: int
+    product_id: int
+    sku_id: int
+    stock_sku_id: int
+    code: Optional[str] = None
+    quantity: int
+    unit_price: float
+    discount_amount: float
+    total_amount: float
+    
+    class Config:
+        from_attributes = True
+
+class SalesOrderResponse(BaseModel):
+    id: int
+    number: str
+    company_id: UUID
+    customer_id: int
+    customer_name: str
+    branch_id: Optional[UUID] = None
+    channel: str
+    external_id: Optional[str] = None
+    status: OrderStatus
+    payment_method: Optional[str] = None
+    installments: int
+    subtotal: float
+    discount_amount: float
+    shipping_amount: float
+    total_amount: float
+    order_date: datetime
+    shipped_at: Optional[datetime] = None
+    delivered_at: Optional[datetime] = None
+    notes: Optional[str] = None
+    items: List[SalesOrderItemResponse] = []
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+class SalesOrderList(BaseModel):
+    id: int
+    number: str
+    customer_id: int
+    customer_name: str
+    channel: str
+    status: OrderStatus
+    payment_method: Optional[str] = None
+    total_amount: float
+    item_count: int
+    order_date: datetime
+    
+    class Config:
+        from_attributes = True
+
+class SalesOrderStatusUpdate(BaseModel):
+    status: OrderStatus
+
+class PickingListRequest(BaseModel):
+    order_ids: List[int] = Field([], max_length=5000)
+    movement_ids: List[int] = Field([], max_length=20000)  # saídas de estoque a separar
+    branch_id: Optional[UUID] = None  # localização da filial; vazio = localização do SKU
+    mark_preparing: bool = False  # pedidos confirmados passam para "em separação"
+    
+    @model_validator(mode='after')
+    def check_sources(self):
+        if not self.order_ids and not self.movement_ids:
+            raise ValueError("Informe order_ids ou movement_ids")
+        return self
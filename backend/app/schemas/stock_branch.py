@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Optional, List
 from datetime import datetime
 from uuid import UUID
 
@@ -33,6 +33,7 @@ class StockBranchResponse(StockBranchBase):
     branch_id: UUID
     available_stock: int
     stock_status: str
+    average_cost: Optional[float] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
     
@@ -54,4 +55,24 @@ class StockBranchList(BaseModel):
     created_at: datetime
     
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True 
+
+# Transferência entre filiais
+class StockTransferItem(BaseModel):
+    sku_id: int
+    quantity: int = Field(..., gt=0)
+
+class StockTransferRequest(BaseModel):
+    from_branch_id: UUID
+    to_branch_id: UUID
+    items: List[StockTransferItem] = Field(..., min_length=1, max_length=20000)
+    reference_document: Optional[str] = Field(None, max_length=100)
+    notes: Optional[str] = None
+
+class StockTransferResult(BaseModel):
+    reference_document: str
+    from_branch_id: UUID
+    to_branch_id: UUID
+    lines: int
+    total_quantity: int
+    movements_created: int
@@ -0,0 +1,43 @@
+from pydantic import BaseModel, Field
+from typing import Optional, List
+from datetime import datetime
+from uuid import UUID
+from app.models.stock_reservation import ReservationStatus
+
+class StockReservationItem(BaseModel):
+    sku_id: int
+    quantity: int = Field(..., gt=0)
+
+class StockReservationCreate(BaseModel):
+    reference: str = Field(..., min_length=1, max_length=100)  # carrinho, pedido, etc.
+    branch_id: Optional[UUID] = None
+    ttl_seconds: Optional[int] = Field(None, gt=0)  # padrão: STOCK_RESERVATION_TTL_SECONDS
+    items: List[StockReservationItem] = Field(..., min_length=1, max_length=1000)
+
+class StockReservationResponse(BaseModel):
+    id: int
+    reference: str
+    sku_id: int
+    stock_sku_id: int
+    branch_id: Optional[UUID] = None
+    quantity: int
+    status: ReservationStatus
+    expires_at: Optional[datetime] = None
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+class StockReservationResult(BaseModel):
+    reference: str
+    status: ReservationStatus
+    affected: int  # reservas alteradas
+    expires_at: Optional[datetime] = None
+
+class StockAvailability(BaseModel):
+    sku_id: int
+    stock_sku_id: int
+    branch_id: Optional[UUID] = None
+    current_stock: int
+    reserved_stock: int
+    available_stock: int
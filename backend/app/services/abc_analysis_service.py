@@ -0,0 +1,202 @@
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Dict, Any, Optional
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, select, update, func, case, cast, literal, Numeric
+from uuid import UUID
+from app.models.product import Product
+from app.models.product_sku import ProductSKU
+from app.models.stock_movement import StockMovement, MovementType
+from app.models.customer import Customer
+from app.models.accounts_receivable import AccountsReceivable, ReceivableStatus
+
+
+# Participação acumulada que delimita as classes A e B (o restante é C)
+CLASS_A_LIMIT = 0.80
+CLASS_B_LIMIT = 0.95
+
+
+class AbcAnalysisService:
+    """Curva ABC (Pareto) calculada no banco com funções de janela.
+
+    Uma única consulta ordena os itens por valor, acumula com SUM() OVER (ORDER BY ...)
+    e atribui a classe: A até 80% do valor acumulado, B até 95% e C no restante.
+    """
+
+    @staticmethod
+    def _sku_values(company_id: UUID, since: datetime):
+        """Valor das saídas de cada SKU da empresa no período (SKUs sem saída valem 0)"""
+        movement_value = func.coalesce(func.sum(StockMovement.total_cost), 0)
+        return select(
+            ProductSKU.id.label("id"),
+            movement_value.label("value")
+        ).join(
+            Product, ProductSKU.product_id == Product.id
+        ).outerjoin(
+            StockMovement,
+            and_(
+                StockMovement.sku_id == ProductSKU.id,
+                StockMovement.movement_type == MovementType.EXIT,
+                StockMovement.created_at >= since
+            )
+        ).where(
+            Product.company_id == company_id
+        ).group_by(ProductSKU.id)
+
+    @staticmethod
+    def _customer_values(company_id: UUID, since: date):
+        """Volume a receber de cada cliente da empresa no período (exceto cancelados)"""
+        receivable_value = func.coalesce(func.sum(AccountsReceivable.total_amount), 0)
+        return select(
+            Customer.id.label("id"),
+            receivable_value.label("value")
+        ).outerjoin(
+            AccountsReceivable,
+            and_(
+                AccountsReceivable.customer_id == Customer.id,
+                AccountsReceivable.status != ReceivableStatus.CANCELLED,
+                AccountsReceivable.entry_date >= since
+            )
+        ).where(
+            Customer.company_id == company_id
+        ).group_by(Customer.id)
+
+    @staticmethod
+    def _classified(values):
+        """Ranking, participação acumulada e classe em uma passada com funções de janela"""
+        values = values.subquery("abc_values")
+        value = cast(values.c.value, Numeric)
+        ordering = dict(order_by=(value.desc(), values.c.id))
+        cumulative = func.sum(value).over(rows=(None, 0), **ordering)
+        total = func.sum(value).over()
+        # Participação acumulada antes do item: o item que cruza o limite ainda entra na classe
+        previous_share = (cumulative - value) / func.nullif(total, 0)
+
+        abc_class = case(
+            (value <= 0, literal("C")),
+            (previous_share < CLASS_A_LIMIT, literal("A")),
+            (previous_share < CLASS_B_LIMIT, literal("B")),
+            else_=literal("C")
+        )
+
+        return select(
+            values.c.id,
+            value.label("value"),
+            func.row_number().over(**ordering).label("rank"),
+            (value / func.nullif(total, 0)).label("share"),
+            (cumulative / func.nullif(total, 0)).label("cumulative_share"),
+            abc_class.label("abc_class")
+        ).subquery("abc_curve")
+
+    @staticmethod
+    def _period_start(period_days: int) -> datetime:
+        return datetime.now(timezone.utc) - timedelta(days=period_days)
+
+    @staticmethod
+    def _rows(rows) -> List[Dict[str, Any]]:
+        return [
+            {
+                "id": row.id,
+                "name": row.name,
+                "code": row.code,
+                "value": float(row.value or 0),
+                "rank": row.rank,
+                "share": float(row.share or 0),
+                "cumulative_share": float(row.cumulative_share or 0),
+                "abc_class": row.abc_class,
+            }
+            for row in rows
+        ]
+
+    @staticmethod
+    def sku_curve(db: Session, company_id: UUID, period_days: int, abc_class: Optional[str] = None,
+                  skip: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        """Curva ABC dos SKUs por valor das saídas"""
+        curve = AbcAnalysisService._classified(
+            AbcAnalysisService._sku_values(company_id, AbcAnalysisService._period_start(period_days))
+        )
+        query = select(
+            curve,
+            Product.name.label("name"),
+            ProductSKU.sku_code.label("code")
+        ).join(
+            ProductSKU, ProductSKU.id == curve.c.id
+        ).join(
+            Product, ProductSKU.product_id == Product.id
+        )
+        if abc_class:
+            query = query.where(curve.c.abc_class == abc_class)
+
+        rows = db.execute(query.order_by(curve.c.rank).offset(skip).limit(limit)).all()
+        return AbcAnalysisService._rows(rows)
+
+    @staticmethod
+    def customer_curve(db: Session, company_id: UUID, period_days: int, abc_class: Optional[str] = None,
+                       skip: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        """Curva ABC dos clientes por volume de contas a receber"""
+        curve = AbcAnalysisService._classified(
+            AbcAnalysisService._customer_values(company_id, AbcAnalysisService._period_start(period_days).date())
+        )
+        query = select(
+            curve,
+            Customer.name.label("name"),
+            func.coalesce(Customer.cnpj, Customer.cpf).label("code")
+        ).join(
+            Customer, Customer.id == curve.c.id
+        )
+        if abc_class:
+            query = query.where(curve.c.abc_class == abc_class)
+
+        rows = db.execute(query.order_by(curve.c.rank).offset(skip).limit(limit)).all()
+        return AbcAnalysisService._rows(rows)
+
+    @staticmethod
+    def _class_counts(db: Session, column, company_filter) -> Dict[str, int]:
+        counts = {"A": 0, "B": 0, "C": 0}
+        for abc_class, total in db.query(column, func.count()).filter(company_filter).group_by(column).all():
+            if abc_class in counts:
+                counts[abc_class] = total
+        return counts
+
+    @staticmethod
+    def classify(db: Session, company_id: UUID, period_days: int) -> Dict[str, Any]:
+        """Grava a classe ABC em product_skus e customers (um UPDATE ... FROM para cada, só o que mudou)"""
+        since = AbcAnalysisService._period_start(period_days)
+        try:
+            sku_curve = AbcAnalysisService._classified(AbcAnalysisService._sku_values(company_id, since))
+            db.execute(
+                update(ProductSKU)
+                .where(
+                    and_(
+                        ProductSKU.id == sku_curve.c.id,
+                        ProductSKU.abc_class.is_distinct_from(sku_curve.c.abc_class)
+                    )
+                )
+                .values(abc_class=sku_curve.c.abc_class)
+                .execution_options(synchronize_session=False)
+            )
+
+            customer_curve = AbcAnalysisService._classified(AbcAnalysisService._customer_values(company_id, since.date()))
+            db.execute(
+                update(Customer)
+                .where(
+                    and_(
+                        Customer.id == customer_curve.c.id,
+                        Customer.abc_class.is_distinct_from(customer_curve.c.abc_class)
+                    )
+                )
+                .values(abc_class=customer_curve.c.abc_class)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        return {
+            "period_days": period_days,
+            "skus": AbcAnalysisService._class_counts(
+                db, ProductSKU.abc_class,
+                ProductSKU.product_id.in_(select(Product.id).where(Product.company_id == company_id))
+            ),
+            "customers": AbcAnalysisService._class_counts(db, Customer.abc_class, Customer.company_id == company_id),
+        }
@@ -0,0 +1,193 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, case, select, delete, func, tuple_
+from uuid import UUID
+from app.models.product import Product
+from app.models.product_sku import ProductSKU
+from app.models.catalog_change import (
+    CatalogChange, CHANGE_CATALOG, CHANGE_PRICE, CHANGE_STOCK, CHANGE_DELETED
+)
+
+
+CHANGE_NAMES = (
+    (CHANGE_CATALOG, "catalog"),
+    (CHANGE_PRICE, "price"),
+    (CHANGE_STOCK, "stock"),
+)
+
+
+class CatalogChangeService:
+    """Feed incremental de alterações do catálogo.
+
+    Cada página lê no máximo `limit` registros após o cursor e os agrupa por entidade:
+    várias atualizações de estoque de um SKU viram uma única linha com o valor atual.
+    """
+
+    @staticmethod
+    def _names(fields: int) -> List[str]:
+        return [name for bit, name in CHANGE_NAMES if fields & bit]
+
+    @staticmethod
+    def _product_data(product: Product, fields: int) -> Dict[str, Any]:
+        data: Dict[str, Any] = {}
+        if fields & CHANGE_CATALOG:
+            data.update({
+                "name": product.name,
+                "description": product.description,
+                "brand": product.brand,
+                "model": product.model,
+                "category": product.category,
+                "ncm": product.ncm,
+                "ean": product.ean,
+                "gtin": product.gtin,
+                "weight": product.weight,
+                "length": product.length,
+                "width": product.width,
+                "height": product.height,
+                "is_active": product.is_active,
+                "shopee_category_id": product.shopee_category_id,
+                "mercadolivre_category_id": product.mercadolivre_category_id,
+            })
+        if fields & CHANGE_PRICE:
+            data["sale_price"] = product.sale_price
+        if fields & CHANGE_STOCK:
+            data["current_stock"] = product.current_stock
+            data["effective_stock"] = product.effective_stock
+        return data
+
+    @staticmethod
+    def _sku_data(sku: ProductSKU, fields: int) -> Dict[str, Any]:
+        data: Dict[str, Any] = {"sku_code": sku.sku_code}
+        if fields & CHANGE_CATALOG:
+            data.update({
+                "barcode": sku.barcode,
+                "variant_description": sku.variant_description,
+                "color": sku.color,
+                "size": sku.size,
+                "is_active": sku.is_active,
+                "is_available_for_sale": sku.is_available_for_sale,
+                "stock_sku_id": sku.stock_sku_id,
+            })
+        if fields & CHANGE_PRICE:
+            data.update({
+                "sale_price": sku.sale_price,
+                "promotional_price": sku.promotional_price,
+                "promotional_starts_at": sku.promotional_starts_at,
+                "promotional_ends_at": sku.promotional_ends_at,
+                "wholesale_price": sku.wholesale_price,
+            })
+        if fields & CHANGE_STOCK:
+            data["available_stock"] = sku.available_stock
+        return data
+
+    @staticmethod
+    def get_changes(db: Session, company_id: UUID, since: int = 0, since_id: int = 0, limit: int = 5000) -> Dict[str, Any]:
+        """Alterações após o cursor (since, since_id) = (txid, id), agrupadas por produto/SKU, com o estado atual
+
+        Ids são reservados na ordem de gravação, mas as transações terminam em outra ordem: um
+        cursor só por id passaria por cima de um registro ainda não confirmado. A página fica em
+        (txid, id) e só inclui transações anteriores ao xmin do snapshot (todas já encerradas);
+        qualquer transação ainda aberta, ou iniciada depois, tem txid >= xmin e entra após o cursor.
+
+        Consequência: o feed não avança além da transação com escrita mais antiga ainda aberta
+        no servidor (de qualquer sessão, não só da empresa). Um job longo que grava em uma única
+        transação (reparo de divergências de estoque, importação ou lançamento de NF-e em lote)
+        segura o feed até terminar; nada se perde, as alterações só atrasam. Transações só de
+        leitura (ex.: renderização da exportação de DANFE) não recebem txid e não seguram o feed.
+        """
+        page = select(
+            CatalogChange.id,
+            CatalogChange.txid,
+            CatalogChange.entity,
+            CatalogChange.entity_id,
+            CatalogChange.product_id,
+            CatalogChange.fields
+        ).where(
+            and_(
+                CatalogChange.company_id == company_id,
+                tuple_(CatalogChange.txid, CatalogChange.id) > tuple_(since, since_id),
+                CatalogChange.txid < func.txid_snapshot_xmin(func.txid_current_snapshot())
+            )
+        ).order_by(CatalogChange.txid, CatalogChange.id).limit(limit).subquery("page")
+
+        # Último txid de cada entidade na página (a janela roda depois do LIMIT)
+        entity_last_txid = func.max(page.c.txid).over(partition_by=[page.c.entity, page.c.entity_id])
+        page = select(page, entity_last_txid.label("entity_last_txid")).subquery("page_last")
+
+        last_id = func.max(case((page.c.txid == page.c.entity_last_txid, page.c.id)))
+        grouped = db.execute(
+            select(
+                page.c.entity,
+                page.c.entity_id,
+                func.max(page.c.product_id).label("product_id"),
+                func.bit_or(page.c.fields).label("fields"),
+                func.max(page.c.txid).label("last_txid"),
+                last_id.label("last_id"),
+                func.count().label("raw_changes")
+            ).group_by(page.c.entity, page.c.entity_id).order_by(func.max(page.c.txid), last_id)
+        ).all()
+
+        if not grouped:
+            return {"cursor": since, "cursor_id": since_id, "has_more": False, "changes": []}
+
+        product_ids = [row.entity_id for row in grouped if row.entity == "product"]
+        sku_ids = [row.entity_id for row in grouped if row.entity == "sku"]
+
+        products = {}
+        if product_ids:
+            products = {
+                product.id: product
+                for product in db.query(Product).filter(
+                    and_(Product.id.in_(product_ids), Product.company_id == company_id)
+                ).all()
+            }
+
+        skus = {}
+        if sku_ids:
+            sku_query = db.query(ProductSKU).join(Product, ProductSKU.product_id == Product.id).filter(
+                and_(ProductSKU.id.in_(sku_ids), Product.company_id == company_id)
+            )
+            skus = {sku.id: sku for sku in sku_query.all()}
+            # Estoque de SKUs associados vem do SKU de estoque: carregar em uma consulta
+            stock_sku_ids = {sku.stock_sku_id for sku in skus.values() if sku.stock_sku_id and not sku.is_stock_sku}
+            if stock_sku_ids:
+                db.query(ProductSKU).filter(ProductSKU.id.in_(stock_sku_ids)).all()
+
+        changes = []
+        for row in grouped:
+            entity = (products if row.entity == "product" else skus).get(row.entity_id)
+            deleted = entity is None or bool(row.fields & CHANGE_DELETED)
+            if deleted:
+                data = {}
+            elif row.entity == "product":
+                data = CatalogChangeService._product_data(entity, row.fields)
+            else:
+                data = CatalogChangeService._sku_data(entity, row.fields)
+
+            changes.append({
+                "entity": row.entity,
+                "id": row.entity_id,
+                "product_id": row.product_id,
+                "changes": ["deleted"] if deleted else CatalogChangeService._names(row.fields),
+                "deleted": deleted,
+                "data": data,
+                "cursor": row.last_txid,
+                "cursor_id": row.last_id,
+            })
+
+        raw_changes = sum(row.raw_changes for row in grouped)
+        return {
+            "cursor": grouped[-1].last_txid,
+            "cursor_id": grouped[-1].last_id,
+            "has_more": raw_changes >= limit,
+            "changes": changes,
+        }
+
+    @staticmethod
+    def prune(db: Session, retention_days: int) -> int:
+        """Remove registros mais antigos que a retenção (consumidores atrasados refazem a carga completa)"""
+        cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+        result = db.execute(delete(CatalogChange).where(CatalogChange.changed_at < cutoff))
+        db.commit()
+        return result.rowcount
@@ -0,0 +1,398 @@
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time as time_module
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import and_, select
+from uuid import UUID
+from app.core.config import settings
+from app.models.nota_fiscal import NotaFiscal
+from app.services.pdf_service import PDFService
+
+try:
+    from pypdf import PdfWriter
+except ImportError:  # pypdf é opcional: sem ele a exportação em lote gera apenas ZIP
+    PdfWriter = None
+
+
+logger = logging.getLogger(__name__)
+
+# Alterar quando o leiaute do DANFE (PDFService.generate_nota_fiscal_pdf) mudar: invalida o cache
+DANFE_LAYOUT_VERSION = "1"
+
+NOTA_FIELDS = (
+    "numero", "serie", "tipo", "natureza_operacao", "data_emissao",
+    "emitente_nome", "emitente_cnpj", "emitente_ie", "emitente_endereco",
+    "destinatario_nome", "destinatario_documento", "destinatario_email", "destinatario_telefone",
+    "destinatario_endereco",
+    "valor_total", "valor_produtos", "valor_icms", "valor_ipi", "valor_pis", "valor_cofins",
+    "valor_frete", "valor_seguro", "valor_desconto",
+    "observacoes", "informacoes_adicionais",
+)
+
+PRODUTO_FIELDS = ("codigo", "descricao", "ncm", "cfop", "unidade", "quantidade", "valor_unitario", "valor_total")
+
+# Bloco de leitura/escrita dos arquivos na exportação em lote
+STREAM_BLOCK_SIZE = 64 * 1024
+
+
+def _render_danfe(nota_fiscal: Dict[str, Any]) -> bytes:
+    """Tarefa do pool: PDF do DANFE"""
+    return PDFService.generate_nota_fiscal_pdf(nota_fiscal).getvalue()
+
+
+class DanfeService:
+    """PDF do DANFE com cache em disco e renderização em pool de processos.
+
+    O arquivo fica em DANFE_CACHE_DIR/<empresa>/<nota>/<hash>.pdf, onde o hash cobre os dados
+    usados no DANFE (e a versão do leiaute): uma nota alterada por qualquer caminho gera um
+    novo hash, e update_nota_fiscal/delete_nota_fiscal removem o diretório da nota. Downloads
+    e anexos repetidos custam só a leitura do arquivo; o ReportLab roda fora do processo da API.
+
+    Na exportação em lote, cada tarefa do pool renderiza um bloco de notas para o cache e
+    devolve só os caminhos; o ZIP é montado lendo os arquivos em blocos. As exportações
+    compartilham um único pool de DANFE_EXPORT_WORKERS processos, e cada uma mantém no
+    máximo esse número de blocos na fila: exportações simultâneas se intercalam em vez de
+    multiplicar processos.
+
+    O cache é limitado a DANFE_CACHE_MAX_BYTES por prune_cache (scripts/prune_danfe_cache.py):
+    leituras atualizam o mtime do arquivo, e os menos usados recentemente saem primeiro.
+    """
+
+    _pool: Optional[ProcessPoolExecutor] = None
+    _export_pool: Optional[ProcessPoolExecutor] = None
+    _pool_lock = threading.Lock()
+
+    @staticmethod
+    def nota_dict(nota_fiscal: NotaFiscal) -> Dict[str, Any]:
+        """Dados da nota no formato do PDFService"""
+        data = {field: getattr(nota_fiscal, field) for field in NOTA_FIELDS}
+        data["produtos"] = [
+            {field: getattr(produto, field) for field in PRODUTO_FIELDS}
+            for produto in nota_fiscal.produtos or []
+        ]
+        return data
+
+    @staticmethod
+    def content_hash(nota_fiscal: Dict[str, Any]) -> str:
+        payload = json.dumps(
+            [DANFE_LAYOUT_VERSION, nota_fiscal], sort_keys=True, default=str, separators=(",", ":")
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _directory(company_id: UUID, nota_fiscal_id: int) -> str:
+        return os.path.join(settings.DANFE_CACHE_DIR, str(company_id), str(nota_fiscal_id))
+
+    @staticmethod
+    def _get_pool(attr: str = "_pool") -> ProcessPoolExecutor:
+        """Pool compartilhado do processo: _pool (downloads) ou _export_pool (exportação em lote)"""
+        with DanfeService._pool_lock:
+            pool = getattr(DanfeService, attr)
+            if pool is None:
+                workers = settings.DANFE_RENDER_WORKERS if attr == "_pool" else DanfeService._export_workers()
+                # spawn: o processo filho não herda conexões nem threads da API
+                pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+                setattr(DanfeService, attr, pool)
+            return pool
+
+    @staticmethod
+    def _export_workers() -> int:
+        return max(1, min(settings.DANFE_EXPORT_WORKERS, os.cpu_count() or 1))
+
+    @staticmethod
+    def _reset_pool(pool: ProcessPoolExecutor, attr: str = "_pool") -> None:
+        """Descarta o pool (quebrado ou com worker preso); o próximo _get_pool cria outro"""
+        with DanfeService._pool_lock:
+            if getattr(DanfeService, attr) is pool:
+                setattr(DanfeService, attr, None)
+        # shutdown não interrompe uma tarefa em execução: encerrar os processos libera o worker preso
+        processes = list((getattr(pool, "_processes", None) or {}).values())
+        pool.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    @staticmethod
+    def _render(nota_fiscal: Dict[str, Any]) -> bytes:
+        if settings.DANFE_RENDER_WORKERS <= 0:
+            return _render_danfe(nota_fiscal)
+
+        for attempt in range(2):
+            pool = DanfeService._get_pool()
+            try:
+                return pool.submit(_render_danfe, nota_fiscal).result(timeout=settings.DANFE_RENDER_TIMEOUT)
+            except BrokenProcessPool:
+                # Worker morto (ex.: OOM): recria o pool e tenta mais uma vez
+                DanfeService._reset_pool(pool)
+                if attempt:
+                    raise
+            except FutureTimeoutError:
+                DanfeService._reset_pool(pool)
+                raise
+
+    @staticmethod
+    def _paths(nota_fiscal: NotaFiscal, data: Dict[str, Any]) -> Tuple[str, str]:
+        """Diretório da nota no cache e arquivo da versão atual"""
+        directory = DanfeService._directory(nota_fiscal.company_id, nota_fiscal.id)
+        return directory, os.path.join(directory, f"{DanfeService.content_hash(data)}.pdf")
+
+    @staticmethod
+    def _store(directory: str, path: str, pdf: bytes) -> None:
+        """Grava o PDF no cache (tmp + rename), removendo versões anteriores da nota"""
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            if name.endswith(".pdf"):
+                try:
+                    os.remove(os.path.join(directory, name))
+                except FileNotFoundError:
+                    pass
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                tmp_file.write(pdf)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def get_pdf(nota_fiscal: NotaFiscal) -> bytes:
+        """PDF do DANFE da nota (do cache ou renderizado e gravado no cache)"""
+        data = DanfeService.nota_dict(nota_fiscal)
+        directory, path = DanfeService._paths(nota_fiscal, data)
+        try:
+            with open(path, "rb") as cached:
+                pdf = cached.read()
+            os.utime(path)  # uso recente: fica no cache no próximo prune_cache
+            return pdf
+        except FileNotFoundError:
+            pass
+
+        pdf = DanfeService._render(data)
+        try:
+            DanfeService._store(directory, path, pdf)
+        except OSError as e:
+            # Cache indisponível não impede o download: o PDF já foi renderizado
+            logger.warning("Erro ao gravar DANFE em cache (%s): %s", path, e)
+        return pdf
+
+    @staticmethod
+    def export_ids(db: Session, company_id: UUID, data_inicio: Optional[date] = None, data_fim: Optional[date] = None,
+                   emitente_cnpj: Optional[str] = None, tipo: Optional[str] = None,
+                   max_notas: Optional[int] = None) -> List[int]:
+        """Ids das notas do filtro, na ordem de emissão (ValueError acima de max_notas)"""
+        max_notas = max_notas or settings.DANFE_EXPORT_MAX_NOTAS
+        filters = [NotaFiscal.company_id == company_id]
+        if data_inicio:
+            filters.append(NotaFiscal.data_emissao >= datetime.combine(data_inicio, time.min))
+        if data_fim:
+            filters.append(NotaFiscal.data_emissao < datetime.combine(data_fim + timedelta(days=1), time.min))
+        if emitente_cnpj:
+            filters.append(NotaFiscal.emitente_cnpj == emitente_cnpj)
+        if tipo:
+            filters.append(NotaFiscal.tipo == tipo)
+
+        ids = [row[0] for row in db.execute(
+            select(NotaFiscal.id).where(and_(*filters))
+            .order_by(NotaFiscal.data_emissao, NotaFiscal.id)
+            .limit(max_notas + 1)
+        ).all()]
+        if len(ids) > max_notas:
+            raise ValueError(f"O filtro retorna mais de {max_notas} notas fiscais")
+        return ids
+
+    @staticmethod
+    def iter_rendered(company_id: UUID, nota_fiscal_ids: List[int],
+                      workers: Optional[int] = None) -> Iterator[Tuple[str, str]]:
+        """(nome do arquivo, caminho em cache) de cada nota, na ordem recebida, à medida que os blocos ficam prontos"""
+        chunk_size = settings.DANFE_EXPORT_CHUNK_SIZE
+        chunks = [nota_fiscal_ids[i:i + chunk_size] for i in range(0, len(nota_fiscal_ids), chunk_size)]
+        workers = min(workers or settings.DANFE_EXPORT_WORKERS, len(chunks), DanfeService._export_workers())
+
+        if workers <= 1:
+            for chunk in chunks:
+                yield from _export_danfe_task(company_id, chunk)
+            return
+
+        # Janela de blocos na fila do pool compartilhado: o próximo só entra quando um termina
+        remaining = iter(chunks)
+        pending = deque()
+
+        def submit() -> None:
+            chunk = next(remaining, None)
+            if chunk is not None:
+                pool = DanfeService._get_pool("_export_pool")
+                pending.append((pool, pool.submit(_export_danfe_task, company_id, chunk)))
+
+        try:
+            for _ in range(workers):
+                submit()
+            while pending:
+                pool, future = pending.popleft()
+                try:
+                    rendered = future.result()
+                except BrokenProcessPool:
+                    # Worker morto (ex.: OOM): a próxima exportação recria o pool
+                    DanfeService._reset_pool(pool, "_export_pool")
+                    raise
+                submit()
+                yield from rendered
+        finally:
+            # Cliente desconectado (GeneratorExit) ou erro: retira da fila os blocos pendentes
+            for _, future in pending:
+                future.cancel()
+
+    @staticmethod
+    def iter_zip(rendered: Iterator[Tuple[str, str]]) -> Iterator[bytes]:
+        """ZIP escrito em fluxo (sem seek, com descritores de dados), um arquivo por nota"""
+        stream = _ZipStream()
+        # PDFs do ReportLab já têm o conteúdo comprimido: armazenar sem recompressão
+        with zipfile.ZipFile(stream, "w", compression=zipfile.ZIP_STORED) as archive:
+            for filename, path in rendered:
+                with open(path, "rb") as source, archive.open(filename, "w", force_zip64=True) as target:
+                    shutil.copyfileobj(source, target, STREAM_BLOCK_SIZE)
+                yield stream.pop()
+        yield stream.pop()
+
+    @staticmethod
+    def merge_available() -> bool:
+        return PdfWriter is not None
+
+    @staticmethod
+    def iter_merged_pdf(rendered: Iterator[Tuple[str, str]]) -> Iterator[bytes]:
+        """PDF único com os DANFEs em ordem (requer pypdf)
+
+        Não é streaming: o PdfWriter mantém todas as páginas em memória até o fim (a tabela de
+        referências do PDF só é escrita depois da última página), e o envio só começa após a
+        junção. Por isso a exportação em PDF único é limitada a DANFE_MERGE_MAX_NOTAS notas;
+        lotes maiores devem usar o ZIP, que envia cada nota assim que o bloco fica pronto.
+        """
+        if PdfWriter is None:
+            raise RuntimeError("Exportação em PDF único requer o pacote pypdf")
+
+        writer = PdfWriter()
+        for _, path in rendered:
+            writer.append(path)
+        with tempfile.SpooledTemporaryFile(max_size=STREAM_BLOCK_SIZE * 16) as merged:
+            writer.write(merged)
+            writer.close()
+            merged.seek(0)
+            while True:
+                block = merged.read(STREAM_BLOCK_SIZE)
+                if not block:
+                    break
+                yield block
+
+    @staticmethod
+    def prune_cache(max_bytes: int) -> Tuple[int, int]:
+        """Remove os PDFs menos usados recentemente até o cache caber em max_bytes
+
+        Retorna (arquivos removidos, bytes removidos). Temporários abandonados (gravação
+        interrompida) com mais de uma hora também são removidos.
+        """
+        files = []
+        total = 0
+        stale_before = time_module.time() - 3600
+        removed = freed = 0
+        for root, _, names in os.walk(settings.DANFE_CACHE_DIR):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if name.endswith(".tmp"):
+                    if stat.st_mtime < stale_before:
+                        try:
+                            os.remove(path)
+                        except FileNotFoundError:
+                            pass
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        files.sort()
+        for _, size, path in files:
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+            freed += size
+            try:
+                os.rmdir(os.path.dirname(path))  # diretório da nota, se ficou vazio
+            except OSError:
+                pass
+        return removed, freed
+
+    @staticmethod
+    def invalidate(company_id: UUID, nota_fiscal_id: int) -> None:
+        """Remove os PDFs em cache da nota"""
+        shutil.rmtree(DanfeService._directory(company_id, nota_fiscal_id), ignore_errors=True)
+
+
+class _ZipStream:
+    """Destino do ZipFile sem seek: acumula os bytes escritos até serem enviados"""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._position = 0
+
+    def write(self, data: bytes) -> int:
+        self._buffer.extend(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def pop(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def _export_danfe_task(company_id: UUID, nota_fiscal_ids: List[int]) -> List[Tuple[str, str]]:
+    """Tarefa do pool: garante o PDF em cache de cada nota do bloco (sessão própria)"""
+    from app.core.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        notas = {
+            nota.id: nota
+            for nota in db.query(NotaFiscal).options(selectinload(NotaFiscal.produtos)).filter(
+                NotaFiscal.company_id == company_id, NotaFiscal.id.in_(nota_fiscal_ids)
+            )
+        }
+        rendered = []
+        for nota_fiscal_id in nota_fiscal_ids:
+            nota = notas.get(nota_fiscal_id)
+            if nota is None:  # removida durante a exportação
+                continue
+            data = DanfeService.nota_dict(nota)
+            directory, path = DanfeService._paths(nota, data)
+            if not os.path.exists(path):
+                DanfeService._store(directory, path, _render_danfe(data))
+            rendered.append((f"nfe_{nota.numero}_{nota.serie}_{nota.id}.pdf", path))
+        return rendered
+    finally:
+        db.close()
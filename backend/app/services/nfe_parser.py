@@ -0,0 +1,390 @@
+import logging
+import re
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Union, BinaryIO
+
+try:
+    from lxml import etree as LET
+except ImportError:  # lxml é opcional: sem ele o parser usa o ElementTree da biblioteca padrão
+    LET = None
+
+
+logger = logging.getLogger(__name__)
+
+NFE_NS = "http://www.portalfiscal.inf.br/nfe"
+NS = {"nfe": NFE_NS}
+NS_PREFIX = "{%s}" % NFE_NS
+
+ADDRESS_FIELDS = (
+    ("logradouro", "xLgr"),
+    ("numero", "nro"),
+    ("bairro", "xBairro"),
+    ("cidade", "xMun"),
+    ("estado", "UF"),
+    ("cep", "CEP"),
+)
+
+TOTAL_FIELDS = (
+    ("valor_total", "vNF"),
+    ("valor_produtos", "vProd"),
+    ("valor_icms", "vICMS"),
+    ("valor_ipi", "vIPI"),
+    ("valor_pis", "vPIS"),
+    ("valor_cofins", "vCOFINS"),
+    ("valor_frete", "vFrete"),
+    ("valor_seguro", "vSeg"),
+    ("valor_desconto", "vDesc"),
+)
+
+# Campos obrigatórios de det/prod no leiaute da NF-e (um valor por item)
+PRODUCT_FIELDS = (
+    ("codigo", "cProd", False),
+    ("descricao", "xProd", False),
+    ("ncm", "NCM", False),
+    ("cfop", "CFOP", False),
+    ("unidade", "uCom", False),
+    ("ean", "cEAN", False),
+    ("quantidade", "qCom", True),
+    ("valor_unitario", "vUnCom", True),
+    ("valor_total", "vProd", True),
+)
+
+# Grupo de imposto do item -> (campo do produto, tag do valor)
+ITEM_TAXES = {
+    "ICMS": ("valor_icms", "vICMS"),
+    "IPI": ("valor_ipi", "vIPI"),
+    "PIS": ("valor_pis", "vPIS"),
+    "COFINS": ("valor_cofins", "vCOFINS"),
+}
+
+# GTIN/EAN válido (cEAN "SEM GTIN" ou vazio não identifica o item)
+GTIN = re.compile(r"^(\d{8}|\d{12,14})$")
+
+# 44 dígitos: UF, AAMM, CNPJ, modelo, série, número, tipo de emissão, código e DV
+ACCESS_KEY = re.compile(r"^\d{44}$")
+
+# cStat do protocolo -> status da nota
+AUTHORIZATION_STATUS = {
+    "100": "autorizada",
+    "150": "autorizada",  # autorizada fora de prazo
+    "110": "denegada",
+    "301": "denegada",
+    "302": "denegada",
+    "303": "denegada",
+}
+
+if LET is not None:
+    # Parser sem resolução de entidades nem acesso à rede; XPath compilado uma única vez
+    LXML_PARSER = LET.XMLParser(resolve_entities=False, no_network=True, remove_comments=True, huge_tree=True)
+    LXML_PARSER_UTF8 = LET.XMLParser(resolve_entities=False, no_network=True, remove_comments=True, huge_tree=True,
+                                     encoding="utf-8")
+    FIND_INF_NFE = LET.XPath("descendant-or-self::nfe:infNFe[1]", namespaces=NS)
+    FIND_INF_PROT = LET.XPath("nfe:protNFe/nfe:infProt", namespaces=NS)
+    # Colunas dos itens avaliadas uma vez por nota (em C), em vez de percorrer cada det em Python
+    DET_ITEMS = LET.XPath("nfe:det/@nItem", namespaces=NS, smart_strings=False)
+    PRODUCT_COLUMNS = [
+        (field, LET.XPath(f"nfe:det/nfe:prod/nfe:{tag}/text()", namespaces=NS, smart_strings=False), numeric)
+        for field, tag, numeric in PRODUCT_FIELDS
+    ]
+    # Valores opcionais: itens que têm o valor e os valores, na mesma ordem
+    TAX_COLUMNS = [
+        (
+            field,
+            LET.XPath(f"nfe:det[nfe:imposto/nfe:{group}/*/nfe:{tag}]/@nItem", namespaces=NS, smart_strings=False),
+            LET.XPath(f"nfe:det/nfe:imposto/nfe:{group}/*/nfe:{tag}/text()", namespaces=NS, smart_strings=False),
+        )
+        for group, (field, tag) in ITEM_TAXES.items()
+    ]
+
+
+def _local(tag) -> str:
+    """Nome da tag sem o namespace ("{http://...}nNF" -> "nNF")"""
+    if not isinstance(tag, str):  # comentários/instruções de processamento
+        return ""
+    return tag[len(NS_PREFIX):] if tag.startswith(NS_PREFIX) else tag.rpartition("}")[2]
+
+
+def _texts(element) -> Dict[str, str]:
+    """Texto dos filhos diretos em uma única passada"""
+    values = {}
+    if element is not None:
+        for child in element:
+            text = child.text
+            if text is not None:
+                values[_local(child.tag)] = text.strip()
+    return values
+
+
+def _children(element) -> Dict[str, Any]:
+    """Filhos diretos por nome (primeira ocorrência)"""
+    children = {}
+    if element is not None:
+        for child in element:
+            children.setdefault(_local(child.tag), child)
+    return children
+
+
+def _float(value: Optional[str]) -> float:
+    return float(value) if value else 0.0
+
+
+def _gtin(value: Optional[str]) -> str:
+    value = (value or "").strip()
+    return value if GTIN.match(value) else ""
+
+
+def _address(element) -> Dict[str, str]:
+    if element is None:
+        return {}
+    values = _texts(element)
+    return {field: values.get(tag, "") for field, tag in ADDRESS_FIELDS}
+
+
+class NFeParser:
+    """Leitura do XML da NF-e (nfeProc, NFe ou infNFe) em uma passada pelos blocos.
+
+    Os blocos (ide, emit, dest, total, transp) são lidos uma vez, filho a filho, sem buscas
+    `.//` a partir da raiz. Com lxml os itens saem de XPath compilado com namespace, uma
+    coluna por campo para a nota inteira; sem lxml (ou fora do leiaute), uma passada por det.
+    O ganho de velocidade em notas com muitos itens vem do caminho lxml (dependência fixada
+    em requirements.txt); com o ElementTree o desempenho é equivalente ao do parser anterior.
+    Para arquivos grandes, parse_stream lê o XML incrementalmente (iterparse), descartando
+    cada det assim que o item é convertido.
+    """
+
+    @staticmethod
+    def backend() -> str:
+        return "lxml" if LET is not None else "elementtree"
+
+    @staticmethod
+    def _parse_root(xml_content: Union[str, bytes], use_lxml: bool):
+        if use_lxml:
+            if isinstance(xml_content, str):
+                root = LET.fromstring(xml_content.encode("utf-8"), LXML_PARSER_UTF8)
+            else:
+                root = LET.fromstring(xml_content, LXML_PARSER)
+            found = FIND_INF_NFE(root)
+            inf_prot = FIND_INF_PROT(root)
+            return (found[0] if found else None), (inf_prot[0] if inf_prot else None)
+
+        root = ET.fromstring(xml_content)
+        inf_prot = root.find("nfe:protNFe/nfe:infProt", NS)
+        if _local(root.tag) == "infNFe":
+            return root, inf_prot
+        return root.find(".//nfe:infNFe", NS), inf_prot
+
+    @staticmethod
+    def _parse_date(value: str) -> datetime:
+        if value:
+            try:
+                # Formato: 2025-07-24T10:30:00-03:00 ou 2025-07-24
+                if "T" in value:
+                    return datetime.fromisoformat(value)
+                return datetime.strptime(value, "%Y-%m-%d")
+            except ValueError:
+                logger.warning("Data inválida na NF-e: %s", value)
+        return datetime.now()
+
+    @staticmethod
+    def _authorization(inf_nfe, inf_prot) -> Dict[str, Any]:
+        """Chave de acesso (atributo Id de infNFe ou chNFe do protocolo) e dados da autorização"""
+        chave = (inf_nfe.get("Id") or "").strip()
+        chave = chave[3:] if chave.startswith("NFe") else chave
+        protocolo = _texts(inf_prot)
+        if not ACCESS_KEY.match(chave):
+            chave = protocolo.get("chNFe", "") if ACCESS_KEY.match(protocolo.get("chNFe", "")) else ""
+
+        recebimento = protocolo.get("dhRecbto")
+        return {
+            "chave_acesso": chave,
+            "protocolo_autorizacao": protocolo.get("nProt", ""),
+            "data_autorizacao": NFeParser._parse_date(recebimento) if recebimento else None,
+            "status": AUTHORIZATION_STATUS.get(protocolo.get("cStat"), "pendente"),
+        }
+
+    @staticmethod
+    def _product(det) -> Optional[Dict[str, Any]]:
+        """Item da nota: prod e imposto lidos em uma passada pelos filhos do det"""
+        prod = imposto = None
+        for child in det:
+            name = _local(child.tag)
+            if name == "prod":
+                prod = child
+            elif name == "imposto":
+                imposto = child
+        if prod is None:
+            return None
+
+        values = _texts(prod)
+        produto = {
+            field: _float(values.get(tag)) if numeric else values.get(tag, "")
+            for field, tag, numeric in PRODUCT_FIELDS
+        }
+        produto.update({field: 0.0 for field, _ in ITEM_TAXES.values()})
+
+        # imposto/ICMS/ICMS00 (ou ICMS20, ICMSSN102...), IPI/IPITrib, PIS/PISAliq, COFINS/COFINSOutr...
+        if imposto is not None:
+            for group in imposto:
+                tax = ITEM_TAXES.get(_local(group.tag))
+                if tax is None:
+                    continue
+                field, value_tag = tax
+                for situation in group:
+                    value = _texts(situation).get(value_tag)
+                    if value:
+                        produto[field] = float(value)
+                        break
+        return produto
+
+    @staticmethod
+    def _products_lxml(inf_nfe) -> Optional[List[Dict[str, Any]]]:
+        """Itens por colunas de XPath; None quando a nota foge do leiaute (usa a leitura por det)"""
+        items = DET_ITEMS(inf_nfe)
+        columns = []
+        for field, xpath, numeric in PRODUCT_COLUMNS:
+            values = xpath(inf_nfe)
+            if len(values) != len(items):
+                return None
+            columns.append((field, [float(value) for value in values] if numeric else [value.strip() for value in values]))
+
+        produtos = [dict(zip([field for field, _ in columns], row)) for row in zip(*[values for _, values in columns])]
+        for produto in produtos:
+            produto.update({field: 0.0 for field, _ in ITEM_TAXES.values()})
+
+        position = {item: index for index, item in enumerate(items)}
+        for field, items_xpath, values_xpath in TAX_COLUMNS:
+            tax_items, tax_values = items_xpath(inf_nfe), values_xpath(inf_nfe)
+            if len(tax_items) != len(tax_values):
+                return None
+            for item, value in zip(tax_items, tax_values):
+                if value:
+                    produtos[position[item]][field] = float(value)
+        return produtos
+
+    @staticmethod
+    def parse(xml_content: Union[str, bytes], use_lxml: Optional[bool] = None) -> Dict[str, Any]:
+        """Extrai os dados da nota no mesmo formato de NotaFiscalService.parse_xml_nfe"""
+        use_lxml = LET is not None if use_lxml is None else (use_lxml and LET is not None)
+        inf_nfe, inf_prot = NFeParser._parse_root(xml_content, use_lxml)
+        if inf_nfe is None:
+            raise ValueError("XML não contém o grupo infNFe")
+
+        produtos = NFeParser._products_lxml(inf_nfe) if use_lxml else None
+        read_items = produtos is None
+        if read_items:
+            produtos = []
+
+        # Uma passada pelos filhos de infNFe: blocos únicos e itens (det)
+        blocks: Dict[str, Any] = {}
+        for child in inf_nfe:
+            name = _local(child.tag)
+            if name == "det":
+                if read_items:
+                    produto = NFeParser._product(child)
+                    if produto is not None:
+                        produtos.append(produto)
+            else:
+                blocks.setdefault(name, child)
+
+        return NFeParser._build(inf_nfe, inf_prot, blocks, produtos)
+
+    @staticmethod
+    def parse_stream(source: BinaryIO, use_lxml: Optional[bool] = None) -> Dict[str, Any]:
+        """Leitura incremental de um arquivo (mesmo resultado de parse)
+
+        Cada det é convertido no fim do elemento e removido da árvore: a memória fica
+        proporcional a um item mais os blocos de cabeçalho, não ao documento inteiro.
+        """
+        use_lxml = LET is not None if use_lxml is None else (use_lxml and LET is not None)
+        if use_lxml:
+            events = LET.iterparse(source, events=("start", "end"), resolve_entities=False, no_network=True,
+                                   remove_comments=True, huge_tree=True)
+        else:
+            events = ET.iterparse(source, events=("start", "end"))
+
+        root = inf_nfe = None
+        depth = inf_depth = 0
+        produtos = []
+        for event, element in events:
+            if event == "start":
+                depth += 1
+                if root is None:
+                    root = element
+                if inf_nfe is None and _local(element.tag) == "infNFe":
+                    inf_nfe, inf_depth = element, depth
+                continue
+
+            # det completo (filho direto de infNFe): converter e descartar
+            if inf_nfe is not None and depth == inf_depth + 1 and _local(element.tag) == "det":
+                produto = NFeParser._product(element)
+                if produto is not None:
+                    produtos.append(produto)
+                element.clear()
+                inf_nfe.remove(element)
+            depth -= 1
+
+        if inf_nfe is None:
+            raise ValueError("XML não contém o grupo infNFe")
+
+        blocks: Dict[str, Any] = {}
+        for child in inf_nfe:
+            blocks.setdefault(_local(child.tag), child)
+        inf_prot = None if root is inf_nfe else root.find("nfe:protNFe/nfe:infProt", NS)
+        return NFeParser._build(inf_nfe, inf_prot, blocks, produtos)
+
+    @staticmethod
+    def _build(inf_nfe, inf_prot, blocks: Dict[str, Any], produtos: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Dados da nota a partir dos blocos de infNFe e dos itens já convertidos"""
+        ide = _texts(blocks.get("ide"))
+        emit = blocks.get("emit")
+        emit_values = _texts(emit)
+        emit_children = _children(emit)
+        dest = blocks.get("dest")
+        dest_values = _texts(dest)
+        dest_children = _children(dest)
+
+        total_values = _texts(_children(blocks.get("total")).get("ICMSTot"))
+        # Fatura: cobr/dup (uma parcela por duplicata)
+        duplicatas = []
+        for dup in blocks.get("cobr", ()):
+            if _local(dup.tag) != "dup":
+                continue
+            values = _texts(dup)
+            duplicatas.append({
+                "numero": values.get("nDup", ""),
+                "vencimento": values.get("dVenc", ""),
+                "valor": _float(values.get("vDup")),
+            })
+        for produto in produtos:
+            produto["ean"] = _gtin(produto.get("ean"))
+        transp_children = _children(blocks.get("transp"))
+        transporta = _texts(transp_children.get("transporta"))
+        veiculo = _texts(transp_children.get("veicTransp"))
+
+        parsed = {
+            "numero": ide.get("nNF", ""),
+            "serie": ide.get("serie", ""),
+            "tipo": "entrada" if ide.get("tpNF") == "0" else "saida",
+            "natureza_operacao": ide.get("natOp", ""),
+            "data_emissao": NFeParser._parse_date(ide.get("dhEmi") or ide.get("dEmi", "")),
+            "emitente_nome": emit_values.get("xNome", ""),
+            "emitente_cnpj": emit_values.get("CNPJ") or emit_values.get("CPF", ""),
+            "emitente_ie": emit_values.get("IE", ""),
+            "emitente_endereco": _address(emit_children.get("enderEmit")),
+            "destinatario_nome": dest_values.get("xNome", ""),
+            "destinatario_documento": dest_values.get("CNPJ") or dest_values.get("CPF", ""),
+            "destinatario_endereco": _address(dest_children.get("enderDest")),
+        }
+        for field, tag in TOTAL_FIELDS:
+            parsed[field] = _float(total_values.get(tag))
+        parsed.update({
+            "transportadora_nome": transporta.get("xNome", ""),
+            "transportadora_cnpj": transporta.get("CNPJ", ""),
+            "transportadora_placa": veiculo.get("placa") or transporta.get("placa", ""),
+            "transportadora_uf": transporta.get("UF", ""),
+            "produtos": produtos,
+            "duplicatas": duplicatas,
+        })
+        parsed.update(NFeParser._authorization(inf_nfe, inf_prot))
+        return parsed
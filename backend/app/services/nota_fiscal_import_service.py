@@ -0,0 +1,248 @@
+import multiprocessing
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple, BinaryIO, Iterator
+from sqlalchemy.orm import Session
+from sqlalchemy import delete, insert, func, literal_column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from uuid import UUID
+from app.core.config import settings
+from app.models.nota_fiscal import NotaFiscal, NotaFiscalProduto
+from app.services.nfe_parser import NFeParser
+
+
+# Campos da nota vindos do parser
+NOTA_FIELDS = (
+    "numero", "serie", "natureza_operacao", "data_emissao",
+    "emitente_nome", "emitente_cnpj", "emitente_ie", "emitente_endereco",
+    "destinatario_nome", "destinatario_documento", "destinatario_endereco",
+    "valor_total", "valor_produtos", "valor_icms", "valor_ipi", "valor_pis", "valor_cofins",
+    "valor_frete", "valor_seguro", "valor_desconto",
+    "transportadora_nome", "transportadora_cnpj", "transportadora_placa", "transportadora_uf",
+    "chave_acesso", "protocolo_autorizacao", "data_autorizacao", "status", "duplicatas",
+)
+
+# Colunas substituídas quando a nota é sobrescrita (overwrite)
+UPSERT_FIELDS = NOTA_FIELDS + ("tipo", "origem", "xml_gzip", "xml_sha256", "xml_size", "xml_filename")
+
+PRODUTO_FIELDS = (
+    "codigo", "descricao", "ncm", "cfop", "unidade", "ean", "quantidade", "valor_unitario", "valor_total",
+    "valor_icms", "valor_ipi", "valor_pis", "valor_cofins",
+)
+
+
+def _parse_file(content: bytes) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]], Optional[str]]:
+    """Tarefa do pool: (dados da nota, XML comprimido para gravação, erro)"""
+    try:
+        return NFeParser.parse(content), NotaFiscal.compress_xml(content), None
+    except Exception as e:
+        return None, None, f"Erro ao processar XML: {str(e)}"
+
+
+class NotaFiscalImportService:
+    """Importação em lote de XMLs de NF-e (ZIP ou vários arquivos).
+
+    O parsing roda em um pool de processos; as notas são gravadas com INSERT multi-linha
+    ... ON CONFLICT pela chave de acesso (sem consulta de duplicidade) e os produtos com INSERT
+    multi-linha, uma transação a cada NFE_IMPORT_CHUNK_SIZE notas. Cada arquivo recebe um
+    resultado no relatório.
+    """
+
+    @staticmethod
+    def _check_size(name: str, size: int, batch_bytes: int) -> None:
+        if size > settings.NFE_UPLOAD_MAX_BYTES:
+            raise ValueError(
+                f"{name}: XML maior que o limite de {settings.NFE_UPLOAD_MAX_BYTES // (1024 * 1024)} MB"
+            )
+        if batch_bytes + size > settings.NFE_IMPORT_MAX_BATCH_BYTES:
+            raise ValueError(
+                f"Importação maior que o limite de {settings.NFE_IMPORT_MAX_BATCH_BYTES // (1024 * 1024)} MB de XML"
+            )
+
+    @staticmethod
+    def iter_files(filename: str, file: BinaryIO, batch_bytes: int = 0) -> Iterator[Tuple[str, bytes]]:
+        """XMLs de um upload: o próprio arquivo ou os .xml de dentro do ZIP
+
+        batch_bytes: bytes de XML já lidos na importação. Cada XML é limitado a
+        NFE_UPLOAD_MAX_BYTES e o lote a NFE_IMPORT_MAX_BATCH_BYTES (ValueError); no ZIP o
+        tamanho descompactado declarado é verificado antes da leitura (a leitura não passa
+        dele), evitando descompactar arquivos de taxa de compressão abusiva.
+        """
+        if (filename or "").lower().endswith(".zip"):
+            with zipfile.ZipFile(file) as archive:
+                for info in archive.infolist():
+                    if info.is_dir() or not info.filename.lower().endswith(".xml"):
+                        continue
+                    name = f"{filename}/{info.filename}"
+                    NotaFiscalImportService._check_size(name, info.file_size, batch_bytes)
+                    batch_bytes += info.file_size
+                    yield name, archive.read(info)
+        else:
+            content = file.read(settings.NFE_UPLOAD_MAX_BYTES + 1)
+            NotaFiscalImportService._check_size(filename, len(content), batch_bytes)
+            yield filename, content
+
+    @staticmethod
+    def parse_files(contents: List[bytes], workers: Optional[int] = None) -> List[Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]], Optional[str]]]:
+        """Parsing (e compressão) dos XMLs na ordem recebida (pool de processos para lotes grandes)"""
+        workers = workers or settings.NFE_IMPORT_WORKERS
+        if workers <= 1 or len(contents) < settings.NFE_IMPORT_POOL_THRESHOLD:
+            return [_parse_file(content) for content in contents]
+
+        context = multiprocessing.get_context("spawn")
+        chunksize = max(1, min(64, len(contents) // (workers * 4)))
+        with ProcessPoolExecutor(max_workers=min(workers, os.cpu_count() or 1), mp_context=context) as pool:
+            return list(pool.map(_parse_file, contents, chunksize=chunksize))
+
+    @staticmethod
+    def write_chunk(db: Session, company_id: UUID, tipo: str, chunk: List[Dict[str, Any]],
+                    handle_duplicates: str = "skip", commit: bool = True) -> None:
+        """Grava um bloco de notas em uma transação com INSERT ... ON CONFLICT (company_id, chave_acesso)
+
+        skip: notas já existentes ficam como "duplicate"; overwrite: a nota existente é
+        atualizada (mesmo id) e seus produtos substituídos, exceto se já lançada (fica como
+        "duplicate"). Preenche status/nota_fiscal_id
+        de cada entrada. As chaves do bloco devem ser distintas.
+        commit=False: grava sem encerrar a transação (usado dentro de savepoints).
+        """
+        if handle_duplicates not in ("skip", "overwrite"):
+            raise ValueError(f"Valor inválido para handle_duplicates: {handle_duplicates}")
+
+        notas = []
+        for entry in chunk:
+            data = entry["data"]
+            nota = {field: data[field] for field in NOTA_FIELDS}
+            nota.update({
+                "tipo": tipo,
+                "origem": "manual",  # Notas importadas são sempre "manual"
+                **entry["xml"],
+                "xml_filename": os.path.basename(entry["filename"])[:255],
+                "company_id": company_id,
+            })
+            notas.append(nota)
+
+        stmt = pg_insert(NotaFiscal).values(notas)
+        if handle_duplicates == "overwrite":
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[NotaFiscal.company_id, NotaFiscal.chave_acesso],
+                set_={**{field: stmt.excluded[field] for field in UPSERT_FIELDS}, "updated_at": func.now()},
+                # Nota já lançada no estoque/financeiro não é sobrescrita (fica como duplicada)
+                where=NotaFiscal.data_lancamento.is_(None)
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=[NotaFiscal.company_id, NotaFiscal.chave_acesso])
+        written = {
+            row.chave_acesso: row
+            for row in db.execute(stmt.returning(
+                NotaFiscal.id, NotaFiscal.chave_acesso, literal_column("(xmax = 0)").label("inserted")
+            )).all()
+        }
+
+        replaced = [row.id for row in written.values() if not row.inserted]
+        if replaced:
+            db.execute(delete(NotaFiscalProduto).where(NotaFiscalProduto.nota_fiscal_id.in_(replaced)))
+
+        produtos = []
+        for entry in chunk:
+            row = written.get(entry["data"]["chave_acesso"])
+            if row is None:
+                entry.update({"status": "duplicate", "nota_fiscal_id": None})
+                continue
+            entry.update({"status": "created" if row.inserted else "overwritten", "nota_fiscal_id": row.id})
+            for produto in entry["data"]["produtos"]:
+                values = {field: produto[field] for field in PRODUTO_FIELDS}
+                values["nota_fiscal_id"] = row.id
+                produtos.append(values)
+
+        for i in range(0, len(produtos), settings.NFE_IMPORT_CHUNK_SIZE * 4):
+            db.execute(insert(NotaFiscalProduto).values(produtos[i:i + settings.NFE_IMPORT_CHUNK_SIZE * 4]))
+        if commit:
+            db.commit()
+
+    @staticmethod
+    def _write_individually(db: Session, company_id: UUID, tipo: str, chunk: List[Dict[str, Any]],
+                            handle_duplicates: str) -> None:
+        """Regrava um bloco que falhou nota a nota, cada uma em um savepoint
+
+        Só as notas com erro ficam como "error" (com a mensagem do banco); as demais são
+        gravadas normalmente.
+        """
+        for entry in chunk:
+            try:
+                with db.begin_nested():
+                    NotaFiscalImportService.write_chunk(db, company_id, tipo, [entry], handle_duplicates, commit=False)
+            except Exception as e:
+                entry.update({"status": "error", "nota_fiscal_id": None})
+                entry["error"] = f"Erro ao gravar nota fiscal: {str(getattr(e, 'orig', e)).strip()}"
+        db.commit()
+
+    @staticmethod
+    def import_files(db: Session, company_id: UUID, files: List[Tuple[str, bytes]], tipo: str = "entrada",
+                     handle_duplicates: str = "skip") -> Dict[str, Any]:
+        """Importa os XMLs e devolve o resultado de cada arquivo"""
+        started = time.monotonic()
+
+        parsed = NotaFiscalImportService.parse_files([content for _, content in files])
+
+        results: List[Dict[str, Any]] = []
+        entries = []
+        for (filename, _), (data, xml, error) in zip(files, parsed):
+            result = {"filename": filename, "status": "error", "nota_fiscal_id": None, "errors": []}
+            results.append(result)
+            if error:
+                result["errors"].append(error)
+                continue
+            result.update({"numero": data["numero"], "serie": data["serie"], "emitente_nome": data["emitente_nome"]})
+            entries.append({"filename": filename, "data": data, "xml": xml, "result": result})
+
+        # Duplicidade contra o banco é resolvida no próprio INSERT (chave única); aqui só dentro do lote
+        pending = []
+        seen = set()
+        for entry in entries:
+            chave = entry["data"]["chave_acesso"]
+            result = entry["result"]
+            if not chave:
+                result["errors"].append("XML sem chave de acesso")
+                continue
+            if chave in seen:
+                result.update({"status": "duplicate", "errors": ["Nota repetida no lote"]})
+                continue
+            seen.add(chave)
+            pending.append(entry)
+
+        chunk_size = settings.NFE_IMPORT_CHUNK_SIZE
+        for i in range(0, len(pending), chunk_size):
+            chunk = pending[i:i + chunk_size]
+            try:
+                NotaFiscalImportService.write_chunk(db, company_id, tipo, chunk, handle_duplicates)
+            except Exception:
+                # Um valor inválido derruba o bloco inteiro: regravar nota a nota para isolar o erro
+                db.rollback()
+                try:
+                    NotaFiscalImportService._write_individually(db, company_id, tipo, chunk, handle_duplicates)
+                except Exception as e:
+                    db.rollback()
+                    for entry in chunk:
+                        entry.update({"status": "error", "nota_fiscal_id": None, "error": f"Erro ao gravar nota fiscal: {str(e)}"})
+            for entry in chunk:
+                entry["result"].update({"status": entry["status"], "nota_fiscal_id": entry["nota_fiscal_id"]})
+                if entry["status"] == "error":
+                    entry["result"]["errors"] = [entry["error"]]
+                elif entry["status"] == "duplicate":
+                    entry["result"]["errors"] = [f"Nota fiscal {entry['data']['chave_acesso']} já foi importada anteriormente"]
+
+        counts = {status: 0 for status in ("created", "overwritten", "duplicate", "error")}
+        for result in results:
+            counts[result["status"]] += 1
+
+        return {
+            "total_files": len(results),
+            "created": counts["created"],
+            "overwritten": counts["overwritten"],
+            "duplicates": counts["duplicate"],
+            "errors": counts["error"],
+            "elapsed_seconds": round(time.monotonic() - started, 3),
+            "results": results,
+        }
@@ -0,0 +1,394 @@
+import gzip
+import re
+import time
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import and_, select, update, insert, func, tuple_
+from uuid import UUID
+from app.models.accounts_payable import AccountsPayable, PayableStatus, PayableType
+from app.models.nota_fiscal import NotaFiscal, NotaFiscalProduto
+from app.models.product import Product
+from app.models.product_sku import ProductSKU
+from app.models.stock_branch import StockBranch
+from app.models.stock_movement import StockMovement, MovementType, MovementReason
+from app.models.supplier import Supplier
+from app.services.nfe_parser import NFeParser
+from app.services.stock_cost_service import StockCostService
+
+
+def _digits(value: Optional[str]) -> str:
+    return re.sub(r"\D", "", value or "")
+
+
+def _money(value: float) -> float:
+    return round(value + 1e-9, 2)
+
+
+def _date(value: Optional[str]) -> Optional[date]:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date() if value else None
+    except ValueError:
+        return None
+
+
+class NotaFiscalPostingService:
+    """Lançamento de NF-e de entrada no estoque e no contas a pagar.
+
+    Para o lote inteiro, o fornecedor (CNPJ do emitente) e os SKUs dos itens são resolvidos
+    com poucas consultas indexadas: SKU informado no item, código do fornecedor (supplier_id +
+    supplier_sku = cProd), código de barras (cEAN) e, por último, NCM quando um único SKU de
+    estoque da empresa tem aquele NCM. Cada nota é lançada em sua própria transação:
+    movimentações ENTRY (estoque e custo médio; SKUs bloqueados por id, depois as filiais) e
+    uma conta a pagar por duplicata (ou uma única no valor da nota). Notas com fornecedor ou
+    item não identificado não são lançadas e voltam com os erros.
+    """
+
+    @staticmethod
+    def _load(db: Session, company_id: UUID, nota_fiscal_ids: List[int]) -> List[Dict[str, Any]]:
+        """Notas e itens como dicionários (não expiram com o commit de cada nota)"""
+        notas = db.query(NotaFiscal).options(selectinload(NotaFiscal.produtos)).filter(
+            and_(
+                NotaFiscal.company_id == company_id,
+                NotaFiscal.id.in_(nota_fiscal_ids)
+            )
+        ).all()
+
+        loaded = [
+            {
+                "id": nota.id,
+                "numero": nota.numero,
+                "serie": nota.serie,
+                "tipo": nota.tipo,
+                "chave_acesso": nota.chave_acesso,
+                "data_emissao": nota.data_emissao,
+                "emitente_cnpj": nota.emitente_cnpj,
+                "valor_total": nota.valor_total or 0.0,
+                "duplicatas": nota.duplicatas,
+                "data_lancamento": nota.data_lancamento,
+                "produtos": [
+                    {
+                        "id": produto.id,
+                        "codigo": produto.codigo,
+                        "ean": produto.ean,
+                        "ncm": produto.ncm,
+                        "quantidade": produto.quantidade,
+                        "valor_total": produto.valor_total,
+                        "valor_ipi": produto.valor_ipi or 0.0,
+                        "sku_id": produto.sku_id,
+                    }
+                    for produto in nota.produtos
+                ],
+            }
+            for nota in notas
+        ]
+
+        # Notas importadas antes das duplicatas serem gravadas: ler a fatura do XML armazenado
+        legacy = [nota["id"] for nota in loaded if nota["duplicatas"] is None and not nota["data_lancamento"]]
+        if legacy:
+            xmls = dict(db.execute(
+                select(NotaFiscal.id, NotaFiscal.xml_gzip).where(NotaFiscal.id.in_(legacy))
+            ).all())
+            for nota in loaded:
+                xml_gzip = xmls.get(nota["id"])
+                if xml_gzip:
+                    try:
+                        nota["duplicatas"] = NFeParser.parse(gzip.decompress(xml_gzip))["duplicatas"]
+                    except Exception:
+                        nota["duplicatas"] = None
+        return loaded
+
+    @staticmethod
+    def _resolve_suppliers(db: Session, company_id: UUID, cnpjs: set) -> Dict[str, UUID]:
+        """CNPJ (só dígitos) -> fornecedor, em uma consulta pelo índice de dígitos"""
+        cnpjs.discard("")
+        if not cnpjs:
+            return {}
+        digits = func.regexp_replace(Supplier.cnpj, "[^0-9]", "", "g")
+        rows = db.query(Supplier.id, digits.label("cnpj")).filter(
+            and_(Supplier.company_id == company_id, digits.in_(cnpjs))
+        ).order_by(Supplier.created_at).all()
+        suppliers: Dict[str, UUID] = {}
+        for row in rows:
+            suppliers.setdefault(row.cnpj, row.id)
+        return suppliers
+
+    @staticmethod
+    def _resolve_skus(db: Session, company_id: UUID, notas: List[Dict[str, Any]],
+                      suppliers: Dict[str, UUID]) -> Dict[str, Dict[Any, Tuple[int, int]]]:
+        """Índices de busca dos itens: chave -> (sku_id, stock_sku_id)"""
+        sku_ids, pairs, eans, ncms = set(), set(), set(), set()
+        for nota in notas:
+            supplier_id = suppliers.get(_digits(nota["emitente_cnpj"]))
+            for produto in nota["produtos"]:
+                if produto["sku_id"]:
+                    sku_ids.add(produto["sku_id"])
+                if supplier_id and produto["codigo"]:
+                    pairs.add((supplier_id, produto["codigo"]))
+                if produto["ean"]:
+                    eans.add(produto["ean"])
+                if produto["ncm"]:
+                    ncms.add(produto["ncm"])
+
+        stock_sku_id = func.coalesce(ProductSKU.stock_sku_id, ProductSKU.id)
+        base = select(
+            ProductSKU.id, stock_sku_id.label("stock_sku_id"), ProductSKU.supplier_id,
+            ProductSKU.supplier_sku, ProductSKU.barcode
+        ).join(
+            Product, ProductSKU.product_id == Product.id
+        ).where(
+            and_(
+                Product.company_id == company_id,
+                ProductSKU.is_active == True
+            )
+        # SKUs associados copiam o código de barras do SKU de estoque; o primeiro (estoque) prevalece
+        ).order_by(ProductSKU.is_stock_sku.desc(), ProductSKU.id)
+
+        lookups: Dict[str, Dict[Any, Tuple[int, int]]] = {"sku": {}, "supplier": {}, "barcode": {}, "ncm": {}}
+        if sku_ids:
+            for row in db.execute(base.where(ProductSKU.id.in_(sku_ids))).all():
+                lookups["sku"][row.id] = (row.id, row.stock_sku_id)
+        if pairs:
+            for row in db.execute(base.where(tuple_(ProductSKU.supplier_id, ProductSKU.supplier_sku).in_(list(pairs)))).all():
+                lookups["supplier"].setdefault((row.supplier_id, row.supplier_sku), (row.id, row.stock_sku_id))
+        if eans:
+            for row in db.execute(base.where(ProductSKU.barcode.in_(eans))).all():
+                lookups["barcode"].setdefault(row.barcode, (row.id, row.stock_sku_id))
+        if ncms:
+            # NCM só identifica o item quando um único SKU de estoque da empresa o tem
+            rows = db.execute(
+                select(Product.ncm, func.min(stock_sku_id).label("stock_sku_id")).join(
+                    ProductSKU, ProductSKU.product_id == Product.id
+                ).where(
+                    and_(
+                        Product.company_id == company_id,
+                        ProductSKU.is_active == True,
+                        Product.ncm.in_(ncms)
+                    )
+                ).group_by(Product.ncm).having(func.count(func.distinct(stock_sku_id)) == 1)
+            ).all()
+            lookups["ncm"] = {row.ncm: (row.stock_sku_id, row.stock_sku_id) for row in rows}
+        return lookups
+
+    @staticmethod
+    def _match(lookups: Dict[str, Dict[Any, Tuple[int, int]]], produto: Dict[str, Any],
+               supplier_id: Optional[UUID]) -> Optional[Tuple[int, int]]:
+        return (
+            lookups["sku"].get(produto["sku_id"])
+            or lookups["supplier"].get((supplier_id, produto["codigo"]))
+            or lookups["barcode"].get(produto["ean"])
+            or lookups["ncm"].get(produto["ncm"])
+        )
+
+    @staticmethod
+    def _payables(company_id: UUID, supplier_id: UUID, nota: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Uma conta a pagar por duplicata; sem fatura, uma única no valor da nota"""
+        emission = nota["data_emissao"].date() if nota["data_emissao"] else date.today()
+        duplicatas = [dup for dup in nota["duplicatas"] or [] if dup.get("valor")]
+        if not duplicatas:
+            if nota["valor_total"] <= 0:
+                return []
+            duplicatas = [{"numero": "", "vencimento": None, "valor": nota["valor_total"]}]
+
+        count = len(duplicatas)
+        label = f"NF-e {nota['numero']}/{nota['serie']}"
+        rows = []
+        for i, dup in enumerate(duplicatas):
+            value = _money(dup["valor"])
+            rows.append({
+                "company_id": company_id,
+                "supplier_id": supplier_id,
+                "description": label if count == 1 else f"{label} - Parcela {i + 1}/{count}",
+                "payable_type": PayableType.CASH if count == 1 else PayableType.INSTALLMENT,
+                "status": PayableStatus.PENDING,
+                "total_amount": value,
+                "paid_amount": 0,
+                "entry_date": emission,
+                "due_date": _date(dup["vencimento"]) or emission,
+                "installment_number": i + 1,
+                "total_installments": count,
+                "installment_amount": value,
+                "notes": f"Duplicata {dup['numero']}" if dup["numero"] else None,
+                "reference": nota["chave_acesso"] or label,
+            })
+        return rows
+
+    @staticmethod
+    def _post_nota(db: Session, company_id: UUID, user_id: Optional[UUID], branch_id: Optional[UUID],
+                   nota: Dict[str, Any], supplier_id: UUID,
+                   matches: Dict[int, Tuple[int, int]]) -> Optional[Tuple[int, int]]:
+        """Grava as entradas e as contas a pagar de uma nota (sem commit); None se já lançada"""
+        # Bloqueio da nota: outro lançamento concorrente da mesma nota espera e vê data_lancamento
+        locked = db.execute(
+            select(NotaFiscal.data_lancamento).where(
+                and_(NotaFiscal.id == nota["id"], NotaFiscal.company_id == company_id)
+            ).with_for_update()
+        ).first()
+        if locked is None or locked.data_lancamento is not None:
+            return None
+
+        quantities: Dict[int, int] = defaultdict(int)
+        costs: Dict[int, float] = defaultdict(float)
+        for produto in nota["produtos"]:
+            stock_sku_id = matches[produto["id"]][1]
+            quantities[stock_sku_id] += int(produto["quantidade"])
+            # Custo de aquisição do item: valor dos produtos mais o IPI (não recuperável na revenda)
+            costs[stock_sku_id] += (produto["valor_total"] or 0.0) + produto["valor_ipi"]
+        stock_sku_ids = sorted(quantities)
+
+        stock_skus = {
+            sku.id: sku
+            for sku in db.query(ProductSKU).filter(ProductSKU.id.in_(stock_sku_ids))
+            .order_by(ProductSKU.id).with_for_update().all()
+        } if stock_sku_ids else {}
+        branch_stocks = {}
+        if branch_id and stock_sku_ids:
+            branch_stocks = {
+                stock.sku_id: stock
+                for stock in db.query(StockBranch).filter(
+                    and_(
+                        StockBranch.sku_id.in_(stock_sku_ids),
+                        StockBranch.branch_id == branch_id
+                    )
+                ).order_by(StockBranch.sku_id).with_for_update().all()
+            }
+
+        movements = []
+        for stock_sku_id in stock_sku_ids:
+            sku, quantity = stock_skus[stock_sku_id], quantities[stock_sku_id]
+            unit_cost = round(costs[stock_sku_id] / quantity, 6)
+            previous_stock = sku.current_stock or 0
+
+            branch_stock = branch_stocks.get(stock_sku_id)
+            branch_previous_stock = 0
+            if branch_id:
+                if branch_stock is None:
+                    raise ValueError(f"Estoque da filial não encontrado para o SKU {sku.sku_code}")
+                branch_previous_stock = branch_stock.current_stock or 0
+                branch_stock.current_stock = branch_previous_stock + quantity
+
+            StockCostService.apply_entry(sku, previous_stock, quantity, unit_cost, branch_stock, branch_previous_stock)
+            sku.current_stock = previous_stock + quantity
+
+            movements.append({
+                "product_id": sku.product_id,
+                "sku_id": stock_sku_id,
+                "company_id": company_id,
+                "branch_id": branch_id,
+                "movement_type": MovementType.ENTRY,
+                "movement_reason": MovementReason.PURCHASE,
+                "quantity": quantity,
+                "previous_stock": previous_stock,
+                "current_stock": previous_stock + quantity,
+                "reference_document": f"NF-e {nota['numero']}/{nota['serie']}"[:100],
+                "reference_id": nota["id"],
+                "unit_cost": unit_cost,
+                "total_cost": _money(costs[stock_sku_id]),
+                "user_id": user_id,
+            })
+
+        payables = NotaFiscalPostingService._payables(company_id, supplier_id, nota)
+
+        db.flush()
+        if movements:
+            db.execute(insert(StockMovement).values(movements))
+        if payables:
+            db.execute(insert(AccountsPayable), payables)
+        if nota["produtos"]:
+            db.execute(update(NotaFiscalProduto), [
+                {"id": produto["id"], "sku_id": matches[produto["id"]][0]} for produto in nota["produtos"]
+            ])
+        db.execute(
+            update(NotaFiscal).where(NotaFiscal.id == nota["id"])
+            .values(supplier_id=supplier_id, data_lancamento=func.now())
+            .execution_options(synchronize_session=False)
+        )
+        return len(movements), len(payables)
+
+    @staticmethod
+    def post(db: Session, company_id: UUID, nota_fiscal_ids: List[int], user_id: Optional[UUID] = None,
+             branch_id: Optional[UUID] = None) -> Dict[str, Any]:
+        """Lança um lote de notas de entrada (uma transação por nota; idempotente por nota)"""
+        started = time.monotonic()
+        nota_fiscal_ids = list(dict.fromkeys(nota_fiscal_ids))
+        results = {
+            nota_fiscal_id: {"nota_fiscal_id": nota_fiscal_id, "status": "error", "movements": 0, "payables": 0, "errors": []}
+            for nota_fiscal_id in nota_fiscal_ids
+        }
+
+        try:
+            notas = NotaFiscalPostingService._load(db, company_id, nota_fiscal_ids)
+            suppliers = NotaFiscalPostingService._resolve_suppliers(
+                db, company_id, {_digits(nota["emitente_cnpj"]) for nota in notas}
+            )
+            lookups = NotaFiscalPostingService._resolve_skus(db, company_id, notas, suppliers)
+            db.rollback()
+        except Exception:
+            db.rollback()
+            raise
+
+        found = {nota["id"] for nota in notas}
+        for nota_fiscal_id in nota_fiscal_ids:
+            if nota_fiscal_id not in found:
+                results[nota_fiscal_id]["errors"].append("Nota fiscal não encontrada")
+
+        for nota in notas:
+            result = results[nota["id"]]
+            if nota["data_lancamento"]:
+                result.update({"status": "skipped", "errors": ["Nota fiscal já lançada"]})
+                continue
+            if nota["tipo"] != "entrada":
+                result["errors"].append("Apenas notas fiscais de entrada são lançadas")
+                continue
+
+            cnpj = _digits(nota["emitente_cnpj"])
+            supplier_id = suppliers.get(cnpj)
+            if supplier_id is None:
+                result["errors"].append(f"Fornecedor não cadastrado para o CNPJ {nota['emitente_cnpj']}")
+
+            matches = {}
+            unmatched, fractional = [], []
+            for produto in nota["produtos"]:
+                match = NotaFiscalPostingService._match(lookups, produto, supplier_id)
+                if match is None:
+                    unmatched.append(produto["codigo"])
+                else:
+                    matches[produto["id"]] = match
+                quantity = produto["quantidade"] or 0
+                if quantity <= 0 or quantity != int(quantity):
+                    fractional.append(produto["codigo"])
+            if unmatched:
+                result["errors"].append(f"Itens sem SKU correspondente: {unmatched}")
+            if fractional:
+                result["errors"].append(f"Quantidade não inteira (estoque em unidades): {fractional}")
+            if result["errors"]:
+                continue
+
+            try:
+                posted = NotaFiscalPostingService._post_nota(
+                    db, company_id, user_id, branch_id, nota, supplier_id, matches
+                )
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                result["errors"].append(f"Erro ao lançar nota fiscal: {str(e)}")
+                continue
+
+            if posted is None:
+                result.update({"status": "skipped", "errors": ["Nota fiscal já lançada"]})
+            else:
+                result.update({"status": "posted", "movements": posted[0], "payables": posted[1]})
+
+        counts = {status: 0 for status in ("posted", "skipped", "error")}
+        for result in results.values():
+            counts[result["status"]] += 1
+
+        return {
+            "total": len(results),
+            "posted": counts["posted"],
+            "skipped": counts["skipped"],
+            "errors": counts["error"],
+            "elapsed_seconds": round(time.monotonic() - started, 3),
+            "results": list(results.values()),
+        }
@@ -0,0 +1,135 @@
+from datetime import date
+from typing import Dict, Any, List, Optional
+from sqlalchemy.orm import Session
+from sqlalchemy import Date, and_, case, cast, delete, func, insert, literal_column, select
+from uuid import UUID
+from app.models.nota_fiscal import (
+    NotaFiscal, NotaFiscalProduto, NotaFiscalResumoMensal, RESUMO_EXCLUDED_STATUS, RESUMO_VALUES
+)
+
+
+# Dimensões do relatório de impostos (nome no parâmetro -> coluna do resumo)
+TAX_REPORT_DIMENSIONS = {
+    "mes": NotaFiscalResumoMensal.mes,
+    "tipo": NotaFiscalResumoMensal.tipo,
+    "cfop": NotaFiscalResumoMensal.cfop,
+    "ncm": NotaFiscalResumoMensal.ncm,
+    "emitente": NotaFiscalResumoMensal.emitente_cnpj,
+}
+
+# Campo da linha do relatório de cada dimensão
+TAX_REPORT_FIELDS = {"mes": "mes", "tipo": "tipo", "cfop": "cfop", "ncm": "ncm", "emitente": "emitente_cnpj"}
+
+
+class NotaFiscalReportService:
+    """Relatórios fiscais (apuração de ICMS, IPI, PIS e COFINS dos itens das notas).
+
+    Os totais vêm de notas_fiscais_resumo_mensal, mantido por triggers nos itens e nas notas
+    (importação, cadastro, alteração e exclusão), e não da varredura dos itens: o relatório
+    de um período lê no máximo uma linha por mês/tipo/CFOP/NCM/emitente. Notas canceladas e
+    denegadas ficam fora da apuração.
+    """
+
+    @staticmethod
+    def month_start(value: date) -> date:
+        return value.replace(day=1)
+
+    @staticmethod
+    def tax_report(db: Session, company_id: UUID, dimensions: List[str],
+                   mes_inicio: Optional[date] = None, mes_fim: Optional[date] = None,
+                   tipo: Optional[str] = None, emitente_cnpj: Optional[str] = None,
+                   cfop: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Totais agrupados pelas dimensões, na ordem informada, com subtotais (GROUP BY ROLLUP)
+
+        Cada linha traz nivel = quantidade de dimensões preenchidas: len(dimensions) nas linhas
+        de detalhe, menos nos subtotais e 0 no total geral. Os subtotais vêm depois das linhas
+        do seu grupo.
+        """
+        if not dimensions:
+            raise ValueError("Informe ao menos uma dimensão para o agrupamento")
+        if len(set(dimensions)) != len(dimensions):
+            raise ValueError("Dimensão repetida no agrupamento")
+        unknown = [dimension for dimension in dimensions if dimension not in TAX_REPORT_DIMENSIONS]
+        if unknown:
+            raise ValueError(f"Dimensão inválida: {', '.join(unknown)}")
+
+        resumo = NotaFiscalResumoMensal
+        filters = [resumo.company_id == company_id]
+        if mes_inicio:
+            filters.append(resumo.mes >= NotaFiscalReportService.month_start(mes_inicio))
+        if mes_fim:
+            filters.append(resumo.mes <= NotaFiscalReportService.month_start(mes_fim))
+        if tipo:
+            filters.append(resumo.tipo == tipo)
+        if emitente_cnpj:
+            filters.append(resumo.emitente_cnpj == emitente_cnpj)
+        if cfop:
+            filters.append(resumo.cfop == cfop)
+
+        columns = [TAX_REPORT_DIMENSIONS[dimension] for dimension in dimensions]
+        grouping = func.grouping(*columns).label("grouping")
+        query = select(
+            *columns,
+            grouping,
+            func.sum(resumo.itens).label("itens"),
+            *[func.sum(getattr(resumo, column)).label(column) for column in RESUMO_VALUES],
+        )
+        if "emitente" in dimensions:
+            # Nome só nas linhas agrupadas por emitente
+            query = query.add_columns(
+                case((func.grouping(resumo.emitente_cnpj) == 0, func.max(resumo.emitente_nome))).label("emitente_nome")
+            )
+        query = query.where(and_(*filters)).group_by(func.rollup(*columns)).order_by(
+            *[column.asc().nulls_last() for column in columns]
+        )
+
+        rows = []
+        for row in db.execute(query).all():
+            item = {field: None for field in TAX_REPORT_FIELDS.values()}
+            item["emitente_nome"] = getattr(row, "emitente_nome", None)
+            nivel = 0
+            for position, dimension in enumerate(dimensions):
+                # GROUPING(a, b, ...): bit 1 = coluna agregada no subtotal (primeira dimensão no bit mais alto)
+                if not row.grouping & (1 << (len(dimensions) - 1 - position)):
+                    item[TAX_REPORT_FIELDS[dimension]] = getattr(row, TAX_REPORT_DIMENSIONS[dimension].key)
+                    nivel += 1
+            item["nivel"] = nivel
+            item["itens"] = int(row.itens or 0)
+            for column in RESUMO_VALUES:
+                item[column] = round(getattr(row, column) or 0.0, 2)
+            rows.append(item)
+        return rows
+
+    @staticmethod
+    def rebuild_summary(db: Session, company_id: Optional[UUID] = None) -> int:
+        """Recalcula o resumo mensal a partir dos itens (correção; normalmente mantido pelos triggers)"""
+        produto = NotaFiscalProduto
+        # Literais no SQL (e não parâmetros): as expressões do SELECT e do GROUP BY precisam ser iguais
+        mes = cast(func.date_trunc(literal_column("'month'"), NotaFiscal.data_emissao), Date)
+        ncm = func.coalesce(produto.ncm, literal_column("''"))
+        keys = [NotaFiscal.company_id, mes, NotaFiscal.tipo, produto.cfop, ncm, NotaFiscal.emitente_cnpj]
+        filters = [func.coalesce(NotaFiscal.status, "").notin_(RESUMO_EXCLUDED_STATUS)]
+        if company_id:
+            filters.append(NotaFiscal.company_id == company_id)
+
+        summary = select(
+            *keys,
+            func.max(NotaFiscal.emitente_nome),
+            func.count(produto.id),
+            *[func.sum(getattr(produto, column)) for column in RESUMO_VALUES],
+        ).join(NotaFiscal, NotaFiscal.id == produto.nota_fiscal_id).where(and_(*filters)).group_by(*keys)
+
+        try:
+            cleanup = delete(NotaFiscalResumoMensal)
+            if company_id:
+                cleanup = cleanup.where(NotaFiscalResumoMensal.company_id == company_id)
+            db.execute(cleanup)
+            result = db.execute(insert(NotaFiscalResumoMensal).from_select(
+                ["company_id", "mes", "tipo", "cfop", "ncm", "emitente_cnpj", "emitente_nome", "itens", *RESUMO_VALUES],
+                summary
+            ))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return result.rowcount
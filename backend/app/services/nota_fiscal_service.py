@@ -1,197 +1,28 @@
-import xml.etree.ElementTree as ET
-from typing import List, Optional, Dict, Any
-from datetime import datetime
+from typing import List, Optional, Dict, Any, BinaryIO
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_
+from sqlalchemy import and_, func
 from app.models.nota_fiscal import NotaFiscal, NotaFiscalProduto
 from app.schemas.nota_fiscal import NotaFiscalCreate, NotaFiscalUpdate, NotaFiscalImport
+from app.services.danfe_service import DanfeService
+from app.services.nfe_parser import NFeParser
+from app.services.nota_fiscal_import_service import NotaFiscalImportService
 from uuid import UUID
 
 
+# Campos usados no lançamento (estoque/contas a pagar): não mudam depois de lançada
+POSTED_LOCKED_FIELDS = (
+    "numero", "serie", "tipo", "emitente_cnpj", "valor_total", "valor_produtos",
+    "valor_ipi", "duplicatas", "xml_content",
+)
+
+
 class NotaFiscalService:
     
     @staticmethod
     def parse_xml_nfe(xml_content: str) -> Dict[str, Any]:
-        """Parse XML da NFe e extrai os dados"""
+        """Parse XML da NFe e extrai os dados (lxml quando disponível, senão ElementTree)"""
         try:
-            # Remove namespace para facilitar parsing
-            xml_content_clean = xml_content.replace('xmlns="http://www.portalfiscal.inf.br/nfe"', '')
-            root = ET.fromstring(xml_content_clean)
-            
-            # Extrair dados básicos
-            ide = root.find('.//ide')
-            emit = root.find('.//emit')
-            dest = root.find('.//dest')
-            total = root.find('.//total')
-            transp = root.find('.//transp')
-            pag = root.find('.//pag')
-            
-            # Dados básicos
-            numero = ide.find('nNF').text if ide.find('nNF') is not None else ""
-            serie = ide.find('serie').text if ide.find('serie') is not None else ""
-            tipo = "entrada" if ide.find('tpNF').text == "0" else "saida"
-            natureza_operacao = ide.find('natOp').text if ide.find('natOp') is not None else ""
-            
-            # Data de emissão
-            data_emissao_str = ide.find('dhEmi').text if ide.find('dhEmi') is not None else ""
-            if data_emissao_str:
-                try:
-                    # Tentar diferentes formatos de data
-                    if 'T' in data_emissao_str:
-                        # Formato: 2025-07-24T10:30:00-03:00
-                        data_emissao = datetime.fromisoformat(data_emissao_str)
-                    else:
-                        # Formato: 2025-07-24
-                        data_emissao = datetime.strptime(data_emissao_str, '%Y-%m-%d')
-                except ValueError:
-                    print(f"DEBUG: Erro ao parsear data: {data_emissao_str}")
-                    data_emissao = datetime.now()
-            else:
-                data_emissao = datetime.now()
-            
-            # Emitente
-            emitente_nome = emit.find('.//xNome').text if emit.find('.//xNome') is not None else ""
-            emitente_cnpj = emit.find('.//CNPJ').text if emit.find('.//CNPJ') is not None else ""
-            emitente_ie = emit.find('.//IE').text if emit.find('.//IE') is not None else ""
-            
-            # Endereço do emitente
-            end_emit = emit.find('.//enderEmit')
-            emitente_endereco = {}
-            if end_emit is not None:
-                emitente_endereco = {
-                    "logradouro": end_emit.find('xLgr').text if end_emit.find('xLgr') is not None else "",
-                    "numero": end_emit.find('nro').text if end_emit.find('nro') is not None else "",
-                    "bairro": end_emit.find('xBairro').text if end_emit.find('xBairro') is not None else "",
-                    "cidade": end_emit.find('xMun').text if end_emit.find('xMun') is not None else "",
-                    "estado": end_emit.find('UF').text if end_emit.find('UF') is not None else "",
-                    "cep": end_emit.find('CEP').text if end_emit.find('CEP') is not None else "",
-                }
-            
-            # Destinatário
-            destinatario_nome = dest.find('.//xNome').text if dest.find('.//xNome') is not None else ""
-            destinatario_documento = dest.find('.//CNPJ').text if dest.find('.//CNPJ') is not None else ""
-            if not destinatario_documento:
-                destinatario_documento = dest.find('.//CPF').text if dest.find('.//CPF') is not None else ""
-            
-            # Endereço do destinatário
-            end_dest = dest.find('.//enderDest')
-            destinatario_endereco = {}
-            if end_dest is not None:
-                destinatario_endereco = {
-                    "logradouro": end_dest.find('xLgr').text if end_dest.find('xLgr') is not None else "",
-                    "numero": end_dest.find('nro').text if end_dest.find('nro') is not None else "",
-                    "bairro": end_dest.find('xBairro').text if end_dest.find('xBairro') is not None else "",
-                    "cidade": end_dest.find('xMun').text if end_dest.find('xMun') is not None else "",
-                    "estado": end_dest.find('UF').text if end_dest.find('UF') is not None else "",
-                    "cep": end_dest.find('CEP').text if end_dest.find('CEP') is not None else "",
-                }
-            
-            # Valores
-            icms_total = total.find('.//ICMSTot')
-            valor_total = float(icms_total.find('vNF').text) if icms_total.find('vNF') is not None else 0.0
-            valor_produtos = float(icms_total.find('vProd').text) if icms_total.find('vProd') is not None else 0.0
-            valor_icms = float(icms_total.find('vICMS').text) if icms_total.find('vICMS') is not None else 0.0
-            valor_ipi = float(icms_total.find('vIPI').text) if icms_total.find('vIPI') is not None else 0.0
-            valor_pis = float(icms_total.find('vPIS').text) if icms_total.find('vPIS') is not None else 0.0
-            valor_cofins = float(icms_total.find('vCOFINS').text) if icms_total.find('vCOFINS') is not None else 0.0
-            valor_frete = float(icms_total.find('vFrete').text) if icms_total.find('vFrete') is not None else 0.0
-            valor_seguro = float(icms_total.find('vSeg').text) if icms_total.find('vSeg') is not None else 0.0
-            valor_desconto = float(icms_total.find('vDesc').text) if icms_total.find('vDesc') is not None else 0.0
-            
-            # Transporte
-            transportadora_nome = ""
-            transportadora_cnpj = ""
-            transportadora_placa = ""
-            transportadora_uf = ""
-            
-            if transp is not None:
-                transp_info = transp.find('.//transporta')
-                if transp_info is not None:
-                    transportadora_nome = transp_info.find('xNome').text if transp_info.find('xNome') is not None else ""
-                    transportadora_cnpj = transp_info.find('CNPJ').text if transp_info.find('CNPJ') is not None else ""
-                    transportadora_placa = transp_info.find('placa').text if transp_info.find('placa') is not None else ""
-                    transportadora_uf = transp_info.find('UF').text if transp_info.find('UF') is not None else ""
-            
-            # Produtos
-            produtos = []
-            det_items = root.findall('.//det')
-            
-            for det in det_items:
-                prod = det.find('prod')
-                if prod is not None:
-                    produto = {
-                        "codigo": prod.find('cProd').text if prod.find('cProd') is not None else "",
-                        "descricao": prod.find('xProd').text if prod.find('xProd') is not None else "",
-                        "ncm": prod.find('NCM').text if prod.find('NCM') is not None else "",
-                        "cfop": prod.find('CFOP').text if prod.find('CFOP') is not None else "",
-                        "unidade": prod.find('uCom').text if prod.find('uCom') is not None else "",
-                        "quantidade": float(prod.find('qCom').text) if prod.find('qCom') is not None else 0.0,
-                        "valor_unitario": float(prod.find('vUnCom').text) if prod.find('vUnCom') is not None else 0.0,
-                        "valor_total": float(prod.find('vProd').text) if prod.find('vProd') is not None else 0.0,
-                        "valor_icms": 0.0,
-                        "valor_ipi": 0.0,
-                        "valor_pis": 0.0,
-                        "valor_cofins": 0.0,
-                    }
-                    
-                    # Impostos do produto
-                    imposto = det.find('imposto')
-                    if imposto is not None:
-                        icms = imposto.find('.//ICMS')
-                        if icms is not None:
-                            icms_trib = icms.find('.//ICMSTrib')
-                            if icms_trib is not None:
-                                produto["valor_icms"] = float(icms_trib.find('vICMS').text) if icms_trib.find('vICMS') is not None else 0.0
-                        
-                        ipi = imposto.find('.//IPI')
-                        if ipi is not None:
-                            ipi_trib = ipi.find('.//IPITrib')
-                            if ipi_trib is not None:
-                                produto["valor_ipi"] = float(ipi_trib.find('vIPI').text) if ipi_trib.find('vIPI') is not None else 0.0
-                        
-                        pis = imposto.find('.//PIS')
-                        if pis is not None:
-                            pis_trib = pis.find('.//PISAliq')
-                            if pis_trib is not None:
-                                produto["valor_pis"] = float(pis_trib.find('vPIS').text) if pis_trib.find('vPIS') is not None else 0.0
-                        
-                        cofins = imposto.find('.//COFINS')
-                        if cofins is not None:
-                            cofins_trib = cofins.find('.//COFINSAliq')
-                            if cofins_trib is not None:
-                                produto["valor_cofins"] = float(cofins_trib.find('vCOFINS').text) if cofins_trib.find('vCOFINS') is not None else 0.0
-                    
-                    produtos.append(produto)
-            
-            return {
-                "numero": numero,
-                "serie": serie,
-                "tipo": tipo,
-                "natureza_operacao": natureza_operacao,
-                "data_emissao": data_emissao,
-                "emitente_nome": emitente_nome,
-                "emitente_cnpj": emitente_cnpj,
-                "emitente_ie": emitente_ie,
-                "emitente_endereco": emitente_endereco,
-                "destinatario_nome": destinatario_nome,
-                "destinatario_documento": destinatario_documento,
-                "destinatario_endereco": destinatario_endereco,
-                "valor_total": valor_total,
-                "valor_produtos": valor_produtos,
-                "valor_icms": valor_icms,
-                "valor_ipi": valor_ipi,
-                "valor_pis": valor_pis,
-                "valor_cofins": valor_cofins,
-                "valor_frete": valor_frete,
-                "valor_seguro": valor_seguro,
-                "valor_desconto": valor_desconto,
-                "transportadora_nome": transportadora_nome,
-                "transportadora_cnpj": transportadora_cnpj,
-                "transportadora_placa": transportadora_placa,
-                "transportadora_uf": transportadora_uf,
-                "produtos": produtos,
-            }
-            
+            return NFeParser.parse(xml_content)
         except Exception as e:
             raise ValueError(f"Erro ao processar XML: {str(e)}")
     
@@ -214,6 +45,7 @@ class NotaFiscalService:
                 data_emissao=nota_fiscal_data.data_emissao,
                 data_entrada_saida=nota_fiscal_data.data_entrada_saida,
                 origem=nota_fiscal_data.origem,
+                chave_acesso=nota_fiscal_data.chave_acesso,
                 emitente_nome=nota_fiscal_data.emitente_nome,
                 emitente_cnpj=nota_fiscal_data.emitente_cnpj,
                 emitente_ie=nota_fiscal_data.emitente_ie,
@@ -234,6 +66,7 @@ class NotaFiscalService:
                 valor_desconto=nota_fiscal_data.valor_desconto,
                 forma_pagamento=nota_fiscal_data.forma_pagamento,
                 condicao_pagamento=nota_fiscal_data.condicao_pagamento,
+                duplicatas=nota_fiscal_data.duplicatas,
                 transportadora_nome=nota_fiscal_data.transportadora_nome,
                 transportadora_cnpj=nota_fiscal_data.transportadora_cnpj,
                 transportadora_placa=nota_fiscal_data.transportadora_placa,
@@ -257,6 +90,7 @@ class NotaFiscalService:
                     ncm=produto_data.ncm,
                     cfop=produto_data.cfop,
                     unidade=produto_data.unidade,
+                    ean=produto_data.ean,
                     quantidade=produto_data.quantidade,
                     valor_unitario=produto_data.valor_unitario,
                     valor_total=produto_data.valor_total,
@@ -276,6 +110,42 @@ class NotaFiscalService:
             db.rollback()
             raise ValueError(f"Erro ao criar nota fiscal: {str(e)}")
     
+    @staticmethod
+    def _write_imported(db: Session, company_id: UUID, tipo: str, handle_duplicates: str,
+                        entry: Dict[str, Any]) -> NotaFiscal:
+        """Grava uma nota importada com chave de acesso (INSERT ... ON CONFLICT, skip/overwrite)"""
+        parsed_data = entry["data"]
+        try:
+            NotaFiscalImportService.write_chunk(db, company_id, tipo, [entry], handle_duplicates)
+        except Exception:
+            db.rollback()
+            raise
+        if entry["status"] == "duplicate":
+            raise ValueError(f"Nota fiscal Nº {parsed_data['numero']} série {parsed_data['serie']} já foi importada anteriormente. Emitente: {parsed_data['emitente_nome']} ({parsed_data['emitente_cnpj']})")
+        return NotaFiscalService.get_nota_fiscal(db, entry["nota_fiscal_id"], company_id)
+    
+    @staticmethod
+    def import_xml_file(db: Session, company_id: UUID, xml_file: BinaryIO, filename: str, tipo: str = "entrada",
+                        handle_duplicates: str = "skip") -> NotaFiscal:
+        """Importa nota fiscal de um arquivo (upload em spool) sem carregar o XML inteiro em memória
+        
+        O XML é lido com iterparse e depois comprimido em blocos a partir do mesmo arquivo.
+        """
+        xml_file.seek(0)
+        try:
+            parsed_data = NFeParser.parse_stream(xml_file)
+        except Exception as e:
+            raise ValueError(f"Erro ao processar XML: {str(e)}")
+        if not parsed_data["chave_acesso"]:
+            raise ValueError("XML sem chave de acesso")
+        
+        xml_file.seek(0)
+        return NotaFiscalService._write_imported(db, company_id, tipo, handle_duplicates, {
+            "filename": filename,
+            "data": parsed_data,
+            "xml": NotaFiscal.compress_xml_file(xml_file),
+        })
+    
     @staticmethod
     def import_xml_nota_fiscal(db: Session, import_data: NotaFiscalImport) -> NotaFiscal:
         """Importa nota fiscal a partir de XML"""
@@ -290,7 +160,17 @@ class NotaFiscalService:
             parsed_data = NotaFiscalService.parse_xml_nfe(import_data.xml_content)
             print(f"DEBUG: XML parseado com sucesso. Dados extraídos: {len(parsed_data.get('produtos', []))} produtos")
             
-            # Verificar se já existe uma nota fiscal com o mesmo número, série e emitente (CNPJ e nome)
+            # Com chave de acesso a duplicidade é resolvida no INSERT ... ON CONFLICT (skip/overwrite)
+            if parsed_data["chave_acesso"]:
+                return NotaFiscalService._write_imported(
+                    db, import_data.company_id, import_data.tipo, import_data.handle_duplicates, {
+                        "filename": import_data.xml_filename,
+                        "data": parsed_data,
+                        "xml": NotaFiscal.compress_xml(import_data.xml_content),
+                    }
+                )
+            
+            # Sem chave de acesso: verificar se já existe uma nota fiscal com o mesmo número, série e emitente (CNPJ e nome)
             existing_nota = NotaFiscalService.get_nota_fiscal_by_numero_serie_emitente(db, parsed_data["numero"], parsed_data["serie"], parsed_data["emitente_cnpj"], parsed_data["emitente_nome"], import_data.company_id)
             
             if existing_nota:
@@ -301,6 +181,9 @@ class NotaFiscalService:
                     print(f"DEBUG: Pulando nota fiscal duplicada")
                     raise ValueError(f"Nota fiscal Nº {parsed_data['numero']} série {parsed_data['serie']} já foi importada anteriormente. Emitente: {parsed_data['emitente_nome']} ({parsed_data['emitente_cnpj']})")
                 elif import_data.handle_duplicates == "overwrite":
+                    # Nota lançada não é sobrescrita (como no caminho com chave de acesso)
+                    if existing_nota.data_lancamento is not None:
+                        raise ValueError(f"Nota fiscal Nº {parsed_data['numero']} série {parsed_data['serie']} já foi lançada no estoque/financeiro e não pode ser sobrescrita")
                     # Deletar a nota fiscal existente para sobrescrever
                     print(f"DEBUG: Sobrescrevendo nota fiscal existente: {parsed_data['numero']} série {parsed_data['serie']} emitente {parsed_data['emitente_nome']}")
                     NotaFiscalService.delete_nota_fiscal(db, existing_nota.id, import_data.company_id)
@@ -339,6 +222,7 @@ class NotaFiscalService:
                 transportadora_cnpj=parsed_data["transportadora_cnpj"],
                 transportadora_placa=parsed_data["transportadora_placa"],
                 transportadora_uf=parsed_data["transportadora_uf"],
+                duplicatas=parsed_data["duplicatas"],
                 xml_content=import_data.xml_content,
                 xml_filename=import_data.xml_filename,
                 company_id=import_data.company_id,
@@ -359,45 +243,91 @@ class NotaFiscalService:
         ).offset(skip).limit(limit).all()
 
     @staticmethod
-    def get_all_notas_fiscais(db: Session, company_id: UUID) -> List[NotaFiscal]:
-        """Lista TODAS as notas fiscais de uma empresa sem limite"""
+    def address_filters(emitente_uf: Optional[str] = None, emitente_cidade: Optional[str] = None,
+                        destinatario_uf: Optional[str] = None, destinatario_cidade: Optional[str] = None) -> list:
+        """Filtros por UF/cidade dos endereços (mesmas expressões dos índices de notas_fiscais)"""
+        filters = []
+        for endereco, uf, cidade in (
+            (NotaFiscal.emitente_endereco, emitente_uf, emitente_cidade),
+            (NotaFiscal.destinatario_endereco, destinatario_uf, destinatario_cidade),
+        ):
+            if uf:
+                filters.append(endereco["estado"].astext == uf.strip().upper())
+            if cidade:
+                filters.append(func.lower(endereco["cidade"].astext) == cidade.strip().lower())
+        return filters
+
+    @staticmethod
+    def get_all_notas_fiscais(db: Session, company_id: UUID, emitente_uf: Optional[str] = None,
+                              emitente_cidade: Optional[str] = None, destinatario_uf: Optional[str] = None,
+                              destinatario_cidade: Optional[str] = None) -> List[NotaFiscal]:
+        """Lista TODAS as notas fiscais de uma empresa sem limite (opcionalmente por UF/cidade)"""
+        filters = NotaFiscalService.address_filters(emitente_uf, emitente_cidade, destinatario_uf, destinatario_cidade)
         return db.query(NotaFiscal).filter(
-            NotaFiscal.company_id == company_id
+            NotaFiscal.company_id == company_id, *filters
         ).options(
             joinedload(NotaFiscal.produtos)
         ).all()
     
     @staticmethod
-    def get_nota_fiscal(db: Session, nota_fiscal_id: int, company_id: UUID) -> Optional[NotaFiscal]:
-        """Busca uma nota fiscal específica"""
-        return db.query(NotaFiscal).filter(
+    def get_nota_fiscal(db: Session, nota_fiscal_id: int, company_id: UUID, lock: bool = False) -> Optional[NotaFiscal]:
+        """Busca uma nota fiscal específica (lock: bloqueia a linha, como o lançamento)"""
+        query = db.query(NotaFiscal).filter(
             and_(NotaFiscal.id == nota_fiscal_id, NotaFiscal.company_id == company_id)
-        ).first()
+        )
+        if lock:
+            return query.with_for_update().first()
+        return query.first()
     
     @staticmethod
     def update_nota_fiscal(db: Session, nota_fiscal_id: int, company_id: UUID, update_data: NotaFiscalUpdate) -> Optional[NotaFiscal]:
-        """Atualiza uma nota fiscal"""
-        db_nota_fiscal = NotaFiscalService.get_nota_fiscal(db, nota_fiscal_id, company_id)
+        """Atualiza uma nota fiscal (nota lançada: ValueError ao alterar campos do lançamento)"""
+        db_nota_fiscal = NotaFiscalService.get_nota_fiscal(db, nota_fiscal_id, company_id, lock=True)
         if not db_nota_fiscal:
             return None
         
         update_dict = update_data.dict(exclude_unset=True)
+        if db_nota_fiscal.data_lancamento is not None:
+            locked = [
+                field for field in POSTED_LOCKED_FIELDS
+                if field in update_dict and update_dict[field] != getattr(db_nota_fiscal, field)
+            ]
+            if locked:
+                db.rollback()
+                raise ValueError(f"Nota fiscal já lançada no estoque/financeiro; campos não alteráveis: {', '.join(locked)}")
         for field, value in update_dict.items():
             setattr(db_nota_fiscal, field, value)
         
         db.commit()
+        DanfeService.invalidate(company_id, nota_fiscal_id)
         db.refresh(db_nota_fiscal)
         return db_nota_fiscal
     
+    @staticmethod
+    def get_xml_nota_fiscal(db: Session, nota_fiscal_id: int, company_id: UUID):
+        """XML comprimido da nota (id, numero, xml_gzip, xml_sha256, xml_filename) sem carregar a nota inteira"""
+        return db.query(
+            NotaFiscal.id, NotaFiscal.numero, NotaFiscal.xml_gzip, NotaFiscal.xml_sha256, NotaFiscal.xml_filename
+        ).filter(
+            and_(
+                NotaFiscal.id == nota_fiscal_id,
+                NotaFiscal.company_id == company_id
+            )
+        ).first()
+    
     @staticmethod
     def delete_nota_fiscal(db: Session, nota_fiscal_id: int, company_id: UUID) -> bool:
-        """Deleta uma nota fiscal"""
-        db_nota_fiscal = NotaFiscalService.get_nota_fiscal(db, nota_fiscal_id, company_id)
+        """Deleta uma nota fiscal (ValueError se já lançada: liberaria a chave para novo lançamento)"""
+        db_nota_fiscal = NotaFiscalService.get_nota_fiscal(db, nota_fiscal_id, company_id, lock=True)
         if not db_nota_fiscal:
             return False
+        if db_nota_fiscal.data_lancamento is not None:
+            db.rollback()
+            raise ValueError(f"Nota fiscal Nº {db_nota_fiscal.numero} já foi lançada no estoque/financeiro e não pode ser excluída")
         
         db.delete(db_nota_fiscal)
         db.commit()
+        DanfeService.invalidate(company_id, nota_fiscal_id)
         return True 
 
     @staticmethod
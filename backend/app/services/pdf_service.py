@@ -3,6 +3,7 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib import colors
+from reportlab.pdfgen import canvas
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 from io import BytesIO
 from datetime import datetime
@@ -355,4 +356,61 @@ class PDFService:
         # Gerar PDF
         doc.build(story)
         buffer.seek(0)
-        return buffer 
\ No newline at end of file
+        return buffer 
+
+    @staticmethod
+    def generate_picking_list_pdf(picking: Dict[str, Any]) -> BytesIO:
+        """Gera PDF da lista de separação (linhas na ordem de coleta)
+
+        Desenhado direto no canvas, linha a linha: listas com milhares de itens não passam
+        pela quebra de tabelas do platypus.
+        """
+        buffer = BytesIO()
+        pdf = canvas.Canvas(buffer, pagesize=A4)
+        width, height = A4
+        margin = 36
+        row_height = 14
+        # Colunas: seq, localização, SKU, produto, quantidade, conferência
+        columns = [margin, margin + 30, margin + 140, margin + 240, width - margin - 70, width - margin - 20]
+        lines = picking.get("lines", [])
+        generated_at = PDFService.format_date(picking.get("generated_at")) if picking.get("generated_at") else ""
+
+        def header(page: int) -> float:
+            pdf.setFont("Helvetica-Bold", 12)
+            pdf.drawString(margin, height - margin, "LISTA DE SEPARAÇÃO")
+            pdf.setFont("Helvetica", 8)
+            pdf.drawRightString(width - margin, height - margin, f"{generated_at}  -  Página {page}")
+            pdf.drawString(
+                margin, height - margin - 14,
+                f"Itens: {picking.get('total_lines', 0)}    Unidades: {picking.get('total_units', 0)}    "
+                f"Pedidos: {len(picking.get('order_ids', []))}"
+            )
+            y = height - margin - 34
+            pdf.setFont("Helvetica-Bold", 8)
+            for x, title in zip(columns, ["#", "LOCALIZAÇÃO", "SKU", "PRODUTO", "QTD", "OK"]):
+                pdf.drawString(x, y, title)
+            pdf.line(margin, y - 4, width - margin, y - 4)
+            pdf.setFont("Helvetica", 8)
+            return y - row_height - 2
+
+        page = 1
+        y = header(page)
+        for line in lines:
+            if y < margin:
+                pdf.showPage()
+                page += 1
+                y = header(page)
+            product = line.get("product_name") or ""
+            if line.get("variant_description"):
+                product = f"{product} - {line['variant_description']}"
+            pdf.drawString(columns[0], y, str(line.get("sequence", "")))
+            pdf.drawString(columns[1], y, (line.get("location") or "-")[:22])
+            pdf.drawString(columns[2], y, (line.get("sku_code") or "")[:20])
+            pdf.drawString(columns[3], y, product[:48])
+            pdf.drawRightString(columns[5] - 12, y, str(line.get("quantity", 0)))
+            pdf.rect(columns[5], y - 2, 8, 8)
+            y -= row_height
+
+        pdf.save()
+        buffer.seek(0)
+        return buffer
@@ -0,0 +1,220 @@
+import json
+import re
+from collections import defaultdict
+from datetime import datetime, timezone
+from functools import lru_cache
+from itertools import groupby
+from typing import Dict, Any, List, Optional, Tuple, Iterator
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, select, update, func
+from uuid import UUID
+from app.models.product import Product
+from app.models.product_sku import ProductSKU
+from app.models.stock_branch import StockBranch
+from app.models.stock_movement import StockMovement, MovementType
+from app.models.sales_order import SalesOrder, SalesOrderItem, OrderStatus
+
+
+# Palavras descritivas ignoradas ao interpretar a localização ("Corredor 3 - Prateleira 2")
+LOCATION_WORDS = re.compile(
+    r"\b(corredor|rua|aisle|bloco|m[oó]dulo|estante|prateleira|shelf|n[ií]vel|posi[cç][aã]o|pos|box|bin|vao|vão)\b",
+    re.IGNORECASE
+)
+LOCATION_TOKEN = re.compile(r"\d+|[^\W\d_]+")
+
+# Pedidos que podem entrar em uma lista de separação
+PICKABLE_STATUSES = (OrderStatus.CONFIRMED, OrderStatus.PREPARING)
+
+
+@lru_cache(maxsize=65536)
+def _tokens(location: str) -> Tuple[str, ...]:
+    return tuple(LOCATION_TOKEN.findall(LOCATION_WORDS.sub(" ", location)))
+
+
+def location_tokens(warehouse_location: Optional[str], shelf_location: Optional[str]) -> Tuple[str, ...]:
+    """Segmentos da localização (corredor, prateleira, posição...) na ordem em que aparecem"""
+    return _tokens(warehouse_location or "") + _tokens(shelf_location or "")
+
+
+def location_key(tokens: Tuple[str, ...]) -> Tuple:
+    """Chave de ordenação natural: números comparados como números ("2" antes de "10")"""
+    return tuple((0, int(token), "") if token.isdigit() else (1, 0, token.upper()) for token in tokens)
+
+
+class PickingService:
+    """Lista de separação consolidada por SKU e ordenada pela localização no armazém.
+
+    As quantidades dos pedidos (e/ou saídas de estoque) são somadas por SKU de estoque no
+    banco; a rota percorre os corredores em ordem e alterna o sentido a cada corredor
+    (zigue-zague), evitando voltar ao início do corredor a cada item.
+    """
+
+    @staticmethod
+    def _order_quantities(db: Session, company_id: UUID, order_ids: List[int],
+                          branch_id: Optional[UUID] = None):
+        conditions = [
+            SalesOrder.company_id == company_id,
+            SalesOrder.id.in_(order_ids),
+            SalesOrder.status.in_(PICKABLE_STATUSES)
+        ]
+        if branch_id:
+            # Pedidos de outra filial não são separados com as localizações desta
+            conditions.append(SalesOrder.branch_id == branch_id)
+        return db.execute(
+            select(
+                SalesOrderItem.stock_sku_id,
+                func.sum(SalesOrderItem.quantity),
+                func.array_agg(func.distinct(SalesOrderItem.order_id))
+            ).join(
+                SalesOrder, SalesOrderItem.order_id == SalesOrder.id
+            ).where(and_(*conditions)).group_by(SalesOrderItem.stock_sku_id)
+        ).all()
+
+    @staticmethod
+    def _movement_quantities(db: Session, company_id: UUID, movement_ids: List[int],
+                             branch_id: Optional[UUID] = None):
+        conditions = [
+            StockMovement.company_id == company_id,
+            StockMovement.id.in_(movement_ids),
+            StockMovement.movement_type == MovementType.EXIT
+        ]
+        if branch_id:
+            # Saídas de outra filial não são separadas com as localizações desta
+            conditions.append(StockMovement.branch_id == branch_id)
+        return db.execute(
+            select(
+                StockMovement.sku_id,
+                func.sum(StockMovement.quantity)
+            ).where(and_(*conditions)).group_by(StockMovement.sku_id)
+        ).all()
+
+    @staticmethod
+    def _route(lines: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Ordena por localização e inverte o sentido em corredores alternados"""
+        located = sorted((line for line in lines if line["_tokens"]), key=lambda line: (line["_key"], line["sku_code"]))
+        unlocated = sorted((line for line in lines if not line["_tokens"]), key=lambda line: line["sku_code"])
+
+        route = []
+        for position, (_, aisle_lines) in enumerate(groupby(located, key=lambda line: line["_key"][:1])):
+            aisle_lines = list(aisle_lines)
+            route.extend(reversed(aisle_lines) if position % 2 else aisle_lines)
+        return route + unlocated
+
+    @staticmethod
+    def build(db: Session, company_id: UUID, order_ids: List[int], movement_ids: List[int],
+              branch_id: Optional[UUID] = None) -> Dict[str, Any]:
+        """Monta a lista de separação (linhas consolidadas por SKU na ordem de coleta)"""
+        quantities: Dict[int, int] = defaultdict(int)
+        orders_by_sku: Dict[int, List[int]] = defaultdict(list)
+        picked_orders = set()
+
+        if order_ids:
+            for stock_sku_id, quantity, sku_orders in PickingService._order_quantities(db, company_id, order_ids, branch_id):
+                quantities[stock_sku_id] += int(quantity)
+                orders_by_sku[stock_sku_id] = sorted(sku_orders)
+                picked_orders.update(sku_orders)
+        if movement_ids:
+            for sku_id, quantity in PickingService._movement_quantities(db, company_id, movement_ids, branch_id):
+                quantities[sku_id] += int(quantity)
+
+        if not quantities:
+            return {
+                "generated_at": datetime.now(timezone.utc), "branch_id": branch_id, "order_ids": [],
+                "total_lines": 0, "total_units": 0, "lines": [],
+            }
+
+        # Localização da filial quando informada; senão a do cadastro do SKU
+        columns = [
+            ProductSKU.id,
+            ProductSKU.sku_code,
+            ProductSKU.barcode,
+            ProductSKU.variant_description,
+            Product.name.label("product_name"),
+            ProductSKU.warehouse_location,
+            ProductSKU.shelf_location,
+        ]
+        query = select(*columns).join(Product, ProductSKU.product_id == Product.id)
+        if branch_id:
+            query = query.add_columns(
+                StockBranch.warehouse_location.label("branch_warehouse_location"),
+                StockBranch.shelf_location.label("branch_shelf_location")
+            ).outerjoin(
+                StockBranch,
+                and_(
+                    StockBranch.sku_id == ProductSKU.id,
+                    StockBranch.branch_id == branch_id
+                )
+            )
+        rows = db.execute(query.where(
+            and_(
+                ProductSKU.id.in_(list(quantities)),
+                Product.company_id == company_id
+            )
+        )).all()
+
+        lines = []
+        for row in rows:
+            warehouse_location, shelf_location = row.warehouse_location, row.shelf_location
+            if branch_id and (row.branch_warehouse_location or row.branch_shelf_location):
+                warehouse_location, shelf_location = row.branch_warehouse_location, row.branch_shelf_location
+            tokens = location_tokens(warehouse_location, shelf_location)
+            lines.append({
+                "_tokens": tokens,
+                "_key": location_key(tokens),
+                "location": " / ".join(part for part in (warehouse_location, shelf_location) if part) or None,
+                "aisle": tokens[0] if len(tokens) > 0 else None,
+                "shelf": tokens[1] if len(tokens) > 1 else None,
+                "bin": "-".join(tokens[2:]) or None,
+                "sku_id": row.id,
+                "sku_code": row.sku_code,
+                "barcode": row.barcode,
+                "product_name": row.product_name,
+                "variant_description": row.variant_description,
+                "quantity": quantities[row.id],
+                "order_ids": orders_by_sku.get(row.id, []),
+            })
+
+        route = PickingService._route(lines)
+        for sequence, line in enumerate(route, start=1):
+            line["sequence"] = sequence
+            del line["_tokens"], line["_key"]
+
+        return {
+            "generated_at": datetime.now(timezone.utc),
+            "branch_id": branch_id,
+            "order_ids": sorted(picked_orders),
+            "total_lines": len(route),
+            "total_units": sum(line["quantity"] for line in route),
+            "lines": route,
+        }
+
+    @staticmethod
+    def mark_preparing(db: Session, company_id: UUID, order_ids: List[int]) -> int:
+        """Pedidos confirmados incluídos na lista passam para "em separação" """
+        if not order_ids:
+            return 0
+        result = db.execute(
+            update(SalesOrder)
+            .where(
+                and_(
+                    SalesOrder.company_id == company_id,
+                    SalesOrder.id.in_(order_ids),
+                    SalesOrder.status == OrderStatus.CONFIRMED
+                )
+            )
+            .values(status=OrderStatus.PREPARING)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return result.rowcount
+
+    @staticmethod
+    def iter_json(picking: Dict[str, Any], chunk_lines: int = 500) -> Iterator[str]:
+        """Serializa a lista em partes (cabeçalho e blocos de linhas) para StreamingResponse"""
+        header = {key: value for key, value in picking.items() if key != "lines"}
+        yield json.dumps(header, default=str)[:-1] + ', "lines": ['
+        lines = picking["lines"]
+        for start in range(0, len(lines), chunk_lines):
+            chunk = ", ".join(json.dumps(line, default=str) for line in lines[start:start + chunk_lines])
+            yield ("" if start == 0 else ", ") + chunk
+        yield "]}"
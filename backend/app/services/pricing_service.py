@@ -0,0 +1,151 @@
+from typing import List
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, select, update, func, cast, Numeric, Float, null
+from uuid import UUID
+from app.models.product import Product
+from app.models.product_sku import ProductSKU
+from app.schemas.product import (
+    PriceRule, PriceRuleAction, PriceTarget, BulkPriceUpdateRequest, BulkPriceUpdateResponse,
+    PriceRuleResult, PricePreviewItem
+)
+
+
+class PricingService:
+    """Reajuste de preços em massa: um UPDATE por regra, todas as regras em uma transação"""
+
+    @staticmethod
+    def _conditions(company_id: UUID, rule: PriceRule) -> list:
+        filters = rule.filters
+        conditions = [
+            ProductSKU.product_id == Product.id,
+            Product.company_id == company_id,
+        ]
+        if filters.only_active:
+            conditions.append(ProductSKU.is_active == True)
+        if filters.category:
+            conditions.append(Product.category == filters.category)
+        if filters.category_id:
+            conditions.append(Product.category_id == filters.category_id)
+        if filters.brand:
+            conditions.append(Product.brand == filters.brand)
+        if filters.supplier_id:
+            conditions.append(ProductSKU.supplier_id == filters.supplier_id)
+        if filters.product_ids:
+            conditions.append(ProductSKU.product_id.in_(filters.product_ids))
+        if filters.sku_ids:
+            conditions.append(ProductSKU.id.in_(filters.sku_ids))
+
+        # Preço de origem vazio: SKU fora da regra (GREATEST ignora NULL e gravaria o piso de R$ 0,01)
+        if rule.action == PriceRuleAction.PROMOTION:
+            conditions.append(ProductSKU.sale_price.isnot(None))
+        elif rule.action == PriceRuleAction.MARKUP:
+            conditions.append(ProductSKU.cost_price.isnot(None))
+        elif rule.action in (PriceRuleAction.PERCENT, PriceRuleAction.FIXED):
+            conditions.append(getattr(ProductSKU, rule.target.value).isnot(None))
+        return conditions
+
+    @staticmethod
+    def _finish(expression, rule: PriceRule):
+        """Aplica o arredondamento de final (ex.: ,90), piso de R$ 0,01 e 2 casas decimais"""
+        if rule.rounding_ending is not None:
+            expression = func.ceil(expression - rule.rounding_ending) + rule.rounding_ending
+        expression = func.greatest(expression, 0.01)
+        return cast(func.round(cast(expression, Numeric), 2), Float)
+
+    @staticmethod
+    def _values(rule: PriceRule) -> dict:
+        """Monta o SET do UPDATE para a regra"""
+        if rule.action != PriceRuleAction.CLEAR_PROMOTION and rule.value is None:
+            raise ValueError(f"A ação {rule.action.value} exige o campo value")
+        if rule.starts_at and rule.ends_at and rule.ends_at <= rule.starts_at:
+            raise ValueError("ends_at deve ser posterior a starts_at")
+
+        if rule.action == PriceRuleAction.CLEAR_PROMOTION:
+            return {
+                ProductSKU.promotional_price: null(),
+                ProductSKU.promotional_starts_at: null(),
+                ProductSKU.promotional_ends_at: null(),
+            }
+
+        if rule.action == PriceRuleAction.PROMOTION:
+            if not 0 < rule.value < 100:
+                raise ValueError("O desconto da promoção deve estar entre 0 e 100%")
+            expression = PricingService._finish(ProductSKU.sale_price * (1 - rule.value / 100.0), rule)
+            return {
+                ProductSKU.promotional_price: expression,
+                ProductSKU.promotional_starts_at: rule.starts_at,
+                ProductSKU.promotional_ends_at: rule.ends_at,
+            }
+
+        target = getattr(ProductSKU, rule.target.value)
+        if rule.action == PriceRuleAction.MARKUP:
+            expression = ProductSKU.cost_price * (1 + rule.value / 100.0)
+        elif rule.action == PriceRuleAction.PERCENT:
+            expression = target * (1 + rule.value / 100.0)
+        elif rule.action == PriceRuleAction.FIXED:
+            expression = target + rule.value
+        else:
+            expression = cast(rule.value, Float)
+
+        values = {target: PricingService._finish(expression, rule)}
+        if rule.target == PriceTarget.PROMOTIONAL_PRICE and (rule.starts_at or rule.ends_at):
+            values[ProductSKU.promotional_starts_at] = rule.starts_at
+            values[ProductSKU.promotional_ends_at] = rule.ends_at
+        return values
+
+    @staticmethod
+    def _preview_column(rule: PriceRule):
+        if rule.action in (PriceRuleAction.PROMOTION, PriceRuleAction.CLEAR_PROMOTION):
+            return ProductSKU.promotional_price
+        return getattr(ProductSKU, rule.target.value)
+
+    @staticmethod
+    def bulk_update(db: Session, company_id: UUID, request: BulkPriceUpdateRequest) -> BulkPriceUpdateResponse:
+        """Aplica as regras em ordem; em dry_run executa tudo e desfaz (rollback) ao final"""
+        results: List[PriceRuleResult] = []
+        total_affected = 0
+
+        try:
+            for index, rule in enumerate(request.rules):
+                conditions = PricingService._conditions(company_id, rule)
+                values = PricingService._values(rule)
+
+                preview = []
+                if request.dry_run and request.preview_limit:
+                    column = PricingService._preview_column(rule)
+                    rows = db.execute(
+                        select(
+                            ProductSKU.id,
+                            ProductSKU.sku_code,
+                            Product.name,
+                            column.label("old_price"),
+                            values[column].label("new_price")
+                        ).where(and_(*conditions)).order_by(ProductSKU.id).limit(request.preview_limit)
+                    ).all()
+                    preview = [
+                        PricePreviewItem(
+                            sku_id=row.id,
+                            sku_code=row.sku_code,
+                            product_name=row.name,
+                            old_price=row.old_price,
+                            new_price=row.new_price
+                        )
+                        for row in rows
+                    ]
+
+                values[ProductSKU.updated_at] = func.now()
+                result = db.execute(
+                    update(ProductSKU).where(and_(*conditions)).values(values).execution_options(synchronize_session=False)
+                )
+                total_affected += result.rowcount
+                results.append(PriceRuleResult(rule_index=index, affected=result.rowcount, preview=preview))
+
+            if request.dry_run:
+                db.rollback()
+            else:
+                db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        return BulkPriceUpdateResponse(dry_run=request.dry_run, total_affected=total_affected, rules=results)
@@ -0,0 +1,291 @@
+import csv
+import io
+import json
+from typing import List, Dict, Any, Iterator, Tuple, Optional, BinaryIO
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, select, func, literal_column
+from sqlalchemy.dialects.postgresql import insert
+from pydantic import ValidationError
+from uuid import UUID
+from app.models.product import Product
+from app.models.product_sku import ProductSKU
+from app.models.supplier import Supplier
+from app.schemas.product import ProductImportRow, ProductImportError, ProductImportResult
+
+
+# Linhas processadas por transação
+IMPORT_CHUNK_SIZE = 1000
+
+# Campos do SKU atualizados quando o sku_code já existe (estoque não é sobrescrito)
+SKU_UPDATE_FIELDS = [
+    "product_id", "barcode", "color", "size", "material", "flavor", "variant_description",
+    "cost_price", "sale_price", "wholesale_price", "promotional_price",
+    "minimum_stock", "maximum_stock", "warehouse_location", "shelf_location",
+    "supplier_sku", "supplier_id",
+]
+
+
+class ProductImportService:
+
+    @staticmethod
+    def iter_rows(file: BinaryIO, file_format: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Lê o arquivo linha a linha (CSV com ',' ou ';' ou JSON lines) sem carregá-lo inteiro"""
+        text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+
+        if file_format == "jsonl":
+            for line_number, line in enumerate(text, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    data = json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_number, {"__error__": f"JSON inválido: {e.msg}"}
+                    continue
+                if not isinstance(data, dict):
+                    yield line_number, {"__error__": "Cada linha deve ser um objeto JSON"}
+                    continue
+                yield line_number, data
+            return
+
+        sample = text.read(4096)
+        text.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.DictReader(text, dialect=dialect)
+        # Linha 1 é o cabeçalho
+        for line_number, data in enumerate(reader, start=2):
+            yield line_number, data
+
+    @staticmethod
+    def _chunks(rows: Iterator[Tuple[int, Dict[str, Any]]], size: int) -> Iterator[List[Tuple[int, Dict[str, Any]]]]:
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    @staticmethod
+    def _resolve_products(db: Session, company_id: UUID, rows: List[ProductImportRow]) -> Tuple[Dict[str, int], int]:
+        """Busca produtos por nome em uma consulta e cria os que faltam com um INSERT multi-linha"""
+        names = {row.product_name for row in rows}
+        existing = db.query(Product.name, Product.id).filter(
+            and_(
+                Product.company_id == company_id,
+                Product.name.in_(names)
+            )
+        ).all()
+        product_ids = {name: product_id for name, product_id in existing}
+
+        new_products = {}
+        for row in rows:
+            if row.product_name in product_ids or row.product_name in new_products:
+                continue
+            new_products[row.product_name] = {
+                "company_id": company_id,
+                "name": row.product_name,
+                "description": row.description,
+                "brand": row.brand,
+                "model": row.model,
+                "category": row.category,
+                "ncm": row.ncm,
+                "product_type": "simple",
+                "is_active": True,
+                "is_service": False,
+                "cost_price": row.cost_price,
+                "sale_price": row.sale_price,
+            }
+
+        if new_products:
+            result = db.execute(
+                insert(Product).values(list(new_products.values())).returning(Product.name, Product.id)
+            )
+            for name, product_id in result:
+                product_ids[name] = product_id
+
+        return product_ids, len(new_products)
+
+    @staticmethod
+    def _sku_values(row: ProductImportRow, product_id: int, supplier_id: Optional[UUID]) -> Dict[str, Any]:
+        return {
+            "product_id": product_id,
+            "sku_code": row.sku_code,
+            "barcode": row.barcode,
+            "color": row.color,
+            "size": row.size,
+            "material": row.material,
+            "flavor": row.flavor,
+            "variant_description": row.variant_description,
+            "cost_price": row.cost_price,
+            "sale_price": row.sale_price,
+            "wholesale_price": row.wholesale_price,
+            "promotional_price": row.promotional_price,
+            "current_stock": row.current_stock,
+            "minimum_stock": row.minimum_stock,
+            "maximum_stock": row.maximum_stock,
+            "reserved_stock": 0,
+            "warehouse_location": row.warehouse_location,
+            "shelf_location": row.shelf_location,
+            "supplier_sku": row.supplier_sku,
+            "supplier_id": supplier_id,
+            "taxes": {},
+            "is_active": True,
+            "is_available_for_sale": True,
+            "is_stock_sku": False,
+        }
+
+    @staticmethod
+    def _upsert_skus(db: Session, company_id: UUID, values: List[Dict[str, Any]]):
+        """INSERT ... ON CONFLICT (sku_code) DO UPDATE restrito aos SKUs da própria empresa.
+
+        sku_code é único em toda a base: um conflito com SKU de outra empresa não atualiza
+        nada e a linha não aparece no RETURNING.
+        """
+        stmt = insert(ProductSKU).values(values)
+        company_products = select(Product.id).where(Product.company_id == company_id)
+        update_values = {field: stmt.excluded[field] for field in SKU_UPDATE_FIELDS}
+        update_values["updated_at"] = func.now()
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ProductSKU.sku_code],
+            set_=update_values,
+            where=ProductSKU.product_id.in_(company_products)
+        ).returning(
+            ProductSKU.sku_code,
+            literal_column("(xmax = 0)").label("inserted")
+        )
+        return db.execute(stmt).all()
+
+    @staticmethod
+    def import_file(db: Session, company_id: UUID, file: BinaryIO, file_format: str,
+                    chunk_size: int = IMPORT_CHUNK_SIZE) -> ProductImportResult:
+        """Importa produtos e SKUs em lotes, uma transação por lote, com relatório de erros por linha"""
+        suppliers = dict(
+            db.query(Supplier.cnpj, Supplier.id).filter(
+                and_(
+                    Supplier.company_id == company_id,
+                    Supplier.is_active == True,
+                    Supplier.cnpj.isnot(None)
+                )
+            ).all()
+        )
+
+        total_rows = 0
+        products_created = 0
+        skus_created = 0
+        skus_updated = 0
+        errors: List[ProductImportError] = []
+        seen_sku_codes = set()
+
+        for raw_chunk in ProductImportService._chunks(ProductImportService.iter_rows(file, file_format), chunk_size):
+            valid: List[Tuple[int, ProductImportRow, Optional[UUID]]] = []
+
+            for line_number, data in raw_chunk:
+                total_rows += 1
+                if "__error__" in data:
+                    errors.append(ProductImportError(row=line_number, errors=[data["__error__"]]))
+                    continue
+                try:
+                    row = ProductImportRow(**data)
+                except ValidationError as e:
+                    errors.append(ProductImportError(
+                        row=line_number,
+                        sku_code=data.get("sku_code"),
+                        errors=[f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in e.errors()]
+                    ))
+                    continue
+
+                if row.sku_code in seen_sku_codes:
+                    errors.append(ProductImportError(
+                        row=line_number, sku_code=row.sku_code,
+                        errors=["sku_code repetido no arquivo (mantida a primeira ocorrência)"]
+                    ))
+                    continue
+                seen_sku_codes.add(row.sku_code)
+
+                supplier_id = None
+                if row.supplier_cnpj:
+                    supplier_id = suppliers.get(row.supplier_cnpj)
+                    if supplier_id is None:
+                        errors.append(ProductImportError(
+                            row=line_number, sku_code=row.sku_code,
+                            errors=[f"Fornecedor com CNPJ {row.supplier_cnpj} não encontrado"]
+                        ))
+                        continue
+
+                valid.append((line_number, row, supplier_id))
+
+            if not valid:
+                continue
+
+            chunk_errors: List[ProductImportError] = []
+            try:
+                product_ids, created = ProductImportService._resolve_products(
+                    db, company_id, [row for _, row, _ in valid]
+                )
+                values = [
+                    ProductImportService._sku_values(row, product_ids[row.product_name], supplier_id)
+                    for _, row, supplier_id in valid
+                ]
+                returned = ProductImportService._upsert_skus(db, company_id, values)
+                db.commit()
+            except Exception:
+                db.rollback()
+                # Lote falhou no banco: reprocessar linha a linha para isolar as linhas com erro
+                created, returned = ProductImportService._import_rows_individually(db, company_id, valid, chunk_errors)
+
+            products_created += created
+            returned_codes = set()
+            for sku_code, inserted in returned:
+                returned_codes.add(sku_code)
+                if inserted:
+                    skus_created += 1
+                else:
+                    skus_updated += 1
+
+            failed_codes = {error.sku_code for error in chunk_errors}
+            for line_number, row, _ in valid:
+                if row.sku_code not in returned_codes and row.sku_code not in failed_codes:
+                    chunk_errors.append(ProductImportError(
+                        row=line_number, sku_code=row.sku_code,
+                        errors=["sku_code já utilizado por outra empresa"]
+                    ))
+            errors.extend(chunk_errors)
+
+        errors.sort(key=lambda error: error.row)
+        return ProductImportResult(
+            total_rows=total_rows,
+            products_created=products_created,
+            skus_created=skus_created,
+            skus_updated=skus_updated,
+            failed_rows=len(errors),
+            errors=errors
+        )
+
+    @staticmethod
+    def _import_rows_individually(db: Session, company_id: UUID,
+                                  valid: List[Tuple[int, ProductImportRow, Optional[UUID]]],
+                                  errors: List[ProductImportError]):
+        created_total = 0
+        returned_total = []
+        for line_number, row, supplier_id in valid:
+            try:
+                with db.begin_nested():
+                    product_ids, created = ProductImportService._resolve_products(db, company_id, [row])
+                    returned = ProductImportService._upsert_skus(
+                        db, company_id,
+                        [ProductImportService._sku_values(row, product_ids[row.product_name], supplier_id)]
+                    )
+                created_total += created
+                returned_total.extend(returned)
+            except Exception as e:
+                errors.append(ProductImportError(
+                    row=line_number, sku_code=row.sku_code,
+                    errors=[str(getattr(e, "orig", e)).strip()]
+                ))
+        db.commit()
+        return created_total, returned_total
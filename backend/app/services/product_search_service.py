@@ -0,0 +1,127 @@
+import re
+from typing import List, Optional, Dict, Any
+from sqlalchemy.orm import Session, Query
+from sqlalchemy import and_, or_, func, select, literal_column
+from uuid import UUID
+from app.models.product import Product
+from app.models.product_sku import ProductSKU
+
+
+# Configuração criada pela migration add_product_search_index (portuguese + unaccent)
+SEARCH_CONFIG = "portuguese_unaccent"
+
+
+class ProductSearchService:
+
+    @staticmethod
+    def build_prefix_tsquery(term: str) -> Optional[str]:
+        """Converte o termo digitado em uma tsquery com prefixo em todas as palavras"""
+        tokens = re.findall(r"\w+", term or "", flags=re.UNICODE)
+        if not tokens:
+            return None
+        return " & ".join(f"{token}:*" for token in tokens)
+
+    @staticmethod
+    def escape_like(term: str) -> str:
+        """Escapa os curingas do LIKE (% e _) e a barra de escape"""
+        return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+    @staticmethod
+    def _tsquery(term: str):
+        tsquery_text = ProductSearchService.build_prefix_tsquery(term)
+        if tsquery_text is None:
+            return None
+        return func.to_tsquery(literal_column(f"'{SEARCH_CONFIG}'::regconfig"), tsquery_text)
+
+    @staticmethod
+    def _match_clause(term: str, tsquery):
+        """Texto completo OU prefixo de código de SKU/código de barras OU nome similar (trigramas)"""
+        prefix = f"{ProductSearchService.escape_like(term)}%"
+        sku_match = Product.id.in_(
+            select(ProductSKU.product_id).where(
+                or_(
+                    ProductSKU.sku_code.ilike(prefix, escape="\\"),
+                    ProductSKU.barcode.ilike(prefix, escape="\\")
+                )
+            )
+        )
+        return or_(
+            Product.search_vector.op("@@")(tsquery),
+            sku_match,
+            Product.name.op("%")(term)
+        )
+
+    @staticmethod
+    def _rank(term: str, tsquery):
+        return func.ts_rank_cd(Product.search_vector, tsquery) + func.similarity(Product.name, term)
+
+    @staticmethod
+    def sku_tax_filter(tax: str, rate: Optional[float] = None):
+        """SKUs com o imposto (taxes ? 'ICMS') ou com a alíquota (taxes @> '{"ICMS": 18}'), pelo índice GIN"""
+        if rate is None:
+            return ProductSKU.taxes.has_key(tax)
+        return ProductSKU.taxes.contains({tax: rate})
+
+    @staticmethod
+    def apply_ilike_filter(query: Query, term: str) -> Query:
+        """Filtro por substring (atendido pelos índices GIN de trigramas)"""
+        pattern = f"%{ProductSearchService.escape_like(term)}%"
+        search_filter = or_(
+            Product.name.ilike(pattern, escape="\\"),
+            Product.description.ilike(pattern, escape="\\"),
+            Product.brand.ilike(pattern, escape="\\"),
+            Product.model.ilike(pattern, escape="\\")
+        )
+        return query.filter(search_filter)
+
+    @staticmethod
+    def apply_fulltext_filter(query: Query, term: str) -> Query:
+        """Filtro por texto completo com prefixo, ordenado por relevância"""
+        tsquery = ProductSearchService._tsquery(term)
+        if tsquery is None:
+            return query
+
+        query = query.filter(ProductSearchService._match_clause(term, tsquery))
+        return query.order_by(ProductSearchService._rank(term, tsquery).desc(), Product.id)
+
+    @staticmethod
+    def search(db: Session, company_id: UUID, term: str, limit: int = 20, only_active: bool = True) -> List[Dict[str, Any]]:
+        """Busca rápida (typeahead) retornando produtos ranqueados por relevância"""
+        tsquery = ProductSearchService._tsquery(term)
+        if tsquery is None:
+            return []
+
+        rank = ProductSearchService._rank(term, tsquery).label("rank")
+
+        query = db.query(
+            Product.id,
+            Product.name,
+            Product.brand,
+            Product.model,
+            Product.sku,
+            Product.category,
+            rank
+        ).filter(
+            and_(
+                Product.company_id == company_id,
+                ProductSearchService._match_clause(term, tsquery)
+            )
+        )
+
+        if only_active:
+            query = query.filter(Product.is_active == True)
+
+        rows = query.order_by(rank.desc(), Product.id).limit(limit).all()
+
+        return [
+            {
+                "id": row.id,
+                "name": row.name,
+                "brand": row.brand,
+                "model": row.model,
+                "sku": row.sku,
+                "category": row.category,
+                "rank": float(row.rank or 0)
+            }
+            for row in rows
+        ]
@@ -0,0 +1,246 @@
+import math
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, select, func, cast, delete, insert, literal_column, Integer
+from uuid import UUID
+from app.core.config import settings
+from app.models.product import Product
+from app.models.product_sku import ProductSKU
+from app.models.stock_branch import StockBranch
+from app.models.stock_movement import StockMovement, MovementType
+from app.models.reorder_suggestion import ReorderSuggestion
+
+
+# Linhas lidas do cursor do servidor por vez
+STREAM_BATCH_SIZE = 50000
+
+
+class ReorderService:
+    """Sugestão de ponto de pedido e quantidade de reposição a partir das saídas de estoque.
+
+    As saídas do período são agregadas por SKU de estoque, filial e dia em uma única
+    consulta lida em lotes; a demanda diária vira uma matriz (SKU x dia) e todas as
+    estatísticas são calculadas de forma vetorizada com NumPy.
+    """
+
+    @staticmethod
+    def _stream_daily_exits(db: Session, company_id: UUID, start: datetime, n_days: int):
+        """Lê (sku de estoque, filial, dia, quantidade) e devolve arrays NumPy"""
+        # Saídas de SKUs associados contam para o SKU de estoque
+        stock_sku_id = func.coalesce(ProductSKU.stock_sku_id, ProductSKU.id)
+        day_index = cast(func.floor(func.extract("epoch", StockMovement.created_at - start) / 86400), Integer)
+
+        stmt = select(
+            stock_sku_id.label("stock_sku"),
+            StockMovement.branch_id,
+            day_index.label("day_index"),
+            func.sum(StockMovement.quantity).label("quantity")
+        ).join(
+            ProductSKU, StockMovement.sku_id == ProductSKU.id
+        ).where(
+            and_(
+                StockMovement.company_id == company_id,
+                StockMovement.movement_type == MovementType.EXIT,
+                StockMovement.created_at >= start
+            )
+        ).group_by(literal_column("1"), literal_column("2"), literal_column("3"))
+
+        result = db.execute(stmt.execution_options(stream_results=True, yield_per=STREAM_BATCH_SIZE))
+
+        branch_codes: Dict[UUID, int] = {}
+        sku_parts, branch_parts, day_parts, quantity_parts = [], [], [], []
+        for rows in result.partitions():
+            sku_parts.append(np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows)))
+            # -1 = movimentação sem filial
+            branch_parts.append(np.fromiter(
+                (-1 if row[1] is None else branch_codes.setdefault(row[1], len(branch_codes)) for row in rows),
+                dtype=np.int64, count=len(rows)
+            ))
+            day_parts.append(np.fromiter((row[2] for row in rows), dtype=np.int64, count=len(rows)))
+            quantity_parts.append(np.fromiter((row[3] for row in rows), dtype=np.float64, count=len(rows)))
+
+        if not sku_parts:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, empty, np.empty(0, dtype=np.float64), branch_codes
+
+        days = np.clip(np.concatenate(day_parts), 0, n_days - 1)
+        return (
+            np.concatenate(sku_parts),
+            np.concatenate(branch_parts),
+            days,
+            np.concatenate(quantity_parts),
+            branch_codes
+        )
+
+    @staticmethod
+    def _demand_matrix(keys: np.ndarray, days: np.ndarray, quantities: np.ndarray, n_days: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Agrupa por chave e monta a matriz de demanda diária (chave x dia)"""
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        matrix = np.bincount(
+            inverse * n_days + days,
+            weights=quantities,
+            minlength=len(unique_keys) * n_days
+        ).reshape(len(unique_keys), n_days)
+        return unique_keys, matrix
+
+    @staticmethod
+    def _policy(matrix: np.ndarray, available: np.ndarray, recent_days: int, lead_time_days: int,
+                review_days: int, service_level_z: float) -> Dict[str, np.ndarray]:
+        """Taxa de demanda, variabilidade, cobertura, ponto de pedido e quantidade sugerida"""
+        full_rate = matrix.mean(axis=1)
+        recent_rate = matrix[:, -recent_days:].mean(axis=1)
+        # Média entre a janela completa e a recente: suaviza, mas acompanha tendência
+        rate = (full_rate + recent_rate) / 2
+        std = matrix.std(axis=1, ddof=1) if matrix.shape[1] > 1 else np.zeros(len(matrix))
+
+        safety_stock = np.ceil(service_level_z * std * math.sqrt(lead_time_days))
+        reorder_point = np.ceil(rate * lead_time_days + safety_stock)
+        target_stock = np.ceil(reorder_point + rate * review_days)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            days_of_cover = np.where(rate > 0, np.maximum(available, 0) / rate, np.nan)
+
+        needs_reorder = (rate > 0) & (available <= reorder_point)
+        suggested_quantity = np.where(needs_reorder, np.maximum(target_stock - available, 0), 0)
+
+        return {
+            "demand_rate": rate,
+            "demand_std": std,
+            "days_of_cover": days_of_cover,
+            "safety_stock": safety_stock,
+            "reorder_point": reorder_point,
+            "target_stock": target_stock,
+            "suggested_quantity": suggested_quantity,
+            "needs_reorder": needs_reorder,
+        }
+
+    @staticmethod
+    def _align(keys: np.ndarray, position_keys: np.ndarray, position_values: np.ndarray) -> np.ndarray:
+        """Busca vetorizada do estoque disponível de cada chave (0 quando não há registro)"""
+        if len(position_keys) == 0:
+            return np.zeros(len(keys))
+        order = np.argsort(position_keys)
+        sorted_keys = position_keys[order]
+        positions = np.clip(np.searchsorted(sorted_keys, keys), 0, len(sorted_keys) - 1)
+        found = sorted_keys[positions] == keys
+        return np.where(found, position_values[order][positions], 0)
+
+    @staticmethod
+    def _rows(company_id: UUID, sku_ids: np.ndarray, branch_ids: List[Optional[UUID]],
+              available: np.ndarray, policy: Dict[str, np.ndarray], computed_at: datetime) -> List[Dict[str, Any]]:
+        columns = {name: values.tolist() for name, values in policy.items()}
+        available_list = available.astype(np.int64).tolist()
+        rows = []
+        for i, sku_id in enumerate(sku_ids.tolist()):
+            cover = columns["days_of_cover"][i]
+            rows.append({
+                "company_id": company_id,
+                "sku_id": sku_id,
+                "branch_id": branch_ids[i],
+                "demand_rate": round(columns["demand_rate"][i], 4),
+                "demand_std": round(columns["demand_std"][i], 4),
+                "available_stock": available_list[i],
+                "days_of_cover": None if math.isnan(cover) else round(cover, 1),
+                "safety_stock": int(columns["safety_stock"][i]),
+                "reorder_point": int(columns["reorder_point"][i]),
+                "target_stock": int(columns["target_stock"][i]),
+                "suggested_quantity": int(columns["suggested_quantity"][i]),
+                "needs_reorder": bool(columns["needs_reorder"][i]),
+                "computed_at": computed_at,
+            })
+        return rows
+
+    @staticmethod
+    def compute(db: Session, company_id: UUID, history_days: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Calcula as sugestões por SKU de estoque (empresa toda) e por SKU/filial"""
+        history_days = history_days or settings.REORDER_HISTORY_DAYS
+        recent_days = min(settings.REORDER_RECENT_DAYS, history_days)
+        computed_at = datetime.now(timezone.utc)
+        start = (computed_at - timedelta(days=history_days)).replace(hour=0, minute=0, second=0, microsecond=0)
+        n_days = (computed_at - start).days + 1
+
+        skus, branches, days, quantities, branch_codes = ReorderService._stream_daily_exits(db, company_id, start, n_days)
+        if len(skus) == 0:
+            return []
+
+        policy_args = dict(
+            recent_days=recent_days,
+            lead_time_days=settings.REORDER_LEAD_TIME_DAYS,
+            review_days=settings.REORDER_REVIEW_DAYS,
+            service_level_z=settings.REORDER_SERVICE_LEVEL_Z,
+        )
+
+        # Empresa toda: estoque disponível do SKU de estoque
+        sku_positions = db.query(
+            ProductSKU.id,
+            ProductSKU.current_stock - func.coalesce(ProductSKU.reserved_stock, 0)
+        ).join(Product, ProductSKU.product_id == Product.id).filter(
+            Product.company_id == company_id
+        ).all()
+        position_keys = np.array([row[0] for row in sku_positions], dtype=np.int64)
+        position_values = np.array([row[1] or 0 for row in sku_positions], dtype=np.float64)
+
+        sku_keys, matrix = ReorderService._demand_matrix(skus, days, quantities, n_days)
+        available = ReorderService._align(sku_keys, position_keys, position_values)
+        policy = ReorderService._policy(matrix, available, **policy_args)
+        rows = ReorderService._rows(company_id, sku_keys, [None] * len(sku_keys), available, policy, computed_at)
+
+        # Por filial: chave composta sku * n_filiais + código da filial
+        with_branch = branches >= 0
+        if with_branch.any():
+            n_branches = len(branch_codes)
+            branch_by_code = {code: branch_id for branch_id, code in branch_codes.items()}
+
+            branch_positions = db.query(
+                StockBranch.sku_id,
+                StockBranch.branch_id,
+                StockBranch.current_stock - func.coalesce(StockBranch.reserved_stock, 0)
+            ).join(ProductSKU, StockBranch.sku_id == ProductSKU.id).join(
+                Product, ProductSKU.product_id == Product.id
+            ).filter(
+                and_(
+                    Product.company_id == company_id,
+                    StockBranch.branch_id.in_(list(branch_codes.keys()))
+                )
+            ).all()
+            position_keys = np.array(
+                [row[0] * n_branches + branch_codes[row[1]] for row in branch_positions], dtype=np.int64
+            )
+            position_values = np.array([row[2] or 0 for row in branch_positions], dtype=np.float64)
+
+            composite = skus[with_branch] * n_branches + branches[with_branch]
+            branch_keys, matrix = ReorderService._demand_matrix(composite, days[with_branch], quantities[with_branch], n_days)
+            available = ReorderService._align(branch_keys, position_keys, position_values)
+            policy = ReorderService._policy(matrix, available, **policy_args)
+            rows.extend(ReorderService._rows(
+                company_id,
+                branch_keys // n_branches,
+                [branch_by_code[code] for code in (branch_keys % n_branches).tolist()],
+                available, policy, computed_at
+            ))
+
+        return rows
+
+    @staticmethod
+    def run(db: Session, company_id: UUID, history_days: Optional[int] = None) -> Dict[str, Any]:
+        """Recalcula e substitui as sugestões da empresa em uma transação"""
+        started = time.monotonic()
+        try:
+            rows = ReorderService.compute(db, company_id, history_days)
+            db.execute(delete(ReorderSuggestion).where(ReorderSuggestion.company_id == company_id))
+            for i in range(0, len(rows), STREAM_BATCH_SIZE):
+                db.execute(insert(ReorderSuggestion), rows[i:i + STREAM_BATCH_SIZE])
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        return {
+            "company_id": company_id,
+            "suggestions": len(rows),
+            "needs_reorder": sum(1 for row in rows if row["needs_reorder"]),
+            "elapsed_seconds": round(time.monotonic() - started, 3),
+        }
@@ -0,0 +1,358 @@
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import and_, or_, select, update, insert, func, tuple_
+from sqlalchemy.exc import IntegrityError
+from uuid import UUID
+from app.models.product import Product
+from app.models.product_sku import ProductSKU
+from app.models.customer import Customer
+from app.models.accounts_receivable import AccountsReceivable, ReceivableStatus, ReceivableType
+from app.models.sales_order import SalesOrder, SalesOrderItem, OrderStatus
+from app.schemas.sales_order import SalesOrderCreate
+from app.services.stock_reservation_service import StockReservationService
+
+
+# Transições de status permitidas
+STATUS_TRANSITIONS = {
+    OrderStatus.PENDING: {OrderStatus.CANCELLED},
+    OrderStatus.CONFIRMED: {OrderStatus.PREPARING, OrderStatus.SHIPPED, OrderStatus.CANCELLED},
+    OrderStatus.PREPARING: {OrderStatus.SHIPPED, OrderStatus.CANCELLED},
+    OrderStatus.SHIPPED: {OrderStatus.DELIVERED},
+    OrderStatus.DELIVERED: set(),
+    OrderStatus.CANCELLED: set(),
+}
+
+# Linhas por INSERT multi-linha
+INSERT_BATCH_SIZE = 1000
+
+
+def _digits(value: Optional[str]) -> str:
+    return re.sub(r"\D", "", value or "")
+
+
+def _money(value: float) -> float:
+    return round(value + 1e-9, 2)
+
+
+class SalesOrderService:
+    """Entrada de pedidos de venda em lote.
+
+    Um lote inteiro usa um número fixo de consultas, independente da quantidade de pedidos:
+    pedidos já importados (canal + id externo), SKUs por sku_code/código de barras,
+    clientes, ids dos novos pedidos, bloqueio/reserva do estoque e INSERTs multi-linha
+    de pedidos, itens, reservas e parcelas a receber. Cada pedido é aceito ou recusado
+    por inteiro; os aceitos são gravados em uma única transação.
+    """
+
+    @staticmethod
+    def _existing_orders(db: Session, company_id: UUID, orders: List[SalesOrderCreate]) -> Dict[Tuple[str, str], SalesOrder]:
+        keys = {(order.channel, order.external_id) for order in orders if order.external_id}
+        if not keys:
+            return {}
+        rows = db.query(SalesOrder).filter(
+            and_(
+                SalesOrder.company_id == company_id,
+                tuple_(SalesOrder.channel, SalesOrder.external_id).in_(list(keys))
+            )
+        ).all()
+        return {(row.channel, row.external_id): row for row in rows}
+
+    @staticmethod
+    def _resolve_skus(db: Session, company_id: UUID, codes: List[str]) -> Dict[str, ProductSKU]:
+        """sku_code/código de barras -> SKU ativo, em uma consulta (sku_code tem prioridade)"""
+        if not codes:
+            return {}
+        skus = db.query(ProductSKU).join(Product, ProductSKU.product_id == Product.id).filter(
+            and_(
+                Product.company_id == company_id,
+                ProductSKU.is_active == True,
+                or_(ProductSKU.sku_code.in_(codes), ProductSKU.barcode.in_(codes))
+            )
+        ).order_by(ProductSKU.is_stock_sku.desc(), ProductSKU.id).all()
+
+        by_sku_code = {sku.sku_code: sku for sku in skus}
+        resolved: Dict[str, ProductSKU] = {}
+        for sku in skus:
+            # SKUs associados copiam o código de barras do SKU de estoque; o primeiro (estoque) prevalece
+            if sku.barcode and sku.barcode not in resolved:
+                resolved[sku.barcode] = sku
+        resolved.update(by_sku_code)
+        return resolved
+
+    @staticmethod
+    def _resolve_customers(db: Session, company_id: UUID, orders: List[SalesOrderCreate]) -> Tuple[set, Dict[str, int]]:
+        """Clientes informados por id ou CPF/CNPJ, em uma consulta"""
+        customer_ids = {order.customer_id for order in orders if order.customer_id}
+        documents = {_digits(order.customer_document) for order in orders if not order.customer_id and order.customer_document}
+        documents.discard("")
+        if not customer_ids and not documents:
+            return set(), {}
+
+        conditions = []
+        if customer_ids:
+            conditions.append(Customer.id.in_(customer_ids))
+        if documents:
+            conditions.append(func.regexp_replace(Customer.cpf, "[^0-9]", "", "g").in_(documents))
+            conditions.append(func.regexp_replace(Customer.cnpj, "[^0-9]", "", "g").in_(documents))
+
+        rows = db.query(Customer.id, Customer.cpf, Customer.cnpj).filter(
+            and_(Customer.company_id == company_id, or_(*conditions))
+        ).all()
+        found_ids = {row.id for row in rows}
+        by_document: Dict[str, int] = {}
+        for row in rows:
+            for document in (_digits(row.cpf), _digits(row.cnpj)):
+                if document:
+                    by_document.setdefault(document, row.id)
+        return found_ids, by_document
+
+    @staticmethod
+    def _installments(number: str, company_id: UUID, customer_id: int, order: SalesOrderCreate,
+                      total: float, order_date: datetime) -> List[Dict[str, Any]]:
+        count = order.installments
+        first_due = order.first_due_date or (
+            order_date.date() if count == 1 else order_date.date() + timedelta(days=order.installment_interval_days)
+        )
+        amount = _money(total / count)
+        rows = []
+        for i in range(count):
+            # Última parcela absorve a diferença de centavos
+            value = _money(total - amount * i) if i == count - 1 else amount
+            rows.append({
+                "company_id": company_id,
+                "customer_id": customer_id,
+                "description": f"Pedido {number}" if count == 1 else f"Pedido {number} - Parcela {i + 1}/{count}",
+                "receivable_type": ReceivableType.CASH if count == 1 else ReceivableType.INSTALLMENT,
+                "status": ReceivableStatus.PENDING,
+                "total_amount": value,
+                "paid_amount": 0,
+                "entry_date": order_date.date(),
+                "due_date": first_due + timedelta(days=order.installment_interval_days * i),
+                "installment_number": i + 1,
+                "total_installments": count,
+                "installment_amount": value,
+                "notes": order.payment_method,
+                "reference": number,
+            })
+        return rows
+
+    @staticmethod
+    def _ingest(db: Session, company_id: UUID, orders: List[SalesOrderCreate]) -> List[Dict[str, Any]]:
+        results: List[Dict[str, Any]] = [{"index": i, "status": "rejected", "errors": []} for i in range(len(orders))]
+
+        existing = SalesOrderService._existing_orders(db, company_id, orders)
+        skus = SalesOrderService._resolve_skus(db, company_id, sorted({item.code.strip() for order in orders for item in order.items}))
+        customer_ids, customers_by_document = SalesOrderService._resolve_customers(db, company_id, orders)
+
+        # Validação: duplicados, SKUs e clientes
+        candidates = []
+        seen = set()
+        for i, order in enumerate(orders):
+            result = results[i]
+            key = (order.channel, order.external_id) if order.external_id else None
+            if key and (key in existing or key in seen):
+                result["status"] = "duplicate"
+                if key in existing:
+                    result["order_id"] = existing[key].id
+                    result["order_number"] = existing[key].number
+                continue
+            if key:
+                seen.add(key)
+
+            if order.customer_id:
+                customer_id = order.customer_id if order.customer_id in customer_ids else None
+            else:
+                customer_id = customers_by_document.get(_digits(order.customer_document))
+            if customer_id is None:
+                result["errors"].append("Cliente não encontrado")
+
+            unknown = [item.code for item in order.items if item.code.strip() not in skus]
+            if unknown:
+                result["errors"].append(f"SKUs não encontrados: {unknown}")
+            if result["errors"]:
+                continue
+
+            candidates.append((i, order, customer_id))
+
+        if not candidates:
+            return results
+
+        # Ids dos novos pedidos em uma consulta (a referência da reserva usa o id)
+        order_ids = db.execute(
+            select(func.nextval("sales_orders_id_seq")).select_from(func.generate_series(1, len(candidates)))
+        ).scalars().all()
+
+        reservation_requests = []
+        for (i, order, customer_id), order_id in zip(candidates, order_ids):
+            reservation_requests.append({
+                "reference": f"order:{order_id}",
+                "branch_id": order.branch_id,
+                "items": [
+                    {
+                        "sku_id": skus[item.code.strip()].id,
+                        "stock_sku_id": skus[item.code.strip()].stock_sku_id or skus[item.code.strip()].id,
+                        "quantity": item.quantity,
+                    }
+                    for item in order.items
+                ],
+            })
+        rejected = StockReservationService.reserve_many(db, company_id, reservation_requests)
+        codes_by_stock_sku = {}
+        if rejected:
+            codes_by_stock_sku = dict(db.query(ProductSKU.id, ProductSKU.sku_code).filter(
+                ProductSKU.id.in_({sku_id for short in rejected.values() for sku_id in short})
+            ).all())
+
+        now = datetime.now(timezone.utc)
+        order_rows, item_rows, receivable_rows = [], [], []
+        for (i, order, customer_id), order_id in zip(candidates, order_ids):
+            result = results[i]
+            short = rejected.get(f"order:{order_id}")
+            if short:
+                result["errors"].append(
+                    f"Estoque insuficiente: {[codes_by_stock_sku.get(sku_id, sku_id) for sku_id in short]}"
+                )
+                continue
+
+            order_date = order.order_date or now
+            subtotal = 0.0
+            for item in order.items:
+                sku = skus[item.code.strip()]
+                unit_price = item.unit_price if item.unit_price is not None else sku.effective_price
+                line_total = _money(unit_price * item.quantity - item.discount_amount)
+                subtotal += line_total
+                item_rows.append({
+                    "order_id": order_id,
+                    "product_id": sku.product_id,
+                    "sku_id": sku.id,
+                    "stock_sku_id": sku.stock_sku_id or sku.id,
+                    "code": item.code,
+                    "quantity": item.quantity,
+                    "unit_price": unit_price,
+                    "discount_amount": item.discount_amount,
+                    "total_amount": line_total,
+                })
+            total = _money(subtotal - order.discount_amount + order.shipping_amount)
+            number = order.order_number or f"PED-{order_id:06d}"
+
+            order_rows.append({
+                "id": order_id,
+                "company_id": company_id,
+                "customer_id": customer_id,
+                "branch_id": order.branch_id,
+                "order_number": order.order_number,
+                "channel": order.channel,
+                "external_id": order.external_id,
+                "status": OrderStatus.CONFIRMED,
+                "payment_method": order.payment_method,
+                "installments": order.installments,
+                "subtotal": _money(subtotal),
+                "discount_amount": order.discount_amount,
+                "shipping_amount": order.shipping_amount,
+                "total_amount": total,
+                "order_date": order_date,
+                "notes": order.notes,
+            })
+            if total > 0:
+                receivable_rows.extend(SalesOrderService._installments(
+                    number, company_id, customer_id, order, total, order_date
+                ))
+            result.update({"status": "created", "order_id": order_id, "order_number": number})
+
+        for table, rows in ((SalesOrder, order_rows), (SalesOrderItem, item_rows), (AccountsReceivable, receivable_rows)):
+            for start in range(0, len(rows), INSERT_BATCH_SIZE):
+                db.execute(insert(table), rows[start:start + INSERT_BATCH_SIZE])
+
+        return results
+
+    @staticmethod
+    def ingest(db: Session, company_id: UUID, orders: List[SalesOrderCreate]) -> Dict[str, Any]:
+        """Importa um lote de pedidos (idempotente por canal + id externo)"""
+        started = time.monotonic()
+        # Outro lote concorrente pode gravar o mesmo id externo: refazer uma vez (vira duplicado)
+        for attempt in range(2):
+            try:
+                results = SalesOrderService._ingest(db, company_id, orders)
+                db.commit()
+                break
+            except IntegrityError:
+                db.rollback()
+                if attempt:
+                    raise
+            except Exception:
+                db.rollback()
+                raise
+
+        return {
+            "created": sum(1 for result in results if result["status"] == "created"),
+            "duplicates": sum(1 for result in results if result["status"] == "duplicate"),
+            "rejected": sum(1 for result in results if result["status"] == "rejected"),
+            "results": results,
+            "elapsed_seconds": round(time.monotonic() - started, 3),
+        }
+
+    @staticmethod
+    def get_order(db: Session, company_id: UUID, order_id: int, lock: bool = False) -> Optional[SalesOrder]:
+        query = db.query(SalesOrder).filter(
+            and_(
+                SalesOrder.id == order_id,
+                SalesOrder.company_id == company_id
+            )
+        )
+        if lock:
+            return query.with_for_update().first()
+        return query.options(joinedload(SalesOrder.items), joinedload(SalesOrder.customer)).first()
+
+    @staticmethod
+    def _ship(db: Session, company_id: UUID, user_id: Optional[UUID], order: SalesOrder) -> None:
+        """Converte a reserva em saída de estoque (baixa da reserva com movimentações EXIT em lote)"""
+        result = StockReservationService.consume(
+            db, company_id, order.reservation_reference, user_id,
+            reference_document=order.number, reference_id=order.id, commit=False
+        )
+        if not result["affected"]:
+            raise ValueError(f"Pedido {order.number} sem reserva de estoque para baixar")
+        order.shipped_at = func.now()
+
+    @staticmethod
+    def update_status(db: Session, company_id: UUID, user_id: Optional[UUID], order_id: int,
+                      new_status: OrderStatus) -> SalesOrder:
+        """Altera o status do pedido aplicando os efeitos no estoque e nas contas a receber"""
+        try:
+            order = SalesOrderService.get_order(db, company_id, order_id, lock=True)
+            if not order:
+                raise LookupError("Pedido não encontrado")
+            if new_status not in STATUS_TRANSITIONS[order.status]:
+                raise ValueError(f"Transição de status inválida: {order.status.value} -> {new_status.value}")
+
+            if new_status == OrderStatus.SHIPPED:
+                SalesOrderService._ship(db, company_id, user_id, order)
+            elif new_status == OrderStatus.DELIVERED:
+                order.delivered_at = func.now()
+            elif new_status == OrderStatus.CANCELLED:
+                StockReservationService.release(db, company_id, order.reservation_reference, commit=False)
+                # Parcelas ainda não recebidas são canceladas
+                db.execute(
+                    update(AccountsReceivable)
+                    .where(
+                        and_(
+                            AccountsReceivable.company_id == company_id,
+                            AccountsReceivable.customer_id == order.customer_id,
+                            AccountsReceivable.reference == order.number,
+                            AccountsReceivable.status == ReceivableStatus.PENDING
+                        )
+                    )
+                    .values(status=ReceivableStatus.CANCELLED)
+                    .execution_options(synchronize_session=False)
+                )
+
+            order.status = new_status
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        return SalesOrderService.get_order(db, company_id, order_id)
@@ -0,0 +1,144 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any, Tuple
+from sqlalchemy.orm import Session
+from sqlalchemy import and_
+from uuid import UUID
+from app.core.config import settings
+from app.models.product import Product
+from app.models.product_sku import ProductSKU
+
+
+class _TenantIndex:
+    """Mapa código -> registro compacto de SKU de uma empresa"""
+
+    __slots__ = ("by_sku_code", "by_barcode", "loaded_at")
+
+    def __init__(self, by_sku_code: Dict[str, Dict[str, Any]], by_barcode: Dict[str, Dict[str, Any]]):
+        self.by_sku_code = by_sku_code
+        self.by_barcode = by_barcode
+        self.loaded_at = time.monotonic()
+
+
+class SKULookupCache:
+    """Cache em memória (por processo) para resolver código de SKU/código de barras.
+
+    O índice de cada empresa é carregado com uma única consulta na primeira leitura e
+    descartado quando um SKU da empresa é criado, alterado ou removido. Como cada worker
+    tem seu próprio cache, o índice também expira após SKU_LOOKUP_CACHE_TTL segundos para
+    absorver alterações feitas em outros processos.
+    """
+
+    def __init__(self, ttl_seconds: int, max_tenants: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_tenants = max_tenants
+        self._indexes: "OrderedDict[UUID, _TenantIndex]" = OrderedDict()
+        self._generations: Dict[UUID, int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _build_index(db: Session, company_id: UUID) -> _TenantIndex:
+        rows = db.query(
+            ProductSKU.id,
+            ProductSKU.product_id,
+            ProductSKU.sku_code,
+            ProductSKU.barcode,
+            ProductSKU.variant_description,
+            ProductSKU.sale_price,
+            ProductSKU.promotional_price,
+            ProductSKU.promotional_starts_at,
+            ProductSKU.promotional_ends_at,
+            ProductSKU.wholesale_price,
+            ProductSKU.is_available_for_sale,
+            ProductSKU.is_stock_sku,
+            ProductSKU.stock_sku_id,
+            Product.name.label("product_name")
+        ).join(Product, ProductSKU.product_id == Product.id).filter(
+            and_(
+                Product.company_id == company_id,
+                ProductSKU.is_active == True
+            )
+        ).order_by(ProductSKU.is_stock_sku.desc(), ProductSKU.id).yield_per(5000)
+
+        by_sku_code: Dict[str, Dict[str, Any]] = {}
+        by_barcode: Dict[str, Dict[str, Any]] = {}
+        for row in rows:
+            record = {
+                "sku_id": row.id,
+                "product_id": row.product_id,
+                "product_name": row.product_name,
+                "sku_code": row.sku_code,
+                "barcode": row.barcode,
+                "variant_description": row.variant_description,
+                "sale_price": row.sale_price,
+                "promotional_price": row.promotional_price,
+                "promotional_starts_at": row.promotional_starts_at,
+                "promotional_ends_at": row.promotional_ends_at,
+                "wholesale_price": row.wholesale_price,
+                "is_available_for_sale": row.is_available_for_sale,
+                "stock_sku_id": row.stock_sku_id,
+            }
+            by_sku_code[row.sku_code] = record
+            # SKUs associados copiam o código de barras do SKU de estoque; o primeiro (estoque) prevalece
+            if row.barcode and row.barcode not in by_barcode:
+                by_barcode[row.barcode] = record
+
+        return _TenantIndex(by_sku_code, by_barcode)
+
+    def _get_index(self, db: Session, company_id: UUID) -> _TenantIndex:
+        with self._lock:
+            index = self._indexes.get(company_id)
+            if index is not None and time.monotonic() - index.loaded_at < self.ttl_seconds:
+                self._indexes.move_to_end(company_id)
+                return index
+            generation = self._generations.get(company_id, 0)
+
+        # Carregar fora do lock para não bloquear outras empresas
+        index = self._build_index(db, company_id)
+
+        with self._lock:
+            # Uma invalidação durante o carregamento torna este índice obsoleto: não guardar
+            if self._generations.get(company_id, 0) != generation:
+                return index
+            self._indexes[company_id] = index
+            self._indexes.move_to_end(company_id)
+            while len(self._indexes) > self.max_tenants:
+                self._indexes.popitem(last=False)
+        return index
+
+    def lookup(self, db: Session, company_id: UUID, code: str) -> Optional[Dict[str, Any]]:
+        """Resolve um código (sku_code tem prioridade sobre barcode)"""
+        index = self._get_index(db, company_id)
+        code = code.strip()
+        return index.by_sku_code.get(code) or index.by_barcode.get(code)
+
+    def lookup_many(self, db: Session, company_id: UUID, codes: List[str]) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """Resolve vários códigos de uma vez; retorna (encontrados, não encontrados)"""
+        index = self._get_index(db, company_id)
+        found: Dict[str, Dict[str, Any]] = {}
+        missing: List[str] = []
+        for code in codes:
+            key = code.strip()
+            record = index.by_sku_code.get(key) or index.by_barcode.get(key)
+            if record is None:
+                missing.append(code)
+            else:
+                found[code] = record
+        return found, missing
+
+    def invalidate(self, company_id: UUID) -> None:
+        """Descarta o índice da empresa (chamar após criar/alterar/remover SKUs)"""
+        with self._lock:
+            self._indexes.pop(company_id, None)
+            self._generations[company_id] = self._generations.get(company_id, 0) + 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._indexes.clear()
+
+
+sku_lookup_cache = SKULookupCache(
+    ttl_seconds=settings.SKU_LOOKUP_CACHE_TTL,
+    max_tenants=settings.SKU_LOOKUP_CACHE_MAX_TENANTS
+)
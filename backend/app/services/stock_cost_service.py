@@ -0,0 +1,195 @@
+from typing import Dict, Any, Optional, Tuple
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, select, update, func, bindparam
+from uuid import UUID
+from app.models.product import Product
+from app.models.product_sku import ProductSKU
+from app.models.stock_branch import StockBranch
+from app.models.stock_movement import StockMovement, MovementType, MovementReason
+
+
+# Linhas lidas do cursor do servidor / gravadas por executemany
+BACKFILL_BATCH_SIZE = 10000
+
+
+class StockCostService:
+    """Custo médio ponderado móvel por SKU e por SKU/filial.
+
+    Cada entrada com custo unitário recalcula o custo médio em O(1) a partir do estoque
+    anterior e do custo médio anterior, na mesma transação da movimentação. Saídas e
+    ajustes não alteram o custo médio (são valorizadas por ele); a entrada de uma
+    transferência altera apenas o custo médio da filial de destino.
+    """
+
+    @staticmethod
+    def moving_average(previous_stock: int, previous_cost: Optional[float], quantity: int,
+                       unit_cost: Optional[float]) -> Optional[float]:
+        """Novo custo médio após a entrada de `quantity` unidades a `unit_cost`"""
+        if unit_cost is None or quantity <= 0:
+            return previous_cost
+        # Estoque negativo/zerado ou sem custo anterior: o custo da entrada passa a ser o médio
+        base = max(previous_stock or 0, 0)
+        if previous_cost is None or base == 0:
+            return round(unit_cost, 6)
+        return round((base * previous_cost + quantity * unit_cost) / (base + quantity), 6)
+
+    @staticmethod
+    def current_unit_cost(sku: ProductSKU, branch_stock: Optional[StockBranch] = None) -> float:
+        """Custo unitário vigente: médio da filial, médio do SKU ou preço de custo cadastrado"""
+        if branch_stock is not None and branch_stock.average_cost is not None:
+            return branch_stock.average_cost
+        if sku.average_cost is not None:
+            return sku.average_cost
+        return sku.cost_price or 0.0
+
+    @staticmethod
+    def apply_entry(sku: ProductSKU, previous_stock: int, quantity: int, unit_cost: Optional[float],
+                    branch_stock: Optional[StockBranch] = None, branch_previous_stock: int = 0) -> None:
+        """Atualiza o custo médio do SKU (e da filial) para uma entrada; chamar antes do commit"""
+        sku.average_cost = StockCostService.moving_average(previous_stock, sku.average_cost, quantity, unit_cost)
+        if branch_stock is not None:
+            branch_stock.average_cost = StockCostService.moving_average(
+                branch_previous_stock, branch_stock.average_cost, quantity, unit_cost
+            )
+
+    @staticmethod
+    def valuation(db: Session, company_id: UUID, branch_id: Optional[UUID] = None) -> Dict[str, Any]:
+        """Valor do estoque ao custo médio em uma única agregação"""
+        if branch_id:
+            unit_cost = func.coalesce(StockBranch.average_cost, ProductSKU.average_cost, ProductSKU.cost_price, 0)
+            row = db.query(
+                func.coalesce(func.sum(StockBranch.current_stock * unit_cost), 0).label("value"),
+                func.coalesce(func.sum(StockBranch.current_stock), 0).label("units"),
+                func.count(StockBranch.id).label("skus")
+            ).join(ProductSKU, StockBranch.sku_id == ProductSKU.id).join(
+                Product, ProductSKU.product_id == Product.id
+            ).filter(
+                and_(
+                    Product.company_id == company_id,
+                    StockBranch.branch_id == branch_id,
+                    StockBranch.current_stock > 0
+                )
+            ).one()
+        else:
+            unit_cost = func.coalesce(ProductSKU.average_cost, ProductSKU.cost_price, 0)
+            row = db.query(
+                func.coalesce(func.sum(ProductSKU.current_stock * unit_cost), 0).label("value"),
+                func.coalesce(func.sum(ProductSKU.current_stock), 0).label("units"),
+                func.count(ProductSKU.id).label("skus")
+            ).join(Product, ProductSKU.product_id == Product.id).filter(
+                and_(
+                    Product.company_id == company_id,
+                    ProductSKU.current_stock > 0
+                )
+            ).one()
+
+        return {
+            "branch_id": branch_id,
+            "total_stock_value": round(float(row.value), 2),
+            "total_units": int(row.units),
+            "skus_in_stock": row.skus,
+        }
+
+    @staticmethod
+    def _flush(db: Session, sku_rows, branch_rows) -> None:
+        if sku_rows:
+            db.execute(
+                update(ProductSKU.__table__)
+                .where(ProductSKU.__table__.c.id == bindparam("b_sku_id"))
+                .values(average_cost=bindparam("b_average_cost")),
+                sku_rows
+            )
+            sku_rows.clear()
+        if branch_rows:
+            db.execute(
+                update(StockBranch.__table__)
+                .where(
+                    and_(
+                        StockBranch.__table__.c.sku_id == bindparam("b_sku_id"),
+                        StockBranch.__table__.c.branch_id == bindparam("b_branch_id")
+                    )
+                )
+                .values(average_cost=bindparam("b_average_cost")),
+                branch_rows
+            )
+            branch_rows.clear()
+
+    @staticmethod
+    def backfill(db: Session, company_id: Optional[UUID] = None) -> Dict[str, Any]:
+        """Recalcula o custo médio a partir do histórico em uma passada (ordenada por SKU e data).
+
+        O estoque anterior do SKU vem da própria movimentação; o da filial é acumulado a
+        partir das movimentações da filial. SKUs sem entrada com custo não são alterados.
+        Partições arquivadas não fazem parte do histórico lido.
+        """
+        stmt = select(
+            StockMovement.sku_id,
+            StockMovement.branch_id,
+            StockMovement.movement_type,
+            StockMovement.movement_reason,
+            StockMovement.quantity,
+            StockMovement.previous_stock,
+            StockMovement.current_stock,
+            StockMovement.unit_cost
+        ).order_by(StockMovement.sku_id, StockMovement.created_at, StockMovement.id)
+        if company_id:
+            stmt = stmt.where(StockMovement.company_id == company_id)
+
+        sku_rows, branch_rows = [], []
+        skus = branches = movements = 0
+        current_sku = None
+        sku_cost: Optional[float] = None
+        branch_state: Dict[UUID, Tuple[int, Optional[float]]] = {}
+
+        def finish_sku():
+            nonlocal skus, branches
+            if sku_cost is not None:
+                sku_rows.append({"b_sku_id": current_sku, "b_average_cost": sku_cost})
+                skus += 1
+            for branch_id, (_, cost) in branch_state.items():
+                if cost is not None:
+                    branch_rows.append({"b_sku_id": current_sku, "b_branch_id": branch_id, "b_average_cost": cost})
+                    branches += 1
+
+        try:
+            result = db.execute(stmt.execution_options(stream_results=True, yield_per=BACKFILL_BATCH_SIZE))
+            for row in result:
+                movements += 1
+                if row.sku_id != current_sku:
+                    if current_sku is not None:
+                        finish_sku()
+                    current_sku, sku_cost, branch_state = row.sku_id, None, {}
+                    if len(sku_rows) + len(branch_rows) >= BACKFILL_BATCH_SIZE:
+                        StockCostService._flush(db, sku_rows, branch_rows)
+
+                entry = row.movement_type == MovementType.ENTRY
+                if entry:
+                    sku_cost = StockCostService.moving_average(row.previous_stock, sku_cost, row.quantity, row.unit_cost)
+
+                if row.branch_id is not None:
+                    branch_stock, branch_cost = branch_state.get(row.branch_id, (0, None))
+                    # Transferências não mudam o estoque do SKU: a variação da filial é a própria quantidade
+                    transfer = row.movement_type == MovementType.TRANSFER
+                    transfer_in = transfer and row.movement_reason == MovementReason.TRANSFER_IN
+                    if transfer:
+                        delta = row.quantity if transfer_in else -row.quantity
+                    else:
+                        delta = row.current_stock - row.previous_stock
+                    if entry or transfer_in:
+                        branch_cost = StockCostService.moving_average(branch_stock, branch_cost, row.quantity, row.unit_cost)
+                    branch_state[row.branch_id] = (branch_stock + delta, branch_cost)
+
+            if current_sku is not None:
+                finish_sku()
+            StockCostService._flush(db, sku_rows, branch_rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        return {
+            "company_id": company_id,
+            "movements": movements,
+            "skus_updated": skus,
+            "branch_stocks_updated": branches,
+        }
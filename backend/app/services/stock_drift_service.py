@@ -0,0 +1,220 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, select, update, func, case
+from uuid import UUID
+from app.core.config import settings
+from app.models.company import Company
+from app.models.product import Product
+from app.models.product_sku import ProductSKU
+from app.models.stock_branch import StockBranch
+from app.models.stock_movement import StockMovement, MovementType, MovementReason
+
+
+class StockDriftService:
+    """Conferência do estoque gravado contra o histórico de movimentações.
+
+    SKU: o estoque esperado é o current_stock da movimentação mais recente (ajustes gravam
+    o saldo absoluto, então não basta somar quantidades). Filial: soma das variações das
+    movimentações da filial (transferências pela própria quantidade). As agregações rodam no
+    banco por faixas de SKUs; cada empresa é uma tarefa independente no pool de processos.
+
+    A divergência de filial é apenas informada, nunca corrigida: o saldo da filial também é
+    gravado sem movimentação (saldo inicial e edição do estoque da filial, movimentações
+    anteriores a branch_id), então a soma do histórico não é um saldo confiável. Partições
+    arquivadas também não entram nessa soma.
+
+    A correção bloqueia os SKUs divergentes na mesma ordem da movimentação individual e
+    recalcula o esperado antes de gravar, para não sobrescrever uma movimentação concorrente.
+    """
+
+    @staticmethod
+    def _chunks(db: Session, company_id: UUID, chunk_size: int) -> List[Tuple[int, int]]:
+        """Faixas [início, fim] de ids de SKU da empresa com até chunk_size SKUs cada"""
+        bounds = []
+        last_id = 0
+        while True:
+            base = select(ProductSKU.id).join(Product, ProductSKU.product_id == Product.id).where(
+                and_(Product.company_id == company_id, ProductSKU.id > last_id)
+            ).order_by(ProductSKU.id)
+            first = db.execute(base.limit(1)).scalar()
+            if first is None:
+                return bounds
+            upper = db.execute(base.offset(chunk_size - 1).limit(1)).scalar()
+            if upper is None:
+                upper = db.execute(
+                    select(func.max(ProductSKU.id)).join(Product, ProductSKU.product_id == Product.id)
+                    .where(Product.company_id == company_id)
+                ).scalar()
+                bounds.append((first, upper))
+                return bounds
+            bounds.append((first, upper))
+            last_id = upper
+
+    @staticmethod
+    def _sku_filter(column, sku_range: Optional[Tuple[int, int]], sku_ids: Optional[List[int]]):
+        if sku_ids is not None:
+            return column.in_(sku_ids)
+        return column.between(*sku_range)
+
+    @staticmethod
+    def _sku_drift(db: Session, company_id: UUID, sku_range=None, sku_ids=None):
+        latest = select(
+            StockMovement.sku_id,
+            StockMovement.current_stock.label("expected")
+        ).where(
+            and_(
+                StockMovement.company_id == company_id,
+                StockDriftService._sku_filter(StockMovement.sku_id, sku_range, sku_ids)
+            )
+        ).distinct(StockMovement.sku_id).order_by(
+            StockMovement.sku_id, StockMovement.created_at.desc(), StockMovement.id.desc()
+        ).subquery("latest")
+
+        return db.execute(
+            select(
+                ProductSKU.id,
+                ProductSKU.sku_code,
+                ProductSKU.current_stock,
+                latest.c.expected
+            ).join(
+                latest, latest.c.sku_id == ProductSKU.id
+            ).where(
+                func.coalesce(ProductSKU.current_stock, 0) != latest.c.expected
+            ).order_by(ProductSKU.id)
+        ).all()
+
+    @staticmethod
+    def _branch_drift(db: Session, company_id: UUID, sku_range=None, sku_ids=None):
+        delta = case(
+            (
+                and_(
+                    StockMovement.movement_type == MovementType.TRANSFER,
+                    StockMovement.movement_reason == MovementReason.TRANSFER_IN
+                ),
+                StockMovement.quantity
+            ),
+            (StockMovement.movement_type == MovementType.TRANSFER, -StockMovement.quantity),
+            else_=StockMovement.current_stock - StockMovement.previous_stock
+        )
+        history = select(
+            StockMovement.sku_id,
+            StockMovement.branch_id,
+            func.sum(delta).label("expected")
+        ).where(
+            and_(
+                StockMovement.company_id == company_id,
+                StockMovement.branch_id.isnot(None),
+                StockDriftService._sku_filter(StockMovement.sku_id, sku_range, sku_ids)
+            )
+        ).group_by(StockMovement.sku_id, StockMovement.branch_id).subquery("history")
+
+        return db.execute(
+            select(
+                StockBranch.id,
+                StockBranch.sku_id,
+                StockBranch.branch_id,
+                StockBranch.current_stock,
+                history.c.expected
+            ).join(
+                history,
+                and_(
+                    history.c.sku_id == StockBranch.sku_id,
+                    history.c.branch_id == StockBranch.branch_id
+                )
+            ).where(
+                func.coalesce(StockBranch.current_stock, 0) != history.c.expected
+            ).order_by(StockBranch.sku_id, StockBranch.branch_id)
+        ).all()
+
+    @staticmethod
+    def _repair(db: Session, company_id: UUID, sku_ids: List[int]) -> int:
+        """Recalcula e corrige o estoque total dos SKUs informados sob bloqueio (ordem de id)"""
+        db.execute(
+            select(ProductSKU.id).where(ProductSKU.id.in_(sku_ids)).order_by(ProductSKU.id).with_for_update()
+        ).all()
+        sku_rows = StockDriftService._sku_drift(db, company_id, sku_ids=sku_ids)
+        if sku_rows:
+            db.execute(update(ProductSKU), [{"id": row.id, "current_stock": row.expected} for row in sku_rows])
+        db.commit()
+        return len(sku_rows)
+
+    @staticmethod
+    def verify(db: Session, company_id: UUID, repair: bool = False, branches: bool = True,
+               chunk_size: Optional[int] = None) -> Dict[str, Any]:
+        """Confere o estoque de uma empresa faixa a faixa de SKUs (repair corrige só o total do SKU)"""
+        chunk_size = chunk_size or settings.STOCK_DRIFT_CHUNK_SKUS
+        sample_size = settings.STOCK_DRIFT_SAMPLE_SIZE
+        started = time.monotonic()
+        report: Dict[str, Any] = {
+            "company_id": company_id,
+            "skus_with_drift": 0,
+            "branch_stocks_with_drift": 0,
+            "skus_repaired": 0,
+            "samples": [],
+        }
+
+        try:
+            for sku_range in StockDriftService._chunks(db, company_id, chunk_size):
+                sku_rows = StockDriftService._sku_drift(db, company_id, sku_range=sku_range)
+                branch_rows = StockDriftService._branch_drift(db, company_id, sku_range=sku_range) if branches else []
+                # Leitura sem bloqueio: encerrar a transação da faixa
+                db.rollback()
+
+                report["skus_with_drift"] += len(sku_rows)
+                report["branch_stocks_with_drift"] += len(branch_rows)
+                for row in sku_rows:
+                    if len(report["samples"]) >= sample_size:
+                        break
+                    report["samples"].append({
+                        "sku_id": row.id, "sku_code": row.sku_code, "branch_id": None,
+                        "recorded": row.current_stock, "expected": row.expected,
+                    })
+                for row in branch_rows:
+                    if len(report["samples"]) >= sample_size:
+                        break
+                    report["samples"].append({
+                        "sku_id": row.sku_id, "sku_code": None, "branch_id": row.branch_id,
+                        "recorded": row.current_stock, "expected": row.expected,
+                    })
+
+                if repair and sku_rows:
+                    report["skus_repaired"] += StockDriftService._repair(db, company_id, [row.id for row in sku_rows])
+        except Exception:
+            db.rollback()
+            raise
+
+        report["elapsed_seconds"] = round(time.monotonic() - started, 3)
+        return report
+
+    @staticmethod
+    def verify_companies(db: Session, company_ids: Optional[List[UUID]] = None, repair: bool = False,
+                         branches: bool = True, workers: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Confere várias empresas (todas quando vazio), uma por tarefa no pool de processos"""
+        if company_ids is None:
+            company_ids = [row[0] for row in db.execute(select(Company.id).order_by(Company.id)).all()]
+            db.rollback()
+        workers = min(workers or settings.STOCK_DRIFT_WORKERS, len(company_ids))
+
+        if workers <= 1:
+            return [StockDriftService.verify(db, company_id, repair, branches) for company_id in company_ids]
+
+        # spawn: cada processo cria a própria engine (conexões não são herdadas do processo pai)
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            return list(pool.map(
+                _verify_company_task, company_ids, [repair] * len(company_ids), [branches] * len(company_ids)
+            ))
+
+
+def _verify_company_task(company_id: UUID, repair: bool, branches: bool) -> Dict[str, Any]:
+    """Tarefa do pool: sessão própria por empresa"""
+    from app.core.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return StockDriftService.verify(db, company_id, repair, branches)
+    finally:
+        db.close()
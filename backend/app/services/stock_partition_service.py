@@ -0,0 +1,104 @@
+import re
+from datetime import date
+from typing import List, Dict, Any, Optional
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from app.core.config import settings
+
+
+# Partições mensais criadas por stock_movements_create_partition()
+PARTITION_NAME = re.compile(r"^stock_movements_(\d{4})_(\d{2})$")
+
+
+class StockPartitionService:
+    """Manutenção das partições mensais de stock_movements.
+
+    As partições futuras são criadas antecipadamente para que a partição padrão
+    (stock_movements_default) fique vazia; se a manutenção atrasar, as linhas do mês que
+    caíram na padrão são movidas para a partição quando ela é criada. Partições antigas são
+    desanexadas e movidas para o schema de arquivo, deixando de pesar nas consultas e
+    inserções do dia a dia.
+    """
+
+    @staticmethod
+    def _add_months(month: date, months: int) -> date:
+        index = month.year * 12 + month.month - 1 + months
+        return date(index // 12, index % 12 + 1, 1)
+
+    @staticmethod
+    def ensure_partitions(db: Session, months_ahead: Optional[int] = None) -> List[str]:
+        """Garante as partições do mês corrente e dos próximos meses"""
+        months_ahead = settings.STOCK_MOVEMENT_PARTITIONS_AHEAD if months_ahead is None else months_ahead
+        current = date.today().replace(day=1)
+        names = []
+        for offset in range(months_ahead + 1):
+            month = StockPartitionService._add_months(current, offset)
+            names.append(db.execute(
+                text("SELECT stock_movements_create_partition(:month)"), {"month": month}
+            ).scalar())
+        db.commit()
+        return names
+
+    @staticmethod
+    def list_partitions(db: Session) -> List[Dict[str, Any]]:
+        """Partições anexadas à tabela, com mês e estimativa de linhas"""
+        rows = db.execute(text("""
+            SELECT child.relname AS name, child.reltuples::bigint AS estimated_rows
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = 'stock_movements'
+            ORDER BY child.relname
+        """)).all()
+
+        partitions = []
+        for row in rows:
+            match = PARTITION_NAME.match(row.name)
+            partitions.append({
+                "name": row.name,
+                "month": date(int(match.group(1)), int(match.group(2)), 1) if match else None,
+                "estimated_rows": max(row.estimated_rows, 0),
+            })
+        return partitions
+
+    @staticmethod
+    def archive_partitions(db: Session, retention_months: Optional[int] = None,
+                           dry_run: bool = False) -> List[str]:
+        """Desanexa as partições mais antigas que a retenção e move para o schema de arquivo.
+
+        O arquivamento só troca a tabela de schema (e, com STOCK_MOVEMENT_ARCHIVE_TABLESPACE,
+        de tablespace): os dados não são comprimidos e ocupam o mesmo espaço. As tabelas
+        arquivadas continuam consultáveis em <schema>.<partição>; o ganho é tirá-las das
+        consultas e índices da tabela principal e, com o tablespace, do volume principal.
+        """
+        retention_months = settings.STOCK_MOVEMENT_RETENTION_MONTHS if retention_months is None else retention_months
+        cutoff = StockPartitionService._add_months(date.today().replace(day=1), -retention_months)
+        schema = settings.STOCK_MOVEMENT_ARCHIVE_SCHEMA
+        tablespace = settings.STOCK_MOVEMENT_ARCHIVE_TABLESPACE
+
+        expired = [
+            partition["name"]
+            for partition in StockPartitionService.list_partitions(db)
+            if partition["month"] is not None and partition["month"] < cutoff
+        ]
+        if dry_run or not expired:
+            return expired
+
+        preparer = db.get_bind().dialect.identifier_preparer
+        quoted_schema = preparer.quote(schema)
+        try:
+            db.execute(text(f"CREATE SCHEMA IF NOT EXISTS {quoted_schema}"))
+            for name in expired:
+                quoted_name = preparer.quote(name)
+                db.execute(text(f"ALTER TABLE stock_movements DETACH PARTITION {quoted_name}"))
+                db.execute(text(f"ALTER TABLE {quoted_name} SET SCHEMA {quoted_schema}"))
+                if tablespace:
+                    db.execute(text(
+                        f"ALTER TABLE {quoted_schema}.{quoted_name} SET TABLESPACE {preparer.quote(tablespace)}"
+                    ))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        return expired
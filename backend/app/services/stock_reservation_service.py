@@ -0,0 +1,513 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import and_, or_, select, update, insert, func, bindparam, values, column, Integer
+from uuid import UUID
+from app.core.config import settings
+from app.models.product import Product
+from app.models.product_sku import ProductSKU
+from app.models.stock_branch import StockBranch
+from app.models.stock_movement import StockMovement, MovementType, MovementReason
+from app.models.stock_reservation import StockReservation, ReservationStatus
+from app.services.stock_cost_service import StockCostService
+
+
+# Reservas que ainda retêm estoque
+HOLDING_STATUSES = (ReservationStatus.ACTIVE, ReservationStatus.CONFIRMED)
+
+
+class StockReservationService:
+    """Reservas de estoque com validade, aplicadas em reserved_stock.
+
+    Cada reserva incrementa reserved_stock com um UPDATE condicional por tabela (só aplica
+    onde current_stock - reserved_stock comportar a quantidade), sem leitura prévia: a
+    própria linha serializa reservas concorrentes e leitores de disponibilidade nunca
+    esperam. As linhas são sempre bloqueadas em ordem de id (SKUs e depois filiais) para
+    evitar deadlocks. Reservas vencidas são liberadas em lote pela rotina de limpeza;
+    a baixa (consume) converte a reserva em saída de estoque.
+    """
+
+    @staticmethod
+    def _stock_skus(db: Session, company_id: UUID, sku_ids: List[int]) -> Dict[int, int]:
+        """SKU solicitado -> SKU que detém o estoque (SKUs associados reservam no SKU de estoque)"""
+        rows = db.query(
+            ProductSKU.id,
+            func.coalesce(ProductSKU.stock_sku_id, ProductSKU.id)
+        ).join(Product, ProductSKU.product_id == Product.id).filter(
+            and_(
+                ProductSKU.id.in_(sku_ids),
+                Product.company_id == company_id
+            )
+        ).all()
+        return {row[0]: row[1] for row in rows}
+
+    @staticmethod
+    def _adjust_reserved(db: Session, sku_totals: Dict[int, int],
+                         branch_totals: Dict[Tuple[int, UUID], int]) -> None:
+        """Soma as variações em reserved_stock (executemany em ordem de id; nunca abaixo de zero)"""
+        sku_table = ProductSKU.__table__
+        branch_table = StockBranch.__table__
+        if sku_totals:
+            db.execute(
+                update(sku_table)
+                .where(sku_table.c.id == bindparam("b_id"))
+                .values(reserved_stock=func.greatest(func.coalesce(sku_table.c.reserved_stock, 0) + bindparam("b_delta"), 0)),
+                [{"b_id": sku_id, "b_delta": delta} for sku_id, delta in sorted(sku_totals.items())]
+            )
+        if branch_totals:
+            db.execute(
+                update(branch_table)
+                .where(
+                    and_(
+                        branch_table.c.sku_id == bindparam("b_sku_id"),
+                        branch_table.c.branch_id == bindparam("b_branch_id")
+                    )
+                )
+                .values(reserved_stock=func.greatest(func.coalesce(branch_table.c.reserved_stock, 0) + bindparam("b_delta"), 0)),
+                [
+                    {"b_sku_id": sku_id, "b_branch_id": branch_id, "b_delta": delta}
+                    for (sku_id, branch_id), delta in sorted(branch_totals.items(), key=lambda item: (item[0][0], str(item[0][1])))
+                ]
+            )
+
+    @staticmethod
+    def _release_rows(db: Session, rows) -> None:
+        """Agrupa (stock_sku_id, branch_id, quantity) liberados e devolve ao estoque"""
+        sku_totals: Dict[int, int] = defaultdict(int)
+        branch_totals: Dict[Tuple[int, UUID], int] = defaultdict(int)
+        for stock_sku_id, branch_id, quantity in rows:
+            sku_totals[stock_sku_id] -= quantity
+            if branch_id is not None:
+                branch_totals[(stock_sku_id, branch_id)] -= quantity
+        StockReservationService._adjust_reserved(db, sku_totals, branch_totals)
+
+    @staticmethod
+    def _reserve_rows(db: Session, totals: Dict[int, int], branch_id: Optional[UUID] = None) -> List[int]:
+        """Incrementa reserved_stock de todos os SKUs de estoque em um único UPDATE condicional.
+
+        As linhas são bloqueadas antes em ordem de id por uma CTE materializada; o UPDATE ...
+        FROM (VALUES ...) só aplica onde current_stock - reserved_stock comporta a quantidade
+        e devolve os ids atualizados. Retorna os SKUs de estoque sem disponibilidade.
+        """
+        requested = values(
+            column("stock_sku_id", Integer), column("quantity", Integer), name="requested"
+        ).data(sorted(totals.items()))
+
+        if branch_id:
+            table, key = StockBranch, StockBranch.sku_id
+            locked = select(StockBranch.sku_id).where(
+                and_(
+                    StockBranch.sku_id.in_(list(totals)),
+                    StockBranch.branch_id == branch_id
+                )
+            ).order_by(StockBranch.sku_id)
+            conditions = [StockBranch.branch_id == branch_id]
+        else:
+            table, key = ProductSKU, ProductSKU.id
+            locked = select(ProductSKU.id).where(ProductSKU.id.in_(list(totals))).order_by(ProductSKU.id)
+            conditions = []
+        locked = locked.with_for_update().cte("locked").prefix_with("MATERIALIZED")
+
+        reserved = db.execute(
+            update(table)
+            .where(
+                and_(
+                    key == requested.c.stock_sku_id,
+                    key.in_(select(locked.c[0])),
+                    table.current_stock - func.coalesce(table.reserved_stock, 0) >= requested.c.quantity,
+                    *conditions
+                )
+            )
+            .values(reserved_stock=func.coalesce(table.reserved_stock, 0) + requested.c.quantity)
+            .returning(key)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        return sorted(set(totals) - set(reserved))
+
+    @staticmethod
+    def reserve(db: Session, company_id: UUID, reference: str, items: List[Dict[str, int]],
+                branch_id: Optional[UUID] = None, ttl_seconds: Optional[int] = None,
+                commit: bool = True) -> Dict[str, Any]:
+        """Reserva todos os itens ou nenhum; ValueError lista os SKUs sem disponibilidade"""
+        ttl_seconds = min(ttl_seconds or settings.STOCK_RESERVATION_TTL_SECONDS, settings.STOCK_RESERVATION_MAX_TTL_SECONDS)
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds)
+
+        requested: Dict[int, int] = defaultdict(int)
+        for item in items:
+            requested[item["sku_id"]] += item["quantity"]
+
+        try:
+            stock_skus = StockReservationService._stock_skus(db, company_id, list(requested))
+            missing = [sku_id for sku_id in requested if sku_id not in stock_skus]
+            if missing:
+                raise LookupError(f"SKUs não encontrados: {missing}")
+
+            totals: Dict[int, int] = defaultdict(int)
+            for sku_id, quantity in requested.items():
+                totals[stock_skus[sku_id]] += quantity
+
+            unavailable = StockReservationService._reserve_rows(db, totals)
+            if branch_id and not unavailable:
+                unavailable = StockReservationService._reserve_rows(db, totals, branch_id)
+
+            if unavailable:
+                raise ValueError(f"Estoque indisponível para os SKUs: {unavailable}")
+
+            db.execute(insert(StockReservation), [
+                {
+                    "company_id": company_id,
+                    "sku_id": sku_id,
+                    "stock_sku_id": stock_skus[sku_id],
+                    "branch_id": branch_id,
+                    "reference": reference,
+                    "quantity": quantity,
+                    "status": ReservationStatus.ACTIVE,
+                    "expires_at": expires_at,
+                }
+                for sku_id, quantity in requested.items()
+            ])
+            if commit:
+                db.commit()
+        except Exception:
+            if commit:
+                db.rollback()
+            raise
+
+        return {
+            "reference": reference,
+            "status": ReservationStatus.ACTIVE,
+            "affected": len(requested),
+            "expires_at": expires_at,
+        }
+
+    @staticmethod
+    def reserve_many(db: Session, company_id: UUID, requests: List[Dict[str, Any]],
+                     status: ReservationStatus = ReservationStatus.CONFIRMED,
+                     ttl_seconds: Optional[int] = None) -> Dict[str, List[int]]:
+        """Reserva um lote de pedidos (cada um tudo ou nada) sem commit.
+
+        requests: [{"reference", "branch_id", "items": [{"sku_id", "stock_sku_id", "quantity"}]}]
+        Os SKUs e estoques de filial do lote são bloqueados uma vez, em ordem de id; a
+        disponibilidade é distribuída na ordem dos pedidos e gravada com um executemany de
+        reserved_stock e um INSERT multi-linha de reservas.
+        Retorna {referência: SKUs de estoque sem disponibilidade} dos pedidos recusados.
+        """
+        expires_at = None
+        if status == ReservationStatus.ACTIVE:
+            ttl_seconds = min(ttl_seconds or settings.STOCK_RESERVATION_TTL_SECONDS, settings.STOCK_RESERVATION_MAX_TTL_SECONDS)
+            expires_at = datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds)
+
+        stock_sku_ids = sorted({item["stock_sku_id"] for request in requests for item in request["items"]})
+        if not stock_sku_ids:
+            return {}
+        available = {
+            row.id: (row.current_stock or 0) - (row.reserved_stock or 0)
+            for row in db.execute(
+                select(ProductSKU.id, ProductSKU.current_stock, ProductSKU.reserved_stock)
+                .where(ProductSKU.id.in_(stock_sku_ids))
+                .order_by(ProductSKU.id)
+                .with_for_update()
+            )
+        }
+
+        branch_ids = {request["branch_id"] for request in requests if request.get("branch_id")}
+        branch_available: Dict[Tuple[int, UUID], int] = {}
+        if branch_ids:
+            branch_available = {
+                (row.sku_id, row.branch_id): (row.current_stock or 0) - (row.reserved_stock or 0)
+                for row in db.execute(
+                    select(StockBranch.sku_id, StockBranch.branch_id, StockBranch.current_stock, StockBranch.reserved_stock)
+                    .where(
+                        and_(
+                            StockBranch.sku_id.in_(stock_sku_ids),
+                            StockBranch.branch_id.in_(branch_ids)
+                        )
+                    )
+                    .order_by(StockBranch.sku_id, StockBranch.branch_id)
+                    .with_for_update()
+                )
+            }
+
+        rejected: Dict[str, List[int]] = {}
+        sku_totals: Dict[int, int] = defaultdict(int)
+        branch_totals: Dict[Tuple[int, UUID], int] = defaultdict(int)
+        reservations = []
+        for request in requests:
+            branch_id = request.get("branch_id")
+            needed: Dict[int, int] = defaultdict(int)
+            for item in request["items"]:
+                needed[item["stock_sku_id"]] += item["quantity"]
+
+            short = [
+                stock_sku_id for stock_sku_id, quantity in needed.items()
+                if available.get(stock_sku_id, 0) < quantity
+                or (branch_id and branch_available.get((stock_sku_id, branch_id), 0) < quantity)
+            ]
+            if short:
+                rejected[request["reference"]] = sorted(short)
+                continue
+
+            for stock_sku_id, quantity in needed.items():
+                available[stock_sku_id] -= quantity
+                sku_totals[stock_sku_id] += quantity
+                if branch_id:
+                    branch_available[(stock_sku_id, branch_id)] -= quantity
+                    branch_totals[(stock_sku_id, branch_id)] += quantity
+            reservations.extend(
+                {
+                    "company_id": company_id,
+                    "sku_id": item["sku_id"],
+                    "stock_sku_id": item["stock_sku_id"],
+                    "branch_id": branch_id,
+                    "reference": request["reference"],
+                    "quantity": item["quantity"],
+                    "status": status,
+                    "expires_at": expires_at,
+                }
+                for item in request["items"]
+            )
+
+        StockReservationService._adjust_reserved(db, sku_totals, branch_totals)
+        if reservations:
+            db.execute(insert(StockReservation), reservations)
+        return rejected
+
+    @staticmethod
+    def confirm(db: Session, company_id: UUID, reference: str) -> Dict[str, Any]:
+        """Confirma as reservas ativas e ainda válidas da referência (deixam de expirar)"""
+        result = db.execute(
+            update(StockReservation)
+            .where(
+                and_(
+                    StockReservation.company_id == company_id,
+                    StockReservation.reference == reference,
+                    StockReservation.status == ReservationStatus.ACTIVE,
+                    StockReservation.expires_at > func.now()
+                )
+            )
+            .values(status=ReservationStatus.CONFIRMED, expires_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return {"reference": reference, "status": ReservationStatus.CONFIRMED, "affected": result.rowcount}
+
+    @staticmethod
+    def release(db: Session, company_id: UUID, reference: str, commit: bool = True) -> Dict[str, Any]:
+        """Libera as reservas ativas/confirmadas da referência e devolve o estoque reservado"""
+        try:
+            released = db.execute(
+                update(StockReservation)
+                .where(
+                    and_(
+                        StockReservation.company_id == company_id,
+                        StockReservation.reference == reference,
+                        StockReservation.status.in_(HOLDING_STATUSES)
+                    )
+                )
+                .values(status=ReservationStatus.RELEASED)
+                .returning(StockReservation.stock_sku_id, StockReservation.branch_id, StockReservation.quantity)
+                .execution_options(synchronize_session=False)
+            ).all()
+            StockReservationService._release_rows(db, released)
+            if commit:
+                db.commit()
+        except Exception:
+            if commit:
+                db.rollback()
+            raise
+        return {"reference": reference, "status": ReservationStatus.RELEASED, "affected": len(released)}
+
+    @staticmethod
+    def consume(db: Session, company_id: UUID, reference: str, user_id: Optional[UUID] = None,
+                reference_document: Optional[str] = None, reference_id: Optional[int] = None,
+                movement_reason: MovementReason = MovementReason.SALE,
+                commit: bool = True) -> Dict[str, Any]:
+        """Baixa as reservas da referência: libera o reservado e grava a saída de estoque.
+
+        Consome as reservas confirmadas e as ativas ainda válidas; os SKUs e estoques de
+        filial são bloqueados em ordem de id e as movimentações EXIT gravadas em lote.
+        """
+        try:
+            consumed = db.execute(
+                update(StockReservation)
+                .where(
+                    and_(
+                        StockReservation.company_id == company_id,
+                        StockReservation.reference == reference,
+                        or_(
+                            StockReservation.status == ReservationStatus.CONFIRMED,
+                            and_(
+                                StockReservation.status == ReservationStatus.ACTIVE,
+                                StockReservation.expires_at > func.now()
+                            )
+                        )
+                    )
+                )
+                .values(status=ReservationStatus.CONSUMED, expires_at=None)
+                .returning(StockReservation.stock_sku_id, StockReservation.branch_id, StockReservation.quantity)
+                .execution_options(synchronize_session=False)
+            ).all()
+            if consumed:
+                StockReservationService._release_rows(db, consumed)
+                StockReservationService._write_exits(
+                    db, company_id, consumed, user_id, reference_document or reference,
+                    reference_id, movement_reason
+                )
+            if commit:
+                db.commit()
+        except Exception:
+            if commit:
+                db.rollback()
+            raise
+        return {"reference": reference, "status": ReservationStatus.CONSUMED, "affected": len(consumed)}
+
+    @staticmethod
+    def _write_exits(db: Session, company_id: UUID, rows, user_id: Optional[UUID],
+                     reference_document: Optional[str], reference_id: Optional[int],
+                     movement_reason: MovementReason) -> None:
+        """Debita (stock_sku_id, branch_id, quantity) do estoque e grava as saídas (sem commit)"""
+        quantities: Dict[Tuple[int, Optional[UUID]], int] = defaultdict(int)
+        for stock_sku_id, branch_id, quantity in rows:
+            quantities[(stock_sku_id, branch_id)] += quantity
+        stock_sku_ids = sorted({stock_sku_id for stock_sku_id, _ in quantities})
+        branch_ids = {branch_id for _, branch_id in quantities if branch_id is not None}
+
+        stock_skus = {
+            sku.id: sku
+            for sku in db.query(ProductSKU).filter(ProductSKU.id.in_(stock_sku_ids))
+            .order_by(ProductSKU.id).with_for_update().all()
+        }
+        branch_stocks = {}
+        if branch_ids:
+            branch_stocks = {
+                (stock.sku_id, stock.branch_id): stock
+                for stock in db.query(StockBranch).filter(
+                    and_(
+                        StockBranch.sku_id.in_(stock_sku_ids),
+                        StockBranch.branch_id.in_(branch_ids)
+                    )
+                ).order_by(StockBranch.sku_id, StockBranch.branch_id).with_for_update().all()
+            }
+
+        movements = []
+        for (stock_sku_id, branch_id), quantity in sorted(quantities.items(), key=lambda item: (item[0][0], str(item[0][1]))):
+            sku = stock_skus[stock_sku_id]
+            previous_stock = sku.current_stock or 0
+            if previous_stock < quantity:
+                raise ValueError(f"Estoque insuficiente para saída do SKU {sku.sku_code}")
+            branch_stock = branch_stocks.get((stock_sku_id, branch_id))
+            if branch_stock is not None and (branch_stock.current_stock or 0) < quantity:
+                raise ValueError(f"Estoque insuficiente na filial para saída do SKU {sku.sku_code}")
+            unit_cost = StockCostService.current_unit_cost(sku, branch_stock)
+
+            sku.current_stock = previous_stock - quantity
+            if branch_stock is not None:
+                branch_stock.current_stock = (branch_stock.current_stock or 0) - quantity
+
+            movements.append({
+                "product_id": sku.product_id,
+                "sku_id": stock_sku_id,
+                "company_id": company_id,
+                "branch_id": branch_id,
+                "movement_type": MovementType.EXIT,
+                "movement_reason": movement_reason,
+                "quantity": quantity,
+                "previous_stock": previous_stock,
+                "current_stock": previous_stock - quantity,
+                "reference_document": reference_document,
+                "reference_id": reference_id,
+                "unit_cost": unit_cost,
+                "total_cost": round(quantity * unit_cost, 2),
+                "user_id": user_id,
+            })
+
+        db.flush()
+        db.execute(insert(StockMovement).values(movements))
+
+    @staticmethod
+    def expire(db: Session, batch_size: Optional[int] = None) -> int:
+        """Libera reservas vencidas em lotes (SKIP LOCKED: várias instâncias podem rodar juntas)"""
+        batch_size = batch_size or settings.STOCK_RESERVATION_SWEEP_BATCH
+        total = 0
+        while True:
+            try:
+                due = select(StockReservation.id).where(
+                    and_(
+                        StockReservation.status == ReservationStatus.ACTIVE,
+                        StockReservation.expires_at <= func.now()
+                    )
+                ).order_by(StockReservation.expires_at).limit(batch_size).with_for_update(skip_locked=True)
+
+                expired = db.execute(
+                    update(StockReservation)
+                    .where(StockReservation.id.in_(due.scalar_subquery()))
+                    .values(status=ReservationStatus.EXPIRED)
+                    .returning(StockReservation.stock_sku_id, StockReservation.branch_id, StockReservation.quantity)
+                    .execution_options(synchronize_session=False)
+                ).all()
+                StockReservationService._release_rows(db, expired)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+
+            total += len(expired)
+            if len(expired) < batch_size:
+                return total
+
+    @staticmethod
+    def get_reservations(db: Session, company_id: UUID, reference: str) -> List[StockReservation]:
+        return db.query(StockReservation).filter(
+            and_(
+                StockReservation.company_id == company_id,
+                StockReservation.reference == reference
+            )
+        ).order_by(StockReservation.id).all()
+
+    @staticmethod
+    def availability(db: Session, company_id: UUID, sku_ids: List[int],
+                     branch_id: Optional[UUID] = None) -> List[Dict[str, Any]]:
+        """Disponível para prometer (estoque - reservado) lido do SKU de estoque, em uma consulta"""
+        stock_sku = aliased(ProductSKU)
+        if branch_id:
+            current, reserved = StockBranch.current_stock, StockBranch.reserved_stock
+        else:
+            current, reserved = stock_sku.current_stock, stock_sku.reserved_stock
+
+        query = db.query(
+            ProductSKU.id,
+            stock_sku.id,
+            func.coalesce(current, 0),
+            func.coalesce(reserved, 0)
+        ).select_from(ProductSKU).join(
+            stock_sku, stock_sku.id == func.coalesce(ProductSKU.stock_sku_id, ProductSKU.id)
+        ).join(
+            Product, ProductSKU.product_id == Product.id
+        ).filter(
+            and_(
+                ProductSKU.id.in_(sku_ids),
+                Product.company_id == company_id
+            )
+        )
+        if branch_id:
+            query = query.outerjoin(
+                StockBranch,
+                and_(
+                    StockBranch.sku_id == stock_sku.id,
+                    StockBranch.branch_id == branch_id
+                )
+            )
+        rows = query.all()
+
+        return [
+            {
+                "sku_id": sku_id,
+                "stock_sku_id": stock_sku_id,
+                "branch_id": branch_id,
+                "current_stock": current,
+                "reserved_stock": reserved,
+                "available_stock": max(current - reserved, 0),
+            }
+            for sku_id, stock_sku_id, current, reserved in rows
+        ]
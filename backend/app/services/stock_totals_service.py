@@ -0,0 +1,95 @@
+from typing import Dict, Any, Optional
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import and_, select, update, func, case
+from uuid import UUID
+from app.models.product import Product
+from app.models.product_sku import ProductSKU
+
+
+class StockTotalsService:
+    """Conferência do estoque efetivo (effective_stock) mantido pelo gatilho de product_skus.
+
+    Recalcula com agregação no banco a mesma fórmula do gatilho: SKU de estoque soma o
+    próprio estoque ao dos SKUs associados ativos; o produto soma o dos seus SKUs ativos.
+    """
+
+    @staticmethod
+    def _expected_skus(company_id: Optional[UUID]):
+        associated = aliased(ProductSKU)
+        associated_stock = select(
+            associated.stock_sku_id.label("stock_sku_id"),
+            func.sum(associated.current_stock).label("stock")
+        ).where(
+            and_(
+                associated.is_active == True,
+                associated.stock_sku_id.isnot(None),
+                associated.stock_sku_id != associated.id
+            )
+        ).group_by(associated.stock_sku_id).subquery("associated_stock")
+
+        expected = func.coalesce(ProductSKU.current_stock, 0) + case(
+            (ProductSKU.is_stock_sku == True, func.coalesce(associated_stock.c.stock, 0)),
+            else_=0
+        )
+        query = select(
+            ProductSKU.id.label("id"),
+            expected.label("expected")
+        ).outerjoin(
+            associated_stock, associated_stock.c.stock_sku_id == ProductSKU.id
+        )
+        if company_id:
+            query = query.join(Product, ProductSKU.product_id == Product.id).where(Product.company_id == company_id)
+        return query.subquery("expected_skus")
+
+    @staticmethod
+    def _expected_products(company_id: Optional[UUID]):
+        sku_stock = select(
+            ProductSKU.product_id.label("product_id"),
+            func.sum(ProductSKU.effective_stock).label("stock")
+        ).where(ProductSKU.is_active == True).group_by(ProductSKU.product_id).subquery("sku_stock")
+
+        query = select(
+            Product.id.label("id"),
+            func.coalesce(sku_stock.c.stock, 0).label("expected")
+        ).outerjoin(sku_stock, sku_stock.c.product_id == Product.id)
+        if company_id:
+            query = query.where(Product.company_id == company_id)
+        return query.subquery("expected_products")
+
+    @staticmethod
+    def verify(db: Session, company_id: Optional[UUID] = None, repair: bool = False) -> Dict[str, Any]:
+        """Conta SKUs/produtos divergentes e, com repair=True, corrige com UPDATE ... FROM"""
+        try:
+            expected = StockTotalsService._expected_skus(company_id)
+            sku_drift = and_(ProductSKU.id == expected.c.id, ProductSKU.effective_stock.is_distinct_from(expected.c.expected))
+            skus = db.execute(select(func.count()).select_from(ProductSKU).join(expected, expected.c.id == ProductSKU.id)
+                              .where(sku_drift)).scalar() or 0
+            if repair and skus:
+                db.execute(
+                    update(ProductSKU).where(sku_drift).values(effective_stock=expected.c.expected)
+                    .execution_options(synchronize_session=False)
+                )
+
+            # Produtos conferidos depois dos SKUs (já corrigidos quando repair=True)
+            expected = StockTotalsService._expected_products(company_id)
+            product_drift = and_(Product.id == expected.c.id, Product.effective_stock.is_distinct_from(expected.c.expected))
+            products = db.execute(select(func.count()).select_from(Product).join(expected, expected.c.id == Product.id)
+                                  .where(product_drift)).scalar() or 0
+            if repair and products:
+                db.execute(
+                    update(Product).where(product_drift).values(effective_stock=expected.c.expected)
+                    .execution_options(synchronize_session=False)
+                )
+
+            if repair:
+                db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        return {
+            "company_id": company_id,
+            "skus_with_drift": skus,
+            "products_with_drift": products,
+            "repaired": repair,
+        }
@@ -0,0 +1,166 @@
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, select, update, insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from uuid import UUID
+from app.models.company import Branch
+from app.models.product import Product
+from app.models.product_sku import ProductSKU
+from app.models.stock_branch import StockBranch
+from app.models.stock_movement import StockMovement, MovementType, MovementReason
+from app.schemas.stock_branch import StockTransferRequest
+from app.services.stock_cost_service import StockCostService
+
+
+# Linhas por INSERT multi-linha de movimentações
+INSERT_BATCH_SIZE = 1000
+
+
+class StockTransferService:
+    """Transferência de estoque entre filiais em uma única transação.
+
+    SKUs e estoques de filial envolvidos são bloqueados sempre na mesma ordem (SKUs por id,
+    depois estoques por SKU/filial) para que transferências concorrentes não entrem em
+    deadlock. Cada linha gera um par de movimentações TRANSFER (saída na origem e entrada no
+    destino) gravado com INSERT multi-linha. O estoque total do SKU não muda.
+    """
+
+    @staticmethod
+    def transfer(db: Session, company_id: UUID, user_id: Optional[UUID], request: StockTransferRequest) -> Dict[str, Any]:
+        """Transfere as quantidades da filial de origem para a de destino (tudo ou nada)"""
+        if request.from_branch_id == request.to_branch_id:
+            raise ValueError("Filial de origem e destino devem ser diferentes")
+
+        # Quantidade consolidada por SKU (linhas repetidas somam)
+        quantities: Dict[int, int] = {}
+        for item in request.items:
+            quantities[item.sku_id] = quantities.get(item.sku_id, 0) + item.quantity
+        sku_ids = sorted(quantities)
+
+        try:
+            branches = {
+                branch.id: branch
+                for branch in db.query(Branch).filter(
+                    and_(
+                        Branch.id.in_([request.from_branch_id, request.to_branch_id]),
+                        Branch.company_id == company_id
+                    )
+                ).all()
+            }
+            if len(branches) != 2:
+                raise LookupError("Filial não encontrada")
+
+            # 1) SKUs em ordem de id (mesma ordem da movimentação individual: SKU antes da filial)
+            skus = {
+                sku.id: sku
+                for sku in db.query(ProductSKU).join(Product, ProductSKU.product_id == Product.id).filter(
+                    and_(
+                        ProductSKU.id.in_(sku_ids),
+                        Product.company_id == company_id
+                    )
+                ).order_by(ProductSKU.id).with_for_update(of=ProductSKU).all()
+            }
+            missing = [sku_id for sku_id in sku_ids if sku_id not in skus]
+            if missing:
+                raise LookupError(f"SKUs não encontrados: {missing}")
+
+            # Destinos sem configuração de estoque são criados zerados (a chave única evita duplicidade)
+            db.execute(
+                pg_insert(StockBranch).values([
+                    {"sku_id": sku_id, "branch_id": request.to_branch_id, "current_stock": 0,
+                     "minimum_stock": 0, "reserved_stock": 0, "is_active": True}
+                    for sku_id in sku_ids
+                ]).on_conflict_do_nothing(index_elements=["sku_id", "branch_id"])
+            )
+
+            # 2) Estoques de filial em ordem de (SKU, filial)
+            stocks = db.execute(
+                select(
+                    StockBranch.id,
+                    StockBranch.sku_id,
+                    StockBranch.branch_id,
+                    StockBranch.current_stock,
+                    StockBranch.reserved_stock,
+                    StockBranch.average_cost
+                ).where(
+                    and_(
+                        StockBranch.sku_id.in_(sku_ids),
+                        StockBranch.branch_id.in_([request.from_branch_id, request.to_branch_id])
+                    )
+                ).order_by(StockBranch.sku_id, StockBranch.branch_id).with_for_update()
+            ).all()
+            source = {row.sku_id: row for row in stocks if row.branch_id == request.from_branch_id}
+            target = {row.sku_id: row for row in stocks if row.branch_id == request.to_branch_id}
+
+            errors = []
+            for sku_id in sku_ids:
+                row = source.get(sku_id)
+                available = 0 if row is None else (row.current_stock or 0) - (row.reserved_stock or 0)
+                if available < quantities[sku_id]:
+                    errors.append(f"{skus[sku_id].sku_code}: disponível {available}, solicitado {quantities[sku_id]}")
+            if errors:
+                raise ValueError("Estoque insuficiente na filial de origem: " + "; ".join(errors))
+
+            reference = request.reference_document or datetime.now(timezone.utc).strftime("TRF-%Y%m%d%H%M%S")
+            from_name = branches[request.from_branch_id].name
+            to_name = branches[request.to_branch_id].name
+
+            source_updates, target_updates = [], []
+            movements = []
+            for sku_id in sku_ids:
+                sku, quantity = skus[sku_id], quantities[sku_id]
+                out_row, in_row = source[sku_id], target[sku_id]
+                # Entrada no destino ao custo médio da origem
+                unit_cost = out_row.average_cost
+                if unit_cost is None:
+                    unit_cost = StockCostService.current_unit_cost(sku)
+                in_stock = in_row.current_stock or 0
+
+                source_updates.append({"id": out_row.id, "current_stock": (out_row.current_stock or 0) - quantity})
+                target_updates.append({
+                    "id": in_row.id,
+                    "current_stock": in_stock + quantity,
+                    "average_cost": StockCostService.moving_average(in_stock, in_row.average_cost, quantity, unit_cost),
+                })
+
+                common = {
+                    "product_id": sku.product_id,
+                    "sku_id": sku_id,
+                    "company_id": company_id,
+                    "movement_type": MovementType.TRANSFER,
+                    "quantity": quantity,
+                    # Estoque total do SKU não muda na transferência
+                    "previous_stock": sku.current_stock or 0,
+                    "current_stock": sku.current_stock or 0,
+                    "reference_document": reference,
+                    "from_location": from_name,
+                    "to_location": to_name,
+                    "unit_cost": unit_cost,
+                    "total_cost": round(quantity * unit_cost, 2),
+                    "notes": request.notes,
+                    "user_id": user_id,
+                }
+                movements.append({**common, "branch_id": request.from_branch_id, "movement_reason": MovementReason.TRANSFER_OUT})
+                movements.append({**common, "branch_id": request.to_branch_id, "movement_reason": MovementReason.TRANSFER_IN})
+
+            # Atualização em lote por chave primária (executemany)
+            db.execute(update(StockBranch), source_updates)
+            db.execute(update(StockBranch), target_updates)
+
+            for i in range(0, len(movements), INSERT_BATCH_SIZE):
+                db.execute(insert(StockMovement).values(movements[i:i + INSERT_BATCH_SIZE]))
+
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        return {
+            "reference_document": reference,
+            "from_branch_id": request.from_branch_id,
+            "to_branch_id": request.to_branch_id,
+            "lines": len(sku_ids),
+            "total_quantity": sum(quantities.values()),
+            "movements_created": len(movements),
+        }
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Script para recalcular o custo médio ponderado de SKUs e filiais a partir do histórico
+de movimentações (uma passada em streaming):
+
+    python scripts/backfill_average_cost.py [--company-id UUID]
+"""
+
+import argparse
+import sys
+import os
+from uuid import UUID
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import SessionLocal
+from app.services.stock_cost_service import StockCostService
+
+def backfill_average_cost(company_id):
+    """Recalcular o custo médio a partir das entradas"""
+    db = SessionLocal()
+    
+    try:
+        result = StockCostService.backfill(db, company_id)
+        print(f"✅ {result['movements']} movimentações lidas")
+        print(f"✅ Custo médio atualizado: {result['skus_updated']} SKUs, {result['branch_stocks_updated']} estoques de filial")
+    except Exception as e:
+        print(f"❌ Erro ao recalcular custo médio: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recalcular o custo médio ponderado a partir do histórico")
+    parser.add_argument("--company-id", type=UUID, default=None)
+    args = parser.parse_args()
+    backfill_average_cost(args.company_id)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark do parser de NF-e: parser anterior (namespace removido por replace e buscas
+`.//` por campo) contra NFeParser com ElementTree e com lxml (quando instalado).
+O ganho em notas com muitos itens é do caminho lxml (lxml==4.9.3, ~1,7x na nota de 500
+itens); com o ElementTree o resultado fica em torno de 1,0x.
+Usa a nota de exemplo da raiz do repositório e notas sintéticas com muitos itens:
+
+    python scripts/benchmark_nfe_parser.py [--xml ARQUIVO] [--items 500] [--seconds 2]
+"""
+
+import argparse
+import re
+import sys
+import os
+import time
+import xml.etree.ElementTree as ET
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.nfe_parser import NFeParser, LET
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+SAMPLE_XML = os.path.join(REPO_ROOT, "42250757174341000109550010000013761829934074-protNFe.xml")
+
+def _legacy_text(element, path):
+    """Mesmo padrão do parser anterior: find duas vezes por campo"""
+    return element.find(path).text if element is not None and element.find(path) is not None else ""
+
+def legacy_parse(xml_content):
+    """Reprodução do algoritmo do parser anterior (referência de desempenho)"""
+    root = ET.fromstring(xml_content.replace('xmlns="http://www.portalfiscal.inf.br/nfe"', ''))
+    ide, emit, dest = root.find('.//ide'), root.find('.//emit'), root.find('.//dest')
+    total, transp = root.find('.//total'), root.find('.//transp')
+    data = {tag: _legacy_text(ide, tag) for tag in ("nNF", "serie", "tpNF", "natOp", "dhEmi")}
+    for prefix, block, address in (("emit", emit, "enderEmit"), ("dest", dest, "enderDest")):
+        for tag in (".//xNome", ".//CNPJ", ".//CPF", ".//IE"):
+            data[prefix + tag] = _legacy_text(block, tag)
+        ender = block.find('.//' + address) if block is not None else None
+        for tag in ("xLgr", "nro", "xBairro", "xMun", "UF", "CEP"):
+            data[prefix + tag] = _legacy_text(ender, tag)
+    icms_total = total.find('.//ICMSTot')
+    for tag in ("vNF", "vProd", "vICMS", "vIPI", "vPIS", "vCOFINS", "vFrete", "vSeg", "vDesc"):
+        data[tag] = float(_legacy_text(icms_total, tag) or 0)
+    transporta = transp.find('.//transporta') if transp is not None else None
+    for tag in ("xNome", "CNPJ", "placa", "UF"):
+        data["transp" + tag] = _legacy_text(transporta, tag)
+    produtos = []
+    for det in root.findall('.//det'):
+        prod = det.find('prod')
+        produto = {tag: _legacy_text(prod, tag) for tag in ("cProd", "xProd", "NCM", "CFOP", "uCom", "qCom", "vUnCom", "vProd")}
+        imposto = det.find('imposto')
+        for group, trib, tag in (("ICMS", "ICMSTrib", "vICMS"), ("IPI", "IPITrib", "vIPI"),
+                                 ("PIS", "PISAliq", "vPIS"), ("COFINS", "COFINSAliq", "vCOFINS")):
+            block = imposto.find('.//' + group)
+            block = block.find('.//' + trib) if block is not None else None
+            produto[tag] = float(_legacy_text(block, tag) or 0)
+        produtos.append(produto)
+    data["produtos"] = produtos
+    return data
+
+def synthetic_note(xml_content, items):
+    """Nota com `items` itens, replicando o primeiro det da nota de exemplo"""
+    match = re.search(r'<det nItem="1">.*?</det>', xml_content, re.S)
+    if not match:
+        raise ValueError("Nota de exemplo sem itens (det)")
+    det = match.group(0)
+    dets = "".join(det.replace('nItem="1"', f'nItem="{n}"', 1) for n in range(1, items + 1))
+    return xml_content[:match.start()] + dets + xml_content[match.end():]
+
+def measure(parse, xml_content, seconds):
+    """Notas por segundo (melhor de três rodadas de ~seconds/3)"""
+    parse(xml_content)  # aquecimento
+    best = 0.0
+    for _ in range(3):
+        count, started = 0, time.perf_counter()
+        while time.perf_counter() - started < seconds / 3:
+            parse(xml_content)
+            count += 1
+        best = max(best, count / (time.perf_counter() - started))
+    return best
+
+def benchmark_nfe_parser(xml_path, items, seconds):
+    """Executar o benchmark e imprimir notas/s e itens/s de cada parser"""
+    with open(xml_path, encoding="utf-8") as xml_file:
+        sample = xml_file.read()
+
+    parsers = [
+        ("anterior (ElementTree + replace)", legacy_parse),
+        ("NFeParser (ElementTree)", lambda content: NFeParser.parse(content, use_lxml=False)),
+    ]
+    if LET is not None:
+        parsers.append(("NFeParser (lxml)", lambda content: NFeParser.parse(content, use_lxml=True)))
+    else:
+        print("⚠️  lxml não instalado: medindo apenas o ElementTree (sem o ganho do caminho lxml)")
+
+    notes = [
+        (f"exemplo ({os.path.basename(xml_path)})", sample),
+        (f"sintética com {items} itens", synthetic_note(sample, items)),
+    ]
+    for title, content in notes:
+        item_count = len(NFeParser.parse(content)["produtos"])
+        print(f"\n📄 Nota {title}: {len(content) / 1024:.1f} KB, {item_count} itens")
+        baseline = None
+        for name, parse in parsers:
+            rate = measure(parse, content, seconds)
+            baseline = baseline or rate
+            print(f"   {name:<34} {rate:>10.1f} notas/s {rate * item_count:>12.0f} itens/s  {rate / baseline:>5.2f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark do parser de XML da NF-e")
+    parser.add_argument("--xml", default=SAMPLE_XML)
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--seconds", type=float, default=2.0, help="Tempo de medição por parser e nota")
+    args = parser.parse_args()
+    benchmark_nfe_parser(args.xml, args.items, args.seconds)
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Script para recalcular a curva ABC de SKUs e clientes de todas as empresas.
+Executar diariamente (ex.: cron às 03:30):
+
+    python scripts/compute_abc_classification.py [--company-id UUID] [--period-days 365]
+"""
+
+import argparse
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import SessionLocal
+from app.models.company import Company
+from app.services.abc_analysis_service import AbcAnalysisService
+
+def compute_abc_classification(company_id=None, period_days=365):
+    """Recalcular classes ABC, uma transação por empresa"""
+    db = SessionLocal()
+    
+    try:
+        query = db.query(Company.id).filter(Company.status == "active")
+        if company_id:
+            query = query.filter(Company.id == company_id)
+        company_ids = [row.id for row in query.all()]
+        
+        for current_company_id in company_ids:
+            try:
+                result = AbcAnalysisService.classify(db, current_company_id, period_days)
+                print(f"✅ {current_company_id}: SKUs {result['skus']}, clientes {result['customers']}")
+            except Exception as e:
+                print(f"❌ {current_company_id}: erro ao calcular curva ABC: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recalcular curva ABC de SKUs e clientes")
+    parser.add_argument("--company-id", help="Apenas esta empresa")
+    parser.add_argument("--period-days", type=int, default=365, help="Dias de histórico considerados")
+    args = parser.parse_args()
+    compute_abc_classification(args.company_id, args.period_days)
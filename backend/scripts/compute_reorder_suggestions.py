@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Script para recalcular as sugestões de reposição de estoque de todas as empresas.
+Executar diariamente (ex.: cron às 03:00):
+
+    python scripts/compute_reorder_suggestions.py [--company-id UUID] [--history-days 90]
+"""
+
+import argparse
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import SessionLocal
+from app.models.company import Company
+from app.services.reorder_service import ReorderService
+
+def compute_reorder_suggestions(company_id=None, history_days=None):
+    """Recalcular sugestões, uma transação por empresa"""
+    db = SessionLocal()
+    
+    try:
+        query = db.query(Company.id).filter(Company.status == "active")
+        if company_id:
+            query = query.filter(Company.id == company_id)
+        company_ids = [row.id for row in query.all()]
+        
+        for current_company_id in company_ids:
+            try:
+                result = ReorderService.run(db, current_company_id, history_days)
+                print(f"✅ {current_company_id}: {result['suggestions']} sugestões, "
+                      f"{result['needs_reorder']} para repor ({result['elapsed_seconds']}s)")
+            except Exception as e:
+                print(f"❌ {current_company_id}: erro ao calcular sugestões: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recalcular sugestões de reposição de estoque")
+    parser.add_argument("--company-id", help="Apenas esta empresa")
+    parser.add_argument("--history-days", type=int, help="Dias de histórico de saídas")
+    args = parser.parse_args()
+    compute_reorder_suggestions(args.company_id, args.history_days)
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Script para liberar reservas de estoque vencidas.
+Executar em loop como processo de fundo, ou uma vez por minuto via cron:
+
+    python scripts/expire_stock_reservations.py [--loop 30] [--batch-size 5000]
+"""
+
+import argparse
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import SessionLocal
+from app.services.stock_reservation_service import StockReservationService
+
+def expire_reservations(batch_size=None):
+    """Liberar reservas vencidas e devolver o estoque reservado"""
+    db = SessionLocal()
+    
+    try:
+        expired = StockReservationService.expire(db, batch_size)
+        if expired:
+            print(f"✅ {expired} reservas expiradas liberadas")
+    except Exception as e:
+        print(f"❌ Erro ao liberar reservas expiradas: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Liberar reservas de estoque vencidas")
+    parser.add_argument("--loop", type=int, metavar="SEGUNDOS", help="Repetir a cada N segundos")
+    parser.add_argument("--batch-size", type=int, help="Reservas liberadas por transação")
+    args = parser.parse_args()
+    
+    expire_reservations(args.batch_size)
+    while args.loop:
+        time.sleep(args.loop)
+        expire_reservations(args.batch_size)
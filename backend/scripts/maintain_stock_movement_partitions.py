@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Script de manutenção das partições mensais de stock_movements.
+Executar diariamente (ex.: cron às 02:00):
+
+    python scripts/maintain_stock_movement_partitions.py [--archive] [--retention-months 24] [--dry-run]
+"""
+
+import argparse
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import SessionLocal
+from app.services.stock_partition_service import StockPartitionService
+
+def maintain_partitions(archive=False, retention_months=None, dry_run=False):
+    """Criar partições futuras e, opcionalmente, arquivar as antigas"""
+    db = SessionLocal()
+    
+    try:
+        if not dry_run:
+            created = StockPartitionService.ensure_partitions(db)
+            print(f"✅ Partições garantidas: {', '.join(created)}")
+        
+        if archive:
+            archived = StockPartitionService.archive_partitions(db, retention_months, dry_run=dry_run)
+            if not archived:
+                print("Nenhuma partição a arquivar.")
+            for name in archived:
+                print(f"{'🔎 Seria arquivada' if dry_run else '📦 Arquivada'}: {name}")
+    except Exception as e:
+        print(f"❌ Erro na manutenção das partições: {e}")
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manutenção das partições de stock_movements")
+    parser.add_argument("--archive", action="store_true", help="Arquivar partições além da retenção")
+    parser.add_argument("--retention-months", type=int, help="Meses mantidos na tabela principal")
+    parser.add_argument("--dry-run", action="store_true", help="Apenas listar o que seria arquivado")
+    args = parser.parse_args()
+    maintain_partitions(args.archive, args.retention_months, args.dry_run)
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Script para remover registros antigos do feed de alterações do catálogo.
+Executar diariamente (ex.: cron às 04:00):
+
+    python scripts/prune_catalog_changes.py [--retention-days 30]
+"""
+
+import argparse
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.catalog_change_service import CatalogChangeService
+
+def prune_catalog_changes(retention_days):
+    """Remover alterações mais antigas que a retenção"""
+    db = SessionLocal()
+    
+    try:
+        removed = CatalogChangeService.prune(db, retention_days)
+        print(f"✅ {removed} registros de alteração removidos (retenção: {retention_days} dias)")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Limpar o feed de alterações do catálogo")
+    parser.add_argument("--retention-days", type=int, default=settings.CATALOG_CHANGES_RETENTION_DAYS)
+    args = parser.parse_args()
+    prune_catalog_changes(args.retention_days)
@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+Script para limitar o cache em disco dos PDFs de DANFE (remove os menos usados recentemente).
+Executar periodicamente (ex.: cron a cada hora):
+
+    python scripts/prune_danfe_cache.py [--max-mb 2048]
+"""
+
+import argparse
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.services.danfe_service import DanfeService
+
+def prune_danfe_cache(max_bytes):
+    """Remover PDFs do cache até caber no limite"""
+    removed, freed = DanfeService.prune_cache(max_bytes)
+    print(f"✅ {removed} PDFs removidos do cache ({freed / (1024 * 1024):.1f} MB liberados)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Limitar o cache de DANFE")
+    parser.add_argument("--max-mb", type=int, default=settings.DANFE_CACHE_MAX_BYTES // (1024 * 1024))
+    args = parser.parse_args()
+    prune_danfe_cache(args.max_mb * 1024 * 1024)
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Script para recalcular o resumo mensal de impostos das notas fiscais (notas_fiscais_resumo_mensal).
+O resumo é mantido por triggers; use após correções manuais no banco:
+
+    python scripts/rebuild_nota_fiscal_summary.py [--company-id UUID]
+"""
+
+import argparse
+import sys
+import os
+from uuid import UUID
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import SessionLocal
+from app.services.nota_fiscal_report_service import NotaFiscalReportService
+
+def rebuild_nota_fiscal_summary(company_id):
+    """Recalcular o resumo mensal a partir dos itens das notas"""
+    db = SessionLocal()
+    
+    try:
+        groups = NotaFiscalReportService.rebuild_summary(db, company_id)
+        print(f"✅ Resumo mensal recalculado: {groups} grupos")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recalcular o resumo mensal de impostos das notas fiscais")
+    parser.add_argument("--company-id", type=UUID, default=None)
+    args = parser.parse_args()
+    rebuild_nota_fiscal_summary(args.company_id)
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Script para conferir o estoque efetivo (effective_stock) de SKUs e produtos.
+O valor é mantido por gatilho; use --repair para corrigir divergências:
+
+    python scripts/verify_effective_stock.py [--company-id UUID] [--repair]
+"""
+
+import argparse
+import sys
+import os
+from uuid import UUID
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import SessionLocal
+from app.services.stock_totals_service import StockTotalsService
+
+def verify_effective_stock(company_id, repair):
+    """Conferir (e opcionalmente corrigir) o estoque efetivo"""
+    db = SessionLocal()
+    
+    try:
+        result = StockTotalsService.verify(db, company_id, repair)
+        divergent = result["skus_with_drift"] + result["products_with_drift"]
+        if not divergent:
+            print("✅ Estoque efetivo consistente")
+        elif repair:
+            print(f"✅ Corrigidos {result['skus_with_drift']} SKUs e {result['products_with_drift']} produtos")
+        else:
+            print(f"❌ Divergências: {result['skus_with_drift']} SKUs e {result['products_with_drift']} produtos (use --repair)")
+            sys.exit(1)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Conferir o estoque efetivo de SKUs e produtos")
+    parser.add_argument("--company-id", type=UUID, default=None)
+    parser.add_argument("--repair", action="store_true")
+    args = parser.parse_args()
+    verify_effective_stock(args.company_id, args.repair)
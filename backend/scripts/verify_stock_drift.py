@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Script para conferir o estoque de SKUs e filiais contra o histórico de movimentações.
+Cada empresa é conferida em um processo; use --repair para corrigir o estoque total dos
+SKUs (divergências de filial são apenas informadas):
+
+    python scripts/verify_stock_drift.py [--company-id UUID] [--repair] [--workers N] [--skip-branches]
+"""
+
+import argparse
+import sys
+import os
+from uuid import UUID
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import SessionLocal
+from app.services.stock_drift_service import StockDriftService
+
+def verify_stock_drift(company_id, repair, workers, branches):
+    """Conferir o estoque contra as movimentações (e opcionalmente corrigir o total dos SKUs)"""
+    db = SessionLocal()
+    
+    try:
+        reports = StockDriftService.verify_companies(
+            db, [company_id] if company_id else None, repair, branches, workers
+        )
+    finally:
+        db.close()
+    
+    divergent = 0
+    for report in reports:
+        drift = report["skus_with_drift"] + report["branch_stocks_with_drift"]
+        divergent += drift
+        if not drift:
+            print(f"✅ {report['company_id']}: estoque consistente ({report['elapsed_seconds']}s)")
+            continue
+        print(f"❌ {report['company_id']}: {report['skus_with_drift']} SKUs e "
+              f"{report['branch_stocks_with_drift']} estoques de filial divergentes ({report['elapsed_seconds']}s)")
+        for sample in report["samples"][:10]:
+            where = f"filial {sample['branch_id']}" if sample["branch_id"] else "total"
+            print(f"   SKU {sample['sku_id']} ({where}): gravado {sample['recorded']}, esperado {sample['expected']}")
+        if repair:
+            print(f"✅ Corrigidos {report['skus_repaired']} SKUs (estoques de filial não são corrigidos)")
+    
+    if divergent and not repair:
+        print("Use --repair para corrigir as divergências")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Conferir o estoque contra o histórico de movimentações")
+    parser.add_argument("--company-id", type=UUID, default=None)
+    parser.add_argument("--repair", action="store_true")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--skip-branches", action="store_true", help="Conferir apenas o estoque total dos SKUs")
+    args = parser.parse_args()
+    verify_stock_drift(args.company_id, args.repair, args.workers, not args.skip_branches)